@@ -33,6 +33,7 @@ from modules.metadata_template_retrieval import get_metadata_templates, initiali
 from modules.rule_builder import show_rule_overview
 # Import the modified horizontal workflow component (now visual only)
 from modules.horizontal_workflow import display_horizontal_workflow
+from modules.session_state_manager import bind_session_results, create_extraction_results, create_categorization_results
 # Optionally re-add user journey guide if needed later
 # from modules.user_journey_guide import user_journey_guide, display_step_help 
 
@@ -89,7 +90,7 @@ def initialize_session_state():
     
     # Extraction results
     if not hasattr(st.session_state, "extraction_results"):
-        st.session_state.extraction_results = {}
+        st.session_state.extraction_results = create_extraction_results()
         logger.info("Initialized extraction_results in session state")
     
     # Selected results for metadata application - FIXED: Use direct attribute assignment
@@ -147,7 +148,7 @@ def initialize_session_state():
             "is_categorized": False,
             "categorized_files": 0,
             "total_files": 0,
-            "results": {},  # file_id -> categorization result
+            "results": create_categorization_results(),  # categorization results (persisted with the session's run)
             "errors": {},   # file_id -> error message
             "processing_state": {
                 "is_processing": False,
@@ -309,6 +310,9 @@ else:
     display_horizontal_workflow(st.session_state.current_page)
     st.markdown("--- ") # Add a separator
     
+    # Store the session's results in a run owned by the logged-in user
+    bind_session_results()
+    
     # Update activity timestamp (already done by navigate_to or check_session_timeout)
     # update_activity() # Redundant here
     
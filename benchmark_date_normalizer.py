@@ -0,0 +1,119 @@
+"""
+Benchmark for the shared date normalizer.
+Compares modules.date_normalizer with the date parsing cascades it replaced:
+dateutil's parser in direct_metadata_application_v3_fixed.convert_value_for_template,
+isoparse then fromisoformat in extract_document_features, and the
+fromisoformat then strptime cascade of the former Validator date check.
+Run with a file of date strings (one per line, optionally "field<TAB>value"):
+
+    python benchmark_date_normalizer.py --corpus dates.txt
+
+Without --corpus a synthetic corpus of AI and Box date shapes is used.
+"""
+import sys
+import time
+import random
+import argparse
+from datetime import datetime, timezone
+from typing import Any, Callable, List, Optional, Tuple
+from dateutil import parser
+from modules.date_normalizer import DateNormalizer
+
+def legacy_convert_date(value: str) -> Optional[str]:
+    """Previous date branch of convert_value_for_template (ConversionError replaced by None)."""
+    try:
+        dt = parser.parse(value)
+        if dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        else:
+            dt = dt.astimezone(timezone.utc)
+        return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
+    except (parser.ParserError, ValueError):
+        return None
+
+def legacy_feature_date(value: str) -> Optional[str]:
+    """Previous created_at/modified_at parsing of extract_document_features."""
+    try:
+        dt = None
+        try:
+            dt = parser.isoparse(value)
+        except Exception:
+            pass
+        if dt is None:
+            dt = datetime.fromisoformat(value[:-1] + '+00:00' if value.endswith('Z') else value)
+        return dt.strftime('%Y-%m-%d')
+    except Exception:
+        return None
+
+def legacy_is_date(value: str) -> bool:
+    """Previous date check of Validator._validate_data_type."""
+    try:
+        datetime.fromisoformat(value.replace('Z', '+00:00'))
+        return True
+    except ValueError:
+        try:
+            datetime.strptime(value, '%Y-%m-%d')
+            return True
+        except ValueError:
+            try:
+                datetime.strptime(value, '%m/%d/%Y')
+                return True
+            except ValueError:
+                return False
+
+def synthetic_corpus(size: int=5000, seed: int=7) -> List[Tuple[str, str]]:
+    """
+    Build (field, value) pairs where each field uses one date shape, as AI responses do.
+
+    Args:
+        size: Number of values
+        seed: Random seed
+
+    Returns:
+        list: (field, date string) pairs
+    """
+    rng = random.Random(seed)
+    shapes = {'invoice_date': '{y}-{m:02d}-{d:02d}', 'due_date': '{m:02d}/{d:02d}/{y}', 'signed_on': '{month} {d}, {y}', 'created_at': '{y}-{m:02d}-{d:02d}T{h:02d}:{mi:02d}:{s:02d}-07:00', 'effective': '{d} {month} {y}', 'period_end': '{y}{m:02d}{d:02d}'}
+    corpus = []
+    for _ in range(size):
+        field = rng.choice(list(shapes))
+        parts = {'y': rng.randint(1990, 2030), 'm': rng.randint(1, 12), 'd': rng.randint(1, 28), 'h': rng.randint(0, 23), 'mi': rng.randint(0, 59), 's': rng.randint(0, 59)}
+        parts['month'] = datetime(2000, parts['m'], 1).strftime(rng.choice(['%B', '%b']))
+        corpus.append((field, shapes[field].format(**parts)))
+    return corpus
+
+def load_corpus(path: str) -> List[Tuple[str, str]]:
+    """Load (field, value) pairs from a text file."""
+    with open(path, 'r') as f:
+        return [tuple(line.rstrip('\n').split('\t', 1)) if '\t' in line else ('', line.strip()) for line in f if line.strip()]
+
+def time_function(func: Callable[[str, str], Any], corpus: List[Tuple[str, str]], iterations: int) -> float:
+    """Return the mean time per value in microseconds."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for field, value in corpus:
+            func(field, value)
+    return (time.perf_counter() - start) / (iterations * len(corpus)) * 1000000.0
+
+def main(argv=None) -> int:
+    """Run the benchmark and print timings per use."""
+    argument_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    argument_parser.add_argument('--corpus', help='File of date strings, one per line ("field<TAB>value" to group by field)')
+    argument_parser.add_argument('--iterations', type=int, default=5)
+    args = argument_parser.parse_args(argv)
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    normalizer = DateNormalizer()
+    mismatches = sum((1 for field, value in corpus if legacy_convert_date(value) != normalizer.to_rfc3339(value, field)))
+    print(f'{len(corpus)} values, {mismatches} with RFC 3339 output differing from dateutil')
+    to_date = lambda value, field: (lambda parsed: parsed.strftime('%Y-%m-%d') if parsed else None)(normalizer.parse(value, field))
+    uses = [('template conversion', lambda field, value: legacy_convert_date(value), normalizer.to_rfc3339), ('document features', lambda field, value: legacy_feature_date(value), to_date), ('date validation', lambda field, value: legacy_is_date(value), lambda value, field: normalizer.parse(value, field) is not None)]
+    print(f"{'use':<22}{'legacy parsed':>15}{'normalizer parsed':>19}{'legacy us':>12}{'normalizer us':>16}{'speedup':>10}")
+    for name, legacy, current in uses:
+        legacy_parsed = sum((1 for field, value in corpus if legacy(field, value) not in (None, False)))
+        current_parsed = sum((1 for field, value in corpus if current(value, field) not in (None, False)))
+        legacy_time = time_function(legacy, corpus, args.iterations)
+        current_time = time_function(lambda field, value: current(value, field), corpus, args.iterations)
+        print(f'{name:<22}{legacy_parsed:>15}{current_parsed:>19}{legacy_time:>12.1f}{current_time:>16.1f}{legacy_time / current_time:>9.2f}x')
+    return 0
+if __name__ == '__main__':
+    sys.exit(main())
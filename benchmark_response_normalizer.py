@@ -0,0 +1,204 @@
+"""
+Benchmark for the Box AI response normalizer.
+Compares modules.response_normalizer with the per-branch parsing previously
+inlined in metadata_extraction.extract_structured_metadata. Run with a corpus
+of recorded API responses (JSON Lines, one response per line):
+
+    python benchmark_response_normalizer.py --corpus recorded_responses.jsonl
+
+Without --corpus a synthetic corpus covering every response shape is used.
+Logging is configured at INFO (as in the app) and written to os.devnull, so
+the timings include the cost of the log records each implementation emits.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from typing import Dict, Any, List
+from modules.response_normalizer import normalize_structured_response, detect_response_shape
+logger = logging.getLogger(__name__)
+
+def legacy_normalize_structured(response_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Previous inline parsing of extract_structured responses, copied verbatim."""
+    processed_response: Dict[str, Any] = {}
+    if 'answer' in response_data and isinstance(response_data['answer'], dict):
+        answer_dict = response_data['answer']
+        if 'fields' in answer_dict and isinstance(answer_dict['fields'], list):
+            logger.info("Processing 'answer' with 'fields' array format.")
+            fields_array = answer_dict['fields']
+            for field_item in fields_array:
+                if isinstance(field_item, dict) and 'key' in field_item and ('value' in field_item):
+                    field_key = field_item['key']
+                    extracted_value = field_item['value']
+                    confidence_level = field_item.get('confidence', 'Low')
+                    if not confidence_level or confidence_level not in ['High', 'Medium', 'Low']:
+                        logger.warning(f"Field {field_key}: AI provided confidence '{confidence_level}' which is invalid or missing. Defaulting to Low.")
+                        confidence_level = 'Low'
+                    processed_response[field_key] = extracted_value
+                    processed_response[f'{field_key}_confidence'] = confidence_level
+                else:
+                    logger.warning(f"Skipping invalid item in 'fields' array: {field_item}")
+        else:
+            logger.info("Processing 'answer' as standard key-value dictionary.")
+            for field_key, field_data in answer_dict.items():
+                extracted_value = None
+                confidence_level = 'Low'
+                try:
+                    if isinstance(field_data, dict) and 'value' in field_data and ('confidence' in field_data):
+                        extracted_value = field_data['value']
+                        confidence_level = field_data['confidence']
+                        if not confidence_level or confidence_level not in ['High', 'Medium', 'Low']:
+                            logger.warning(f"Field {field_key}: AI provided confidence '{confidence_level}' which is invalid. Defaulting to Low.")
+                            confidence_level = 'Low'
+                    elif field_data is None:
+                        logger.info(f'Field {field_key}: Received null value. Setting value to None and confidence to Low.')
+                        extracted_value = None
+                        confidence_level = 'Low'
+                    elif isinstance(field_data, dict) and 'value' in field_data and (len(field_data) == 1):
+                        logger.warning(f"Field {field_key}: AI response provided 'value' but no 'confidence'. Defaulting confidence to Low.")
+                        extracted_value = field_data['value']
+                        confidence_level = 'Low'
+                    else:
+                        logger.warning(f"Field {field_key}: Unexpected data format for field data: {field_data}. Defaulting confidence to Low.")
+                        extracted_value = field_data
+                        confidence_level = 'Low'
+                    processed_response[field_key] = extracted_value
+                    processed_response[f'{field_key}_confidence'] = confidence_level
+                except Exception as e:
+                    logger.error(f"Error processing field {field_key} with data '{field_data}': {str(e)}")
+                    processed_response[field_key] = field_data
+                    processed_response[f'{field_key}_confidence'] = 'Low'
+    elif 'answer' in response_data and isinstance(response_data['answer'], str):
+        logger.info("Processing 'answer' as string (potential freeform JSON).")
+        response_text = response_data['answer']
+        try:
+            json_start = response_text.find('{')
+            json_end = response_text.rfind('}') + 1
+            if json_start != -1 and json_end > json_start:
+                json_str = response_text[json_start:json_end]
+                parsed_json = json.loads(json_str)
+                if isinstance(parsed_json, dict):
+                    for field_key, field_data in parsed_json.items():
+                        if isinstance(field_data, dict) and 'value' in field_data and ('confidence' in field_data):
+                            extracted_value = field_data['value']
+                            confidence_level = field_data['confidence']
+                            if not confidence_level or confidence_level not in ['High', 'Medium', 'Low']:
+                                logger.warning(f"Field {field_key}: AI provided confidence '{confidence_level}' from parsed string which is invalid. Defaulting to Low.")
+                                confidence_level = 'Low'
+                            processed_response[field_key] = extracted_value
+                            processed_response[f'{field_key}_confidence'] = confidence_level
+                        else:
+                            logger.warning(f"Field {field_key}: Parsed JSON from AI 'answer' string for this field did not contain 'value'/'confidence' dict: {field_data}. Defaulting confidence to Low.")
+                            processed_response[field_key] = field_data
+                            processed_response[f'{field_key}_confidence'] = 'Low'
+                else:
+                    logger.warning(f"Parsed JSON from 'answer' string is not a dictionary: {parsed_json}")
+                    processed_response['_raw_response'] = response_text
+                    processed_response['_confidence_processing_failed'] = True
+            else:
+                logger.warning("No JSON object found in 'answer' string.")
+                processed_response['_raw_response'] = response_text
+                processed_response['_confidence_processing_failed'] = True
+        except Exception as e:
+            logger.error(f'Error parsing JSON from answer string: {str(e)}')
+            processed_response['_raw_response'] = response_text
+            processed_response['_confidence_processing_failed'] = True
+    elif 'entries' in response_data and len(response_data['entries']) > 0:
+        logger.info("Processing response using fallback 'entries' format.")
+        entry = response_data['entries'][0]
+        if 'metadata' in entry:
+            metadata = entry['metadata']
+            for field_key, field_value in metadata.items():
+                extracted_value = field_value
+                confidence_level = 'Low'
+                try:
+                    if isinstance(field_value, str) and field_value.strip().startswith('{') and field_value.strip().endswith('}'):
+                        try:
+                            parsed_value = json.loads(field_value)
+                            if isinstance(parsed_value, dict) and 'value' in parsed_value and ('confidence' in parsed_value):
+                                extracted_value = parsed_value['value']
+                                confidence_level = parsed_value['confidence']
+                                if not confidence_level or confidence_level not in ['High', 'Medium', 'Low']:
+                                    logger.warning(f"Field {field_key}: AI provided confidence '{confidence_level}' in 'entries' path which is invalid. Defaulting to Low.")
+                                    confidence_level = 'Low'
+                            else:
+                                logger.warning(f"Field {field_key}: Parsed JSON but keys 'value' and 'confidence' not found. Using raw value.")
+                        except json.JSONDecodeError:
+                            logger.warning(f"Field {field_key}: Failed to parse potential JSON value '{field_value}'. Using raw value.")
+                    else:
+                        logger.info(f'Field {field_key}: Value is not the expected JSON format. Using raw value and Low confidence.')
+                    processed_response[field_key] = extracted_value
+                    processed_response[f'{field_key}_confidence'] = confidence_level
+                except Exception as e:
+                    logger.error(f"Error processing field {field_key} with value '{field_value}': {str(e)}")
+                    processed_response[field_key] = field_value
+                    processed_response[f'{field_key}_confidence'] = 'Low'
+        else:
+            logger.warning(f"No 'metadata' field found in the structured API entry: {entry}")
+            processed_response['_error'] = "No 'metadata' field in API entry"
+            processed_response['_confidence_processing_failed'] = True
+    else:
+        logger.warning(f"Neither 'answer' nor 'entries' field found in the structured API response: {response_data}")
+        processed_response['_error'] = "Neither 'answer' nor 'entries' field in API response"
+        processed_response['_confidence_processing_failed'] = True
+    return processed_response
+
+def synthetic_corpus(num_fields: int=40, answer_padding: int=20000) -> List[Dict[str, Any]]:
+    """
+    Build one response per shape with num_fields fields.
+
+    Args:
+        num_fields: Number of fields per response
+        answer_padding: Characters of prose after the JSON in answer strings
+
+    Returns:
+        list: API responses
+    """
+    pairs = {f'field_{i}': {'value': f'value {i} ' * 5, 'confidence': ('High', 'Medium', 'Low', 'Unknown')[i % 4]} for i in range(num_fields)}
+    answer_text = 'Extracted metadata: ' + json.dumps(pairs) + ' Notes: ' + 'lorem {ipsum} ' * (answer_padding // 14)
+    return [{'answer': {'fields': [dict(key=key, **pair) for key, pair in pairs.items()]}}, {'answer': pairs}, {'answer': answer_text}, {'entries': [{'metadata': {key: json.dumps(pair) for key, pair in pairs.items()}}]}]
+
+def load_corpus(path: str) -> List[Dict[str, Any]]:
+    """
+    Load recorded API responses from a JSON Lines file.
+
+    Args:
+        path: Path to the corpus file
+
+    Returns:
+        list: API responses
+    """
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def time_function(func, corpus: List[Dict[str, Any]], iterations: int) -> float:
+    """Return the mean time per response in microseconds."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for response in corpus:
+            func(response)
+    return (time.perf_counter() - start) / (iterations * len(corpus)) * 1000000.0
+
+def main(argv=None) -> int:
+    """Run the benchmark and print per-shape timings."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', help='JSON Lines file of recorded extract_structured responses')
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, stream=open(os.devnull, 'w'), force=True, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    corpus = load_corpus(args.corpus) if args.corpus else synthetic_corpus()
+    by_shape: Dict[str, List[Dict[str, Any]]] = {}
+    for response in corpus:
+        by_shape.setdefault(detect_response_shape(response), []).append(response)
+    mismatches = sum((1 for response in corpus if legacy_normalize_structured(response) != normalize_structured_response(response)))
+    print(f'{len(corpus)} responses, {mismatches} with output differing from the legacy parser')
+    print(f"{'shape':<18}{'count':>7}{'legacy us':>12}{'normalizer us':>16}{'speedup':>10}")
+    for shape, responses in sorted(by_shape.items()):
+        legacy = time_function(legacy_normalize_structured, responses, args.iterations)
+        current = time_function(normalize_structured_response, responses, args.iterations)
+        print(f'{shape:<18}{len(responses):>7}{legacy:>12.1f}{current:>16.1f}{legacy / current:>9.2f}x')
+    return 0
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,22 +3,76 @@ Background processing system for long-running operations.
 This module provides a job queue for asynchronous processing of tasks
 without blocking the Streamlit UI.
 """
+import os
 import uuid
 import time
+import socket
+import heapq
 import threading
 import logging
 import json
+from collections import OrderedDict, deque
 from dataclasses import dataclass, field
 from typing import Dict, Any, Callable, List, Optional, Union, TypeVar, Generic
+from modules.job_store import SQLiteJobStore, RedisJobStore, create_job_store
 logger = logging.getLogger(__name__)
 T = TypeVar('T')
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 5
+PRIORITY_BULK = 10
+JOB_BROKER_URL_ENV = 'BOX_JOB_BROKER_URL'
+EXTERNAL_WORKERS_ENV = 'BOX_JOB_EXTERNAL_WORKERS'
+_job_handlers: Dict[str, Callable] = {}
+_current_job = threading.local()
+
+def register_job_handler(handler_name: str, func: Callable) -> Callable:
+    """
+    Register a module-level function that durable jobs can reference by name.
+    Durable jobs are stored with the handler name and JSON arguments so any
+    process that registered the same handler can run or resume them.
+    
+    Args:
+        handler_name: Name stored with durable jobs
+        func: Function to execute
+        
+    Returns:
+        The registered function
+    """
+    _job_handlers[handler_name] = func
+    return func
+
+class JobDeferred(Exception):
+    """
+    Raised by a job handler when this process cannot run a durable job yet,
+    e.g. because it has no Box client for the job's owner. The job is dropped
+    locally and its lease left to expire, so requeue_expired() returns it to
+    the queue for another worker or a later attempt.
+    """
+
+def get_current_job_id() -> Optional[str]:
+    """
+    Get the ID of the job running on the current worker thread.
+    
+    Returns:
+        str: Job ID or None when not called from a background job
+    """
+    return getattr(_current_job, 'job_id', None)
+
+def get_current_job_owner() -> Optional[str]:
+    """
+    Get the owner of the job running on the current worker thread.
+    
+    Returns:
+        str: Job owner or None when not called from a background job or the job has no owner
+    """
+    return getattr(_current_job, 'owner', None)
 
 @dataclass
 class Job:
     """Represents a background job."""
     id: str
     name: str
-    func: Callable
+    func: Optional[Callable]
     args: tuple = field(default_factory=tuple)
     kwargs: Dict[str, Any] = field(default_factory=dict)
     status: str = 'pending'
@@ -30,32 +84,72 @@ class Job:
     progress: float = 0.0
     progress_message: Optional[str] = None
     metadata: Dict[str, Any] = field(default_factory=dict)
+    priority: int = PRIORITY_NORMAL
+    owner: Optional[str] = None
+    handler: Optional[str] = None
+    item_results: Dict[str, Any] = field(default_factory=dict)
+    parent_id: Optional[str] = None
+    children: List[str] = field(default_factory=list)
 
 class BackgroundJobManager:
     """
     Job queue for background processing of long-running operations.
+    
+    Pending jobs are scheduled by priority level (lower value runs first) and,
+    within a level, round-robin across owners so one large job cannot starve
+    other users' jobs. Workers sleep on a condition variable until work arrives.
+    
+    With a job store attached, durable jobs are persisted and claimed from the
+    store with a lease, so they survive restarts and can be shared between
+    processes; a store thread feeds claimed jobs into the local ready queues.
+    With claim_jobs disabled the manager only submits and reads durable jobs,
+    leaving them to separate worker processes (see modules.job_worker).
     """
 
-    def __init__(self, num_workers: int=3, job_ttl: int=86400):
+    def __init__(self, num_workers: int=3, job_ttl: int=86400, interactive_workers: int=1, store: Optional[Union[SQLiteJobStore, RedisJobStore]]=None, worker_id: Optional[str]=None, poll_interval: float=1.0, claim_jobs: bool=True):
         """
         Initialize background job manager.
         
         Args:
             num_workers: Number of worker threads
             job_ttl: Time to live for completed jobs in seconds (default: 24 hours)
+            interactive_workers: Additional worker threads reserved for PRIORITY_INTERACTIVE jobs,
+                so interactive requests start even while bulk jobs occupy the regular workers
+            store: Optional durable job store (broker)
+            worker_id: ID used to claim jobs from the store (or None to derive one from host and PID)
+            poll_interval: Seconds between store polls for jobs enqueued by other processes
+            claim_jobs: Whether to run durable jobs from the store in this process
         """
         self.jobs: Dict[str, Job] = {}
+        self.store = store
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.poll_interval = poll_interval
+        self.claim_jobs = claim_jobs
+        self.interactive_workers = interactive_workers
+        self._queued = 0
+        self._busy = {'regular': 0, 'interactive': 0}
         self.num_workers = num_workers
         self.job_ttl = job_ttl
         self.running = True
         self.lock = threading.RLock()
+        self.condition = threading.Condition(self.lock)
+        self._ready: Dict[int, 'OrderedDict[str, deque]'] = {}
+        self._ready_levels: List[int] = []
         self.workers: List[threading.Thread] = []
         for i in range(num_workers):
             worker = threading.Thread(target=self._worker_loop, name=f'JobWorker-{i}', daemon=True)
             worker.start()
             self.workers.append(worker)
+        for i in range(interactive_workers):
+            worker = threading.Thread(target=self._worker_loop, args=(PRIORITY_INTERACTIVE,), name=f'JobWorker-interactive-{i}', daemon=True)
+            worker.start()
+            self.workers.append(worker)
         self.cleanup_thread = threading.Thread(target=self._cleanup_loop, name='JobCleanup', daemon=True)
         self.cleanup_thread.start()
+        self.store_thread = None
+        if self.store is not None:
+            self.store_thread = threading.Thread(target=self._store_loop, name='JobStoreFeeder', daemon=True)
+            self.store_thread.start()
 
     def enqueue(self, name: str, func: Callable[..., T], *args, **kwargs) -> str:
         """
@@ -69,13 +163,159 @@ class BackgroundJobManager:
         Returns:
             str: Job ID
         """
+        return self.submit(name, func, args=args, kwargs=kwargs)
+
+    def submit(self, name: str, func: Union[Callable[..., T], str], args: tuple=(), kwargs: Optional[Dict[str, Any]]=None, priority: int=PRIORITY_NORMAL, owner: Optional[str]=None, metadata: Optional[Dict[str, Any]]=None, durable: bool=False) -> str:
+        """
+        Add a job to the queue with scheduling options.
+        
+        Args:
+            name: Job name for display
+            func: Function to execute, or the name of a registered job handler
+            args: Positional arguments to pass to function
+            kwargs: Keyword arguments to pass to function
+            priority: Priority level (PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BULK or any int; lower runs first)
+            owner: Fairness group, e.g. a user or parent job ID (or None to schedule the job on its own)
+            metadata: Optional job metadata
+            durable: Persist the job in the job store. func must be a registered job handler
+                and args/kwargs must be JSON-serializable. Without a store the job runs in memory.
+            
+        Returns:
+            str: Job ID
+        """
+        func, handler_name = self._resolve_handler(func, durable)
         job_id = str(uuid.uuid4())
-        job = Job(id=job_id, name=name, func=func, args=args, kwargs=kwargs)
-        with self.lock:
+        if durable and self.store is not None:
+            self.store.add_job({'id': job_id, 'name': name, 'handler': handler_name, 'args': args, 'kwargs': kwargs or {}, 'priority': priority, 'owner': owner, 'created_at': time.time(), 'metadata': metadata or {}})
+            with self.condition:
+                self.condition.notify_all()
+            logger.info(f'Durable job {job_id} ({name}) stored with priority {priority}')
+            return job_id
+        job = Job(id=job_id, name=name, func=func, args=args, kwargs=kwargs or {}, metadata=metadata or {}, priority=priority, owner=owner)
+        with self.condition:
             self.jobs[job_id] = job
-        logger.info(f'Job {job_id} ({name}) enqueued')
+            self._push_ready(job)
+            self.condition.notify_all()
+        logger.info(f'Job {job_id} ({name}) enqueued with priority {priority}')
         return job_id
 
+    def submit_chunked(self, name: str, func: Union[Callable[..., T], str], items: List[Any], chunk_size: int=50, items_arg: str='items', kwargs: Optional[Dict[str, Any]]=None, priority: int=PRIORITY_NORMAL, owner: Optional[str]=None, metadata: Optional[Dict[str, Any]]=None, durable: bool=False) -> str:
+        """
+        Split a large job into chunked child jobs that run in parallel on the worker pool.
+        The returned parent job aggregates progress and completes when every chunk has
+        finished. Children checkpoint their items under the parent, so partial results
+        are readable through get_partial_results while the job runs.
+        
+        Args:
+            name: Job name for display
+            func: Function to execute per chunk, or the name of a registered job handler
+            items: Items to split into chunks
+            chunk_size: Number of items per child job
+            items_arg: Keyword argument that receives each chunk
+            kwargs: Other keyword arguments passed to every chunk
+            priority: Priority level of the child jobs
+            owner: Fairness group (or None to group the chunks under the parent job)
+            metadata: Optional parent job metadata
+            durable: Persist parent and children in the job store (see submit)
+            
+        Returns:
+            str: Parent job ID
+        """
+        func, handler_name = self._resolve_handler(func, durable)
+        items = list(items)
+        chunk_size = max(1, chunk_size)
+        parent_id = str(uuid.uuid4())
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        child_ids = [str(uuid.uuid4()) for _ in chunks]
+        child_owner = owner or parent_id
+        now = time.time()
+        parent_metadata = dict(metadata or {}, chunked=True, total_items=len(items), chunk_size=chunk_size, children=child_ids)
+        parent_status = 'running' if chunks else 'completed'
+        if durable and self.store is not None:
+            rows = [{'id': parent_id, 'name': name, 'handler': handler_name, 'kwargs': kwargs or {}, 'status': parent_status, 'priority': priority, 'owner': owner, 'created_at': now, 'metadata': parent_metadata}]
+            for index, (child_id, chunk) in enumerate(zip(child_ids, chunks)):
+                rows.append({'id': child_id, 'name': f'{name} [{index + 1}/{len(chunks)}]', 'handler': handler_name, 'kwargs': dict(kwargs or {}, **{items_arg: chunk}), 'priority': priority, 'owner': child_owner, 'created_at': now, 'metadata': {'parent_id': parent_id, 'chunk_index': index}, 'parent_id': parent_id})
+            self.store.add_jobs(rows)
+            with self.condition:
+                self.condition.notify_all()
+            logger.info(f'Durable job {parent_id} ({name}) stored as {len(chunks)} chunks')
+            return parent_id
+        parent = Job(id=parent_id, name=name, func=None, kwargs=kwargs or {}, status=parent_status, created_at=now, started_at=now, completed_at=None if chunks else now, metadata=parent_metadata, priority=priority, owner=owner, children=child_ids)
+        with self.condition:
+            self.jobs[parent_id] = parent
+            for index, (child_id, chunk) in enumerate(zip(child_ids, chunks)):
+                child = Job(id=child_id, name=f'{name} [{index + 1}/{len(chunks)}]', func=func, kwargs=dict(kwargs or {}, **{items_arg: chunk}), created_at=now, metadata={'parent_id': parent_id, 'chunk_index': index}, priority=priority, owner=child_owner, parent_id=parent_id)
+                self.jobs[child_id] = child
+                self._push_ready(child)
+            self.condition.notify_all()
+        logger.info(f'Job {parent_id} ({name}) enqueued as {len(chunks)} chunks')
+        return parent_id
+
+    def _resolve_handler(self, func: Union[Callable[..., T], str], durable: bool) -> tuple:
+        """
+        Resolve a job function and, for durable jobs, its registered handler name.
+        
+        Args:
+            func: Function or registered handler name
+            durable: Whether the job must be durable
+            
+        Returns:
+            tuple: (function, handler name or None)
+        """
+        if not isinstance(func, str) and not durable:
+            return (func, None)
+        handler_name = func if isinstance(func, str) else next((n for n, f in _job_handlers.items() if f is func), None)
+        if handler_name not in _job_handlers:
+            raise ValueError(f'Durable jobs require a registered job handler, got {func!r}')
+        return (_job_handlers[handler_name], handler_name)
+
+    def _push_ready(self, job: Job) -> None:
+        """
+        Add a pending job to the ready queues. Must be called with the lock held.
+        
+        Args:
+            job: Pending job
+        """
+        level = self._ready.get(job.priority)
+        if level is None:
+            level = self._ready[job.priority] = OrderedDict()
+            heapq.heappush(self._ready_levels, job.priority)
+        owner_key = job.owner or job.id
+        if owner_key not in level:
+            level[owner_key] = deque()
+        level[owner_key].append(job.id)
+        self._queued += 1
+
+    def _pop_ready(self, max_priority: Optional[int]=None) -> Optional[Job]:
+        """
+        Take the next pending job in priority/fairness order. Must be called with the lock held.
+        
+        Args:
+            max_priority: Only consider jobs with priority <= max_priority (or None for all)
+            
+        Returns:
+            Job: Next job to run, or None if nothing eligible is queued
+        """
+        while self._ready_levels:
+            priority = self._ready_levels[0]
+            if max_priority is not None and priority > max_priority:
+                return None
+            level = self._ready[priority]
+            while level:
+                owner_key, job_ids = next(iter(level.items()))
+                job_id = job_ids.popleft()
+                self._queued -= 1
+                if job_ids:
+                    level.move_to_end(owner_key)
+                else:
+                    del level[owner_key]
+                job = self.jobs.get(job_id)
+                if job is not None and job.status == 'pending':
+                    return job
+            heapq.heappop(self._ready_levels)
+            del self._ready[priority]
+        return None
+
     def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
         """
         Get job status and result.
@@ -87,10 +327,15 @@ class BackgroundJobManager:
             dict: Job information or None if not found
         """
         with self.lock:
-            if job_id not in self.jobs:
-                return None
-            job = self.jobs[job_id]
-            return {'id': job.id, 'name': job.name, 'status': job.status, 'result': job.result, 'error': job.error, 'created_at': job.created_at, 'started_at': job.started_at, 'completed_at': job.completed_at, 'progress': job.progress, 'progress_message': job.progress_message, 'metadata': job.metadata, 'runtime': (job.completed_at or time.time()) - (job.started_at or job.created_at) if job.started_at else 0}
+            job = self.jobs.get(job_id)
+        if self.store is not None and (job is None or job.handler):
+            stored_job = self.store.get_job(job_id)
+            if stored_job is not None:
+                return self._stored_job_to_dict(stored_job)
+        if job is None:
+            return None
+        with self.lock:
+            return {'id': job.id, 'name': job.name, 'status': job.status, 'result': job.result, 'error': job.error, 'created_at': job.created_at, 'started_at': job.started_at, 'completed_at': job.completed_at, 'progress': self._group_progress(job), 'progress_message': job.progress_message, 'metadata': job.metadata, 'priority': job.priority, 'owner': job.owner, 'runtime': (job.completed_at or time.time()) - (job.started_at or job.created_at) if job.started_at else 0}
 
     def get_all_jobs(self, include_completed: bool=True, limit: int=100) -> List[Dict[str, Any]]:
         """
@@ -108,14 +353,58 @@ class BackgroundJobManager:
             for job_id, job in self.jobs.items():
                 if not include_completed and job.status in ['completed', 'failed']:
                     continue
-                job_dict = {'id': job.id, 'name': job.name, 'status': job.status, 'created_at': job.created_at, 'started_at': job.started_at, 'completed_at': job.completed_at, 'progress': job.progress, 'progress_message': job.progress_message, 'runtime': (job.completed_at or time.time()) - (job.started_at or job.created_at) if job.started_at else 0}
+                job_dict = {'id': job.id, 'name': job.name, 'status': job.status, 'created_at': job.created_at, 'started_at': job.started_at, 'completed_at': job.completed_at, 'progress': self._group_progress(job), 'progress_message': job.progress_message, 'runtime': (job.completed_at or time.time()) - (job.started_at or job.created_at) if job.started_at else 0}
                 if job.status in ['completed', 'failed']:
                     if job.status == 'completed':
                         job_dict['result'] = job.result
                     else:
                         job_dict['error'] = job.error
                 jobs_list.append(job_dict)
-            return sorted(jobs_list, key=lambda x: x['created_at'], reverse=True)[:limit]
+        if self.store is not None:
+            local_ids = {job_dict['id'] for job_dict in jobs_list}
+            for stored_job in self.store.list_jobs(include_completed=include_completed, limit=limit):
+                if stored_job['id'] not in local_ids:
+                    jobs_list.append(self._stored_job_to_dict(stored_job))
+                else:
+                    jobs_list = [self._stored_job_to_dict(stored_job) if j['id'] == stored_job['id'] else j for j in jobs_list]
+        return sorted(jobs_list, key=lambda x: x['created_at'], reverse=True)[:limit]
+
+    def _group_progress(self, job: Job) -> float:
+        """
+        Get the progress of a local job, averaged over its chunks for parent jobs.
+        Must be called with the lock held.
+        
+        Args:
+            job: Job
+            
+        Returns:
+            float: Progress value (0.0 to 1.0)
+        """
+        if not job.children or job.status == 'completed':
+            return job.progress
+        children = [self.jobs[child_id] for child_id in job.children if child_id in self.jobs]
+        if not children:
+            return job.progress
+        return sum((1.0 if child.status == 'completed' else child.progress for child in children)) / len(job.children)
+
+    def _stored_job_to_dict(self, stored_job: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Convert a job from the store into the get_job format.
+        
+        Args:
+            stored_job: Job dictionary from the store
+            
+        Returns:
+            dict: Job information
+        """
+        started_at = stored_job.get('started_at')
+        runtime = (stored_job.get('completed_at') or time.time()) - started_at if started_at else 0
+        progress = stored_job.get('progress', 0.0)
+        if (stored_job.get('metadata') or {}).get('chunked') and stored_job['status'] == 'running':
+            children = self.store.get_children(stored_job['id'])
+            if children:
+                progress = sum((1.0 if child['status'] == 'completed' else child['progress'] for child in children)) / len(children)
+        return {'id': stored_job['id'], 'name': stored_job['name'], 'status': stored_job['status'], 'result': stored_job.get('result'), 'error': stored_job.get('error'), 'created_at': stored_job['created_at'], 'started_at': started_at, 'completed_at': stored_job.get('completed_at'), 'progress': progress, 'progress_message': stored_job.get('progress_message'), 'metadata': stored_job.get('metadata') or {}, 'priority': stored_job['priority'], 'owner': stored_job.get('owner'), 'parent_id': stored_job.get('parent_id'), 'worker_id': stored_job.get('worker_id'), 'runtime': runtime}
 
     def update_progress(self, job_id: str, progress: float, message: Optional[str]=None) -> bool:
         """
@@ -138,7 +427,10 @@ class BackgroundJobManager:
             job.progress = max(0.0, min(1.0, progress))
             if message is not None:
                 job.progress_message = message
-            return True
+            durable = job.handler is not None
+        if durable and self.store is not None:
+            self.store.update_progress(job_id, job.progress, message)
+        return True
 
     def cancel_job(self, job_id: str) -> bool:
         """
@@ -152,31 +444,191 @@ class BackgroundJobManager:
         Returns:
             bool: True if job was found and cancelled, False otherwise
         """
+        cancelled = False
         with self.lock:
-            if job_id not in self.jobs:
-                return False
-            job = self.jobs[job_id]
-            if job.status in ['completed', 'failed', 'cancelled']:
-                return False
-            job.status = 'cancelled'
-            job.completed_at = time.time()
-            return True
+            job = self.jobs.get(job_id)
+            if job is not None and job.status not in ['completed', 'failed', 'cancelled']:
+                job.status = 'cancelled'
+                job.completed_at = time.time()
+                cancelled = True
+                for child_id in job.children:
+                    child = self.jobs.get(child_id)
+                    if child is not None and child.status in ['pending', 'running']:
+                        child.status = 'cancelled'
+                        child.completed_at = job.completed_at
+        if self.store is not None and (job is None or job.handler):
+            cancelled = self.store.cancel_job(job_id) or cancelled
+        return cancelled
+
+    def is_cancelled(self, job_id: str) -> bool:
+        """
+        Check whether a job (or the parent of a chunk job) has been cancelled.
+        Long-running job functions call this between items.
+        
+        Args:
+            job_id: Job ID
+            
+        Returns:
+            bool: True if the job should stop
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None and not job.handler:
+                parent = self.jobs.get(job.parent_id) if job.parent_id else None
+                return job.status == 'cancelled' or (parent is not None and parent.status == 'cancelled')
+        if self.store is not None:
+            return self.store.get_status(job_id) == 'cancelled'
+        return False
+
+    def get_partial_results(self, job_id: str, offset: int=0) -> Dict[str, Any]:
+        """
+        Read item results recorded so far by a running or finished job.
+        Poll with offset set to the number of items already read to stream new results.
+        
+        Args:
+            job_id: Job ID (the parent ID for chunked jobs)
+            offset: Number of items already read
+            
+        Returns:
+            dict: Item key to item result, in the order items finished
+        """
+        return self.get_checkpointed_items(job_id, status=None, offset=offset)
+
+    def _checkpoint_job_id(self, job_id: str) -> str:
+        """
+        Get the job that holds item checkpoints for a job: the parent for chunk jobs.
+        
+        Args:
+            job_id: Job ID
+            
+        Returns:
+            str: Job ID to checkpoint under
+        """
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None:
+                return job.parent_id or job_id
+        if self.store is not None:
+            stored_job = self.store.get_job(job_id)
+            if stored_job is not None and stored_job.get('parent_id'):
+                return stored_job['parent_id']
+        return job_id
+
+    def checkpoint_item(self, job_id: str, item_key: str, result: Any=None, status: str='completed') -> None:
+        """
+        Record that one item of a job has been processed, so a resumed job can skip it.
+        Items of chunk jobs are recorded under the parent job.
+        
+        Args:
+            job_id: Job ID
+            item_key: Key identifying the item (e.g. file ID)
+            result: Item result (JSON-serializable for durable jobs)
+            status: Item status ('completed' items are skipped on resume)
+        """
+        job_id = self._checkpoint_job_id(job_id)
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None and not job.handler:
+                job.item_results[str(item_key)] = {'status': status, 'result': result}
+                return
+        if self.store is not None:
+            self.store.checkpoint_item(job_id, item_key, result, status)
 
-    def _worker_loop(self):
-        """Worker thread main loop."""
+    def get_checkpointed_items(self, job_id: str, status: Optional[str]='completed', offset: int=0) -> Dict[str, Any]:
+        """
+        Get checkpointed item results for a job.
+        
+        Args:
+            job_id: Job ID
+            status: Only return items with this status (or None for all)
+            offset: Number of leading items to skip
+            
+        Returns:
+            dict: Item key to item result
+        """
+        job_id = self._checkpoint_job_id(job_id)
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None and not job.handler:
+                items = [(key, item['result']) for key, item in job.item_results.items() if status is None or item['status'] == status]
+                return dict(items[offset:])
+        if self.store is not None:
+            return self.store.get_item_results(job_id, status, offset)
+        return {}
+
+    def _worker_loop(self, max_priority: Optional[int]=None):
+        """
+        Worker thread main loop.
+        
+        Args:
+            max_priority: Only run jobs with priority <= max_priority (or None for all)
+        """
+        pool = 'regular' if max_priority is None else 'interactive'
         while self.running:
-            job_to_process = None
-            with self.lock:
-                for job in self.jobs.values():
-                    if job.status == 'pending':
-                        job_to_process = job
-                        job.status = 'running'
-                        job.started_at = time.time()
-                        break
-            if job_to_process:
+            with self.condition:
+                job_to_process = self._pop_ready(max_priority)
+                while job_to_process is None and self.running:
+                    self.condition.wait()
+                    job_to_process = self._pop_ready(max_priority)
+                if job_to_process is None:
+                    return
+                job_to_process.status = 'running'
+                job_to_process.started_at = job_to_process.started_at or time.time()
+                self._busy[pool] += 1
+            try:
                 self._process_job(job_to_process)
-            else:
-                time.sleep(0.1)
+            finally:
+                with self.condition:
+                    self._busy[pool] -= 1
+                    self.condition.notify_all()
+
+    def _store_loop(self):
+        """Claim durable jobs from the store into the local ready queues and renew leases."""
+        while self.running:
+            try:
+                self.store.requeue_expired()
+                with self.lock:
+                    owned_ids = [job.id for job in self.jobs.values() if job.handler and job.status in ('pending', 'running')]
+                    capacity = self.num_workers - self._busy['regular'] - self._queued
+                    interactive_capacity = self.interactive_workers - self._busy['interactive']
+                self.store.heartbeat(self.worker_id, owned_ids)
+                claimed = 0
+                while self.running and self.claim_jobs and (capacity > 0 or interactive_capacity > 0):
+                    stored_job = self.store.claim_next_job(self.worker_id, None if capacity > 0 else PRIORITY_INTERACTIVE)
+                    if stored_job is None:
+                        break
+                    if stored_job['priority'] <= PRIORITY_INTERACTIVE and interactive_capacity > 0:
+                        interactive_capacity -= 1
+                    else:
+                        capacity -= 1
+                    self._enqueue_claimed(stored_job)
+                    claimed += 1
+                if claimed:
+                    continue
+            except Exception as e:
+                logger.error(f'Error polling job store: {str(e)}')
+            with self.condition:
+                if self.running:
+                    self.condition.wait(self.poll_interval)
+
+    def _enqueue_claimed(self, stored_job: Dict[str, Any]) -> None:
+        """
+        Add a job claimed from the store to the local ready queues.
+        
+        Args:
+            stored_job: Job dictionary from the store
+        """
+        func = _job_handlers.get(stored_job['handler'])
+        if func is None:
+            logger.error(f"Job {stored_job['id']} uses unknown handler '{stored_job['handler']}'")
+            self.store.finish_job(stored_job['id'], self.worker_id, 'failed', error=f"Unknown job handler: {stored_job['handler']}")
+            return
+        job = Job(id=stored_job['id'], name=stored_job['name'], func=func, args=tuple(stored_job.get('args') or ()), kwargs=stored_job.get('kwargs') or {}, created_at=stored_job['created_at'], started_at=stored_job.get('started_at'), progress=stored_job.get('progress', 0.0), progress_message=stored_job.get('progress_message'), metadata=stored_job.get('metadata') or {}, priority=stored_job['priority'], owner=stored_job.get('owner'), handler=stored_job['handler'], parent_id=stored_job.get('parent_id'))
+        with self.condition:
+            self.jobs[job.id] = job
+            self._push_ready(job)
+            self.condition.notify_all()
+        logger.info(f'Claimed durable job {job.id} ({job.name}) from job store')
 
     def _process_job(self, job: Job):
         """
@@ -186,6 +638,8 @@ class BackgroundJobManager:
             job: Job to process
         """
         logger.info(f'Starting job {job.id} ({job.name})')
+        _current_job.job_id = job.id
+        _current_job.owner = job.owner
         try:
             result = job.func(*job.args, **job.kwargs)
             with self.lock:
@@ -196,8 +650,16 @@ class BackgroundJobManager:
                         job.status = 'completed'
                         job.completed_at = time.time()
                         job.progress = 1.0
+            if job.handler and self.store is not None:
+                self.store.finish_job(job.id, self.worker_id, 'completed', result=result)
             logger.info(f'Job {job.id} ({job.name}) completed successfully')
         except Exception as e:
+            if isinstance(e, JobDeferred) and job.handler and self.store is not None:
+                # Without heartbeats the lease expires and the job goes back to the queue
+                logger.info(f'Job {job.id} ({job.name}) deferred: {str(e)}')
+                with self.lock:
+                    self.jobs.pop(job.id, None)
+                return
             logger.exception(f'Job {job.id} ({job.name}) failed: {str(e)}')
             with self.lock:
                 if job.id in self.jobs:
@@ -206,6 +668,49 @@ class BackgroundJobManager:
                         job.error = str(e)
                         job.status = 'failed'
                         job.completed_at = time.time()
+            if job.handler and self.store is not None:
+                self.store.finish_job(job.id, self.worker_id, 'failed', error=str(e))
+        finally:
+            _current_job.job_id = None
+            _current_job.owner = None
+        if job.parent_id:
+            self._update_group(job.parent_id, durable=job.handler is not None)
+
+    def _update_group(self, parent_id: str, durable: bool) -> None:
+        """
+        Complete a parent job once all of its chunk jobs have finished.
+        
+        Args:
+            parent_id: Parent job ID
+            durable: Whether the group lives in the job store
+        """
+        if durable and self.store is not None:
+            children = self.store.get_children(parent_id)
+        else:
+            with self.lock:
+                parent = self.jobs.get(parent_id)
+                if parent is None:
+                    return
+                children = [{'id': child.id, 'status': child.status, 'error': child.error} for child in (self.jobs.get(child_id) for child_id in parent.children) if child is not None]
+        if any((child['status'] in ('pending', 'running') for child in children)):
+            return
+        statuses = [child['status'] for child in children]
+        status = 'failed' if 'failed' in statuses else 'cancelled' if 'cancelled' in statuses else 'completed'
+        error = next((child['error'] for child in children if child['status'] == 'failed'), None)
+        summary = {'chunks': len(children), 'completed_chunks': statuses.count('completed'), 'failed_chunks': statuses.count('failed'), 'cancelled_chunks': statuses.count('cancelled')}
+        if durable and self.store is not None:
+            if self.store.complete_group(parent_id, status, summary, error):
+                logger.info(f'Job {parent_id} finished with status {status}')
+            return
+        with self.lock:
+            if parent.status == 'running':
+                parent.status = status
+                parent.result = summary
+                parent.error = error
+                parent.completed_at = time.time()
+                if status == 'completed':
+                    parent.progress = 1.0
+                logger.info(f'Job {parent_id} ({parent.name}) finished with status {status}')
 
     def _cleanup_loop(self):
         """Periodically clean up old completed jobs."""
@@ -223,38 +728,55 @@ class BackgroundJobManager:
                         del self.jobs[job_id]
                     if jobs_to_remove:
                         logger.info(f'Cleaned up {len(jobs_to_remove)} old jobs')
+                if self.store is not None:
+                    self.store.purge_finished(self.job_ttl)
             except Exception as e:
                 logger.error(f'Error in job cleanup: {str(e)}')
 
     def shutdown(self):
         """Shutdown the job manager, stopping all threads."""
         logger.info('Shutting down background job manager')
-        self.running = False
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
         for worker in self.workers:
             if worker.is_alive():
                 worker.join(timeout=1.0)
         if self.cleanup_thread.is_alive():
             self.cleanup_thread.join(timeout=1.0)
+        if self.store_thread is not None and self.store_thread.is_alive():
+            self.store_thread.join(timeout=1.0)
 _job_manager = None
 
 def get_job_manager() -> BackgroundJobManager:
     """
     Get the global job manager instance, creating it if necessary.
+    Durable jobs use the broker named by the BOX_JOB_BROKER_URL environment
+    variable (default: the SQLite database in .cache). Set BOX_JOB_EXTERNAL_WORKERS=1
+    when separate worker processes run the durable jobs, so this process only
+    submits them and reads their progress and results.
     
     Returns:
         BackgroundJobManager: Global job manager instance
     """
     global _job_manager
     if _job_manager is None:
-        _job_manager = BackgroundJobManager()
+        store = None
+        try:
+            store = create_job_store(os.environ.get(JOB_BROKER_URL_ENV))
+        except Exception as e:
+            logger.warning(f'Durable job store unavailable, durable jobs will run in memory: {str(e)}')
+        external_workers = os.environ.get(EXTERNAL_WORKERS_ENV, '').lower() in ('1', 'true', 'yes')
+        _job_manager = BackgroundJobManager(store=store, claim_jobs=not (external_workers and store is not None))
     return _job_manager
 
-def run_in_background(name: str) -> Callable:
+def run_in_background(name: str, priority: int=PRIORITY_NORMAL) -> Callable:
     """
     Decorator to run a function in the background.
     
     Args:
         name: Job name for display
+        priority: Priority level for the enqueued jobs
         
     Returns:
         Decorated function that returns a job ID
@@ -264,6 +786,6 @@ def run_in_background(name: str) -> Callable:
 
         def wrapper(*args, **kwargs):
             job_manager = get_job_manager()
-            return job_manager.enqueue(name, func, *args, **kwargs)
+            return job_manager.submit(name, func, args=args, kwargs=kwargs, priority=priority)
         return wrapper
     return decorator
\ No newline at end of file
@@ -13,12 +13,16 @@ logger = logging.getLogger(__name__)
 T = TypeVar('T')
 U = TypeVar('U')
 
+class BatchCancelledError(Exception):
+    """Raised for items that were not processed because the batch was cancelled."""
+    pass
+
 class BatchProcessor:
     """
     Batch processor with configurable concurrency, throttling, and monitoring.
     """
 
-    def __init__(self, max_workers: int=5, batch_size: int=10, throttle_rate: float=0.0, timeout: Optional[float]=300.0):
+    def __init__(self, max_workers: int=5, batch_size: int=10, throttle_rate: float=0.0, timeout: Optional[float]=300.0, executor_type: str='thread'):
         """
         Initialize batch processor.
         
@@ -27,17 +31,23 @@ class BatchProcessor:
             batch_size: Default batch size for processing
             throttle_rate: Minimum seconds between requests (rate limiting)
             timeout: Default timeout for batch operations in seconds
+            executor_type: 'thread' for I/O-bound work or 'process' for CPU-bound work.
+                In process mode items and process_func must be picklable (module-level
+                functions and plain data task descriptors) and throttling is not applied.
         """
+        if executor_type not in ('thread', 'process'):
+            raise ValueError(f"Unsupported executor type: {executor_type}")
         self.max_workers = max_workers
         self.batch_size = batch_size
         self.throttle_rate = throttle_rate
         self.timeout = timeout
+        self.executor_type = executor_type
         self.last_request_time = 0.0
         self.throttle_lock = threading.RLock()
         self.metrics = {'total_batches': 0, 'total_items': 0, 'successful_items': 0, 'failed_items': 0, 'total_time': 0.0, 'last_batch_time': 0.0, 'last_batch_size': 0, 'last_batch_success_rate': 0.0}
         self.metrics_lock = threading.RLock()
 
-    def process_batch(self, items: List[T], process_func: Callable[[T], U], batch_size: Optional[int]=None, max_workers: Optional[int]=None, timeout: Optional[float]=None, progress_callback: Optional[Callable[[int, int, float], None]]=None) -> List[Tuple[T, Optional[U], Optional[Exception]]]:
+    def process_batch(self, items: List[T], process_func: Callable[[T], U], batch_size: Optional[int]=None, max_workers: Optional[int]=None, timeout: Optional[float]=None, progress_callback: Optional[Callable[[int, int, float], None]]=None, cancel_check: Optional[Callable[[], bool]]=None) -> List[Tuple[T, Optional[U], Optional[Exception]]]:
         """
         Process a batch of items with concurrency control.
         
@@ -48,6 +58,9 @@ class BatchProcessor:
             max_workers: Maximum workers (or None for default)
             timeout: Timeout in seconds (or None for default)
             progress_callback: Optional callback for progress updates
+            cancel_check: Optional callable returning True once the batch should stop.
+                It is checked before each batch and, in thread mode, before each item
+                starts; items that never start are returned with a BatchCancelledError.
             
         Returns:
             List of tuples (item, result, exception) for each item
@@ -60,14 +73,23 @@ class BatchProcessor:
             self.metrics['total_batches'] += 1
             self.metrics['total_items'] += len(items)
         results: List[Tuple[T, Optional[U], Optional[Exception]]] = []
-        for i in range(0, len(items), batch_size):
-            batch = items[i:i + batch_size]
-            batch_results = self._process_batch_concurrent(batch, process_func, max_workers, timeout)
-            results.extend(batch_results)
-            if progress_callback:
-                items_processed = min(i + batch_size, len(items))
-                progress = items_processed / len(items)
-                progress_callback(items_processed, len(items), progress)
+        process_pool = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) if self.executor_type == 'process' and items else None
+        try:
+            for i in range(0, len(items), batch_size):
+                batch = items[i:i + batch_size]
+                if cancel_check is not None and cancel_check():
+                    logger.info(f'Batch cancelled with {len(items) - i} items remaining')
+                    results.extend(((item, None, BatchCancelledError('Batch cancelled')) for item in items[i:]))
+                    break
+                batch_results = self._process_batch_concurrent(batch, process_func, max_workers, timeout, process_pool, cancel_check)
+                results.extend(batch_results)
+                if progress_callback:
+                    items_processed = min(i + batch_size, len(items))
+                    progress = items_processed / len(items)
+                    progress_callback(items_processed, len(items), progress)
+        finally:
+            if process_pool is not None:
+                process_pool.shutdown(wait=True)
         end_time = time.time()
         batch_time = end_time - start_time
         successful_items = sum((1 for _, result, error in results if error is None))
@@ -83,7 +105,7 @@ class BatchProcessor:
         logger.info(f'Batch processed: {len(items)} items, {successful_items} successful, {failed_items} failed, {batch_time:.2f}s, {success_rate:.1f}% success rate')
         return results
 
-    def _process_batch_concurrent(self, batch: List[T], process_func: Callable[[T], U], max_workers: int, timeout: Optional[float]) -> List[Tuple[T, Optional[U], Optional[Exception]]]:
+    def _process_batch_concurrent(self, batch: List[T], process_func: Callable[[T], U], max_workers: int, timeout: Optional[float], process_pool: Optional[concurrent.futures.ProcessPoolExecutor]=None, cancel_check: Optional[Callable[[], bool]]=None) -> List[Tuple[T, Optional[U], Optional[Exception]]]:
         """
         Process a batch of items concurrently.
         
@@ -92,34 +114,55 @@ class BatchProcessor:
             process_func: Function to process each item
             max_workers: Maximum number of concurrent workers
             timeout: Timeout in seconds
+            process_pool: Process pool shared across batches (process mode only)
+            cancel_check: Optional callable returning True once the batch should stop
             
         Returns:
             List of tuples (item, result, exception) for each item
         """
-        results: List[Tuple[T, Optional[U], Optional[Exception]]] = []
+        if process_pool is not None:
+            future_to_item = {process_pool.submit(process_func, item): item for item in batch}
+            return self._collect_results(future_to_item, timeout)
         with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-            future_to_item = {executor.submit(self._throttled_process, process_func, item): item for item in batch}
-            for future in concurrent.futures.as_completed(future_to_item, timeout=timeout):
-                item = future_to_item[future]
-                try:
-                    result = future.result()
-                    results.append((item, result, None))
-                except Exception as e:
-                    logger.warning(f'Error processing item: {str(e)}')
-                    results.append((item, None, e))
+            future_to_item = {executor.submit(self._throttled_process, process_func, item, cancel_check): item for item in batch}
+            return self._collect_results(future_to_item, timeout)
+
+    def _collect_results(self, future_to_item: Dict[concurrent.futures.Future, T], timeout: Optional[float]) -> List[Tuple[T, Optional[U], Optional[Exception]]]:
+        """
+        Collect results from submitted futures as they complete.
+        
+        Args:
+            future_to_item: Mapping of futures to the items they process
+            timeout: Timeout in seconds
+            
+        Returns:
+            List of tuples (item, result, exception) for each item
+        """
+        results: List[Tuple[T, Optional[U], Optional[Exception]]] = []
+        for future in concurrent.futures.as_completed(future_to_item, timeout=timeout):
+            item = future_to_item[future]
+            try:
+                result = future.result()
+                results.append((item, result, None))
+            except Exception as e:
+                logger.warning(f'Error processing item: {str(e)}')
+                results.append((item, None, e))
         return results
 
-    def _throttled_process(self, process_func: Callable[[T], U], item: T) -> U:
+    def _throttled_process(self, process_func: Callable[[T], U], item: T, cancel_check: Optional[Callable[[], bool]]=None) -> U:
         """
         Process an item with throttling.
         
         Args:
             process_func: Function to process the item
             item: Item to process
+            cancel_check: Optional callable returning True once the batch should stop
             
         Returns:
             Processing result
         """
+        if cancel_check is not None and cancel_check():
+            raise BatchCancelledError('Batch cancelled')
         if self.throttle_rate > 0:
             with self.throttle_lock:
                 current_time = time.time()
@@ -165,7 +208,7 @@ class AdaptiveBatchProcessor(BatchProcessor):
     Batch processor with adaptive concurrency based on system load and performance.
     """
 
-    def __init__(self, min_workers: int=2, max_workers: int=10, batch_size: int=10, throttle_rate: float=0.0, timeout: Optional[float]=300.0, target_success_rate: float=95.0, adaptation_interval: int=3):
+    def __init__(self, min_workers: int=2, max_workers: int=10, batch_size: int=10, throttle_rate: float=0.0, timeout: Optional[float]=300.0, target_success_rate: float=95.0, adaptation_interval: int=3, executor_type: str='thread'):
         """
         Initialize adaptive batch processor.
         
@@ -177,8 +220,9 @@ class AdaptiveBatchProcessor(BatchProcessor):
             timeout: Default timeout for batch operations in seconds
             target_success_rate: Target success rate percentage
             adaptation_interval: Number of batches between adaptations
+            executor_type: 'thread' for I/O-bound work or 'process' for CPU-bound work
         """
-        super().__init__(max_workers=max_workers, batch_size=batch_size, throttle_rate=throttle_rate, timeout=timeout)
+        super().__init__(max_workers=max_workers, batch_size=batch_size, throttle_rate=throttle_rate, timeout=timeout, executor_type=executor_type)
         self.min_workers = min_workers
         self.current_workers = max_workers
         self.target_success_rate = target_success_rate
@@ -187,7 +231,7 @@ class AdaptiveBatchProcessor(BatchProcessor):
         self.performance_history = []
         self.history_lock = threading.RLock()
 
-    def process_batch(self, items: List[T], process_func: Callable[[T], U], batch_size: Optional[int]=None, max_workers: Optional[int]=None, timeout: Optional[float]=None, progress_callback: Optional[Callable[[int, int, float], None]]=None) -> List[Tuple[T, Optional[U], Optional[Exception]]]:
+    def process_batch(self, items: List[T], process_func: Callable[[T], U], batch_size: Optional[int]=None, max_workers: Optional[int]=None, timeout: Optional[float]=None, progress_callback: Optional[Callable[[int, int, float], None]]=None, cancel_check: Optional[Callable[[], bool]]=None) -> List[Tuple[T, Optional[U], Optional[Exception]]]:
         """
         Process a batch of items with adaptive concurrency.
         
@@ -198,13 +242,14 @@ class AdaptiveBatchProcessor(BatchProcessor):
             max_workers: Maximum workers (or None for default)
             timeout: Timeout in seconds (or None for default)
             progress_callback: Optional callback for progress updates
+            cancel_check: Optional callable returning True once the batch should stop
             
         Returns:
             List of tuples (item, result, exception) for each item
         """
         if max_workers is None:
             max_workers = self.current_workers
-        results = super().process_batch(items, process_func, batch_size, max_workers, timeout, progress_callback)
+        results = super().process_batch(items, process_func, batch_size, max_workers, timeout, progress_callback, cancel_check)
         successful_items = sum((1 for _, result, error in results if error is None))
         success_rate = successful_items / len(results) * 100 if results else 0
         with self.history_lock:
@@ -246,4 +291,47 @@ class AdaptiveBatchProcessor(BatchProcessor):
             metrics['max_workers'] = self.max_workers
             metrics['target_success_rate'] = self.target_success_rate
             metrics['performance_history'] = self.performance_history.copy()
-        return metrics
\ No newline at end of file
+        return metrics
+_cpu_pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+_cpu_pool_lock = threading.RLock()
+
+def get_cpu_pool() -> concurrent.futures.ProcessPoolExecutor:
+    """
+    Get the process pool shared by CPU-bound stages that run one item at a time
+    from many threads (e.g. parsing AI responses inside concurrent categorizations).
+
+    Returns:
+        ProcessPoolExecutor: Shared process pool
+    """
+    global _cpu_pool
+    with _cpu_pool_lock:
+        if _cpu_pool is None:
+            _cpu_pool = concurrent.futures.ProcessPoolExecutor()
+        return _cpu_pool
+
+def run_in_cpu_pool(func: Callable[..., U], *args: Any) -> U:
+    """
+    Run a picklable function in the shared process pool and wait for its result.
+    Falls back to running inline if the pool is broken (e.g. a worker was killed).
+
+    Args:
+        func: Module-level function
+        *args: Picklable arguments
+
+    Returns:
+        Result of func
+    """
+    try:
+        return get_cpu_pool().submit(func, *args).result()
+    except concurrent.futures.process.BrokenProcessPool as e:
+        logger.warning(f'Shared process pool is broken ({str(e)}); running {func.__name__} inline')
+        reset_cpu_pool()
+        return func(*args)
+
+def reset_cpu_pool() -> None:
+    """Drop the shared process pool (e.g. after a worker died) so the next use starts a new one."""
+    global _cpu_pool
+    with _cpu_pool_lock:
+        if _cpu_pool is not None:
+            _cpu_pool.shutdown(wait=False, cancel_futures=True)
+        _cpu_pool = None
@@ -0,0 +1,229 @@
+"""
+Vectorized validation of many extraction results at once.
+This module applies a template's validation rules column by column over a
+pandas DataFrame of field values (one row per file, one column per response
+key), producing the same field_validations/mandatory_check structure that
+Validator.validate returns per file. It is meant for re-validating thousands
+of stored results after a rule edit.
+"""
+import re
+import logging
+from typing import Dict, List, Any, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from modules.validation_engine import Validator, normalize_field_key
+
+logger = logging.getLogger(__name__)
+
+def build_value_frame(responses: Dict[str, Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Build the columnar table of raw AI responses.
+
+    Args:
+        responses: File ID to AI response (field key to value or {'value', 'confidence'} dict)
+
+    Returns:
+        DataFrame: One row per file (indexed by file ID) and one object column per response key;
+            cells for keys a response does not have are NaN, while None values stay None
+    """
+    rows = {str(file_id): response for file_id, response in responses.items() if isinstance(response, dict)}
+    columns = list(dict.fromkeys(key for response in rows.values() for key in response))
+    # Built column by column so that None values stay None instead of becoming NaN like absent keys
+    return pd.DataFrame({column: pd.Series([response.get(column, np.nan) for response in rows.values()], index=list(rows), dtype=object) for column in columns}, index=list(rows))
+
+def _unwrap_values(raw: pd.Series) -> pd.Series:
+    """Get the field values from cells that may hold {'value': ..., 'confidence': ...} dicts."""
+    is_wrapped = raw.map(lambda cell: isinstance(cell, dict) and 'value' in cell).to_numpy(dtype=bool)
+    if not is_wrapped.any():
+        return raw
+    values = raw.to_numpy(dtype=object, copy=True)
+    for position in np.flatnonzero(is_wrapped):
+        values[position] = values[position].get('value')
+    return pd.Series(values, index=raw.index, dtype=object)
+
+def _is_present(raw: pd.Series) -> np.ndarray:
+    """Get which cells hold a response value (None included), as opposed to NaN for absent keys."""
+    return raw.notna().to_numpy(dtype=bool) | np.equal(raw.to_numpy(dtype=object), None).astype(bool)
+
+def build_key_positions(responses: Dict[str, Dict[str, Any]]) -> pd.DataFrame:
+    """
+    Build the table of where each key appears in its response, for validate_frame.
+
+    Args:
+        responses: File ID to AI response, as passed to build_value_frame
+
+    Returns:
+        DataFrame: One row per file and one column per response key holding the key's
+            position in that response (0 for the first key), NaN for keys a response does not have
+    """
+    rows = {str(file_id): response for file_id, response in responses.items() if isinstance(response, dict)}
+    positions = [{key: position for position, key in enumerate(response)} for response in rows.values()]
+    return pd.DataFrame(positions, index=list(rows), dtype=float)
+
+def _resolve_column(frame: pd.DataFrame, field_key: Optional[str], columns_by_normalized_key: Dict[str, List[Any]], key_positions: Optional[pd.DataFrame]=None) -> Tuple[pd.Series, pd.Series]:
+    """
+    Find each file's value for a field: the exact column first, then columns whose normalized key matches.
+
+    Returns:
+        tuple: (raw values, whether the field was found with a non-None value) per file
+    """
+    # Like Validator.validate, the exact key wins, then the first normalized match in each
+    # response's own key order, even if its value is None
+    if field_key is None:
+        return (pd.Series(None, index=frame.index, dtype=object), np.zeros(len(frame.index), dtype=bool))
+    normalized = [column for column in columns_by_normalized_key.get(normalize_field_key(field_key), []) if column != field_key]
+    raw = None
+    if len(normalized) == 1:
+        raw = frame[normalized[0]]
+    elif normalized:
+        if key_positions is not None:
+            order = np.column_stack([key_positions[column].reindex(frame.index).to_numpy(dtype=float) if column in key_positions.columns else np.full(len(frame.index), np.nan) for column in normalized])
+        else:
+            order = np.column_stack([np.where(_is_present(frame[column]), position, np.nan) for position, column in enumerate(normalized)])
+        chosen = np.nan_to_num(order, nan=np.inf).argmin(axis=1)
+        candidates = np.column_stack([frame[column].to_numpy(dtype=object) for column in normalized])
+        raw = pd.Series(candidates[np.arange(len(frame.index)), chosen], index=frame.index, dtype=object)
+    if field_key in frame.columns:
+        exact_present = _is_present(frame[field_key])
+        if raw is None:
+            raw, present = (frame[field_key], exact_present)
+        else:
+            present = exact_present | _is_present(raw)
+            raw = frame[field_key].where(exact_present, raw)
+    elif raw is not None:
+        present = _is_present(raw)
+    else:
+        return (pd.Series(None, index=frame.index, dtype=object), np.zeros(len(frame.index), dtype=bool))
+    return (raw, present & raw.notna().to_numpy(dtype=bool))
+
+def _rule_failures(rule: Dict[str, Any], values: pd.Series, is_none: np.ndarray, is_str: np.ndarray, lengths: np.ndarray) -> Optional[Tuple[np.ndarray, Any]]:
+    """
+    Apply one rule to a column of field values.
+
+    Returns:
+        tuple: (failure mask, message or function of value -> message), or None if the rule never fails
+    """
+    rule_type = rule.get('type')
+    rule_name = rule.get('name', f'{rule_type} Rule')
+    if rule_type == 'regex':
+        pattern = rule.get('pattern', '')
+        if not pattern:
+            return None
+        mismatch_message = lambda value: f"{rule_name}: Value '{value}' does not match pattern '{pattern}'"
+        try:
+            compiled = re.compile(pattern)
+        except Exception as e:
+            # Invalid patterns only surface when a string is actually matched
+            error_message = f'{rule_name}: Error validating regex: {e}'
+            return (is_none | is_str, lambda value: mismatch_message(value) if value is None else error_message)
+        matched = values.where(is_str, '').astype(str).str.match(compiled).to_numpy(dtype=bool)
+        return (is_none | is_str & ~matched, mismatch_message)
+    if rule_type == 'enum':
+        allowed_values = rule.get('values', '')
+        cleaned_allowed_values = [str(v).strip() for v in (allowed_values.split(',') if isinstance(allowed_values, str) else allowed_values or [])]
+        if not cleaned_allowed_values:
+            return None
+        allowed_text = ', '.join(cleaned_allowed_values)
+        in_allowed = values.astype(str).str.strip().isin(frozenset(cleaned_allowed_values)).to_numpy(dtype=bool)
+        return (~is_none & ~in_allowed, lambda value: f"{rule_name}: Value '{value}' is not in allowed values: {allowed_text}")
+    if rule_type in ('min_length', 'max_length'):
+        length = rule.get('length', 0)
+        label = 'minimum' if rule_type == 'min_length' else 'maximum'
+        try:
+            length = int(length)
+        except (ValueError, TypeError):
+            return (np.ones(len(values), dtype=bool), f'{rule_name}: Invalid {label} length: {length}')
+        if rule_type == 'min_length':
+            return (is_none | is_str & (lengths < length), lambda value: f'{rule_name}: Value length ({0 if value is None else len(value)}) is less than minimum length ({length})')
+        return (is_str & (lengths > length), lambda value: f'{rule_name}: Value length ({len(value)}) exceeds maximum length ({length})')
+    if rule_type == 'dataType':
+        # The rule's "type" key holds the rule type itself, so the data type is unknown and only None fails
+        return (is_none, lambda value: f"{rule_name}: Value '{value}' is not of type 'dataType'")
+    return None
+
+def validate_frame(frame: pd.DataFrame, template_rules: Dict[str, Any], key_positions: Optional[pd.DataFrame]=None) -> Dict[str, Dict[str, Any]]:
+    """
+    Validate every row of a value table against a template's rules.
+
+    Columns are matched to rule fields by exact key, then by normalized key
+    (case-insensitive, spaces and dashes as underscores) in the key order of
+    each response, or in column order without key_positions.
+    NaN cells are keys the response does not have; None cells are keys
+    without a value, which are skipped like in Validator.validate.
+
+    Args:
+        frame: Table from build_value_frame
+        template_rules: Dictionary with fields and mandatory_fields
+        key_positions: Table from build_key_positions for the same responses (or None)
+
+    Returns:
+        dict: File ID to validation results, as returned by Validator.validate
+    """
+    columns_by_normalized_key: Dict[str, List[Any]] = {}
+    for column in frame.columns:
+        if isinstance(column, str):
+            columns_by_normalized_key.setdefault(normalize_field_key(column), []).append(column)
+    file_ids = list(frame.index)
+    field_results = []
+    for field_def in template_rules.get('fields', []):
+        field_key = field_def.get('key')
+        if field_key is not None and not isinstance(field_key, str):
+            logger.warning(f'Skipping field with invalid key: {field_key}')
+            continue
+        raw, found = _resolve_column(frame, field_key, columns_by_normalized_key, key_positions)
+        values = _unwrap_values(raw)
+        is_none = values.isna().to_numpy(dtype=bool)
+        is_str = values.map(type).eq(str).to_numpy(dtype=bool)
+        lengths = values.where(is_str, '').astype(str).str.len().to_numpy()
+        failures = []
+        for rule in field_def.get('rules', []) or []:
+            outcome = _rule_failures(rule, values, is_none, is_str, lengths)
+            if outcome is not None:
+                failures.append((outcome[0] & found, outcome[1]))
+        failed = np.logical_or.reduce([mask for mask, _ in failures]) if failures else np.zeros(len(file_ids), dtype=bool)
+        # Plain lists index faster than arrays in the per-file assembly below
+        field_results.append((field_key, found.tolist(), failed.tolist(), values.to_numpy(dtype=object), [(mask.tolist(), message) for mask, message in failures]))
+    mandatory_missing = []
+    for field_key in template_rules.get('mandatory_fields', []):
+        raw, found = _resolve_column(frame, field_key if isinstance(field_key, str) else None, columns_by_normalized_key, key_positions)
+        values = _unwrap_values(raw)
+        is_blank = values.map(lambda value: isinstance(value, str) and value.strip() == '').to_numpy(dtype=bool)
+        mandatory_missing.append((field_key, (~found | values.isna().to_numpy(dtype=bool) | is_blank).tolist()))
+    results = {}
+    for row, file_id in enumerate(file_ids):
+        field_validations = {}
+        for field_key, found, failed, values, failures in field_results:
+            if not found[row]:
+                field_validations[field_key] = {'is_valid': True, 'status': 'skip', 'messages': [f"Field '{field_key}' not found in response"]}
+            elif not failed[row]:
+                field_validations[field_key] = {'is_valid': True, 'status': 'pass', 'messages': []}
+            else:
+                messages = [message(values[row]) if callable(message) else message for mask, message in failures if mask[row]]
+                field_validations[field_key] = {'is_valid': False, 'status': 'fail', 'messages': messages}
+        missing_fields = [field_key for field_key, missing in mandatory_missing if missing[row]]
+        results[file_id] = {'field_validations': field_validations, 'mandatory_check': {'status': 'Passed' if not missing_fields else 'Failed', 'missing_fields': missing_fields}}
+    return results
+
+def batch_validate(responses: Dict[str, Dict[str, Any]], template_id: Optional[str], validator: Optional[Validator]=None, doc_category: Optional[str]=None) -> Dict[str, Dict[str, Any]]:
+    """
+    Validate many AI responses that were extracted with the same template.
+
+    Args:
+        responses: File ID to AI response
+        template_id: Metadata template ID used for extraction
+        validator: Validator whose rules file to use (or None for the default rules file)
+        doc_category: Document category (passed to the rule lookup)
+
+    Returns:
+        dict: File ID to validation results; non-dict responses get the per-file error result
+    """
+    validator = validator or Validator()
+    template_rules = validator.get_rules_loader().get_rules_for_category_template(doc_category, template_id)
+    results = validate_frame(build_value_frame(responses), template_rules, build_key_positions(responses))
+    for file_id, response in responses.items():
+        if not isinstance(response, dict):
+            results[str(file_id)] = {'field_validations': {}, 'mandatory_check': {'status': 'Error', 'message': 'AI response not a dict'}}
+    logger.info(f"Batch validated {len(responses)} responses for template '{template_id}'")
+    return results
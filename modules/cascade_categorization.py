@@ -0,0 +1,135 @@
+"""
+Cheap-first cascaded document categorization.
+A fast, inexpensive model categorizes every document first. Only documents
+whose calibrated confidence falls below the configured confidence thresholds
+are escalated to a detailed single-model review, and only those still
+uncertain after that go to sequential consensus.
+"""
+import logging
+from typing import Dict, Any, List, Optional
+
+from modules.document_categorization_utils import (
+    categorize_document,
+    categorize_document_detailed,
+    extract_document_features,
+    calculate_multi_factor_confidence,
+    apply_confidence_calibration,
+    get_confidence_thresholds
+)
+from modules.sequential_consensus_implementation import (
+    categorize_document_with_sequential_consensus,
+    EXECUTION_MODE_PARALLEL
+)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CASCADE_MODELS = {
+    "fast": "google__gemini_2_0_flash_lite_preview",
+    "detailed": "azure__openai__gpt_4_1",
+    "consensus": ["google__gemini_2_0_flash_001", "aws__claude_3_sonnet", "aws__claude_3_5_sonnet"]
+}
+
+def score_result(result: Dict[str, Any], document_features: Dict[str, Any], valid_categories: List[str]) -> float:
+    """
+    Add multi-factor and calibrated confidence to a categorization result.
+
+    Args:
+        result: Categorization result (document_type, confidence, reasoning)
+        document_features: Document features from extract_document_features
+        valid_categories: Valid category names
+
+    Returns:
+        float: Calibrated confidence
+    """
+    multi_factor_confidence = calculate_multi_factor_confidence(
+        result["confidence"],
+        document_features,
+        result["document_type"],
+        result.get("reasoning", ""),
+        valid_categories
+    )
+    result["multi_factor_confidence"] = multi_factor_confidence
+    result["calibrated_confidence"] = apply_confidence_calibration(
+        result["document_type"],
+        multi_factor_confidence.get("overall", result["confidence"])
+    )
+    return result["calibrated_confidence"]
+
+def categorize_document_with_cascade(
+    file_id: str,
+    document_types_with_desc: List[Dict[str, str]],
+    fast_model: str = DEFAULT_CASCADE_MODELS["fast"],
+    detailed_model: str = DEFAULT_CASCADE_MODELS["detailed"],
+    consensus_models: Optional[List[str]] = None,
+    disagreement_threshold: float = 0.3,
+    thresholds: Optional[Dict[str, float]] = None
+) -> Dict[str, Any]:
+    """
+    Categorize a document with the cheapest stage that is confident enough.
+
+    1. The fast model categorizes the document. The result is accepted if its
+       calibrated confidence reaches the auto-accept threshold.
+    2. Otherwise, if it reaches the verification threshold, the detailed model
+       reviews the initial category. That result is accepted if it reaches the
+       verification threshold.
+    3. Everything else goes to sequential consensus (with parallel execution).
+
+    Args:
+        file_id: Box file ID
+        document_types_with_desc: List of document types with descriptions
+        fast_model: Cheap model for the first pass
+        detailed_model: Model for the detailed second stage
+        consensus_models: Models 1, 2 and 3 for sequential consensus
+        disagreement_threshold: Threshold to trigger arbitration in sequential consensus
+        thresholds: auto_accept/verification/rejection thresholds (defaults to get_confidence_thresholds())
+
+    Returns:
+        Dictionary with categorization results and cascade information
+    """
+    thresholds = thresholds or get_confidence_thresholds()
+    consensus_models = consensus_models or DEFAULT_CASCADE_MODELS["consensus"]
+    valid_categories = [dtype["name"] for dtype in document_types_with_desc]
+    stages = []
+
+    # Stage 1: fast model
+    try:
+        document_features = extract_document_features(file_id)
+    except Exception as e:
+        logger.error(f"Error extracting features in cascade for file {file_id}: {str(e)}. Using empty features.")
+        document_features = {}
+    result = categorize_document(file_id, fast_model, document_types_with_desc)
+    result["model_name"] = fast_model
+    confidence = score_result(result, document_features, valid_categories)
+    stages.append({"stage": "fast", "model": fast_model, "document_type": result["document_type"], "calibrated_confidence": confidence})
+    exit_stage = "fast" if confidence >= thresholds["auto_accept"] else None
+
+    # Stage 2: detailed review of the fast model's category
+    if exit_stage is None and confidence >= thresholds["verification"]:
+        logger.info(f"Cascade for file {file_id}: fast confidence {confidence:.2f} below auto-accept ({thresholds['auto_accept']}). Escalating to detailed review with {detailed_model}")
+        detailed_result = categorize_document_detailed(file_id, detailed_model, result["document_type"], document_types_with_desc)
+        detailed_result["model_name"] = detailed_model
+        confidence = score_result(detailed_result, document_features, valid_categories)
+        stages.append({"stage": "detailed", "model": detailed_model, "document_type": detailed_result["document_type"], "calibrated_confidence": confidence})
+        result = detailed_result
+        if confidence >= thresholds["verification"]:
+            exit_stage = "detailed"
+
+    # Stage 3: sequential consensus
+    if exit_stage is None:
+        logger.info(f"Cascade for file {file_id}: confidence {confidence:.2f} below verification ({thresholds['verification']}). Escalating to sequential consensus")
+        result = categorize_document_with_sequential_consensus(
+            file_id,
+            consensus_models[0],
+            consensus_models[1],
+            consensus_models[2],
+            document_types_with_desc,
+            disagreement_threshold,
+            EXECUTION_MODE_PARALLEL
+        )
+        stages.append({"stage": "consensus", "model": ", ".join(consensus_models), "document_type": result["document_type"], "calibrated_confidence": result["calibrated_confidence"]})
+        exit_stage = "consensus"
+
+    logger.info(f"Cascade for file {file_id} finished at stage '{exit_stage}' with {result['document_type']} ({result['calibrated_confidence']:.2f})")
+    result["document_features"] = document_features
+    result["cascade"] = {"exit_stage": exit_stage, "stages": stages, "thresholds": dict(thresholds)}
+    return result
@@ -0,0 +1,258 @@
+"""
+Categorization results of a session.
+CategorizationResults behaves like the list of per-file categorization
+results that document categorization appends to, keeps a file ID index and a
+document type -> files index up to date as results are added, so consumers
+find a file's categorization without scanning the list, and can write every
+result through to a RunStore so that a run's categorizations survive session
+timeouts and can be restored later.
+"""
+import logging
+import threading
+from collections.abc import MutableSequence
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from modules.run_store import RunStore
+
+logger = logging.getLogger(__name__)
+
+def result_document_type(result: Any) -> Optional[str]:
+    """
+    Get the document type of a categorization result.
+
+    Args:
+        result: Categorization result
+
+    Returns:
+        str: document_type (or the older category key), or None
+    """
+    if not isinstance(result, dict):
+        return None
+    return result.get('document_type') or result.get('category')
+
+class CategorizationResults(MutableSequence):
+    """
+    List of categorization results (dicts with file_id, document_type, confidence, ...)
+    with lookups by file ID and by document type.
+    When a file has several results, lookups return the first one, like a
+    scan of the list would.
+    """
+
+    def __init__(self, results: Optional[Iterable[Dict[str, Any]]]=None, run_store: Optional[RunStore]=None, run_id: Optional[str]=None, owner: Optional[str]=None):
+        """
+        Initialize the results.
+
+        Args:
+            results: Initial categorization results
+            run_store: RunStore that results are written through to (or None to keep them in memory only)
+            run_id: Run the results belong to (required with run_store)
+            owner: Box user ID stored as the run's owner when results are written (if the run has none yet)
+        """
+        if run_store is not None and not run_id:
+            raise ValueError('A run_id is required for results backed by a run store')
+        self.run_store = run_store
+        self.run_id = run_id
+        self.owner = owner
+        self.lock = threading.RLock()
+        self._items: List[Dict[str, Any]] = []
+        self._by_file: Dict[str, Dict[str, Any]] = {}
+        self._files_by_type: Dict[Optional[str], List[str]] = {}
+        if results:
+            self.extend(results)
+
+    @classmethod
+    def from_run(cls, run_store: RunStore, run_id: str, owner: Optional[str]=None) -> 'CategorizationResults':
+        """
+        Load the categorization results of a stored run.
+
+        Args:
+            run_store: RunStore with the run
+            run_id: Run ID
+            owner: Box user ID of the run's owner
+
+        Returns:
+            CategorizationResults: Results backed by the run
+        """
+        results = cls(run_store=run_store, run_id=run_id, owner=owner)
+        results._items = run_store.get_categorizations(run_id)
+        results._reindex()
+        logger.info(f'Loaded {len(results)} categorization results of run {run_id}')
+        return results
+
+    def _index(self, new_results: Iterable[Any]) -> None:
+        """Add appended results to the indexes."""
+        for result in new_results:
+            if not isinstance(result, dict):
+                continue
+            file_id = str(result.get('file_id'))
+            if file_id not in self._by_file:
+                self._by_file[file_id] = result
+                self._files_by_type.setdefault(result_document_type(result), []).append(file_id)
+
+    def _reindex(self) -> None:
+        """Rebuild the indexes after results were replaced, inserted or removed."""
+        self._by_file, self._files_by_type = ({}, {})
+        self._index(self._items)
+
+    def get_by_file_id(self, file_id: Any, default: Any=None) -> Any:
+        """
+        Get the categorization result of a file.
+
+        Args:
+            file_id: Box file ID (compared as a string)
+            default: Value returned when the file has no result
+
+        Returns:
+            dict: First categorization result of the file, or default
+        """
+        return self._by_file.get(str(file_id), default)
+
+    def has_file(self, file_id: Any) -> bool:
+        """
+        Check whether a file has a categorization result.
+
+        Args:
+            file_id: Box file ID
+
+        Returns:
+            bool: True if the file has a result
+        """
+        return str(file_id) in self._by_file
+
+    def document_types(self) -> List[str]:
+        """
+        Get the document types of the categorized files.
+
+        Returns:
+            list: Document types in the order they first appear
+        """
+        return [doc_type for doc_type in self._files_by_type if doc_type is not None]
+
+    def file_ids_for_type(self, doc_type: str) -> List[str]:
+        """
+        Get the files categorized as a document type.
+
+        Args:
+            doc_type: Document type
+
+        Returns:
+            list: File IDs in result order
+        """
+        return list(self._files_by_type.get(doc_type, []))
+
+    def _persist(self, start: int) -> None:
+        """Write the results from a position on through to the run store."""
+        if self.run_store is None or start >= len(self._items):
+            return
+        try:
+            self.run_store.save_categorizations(self.run_id, [(position, self._items[position]) for position in range(start, len(self._items)) if isinstance(self._items[position], dict)], self.owner)
+        except Exception as e:
+            logger.error(f'Error saving categorization results to run {self.run_id}: {e}')
+
+    def _unpersist(self, removed: List[Any]) -> None:
+        """Delete removed results from the run store unless their file still has a result."""
+        if self.run_store is None:
+            return
+        remaining = {str(result.get('file_id')) for result in self._items if isinstance(result, dict)}
+        file_ids = [str(result.get('file_id')) for result in removed if isinstance(result, dict) and str(result.get('file_id')) not in remaining]
+        if file_ids:
+            try:
+                self.run_store.delete_categorizations(self.run_id, file_ids)
+            except Exception as e:
+                logger.error(f'Error deleting categorization results from run {self.run_id}: {e}')
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __setitem__(self, index, value) -> None:
+        with self.lock:
+            removed = self._items[index] if isinstance(index, slice) else [self._items[index]]
+            self._items[index] = value
+            self._reindex()
+            self._unpersist(removed)
+            start = index.indices(len(self._items))[0] if isinstance(index, slice) else index % len(self._items)
+            self._persist(start)
+
+    def __delitem__(self, index) -> None:
+        with self.lock:
+            removed = self._items[index] if isinstance(index, slice) else [self._items[index]]
+            start = index.indices(len(self._items))[0] if isinstance(index, slice) else index % len(self._items)
+            del self._items[index]
+            self._reindex()
+            self._unpersist(removed)
+            self._persist(start)
+
+    def insert(self, index: int, value: Dict[str, Any]) -> None:
+        with self.lock:
+            self._items.insert(index, value)
+            self._reindex()
+            # Positions after the insertion point move, so they are written again
+            self._persist(min(max(index if index >= 0 else len(self._items) - 1 + index, 0), len(self._items) - 1))
+
+    def append(self, value: Dict[str, Any]) -> None:
+        with self.lock:
+            self._items.append(value)
+            self._index((value,))
+            self._persist(len(self._items) - 1)
+
+    def extend(self, values: Iterable[Dict[str, Any]]) -> None:
+        with self.lock:
+            start = len(self._items)
+            self._items.extend(values)
+            self._index(self._items[start:])
+            self._persist(start)
+
+    def clear(self) -> None:
+        with self.lock:
+            self._items = []
+            self._reindex()
+            if self.run_store is not None:
+                try:
+                    self.run_store.delete_categorizations(self.run_id)
+                except Exception as e:
+                    logger.error(f'Error deleting categorization results from run {self.run_id}: {e}')
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, CategorizationResults):
+            return self._items == other._items
+        return isinstance(other, list) and self._items == other
+
+    def __repr__(self) -> str:
+        return f'CategorizationResults({self._items!r})'
+
+def find_categorization(results: Any, file_id: Any) -> Optional[Dict[str, Any]]:
+    """
+    Find a file's categorization result in session categorization results.
+
+    Args:
+        results: CategorizationResults, a plain list of results or a file ID -> result mapping
+        file_id: Box file ID (compared as a string)
+
+    Returns:
+        dict: The file's (first) categorization result, or None
+    """
+    if isinstance(results, CategorizationResults):
+        return results.get_by_file_id(file_id)
+    if isinstance(results, Mapping):
+        result = results.get(file_id, results.get(str(file_id)))
+        return result if isinstance(result, dict) else None
+    # Plain lists (e.g. from older sessions) are scanned
+    return next((result for result in results or [] if isinstance(result, dict) and str(result.get('file_id')) == str(file_id)), None)
+
+def categorized_document_types(results: Any) -> List[str]:
+    """
+    Get the distinct document types in session categorization results.
+
+    Args:
+        results: CategorizationResults, a plain list of results or a file ID -> result mapping
+
+    Returns:
+        list: Document types in the order they first appear
+    """
+    if isinstance(results, CategorizationResults):
+        return results.document_types()
+    values = results.values() if isinstance(results, Mapping) else results or []
+    return list(dict.fromkeys((doc_type for doc_type in map(result_document_type, values) if doc_type is not None)))
@@ -7,6 +7,7 @@ to specific metadata templates.
 import streamlit as st
 import pandas as pd
 from typing import Dict, Any
+import os
 import json
 
 # Constants for rule types
@@ -75,18 +76,32 @@ def format_rule_for_display(rule, rule_type="field"):
 def save_validation_rules(rules_data):
     """Save validation rules to config file"""
     try:
-        # Ensure we have rule_loader in session state
-        if 'rule_loader' not in st.session_state:
-            from modules.validation_engine import ValidationRuleLoader
-            st.session_state.rule_loader = ValidationRuleLoader(rules_config_path='config/validation_rules.json')
+        from modules.validation_engine import get_rule_store
+        rule_store = get_rule_store('config/validation_rules.json')
+        config_path = rule_store.rules_config_path
         
-        # Update the rules in the rule loader
-        st.session_state.rule_loader.rules = rules_data
+        # Keep the previous rules (rules_data is usually edited in place)
+        old_rules_data = rule_store.snapshot().mutable_rules()
         
-        # Save to file
-        config_path = st.session_state.rule_loader.rules_config_path
-        with open(config_path, 'w') as f:
+        # Save to file atomically so validators in other sessions never read a partial file
+        temp_path = f"{config_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w') as f:
             json.dump(rules_data, f, indent=2)
+        os.replace(temp_path, config_path)
+        st.session_state.rule_loader = rule_store.reload()
+        
+        # Re-validate already processed results against the changed rules (no AI calls)
+        if st.session_state.get('extraction_results'):
+            from modules.revalidation import revalidate_results
+            summary = revalidate_results(
+                st.session_state.extraction_results,
+                old_rules_data,
+                rules_data,
+                confidence_adjuster=st.session_state.get('confidence_adjuster'),
+                rules_config_path=config_path
+            )
+            if summary["results_revalidated"]:
+                st.info(f"Re-validated {summary['results_revalidated']} processed results against the updated rules.")
         
         return True
     except Exception as e:
@@ -719,15 +734,15 @@ def manage_template_rules():
     st.subheader("Template Rules")
     st.write("Manage validation rules specific to metadata templates.")
     
-    # Initialize the rule loader if it's not already in the session state
+    # Initialize the rule loader (the shared, read-only rules snapshot) if it's not already in the session state
     if 'rule_loader' not in st.session_state:
-        from modules.validation_engine import ValidationRuleLoader
-        st.session_state.rule_loader = ValidationRuleLoader(rules_config_path='config/validation_rules.json')
+        from modules.validation_engine import get_rule_store
+        st.session_state.rule_loader = get_rule_store('config/validation_rules.json').snapshot()
     
     # Initialize validation_rules in session state if not present
     if 'validation_rules' not in st.session_state:
         if hasattr(st.session_state.rule_loader, 'rules'):
-            st.session_state.validation_rules = st.session_state.rule_loader.rules
+            st.session_state.validation_rules = st.session_state.rule_loader.mutable_rules()
         else:
             st.session_state.validation_rules = {"template_rules": []}
     
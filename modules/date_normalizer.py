@@ -0,0 +1,186 @@
+"""
+Shared date parsing and normalization.
+This module recognizes the date shapes that AI responses and Box file
+information use (ISO 8601, numeric and month-name dates) with one regex match
+per candidate format instead of a cascade of parsers that fail with
+exceptions. The format that matched is remembered per field, so a field's
+values are usually parsed with the first regex tried. Values in other shapes
+fall back to dateutil when it is installed.
+"""
+import re
+import calendar
+import functools
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from dateutil import parser as dateutil_parser
+    dateutil_available = True
+except ImportError:
+    dateutil_available = False
+
+logger = logging.getLogger(__name__)
+RFC3339_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+_MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+_MONTHS.update({name.lower(): number for number, name in enumerate(calendar.month_abbr) if name})
+_MONTHS['sept'] = 9
+_MONTH_PATTERN = '(' + '|'.join(sorted(_MONTHS, key=len, reverse=True)) + ')\\.?'
+_DAYS_IN_MONTH = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+def _build_datetime(year: int, month: int, day: int, hour: int=0, minute: int=0, second: int=0, microsecond: int=0, tzinfo: Optional[timezone]=None) -> Optional[datetime]:
+    """Build a datetime after checking the ranges, so invalid dates don't need exception handling."""
+    if not (1 <= month <= 12 and 1 <= year <= 9999 and 1 <= day):
+        return None
+    if day > _DAYS_IN_MONTH[month] and not (month == 2 and day == 29 and calendar.isleap(year)):
+        return None
+    if hour > 23 or minute > 59 or second > 59:
+        return None
+    return datetime(year, month, day, hour, minute, second, microsecond, tzinfo=tzinfo)
+
+@functools.lru_cache(maxsize=256)
+def _parse_offset(offset: Optional[str]) -> Optional[timezone]:
+    """Convert a Z or +HH[:MM] suffix to a timezone (cached, as a corpus only uses a few offsets)."""
+    if not offset:
+        return None
+    if offset in ('Z', 'z'):
+        return timezone.utc
+    digits = offset[1:].replace(':', '')
+    hours, minutes = int(digits[:2]), int(digits[2:4] or 0)
+    if hours > 23 or minutes > 59:
+        return None
+    delta = timedelta(hours=hours, minutes=minutes)
+    return timezone(-delta if offset[0] == '-' else delta)
+
+def _iso(match: re.Match) -> Optional[datetime]:
+    year, month, day, hour, minute, second, fraction, offset = match.groups()
+    tzinfo = None
+    if offset:
+        tzinfo = _parse_offset(offset)
+        if tzinfo is None:
+            return None
+    if hour is None:
+        return _build_datetime(int(year), int(month), int(day), tzinfo=tzinfo)
+    microsecond = int((fraction + '000000')[:6]) if fraction else 0
+    return _build_datetime(int(year), int(month), int(day), int(hour), int(minute), int(second or 0), microsecond, tzinfo)
+
+def _numeric_month_first(match: re.Match) -> Optional[datetime]:
+    # Month first like dateutil's default; a first number above 12 can only be the day
+    first, second, year = map(int, match.groups())
+    if first > 12:
+        first, second = second, first
+    return _build_datetime(year, first, second)
+
+def _year_first(match: re.Match) -> Optional[datetime]:
+    year, month, day = map(int, match.groups())
+    return _build_datetime(year, month, day)
+
+def _compact(match: re.Match) -> Optional[datetime]:
+    year, month, day = map(int, match.groups())
+    return _build_datetime(year, month, day)
+
+def _month_name_first(match: re.Match) -> Optional[datetime]:
+    month, day, year = match.groups()
+    return _build_datetime(int(year), _MONTHS[month.lower()], int(day))
+
+def _day_first_month_name(match: re.Match) -> Optional[datetime]:
+    day, month, year = match.groups()
+    return _build_datetime(int(year), _MONTHS[month.lower()], int(day))
+DATE_FORMATS: List[Tuple[str, re.Pattern, Callable[[re.Match], Optional[datetime]]]] = [
+    ('iso', re.compile('(\\d{4})-(\\d{2})-(\\d{2})(?:[T ](\\d{2}):(\\d{2})(?::(\\d{2})(?:[.,](\\d+))?)?)?\\s*(Z|z|[+-]\\d{2}(?::?\\d{2})?)?'), _iso),
+    ('numeric_month_first', re.compile('(\\d{1,2})[/.-](\\d{1,2})[/.-](\\d{4})'), _numeric_month_first),
+    ('year_first', re.compile('(\\d{4})[/.](\\d{1,2})[/.](\\d{1,2})'), _year_first),
+    ('compact', re.compile('(\\d{4})(\\d{2})(\\d{2})'), _compact),
+    ('month_name_first', re.compile(_MONTH_PATTERN + '\\s+(\\d{1,2})(?:st|nd|rd|th)?,?\\s+(\\d{4})', re.IGNORECASE), _month_name_first),
+    ('day_first_month_name', re.compile('(\\d{1,2})(?:st|nd|rd|th)?[\\s-]+' + _MONTH_PATTERN + ',?[\\s-]+(\\d{4})', re.IGNORECASE), _day_first_month_name)
+]
+
+class DateNormalizer:
+    """
+    Date parser that learns the format used by each field.
+    The last format that matched a field's value is tried first for the
+    field's next value; the other formats are only tried when it doesn't match.
+    """
+
+    def __init__(self, use_fallback: bool=True):
+        """
+        Initialize the normalizer.
+
+        Args:
+            use_fallback: Whether to parse unrecognized shapes with dateutil (if installed)
+        """
+        self.use_fallback = use_fallback and dateutil_available
+        self.lock = threading.RLock()
+        self.learned_formats: Dict[Any, int] = {}
+
+    def parse(self, value: Any, key: Any=None) -> Optional[datetime]:
+        """
+        Parse a date value.
+
+        Args:
+            value: Date string (or datetime, returned as is)
+            key: Field the value belongs to, e.g. (template_key, field_key), used to remember its format
+
+        Returns:
+            datetime: Parsed datetime (timezone-aware only if the value has an offset), or None if it isn't a date
+        """
+        if isinstance(value, datetime):
+            return value
+        if not isinstance(value, str):
+            return None
+        text = value.strip()
+        learned = self.learned_formats.get(key)
+        if learned is not None:
+            _, pattern, build = DATE_FORMATS[learned]
+            match = pattern.fullmatch(text)
+            parsed = build(match) if match is not None else None
+            if parsed is not None:
+                return parsed
+        for index, (_, pattern, build) in enumerate(DATE_FORMATS):
+            match = pattern.fullmatch(text) if index != learned else None
+            parsed = build(match) if match is not None else None
+            if parsed is not None:
+                if key is not None:
+                    with self.lock:
+                        self.learned_formats[key] = index
+                return parsed
+        if self.use_fallback and text:
+            try:
+                return dateutil_parser.parse(text)
+            except (ValueError, OverflowError) as e:
+                logger.debug(f"Could not parse date '{value}': {e}")
+        return None
+
+    def to_rfc3339(self, value: Any, key: Any=None) -> Optional[str]:
+        """
+        Normalize a date value to the RFC 3339 UTC form used by Box date metadata fields.
+
+        Args:
+            value: Date string or datetime; values without an offset are taken as UTC
+            key: Field the value belongs to (see parse)
+
+        Returns:
+            str: Date as YYYY-MM-DDTHH:MM:SSZ, or None if it isn't a date
+        """
+        parsed = self.parse(value, key)
+        if parsed is None:
+            return None
+        if parsed.tzinfo is None or parsed.tzinfo.utcoffset(parsed) is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        else:
+            parsed = parsed.astimezone(timezone.utc)
+        return parsed.strftime(RFC3339_FORMAT)
+_date_normalizer = None
+
+def get_date_normalizer() -> DateNormalizer:
+    """
+    Get the global date normalizer instance, creating it if necessary.
+
+    Returns:
+        DateNormalizer: Global date normalizer instance
+    """
+    global _date_normalizer
+    if _date_normalizer is None:
+        _date_normalizer = DateNormalizer()
+    return _date_normalizer
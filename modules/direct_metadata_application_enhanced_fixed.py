@@ -2,6 +2,7 @@ import streamlit as st
 import logging
 import json
 from boxsdk import Client
+from modules.categorization_results import find_categorization, result_document_type
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, 
@@ -655,9 +656,8 @@ def apply_metadata_direct():
             logger.info(f"Metadata values for file {file_name} ({file_id}) before application: {json.dumps(metadata_values, default=str)}")
             
             # Get document type for mapping
-            categorization_results = st.session_state.get("document_categorization", {}).get("results", {})
-            # Use str(file_id) for lookup consistency
-            doc_type = categorization_results.get(str(file_id), {}).get("category", "Other") # Default to 'Other'
+            cat_result = find_categorization(st.session_state.get("document_categorization", {}).get("results", []), file_id)
+            doc_type = result_document_type(cat_result) or "Other" # Default to 'Other'
             logger.info(f"Retrieved document type 	'{doc_type}	' for file {file_id}")
 
             # Apply metadata directly, passing the document type
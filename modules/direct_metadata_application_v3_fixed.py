@@ -3,46 +3,24 @@ import logging
 import json
 from boxsdk import Client, exception
 from boxsdk.object.metadata import MetadataUpdate
-from dateutil import parser
-from datetime import timezone
+from modules.template_registry import get_template_registry
+from modules.date_normalizer import get_date_normalizer
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-if 'template_schema_cache' not in st.session_state:
-    st.session_state.template_schema_cache = {}
-
 class ConversionError(ValueError):
     pass
 
 def get_template_schema(client, full_scope, template_key):
-    cache_key = f'{full_scope}_{template_key}'
-    if cache_key in st.session_state.template_schema_cache:
-        logger.info(f'Using cached schema for {full_scope}/{template_key}')
-        # Return a copy to prevent modification of cached mutable object if schema is None or {}
-        cached_schema = st.session_state.template_schema_cache[cache_key]
-        return cached_schema.copy() if isinstance(cached_schema, dict) else cached_schema
-
-    try:
-        logger.info(f'Fetching template schema for {full_scope}/{template_key}')
-        template = client.metadata_template(full_scope, template_key).get()
-        if template and hasattr(template, 'fields') and template.fields:
-            schema_details = {field['key']: {'type': field['type'], 'displayName': field.get('displayName', field['key'].replace('_', ' ').title()), 'description': field.get('description', '')} for field in template.fields}
-            st.session_state.template_schema_cache[cache_key] = schema_details
-            logger.info(f'Successfully fetched and cached schema (with descriptions) for {full_scope}/{template_key}')
-            return schema_details.copy() # Return a copy
-        else:
-            logger.warning(f'Template {full_scope}/{template_key} found but has no fields or is invalid.')
-            st.session_state.template_schema_cache[cache_key] = {}
-            return {}
-    except exception.BoxAPIException as e:
-        logger.error(f'Box API Error fetching template schema for {full_scope}/{template_key}: Status={e.status}, Code={e.code}, Message={e.message}')
-        st.session_state.template_schema_cache[cache_key] = {"error_status": e.status, "error_code": e.code} # Store error info
-        return None
-    except Exception as e:
-        logger.exception(f'Unexpected error fetching template schema for {full_scope}/{template_key}: {e}')
-        st.session_state.template_schema_cache[cache_key] = {"error_status": "general_error"} # Store error info
+    # Schemas come from the process-wide template registry; the returned dict is a copy
+    schema_details = get_template_registry().get_schema(client, full_scope, template_key)
+    if schema_details is None:
+        logger.error(f'Could not fetch template schema for {full_scope}/{template_key}: {get_template_registry().get_error(full_scope, template_key)}')
         return None
+    if not schema_details:
+        logger.warning(f'Template {full_scope}/{template_key} found but has no fields or is invalid.')
+    return schema_details
 
 def convert_value_for_template(key, value, field_type):
     if value is None:
@@ -62,15 +40,10 @@ def convert_value_for_template(key, value, field_type):
                 raise ConversionError(f"Value {original_value_repr} for key '{key}' is not a string or number, cannot convert to float.")
         elif field_type == 'date':
             if isinstance(value, str):
-                try:
-                    dt = parser.parse(value)
-                    if dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None:
-                        dt = dt.replace(tzinfo=timezone.utc)
-                    else:
-                        dt = dt.astimezone(timezone.utc)
-                    return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
-                except (parser.ParserError, ValueError) as e:
-                    raise ConversionError(f"Could not parse date string '{value}' for key '{key}': {e}.")
+                normalized_date = get_date_normalizer().to_rfc3339(value, key)
+                if normalized_date is None:
+                    raise ConversionError(f"Could not parse date string '{value}' for key '{key}'.")
+                return normalized_date
             else:
                 raise ConversionError(f"Value {original_value_repr} for key '{key}' is not a string, cannot convert to date.")
         elif field_type == 'string' or field_type == 'enum':
@@ -177,7 +150,7 @@ def apply_metadata_to_file_direct_worker(client, file_id, file_name, raw_ai_resp
         template_schema = get_template_schema(client, full_scope, template_key)
         if template_schema is None:
             # Check if the error was due to a 404 on global/properties
-            cached_error = st.session_state.template_schema_cache.get(f'{full_scope}_{template_key}')
+            cached_error = get_template_registry().get_error(full_scope, template_key)
             if isinstance(cached_error, dict) and cached_error.get("error_status") == 404 and full_scope == "global" and template_key == "properties":
                 error_msg = f"The 'global/properties' metadata template was not found in your Box environment. This template is required for applying freeform extracted metadata. Please create it in Box Admin Console > Content > Metadata."
             else:
@@ -7,18 +7,32 @@ import os
 import datetime
 import pandas as pd
 import altair as alt
-from typing import Dict, Any, List, Optional, Tuple
+import concurrent.futures
+from typing import Dict, Any, Callable, List, Optional, Tuple
 
 # Import the sequential consensus implementation
-from modules.sequential_consensus_implementation import categorize_document_with_sequential_consensus
+from modules.sequential_consensus_implementation import (
+    categorize_document_with_sequential_consensus,
+    EXECUTION_MODES,
+    EXECUTION_MODE_PARALLEL
+)
 from modules.document_categorization_utils import (
     categorize_document,
     extract_document_features,
     calculate_multi_factor_confidence,
     apply_confidence_calibration,
     combine_categorization_results,
-    categorize_document_detailed
+    categorize_document_detailed,
+    with_script_run_context,
+    get_confidence_thresholds,
+    prefetch_file_infos,
+    remember_file_infos,
+    clear_file_info_cache,
+    FILE_INFO_FIELDS
 )
+from modules.local_classifier import get_local_classifier, LOCAL_CLASSIFIER_MODEL_NAME
+from modules.cascade_categorization import categorize_document_with_cascade, DEFAULT_CASCADE_MODELS
+from modules.session_state_manager import create_categorization_results, get_session_user_id
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
@@ -33,6 +47,147 @@ UPDATED_MODEL_LIST = [
     "xai__grok_3_beta", "xai__grok_3_mini_reasoning_beta", "azure__openai__gpt_o3"
 ]
 
+# Upper bound on concurrent Box AI calls made by Parallel Consensus across all files and models
+MAX_PARALLEL_CATEGORIZATION_CALLS = 8
+
+def collect_file_infos(files: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Get the metadata of files for the local pre-classifier, keyed by file ID.
+    """
+    file_infos = prefetch_file_infos([file["id"] for file in files])
+    for file in files:
+        if str(file["id"]) not in file_infos:
+            file_infos[str(file["id"])] = {"id": str(file["id"]), "name": file["name"]}
+    return file_infos
+
+def train_local_classifier(results: List[Dict[str, Any]], file_infos: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Record auto-accepted AI results as training examples of the session user's local
+    pre-classifier, retraining it in the background if any example was new.
+    """
+    auto_accept = get_confidence_thresholds()["auto_accept"]
+    confident_results = [
+        r for r in results
+        if r.get("model_name") != LOCAL_CLASSIFIER_MODEL_NAME and r.get("calibrated_confidence", r.get("confidence", 0.0)) >= auto_accept
+    ]
+    if not confident_results:
+        return
+    missing = [{"id": r["file_id"], "name": r.get("file_name", "")} for r in confident_results if str(r["file_id"]) not in file_infos]
+    file_infos = dict(file_infos, **collect_file_infos(missing))
+    local_classifier = get_local_classifier(get_session_user_id())
+    if local_classifier.record([(file_infos[str(r["file_id"])], r["document_type"]) for r in confident_results]):
+        local_classifier.schedule_training()
+
+def categorize_with_model(file_id: str, model: str, document_types: List[Dict[str, str]], use_two_stage: bool, confidence_threshold: float) -> Dict[str, Any]:
+    """
+    Categorize a document with one model, running the detailed second stage if requested
+    and the first-stage confidence is below the threshold.
+    """
+    result = categorize_document(file_id, model, document_types)
+    if use_two_stage and result["confidence"] < confidence_threshold:
+        logger.info(f"First-stage confidence {result['confidence']:.2f} for file {file_id} (model: {model}) is below {confidence_threshold}; running detailed categorization")
+        result = categorize_document_detailed(file_id, model, result["document_type"], document_types)
+    return result
+
+def finalize_parallel_consensus(file: Dict[str, Any], model_results: List[Dict[str, Any]], document_features: Dict[str, Any], document_types: List[Dict[str, str]]) -> Dict[str, Any]:
+    """
+    Combine one file's model results and add multi-factor and calibrated confidence.
+    """
+    valid_categories = [dtype["name"] for dtype in document_types]
+    combined_result = combine_categorization_results(model_results, valid_categories, [r["model_name"] for r in model_results])
+    
+    # Add file info to result
+    combined_result["file_id"] = file["id"]
+    combined_result["file_name"] = file["name"]
+    combined_result["model_results"] = model_results
+    
+    # Calculate multi-factor confidence
+    multi_factor_confidence = calculate_multi_factor_confidence(
+        combined_result["confidence"],
+        document_features,
+        combined_result["document_type"],
+        combined_result.get("reasoning", ""),
+        valid_categories
+    )
+    combined_result["multi_factor_confidence"] = multi_factor_confidence
+    
+    # Apply confidence calibration
+    calibrated_confidence = apply_confidence_calibration(
+        combined_result["document_type"],
+        multi_factor_confidence.get("overall", combined_result["confidence"])
+    )
+    combined_result["calibrated_confidence"] = calibrated_confidence
+    return combined_result
+
+def run_parallel_consensus(files: List[Dict[str, Any]], models: List[str], document_types: List[Dict[str, str]], use_two_stage: bool, confidence_threshold: float, on_file_done: Optional[Callable[[int, int], None]] = None) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Categorize files with several models concurrently.
+    
+    Every (file, model) call and each file's feature lookup run on a bounded
+    thread pool, and a file's results are combined as soon as its last call
+    completes, so per-file latency is that of the slowest model rather than
+    the sum over models.
+    
+    Args:
+        files: Files to categorize (dicts with id and name)
+        models: Models to use
+        document_types: Document types with descriptions
+        use_two_stage: Whether to run detailed categorization for low-confidence results
+        confidence_threshold: Confidence below which the second stage runs
+        on_file_done: Optional callback(completed_files, total_files), called on the calling thread
+        
+    Returns:
+        tuple: (results in file order, errors)
+    """
+    model_results: Dict[int, List[Optional[Dict[str, Any]]]] = {index: [None] * len(models) for index in range(len(files))}
+    features: Dict[int, Dict[str, Any]] = {}
+    pending = {index: len(models) + 1 for index in range(len(files))}
+    results: Dict[int, Dict[str, Any]] = {}
+    errors = []
+    max_workers = max(1, min(MAX_PARALLEL_CATEGORIZATION_CALLS, len(files) * (len(models) + 1)))
+    categorize = with_script_run_context(categorize_with_model)
+    get_features = with_script_run_context(extract_document_features)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ParallelConsensus") as executor:
+        future_to_task = {}
+        for index, file in enumerate(files):
+            future_to_task[executor.submit(get_features, file["id"])] = (index, None)
+            for position, model_name in enumerate(models):
+                future_to_task[executor.submit(categorize, file["id"], model_name, document_types, use_two_stage, confidence_threshold)] = (index, position)
+        for future in concurrent.futures.as_completed(future_to_task):
+            index, position = future_to_task[future]
+            file = files[index]
+            try:
+                if position is None:
+                    features[index] = future.result()
+                else:
+                    model_result = future.result()
+                    model_result["model_name"] = models[position]
+                    model_results[index][position] = model_result
+            except Exception as e:
+                if position is None:
+                    logger.error(f"Error extracting document features for {file['name']}: {str(e)}")
+                    features[index] = {}
+                else:
+                    logger.error(f"Error with model {models[position]} for {file['name']}: {str(e)}")
+            pending[index] -= 1
+            if pending[index]:
+                continue
+            completed_results = [r for r in model_results.pop(index) if r is not None]
+            try:
+                if not completed_results:
+                    raise Exception("All models failed to categorize the document")
+                results[index] = finalize_parallel_consensus(file, completed_results, features.pop(index), document_types)
+            except Exception as e:
+                logger.error(f"Error categorizing document {file['name']} with parallel consensus: {str(e)}")
+                errors.append({
+                    "file_id": file["id"],
+                    "file_name": file["name"],
+                    "error": str(e)
+                })
+            if on_file_done:
+                on_file_done(len(results) + len(errors), len(files))
+    return [results[index] for index in sorted(results)], errors
+
 def document_categorization():
     """
     Main function for document categorization tab.
@@ -43,7 +198,7 @@ def document_categorization():
     if "document_categorization" not in st.session_state:
         st.session_state.document_categorization = {
             "is_categorized": False,
-            "results": [],
+            "results": create_categorization_results(),
             "errors": []
         }
     
@@ -70,8 +225,8 @@ def document_categorization():
         st.write("### Consensus Mode")
         consensus_mode = st.radio(
             "Consensus Mode",
-            ["Standard", "Parallel Consensus", "Sequential Consensus"],
-            help="Standard: Single model categorization. Parallel: Multiple models categorize independently. Sequential: Models review each other's work."
+            ["Standard", "Parallel Consensus", "Sequential Consensus", "Cascade"],
+            help="Standard: Single model categorization. Parallel: Multiple models categorize independently. Sequential: Models review each other's work. Cascade: A fast model first, escalating to a detailed review or sequential consensus only for low-confidence documents."
         )
         
         if consensus_mode == "Standard":
@@ -140,6 +295,31 @@ def document_categorization():
             else:
                 confidence_threshold = 0.6  # Default value
         
+        elif consensus_mode == "Cascade":
+            st.write("### Select models for each cascade stage:")
+            fast_model = st.selectbox(
+                "Fast model",
+                UPDATED_MODEL_LIST,
+                index=UPDATED_MODEL_LIST.index(DEFAULT_CASCADE_MODELS["fast"]) if DEFAULT_CASCADE_MODELS["fast"] in UPDATED_MODEL_LIST else 0,
+                help="Cheap model that categorizes every document first."
+            )
+            detailed_model = st.selectbox(
+                "Detailed review model",
+                UPDATED_MODEL_LIST,
+                index=UPDATED_MODEL_LIST.index(DEFAULT_CASCADE_MODELS["detailed"]) if DEFAULT_CASCADE_MODELS["detailed"] in UPDATED_MODEL_LIST else 0,
+                help="Reviews documents whose fast-model confidence is below the auto-accept threshold."
+            )
+            consensus_models = st.multiselect(
+                "Sequential consensus models (Model 1, Model 2, Model 3)",
+                options=UPDATED_MODEL_LIST,
+                default=[m for m in DEFAULT_CASCADE_MODELS["consensus"] if m in UPDATED_MODEL_LIST],
+                max_selections=3,
+                help="Used only for documents still below the verification threshold after the detailed review."
+            )
+            thresholds = get_confidence_thresholds()
+            st.caption(f"Auto-accept at {thresholds['auto_accept']:.2f}, detailed review accepted at {thresholds['verification']:.2f} (confidence thresholds).")
+            disagreement_threshold = 0.3
+        
         else:  # Sequential Consensus
             st.write("### Select models for sequential consensus:")
             
@@ -194,6 +374,14 @@ def document_categorization():
                 help="Confidence difference threshold that triggers Model 3 arbitration."
             )
             
+            # Execution mode
+            execution_mode = st.selectbox(
+                "Execution mode",
+                options=EXECUTION_MODES,
+                index=EXECUTION_MODES.index(EXECUTION_MODE_PARALLEL),
+                help="Sequential: run every step one after another. Parallel: run Model 1 and Model 2's independent assessment at the same time. Speculative: also start Model 3 arbitration early when the first two results already disagree (may make an unneeded arbitration call)."
+            )
+            
             # Two-stage categorization option
             use_two_stage = st.checkbox(
                 "Use two-stage categorization",
@@ -235,6 +423,30 @@ def document_categorization():
             initial_folder_id_value = default_folder_id_from_browser if default_folder_id_from_browser != '0' else "0" # Or use a specific previous default if '0' is not desired when at root. For now, "0" is fine.
             folder_id = st.text_input("Box Folder ID", value=initial_folder_id_value)
         
+        # Local pre-classifier
+        local_classifier = get_local_classifier(get_session_user_id())
+        use_local_classifier = False
+        local_classifier_threshold = 0.9
+        if local_classifier.available:
+            use_local_classifier = st.checkbox(
+                "Use local pre-classifier",
+                disabled=not local_classifier.is_trained(),
+                help="Categorize files locally from filename, extension, size, folder and dates, and skip the AI call when the prediction is confident. Trained automatically on past high-confidence results."
+            )
+            if use_local_classifier:
+                local_classifier_threshold = st.slider(
+                    "Local pre-classifier confidence threshold",
+                    min_value=0.5,
+                    max_value=1.0,
+                    value=0.9,
+                    step=0.01,
+                    help="Files predicted with at least this probability are not sent to the AI models."
+                )
+            if local_classifier.is_trained():
+                st.caption(f"Local pre-classifier trained on {local_classifier.model_info.get('num_examples', 0)} files.")
+            else:
+                st.caption("Local pre-classifier is not trained yet; it trains after enough high-confidence results are collected.")
+        
         # Start and cancel buttons
         col1, col2 = st.columns(2)
         with col1:
@@ -245,7 +457,7 @@ def document_categorization():
         # Process categorization
         if start_button:
             st.session_state.document_categorization["is_categorized"] = False
-            st.session_state.document_categorization["results"] = []
+            st.session_state.document_categorization["results"] = create_categorization_results(reset=True)
             st.session_state.document_categorization["errors"] = []
             
             # Get files to process based on selection mode
@@ -264,7 +476,9 @@ def document_categorization():
                 try:
                     # Get folder contents
                     folder = st.session_state.client.folder(folder_id).get()
-                    items = folder.get_items()
+                    # Request the feature fields with the listing so categorization needs no per-file lookups
+                    items = list(folder.get_items(fields=["type", "id"] + FILE_INFO_FIELDS))
+                    remember_file_infos(items, parent={"id": folder.id, "name": folder.name})
                     
                     # Filter for files only
                     files_to_process = [
@@ -277,31 +491,55 @@ def document_categorization():
                 except Exception as e:
                     st.error(f"Error accessing folder: {str(e)}")
             
-            if files_to_process:
+            file_infos = {}
+            # Files the local pre-classifier cannot categorize confidently go to the AI models
+            ai_files = files_to_process
+            if files_to_process and use_local_classifier:
+                file_infos = collect_file_infos(files_to_process)
+                # Only categories that still exist in this session may skip the AI call
+                valid_categories = [dtype["name"] for dtype in st.session_state.document_types]
+                predictions = local_classifier.classify_confident(list(file_infos.values()), local_classifier_threshold, valid_categories)
+                for file in files_to_process:
+                    if str(file["id"]) in predictions:
+                        category, probability = predictions[str(file["id"])]
+                        st.session_state.document_categorization["results"].append({
+                            "file_id": file["id"],
+                            "file_name": file["name"],
+                            "document_type": category,
+                            "confidence": probability,
+                            "calibrated_confidence": probability,
+                            "reasoning": "Predicted by the local pre-classifier from filename, extension, size, folder and dates.",
+                            "model_name": LOCAL_CLASSIFIER_MODEL_NAME
+                        })
+                logger.info(f"Local pre-classifier categorized {len(predictions)} of {len(files_to_process)} files")
+                ai_files = [file for file in files_to_process if str(file["id"]) not in predictions]
+                if not ai_files:
+                    st.session_state.document_categorization["is_categorized"] = True
+                    st.success(f"Categorization complete! All {len(predictions)} files were categorized by the local pre-classifier.")
+            
+            if ai_files:
+                # Fetch the features of all files up front (most come from the folder listing)
+                # instead of one extra API call per file during categorization
+                prefetch_file_infos([file["id"] for file in ai_files])
+                
                 # Process each file
                 progress_text = st.empty()
-                progress_text.info(f"Processing {len(files_to_process)} files...")
+                progress_text.info(f"Processing {len(ai_files)} files...")
 
                 if consensus_mode == "Standard":
-                    progress_text.info(f"Processing {len(files_to_process)} files with {model}...")
+                    progress_text.info(f"Processing {len(ai_files)} files with {model}...")
 
-                    for file in files_to_process:
+                    for file in ai_files:
                         try:
                             progress_text.info(f"Processing {file['name']}...")
                             
-                            if use_two_stage:
-                                result = categorize_document_detailed(
-                                    file["id"],
-                                    model, 
-                                    st.session_state.document_types,
-                                    confidence_threshold
-                                )
-                            else:
-                                result = categorize_document(
-                                    file["id"],
-                                    model, 
-                                    st.session_state.document_types
-                                )
+                            result = categorize_with_model(
+                                file["id"],
+                                model,
+                                st.session_state.document_types,
+                                use_two_stage,
+                                confidence_threshold
+                            )
                             
                             # Add file info to result
                             result["file_id"] = file["id"]
@@ -341,79 +579,54 @@ def document_categorization():
                         st.error("Please select at least one model for parallel consensus.")
                         return
 
-                    progress_text.info(f"Processing {len(files_to_process)} files with {len(models)} models in parallel...")
+                    progress_text.info(f"Processing {len(ai_files)} files with {len(models)} models in parallel...")
 
-                    for file in files_to_process:
-                        try:
-                            progress_text.info(f"Processing {file['name']} with parallel consensus...")
-                            
-                            # Get results from all selected models
-                            model_results = []
-                            for model_name in models:
-                                try:
-                                    if use_two_stage:
-                                        model_result = categorize_document_detailed(
-                                            file["id"],
-                                            model_name,
-                                            st.session_state.document_types,
-                                            confidence_threshold
-                                        )
-                                    else:
-                                        model_result = categorize_document(
-                                            file["id"],
-                                            model_name,
-                                            st.session_state.document_types
-                                        )
-
-                                    model_result["model_name"] = model_name
-                                    model_results.append(model_result)
-                                except Exception as e:
-                                    logger.error(f"Error with model {model_name} for {file['name']}: {str(e)}")
+                    results, errors = run_parallel_consensus(
+                        ai_files,
+                        models,
+                        st.session_state.document_types,
+                        use_two_stage,
+                        confidence_threshold,
+                        on_file_done=lambda done, total: progress_text.info(f"Categorized {done}/{total} files with parallel consensus...")
+                    )
+                    st.session_state.document_categorization["results"].extend(results)
+                    st.session_state.document_categorization["errors"].extend(errors)
+                
+                elif consensus_mode == "Cascade":
+                    if len(consensus_models) != 3:
+                        st.error("Please select three models for the cascade's sequential consensus stage.")
+                        return
 
-                            if model_results:
-                                # Combine results from all models
-                                combined_result = combine_categorization_results(model_results)
-                                
-                                # Add file info to result
-                                combined_result["file_id"] = file["id"]
-                                combined_result["file_name"] = file["name"]
-                                combined_result["model_results"] = model_results
-                                
-                                # Calculate multi-factor confidence
-                                document_features = extract_document_features(file["id"])
-                                multi_factor_confidence = calculate_multi_factor_confidence(
-                                    combined_result["confidence"],
-                                    document_features,
-                                    combined_result["document_type"],
-                                    combined_result.get("reasoning", ""),
-                                    [dtype["name"] for dtype in st.session_state.document_types]
-                                )
-                                combined_result["multi_factor_confidence"] = multi_factor_confidence
-                                
-                                # Apply confidence calibration
-                                calibrated_confidence = apply_confidence_calibration(
-                                    combined_result["document_type"],
-                                    multi_factor_confidence.get("overall", combined_result["confidence"])
-                                )
-                                combined_result["calibrated_confidence"] = calibrated_confidence
-                                
-                                # Add to results
-                                st.session_state.document_categorization["results"].append(combined_result)
-                            else:
-                                raise Exception("All models failed to categorize the document")
-                                
+                    exit_stages = {}
+                    for file in ai_files:
+                        try:
+                            progress_text.info(f"Processing {file['name']} with cascade...")
+                            result = categorize_document_with_cascade(
+                                file["id"],
+                                st.session_state.document_types,
+                                fast_model,
+                                detailed_model,
+                                consensus_models,
+                                disagreement_threshold
+                            )
+                            result["file_id"] = file["id"]
+                            result["file_name"] = file["name"]
+                            exit_stage = result["cascade"]["exit_stage"]
+                            exit_stages[exit_stage] = exit_stages.get(exit_stage, 0) + 1
+                            st.session_state.document_categorization["results"].append(result)
                         except Exception as e:
-                            logger.error(f"Error categorizing document {file['name']} with parallel consensus: {str(e)}")
+                            logger.error(f"Error categorizing document {file['name']} with cascade: {str(e)}")
                             st.session_state.document_categorization["errors"].append({
                                 "file_id": file["id"],
                                 "file_name": file["name"],
                                 "error": str(e)
                             })
+                    logger.info(f"Cascade exit stages: {exit_stages}")
                 
                 else:  # Sequential Consensus
-                    progress_text.info(f"Processing {len(files_to_process)} files with sequential consensus...")
+                    progress_text.info(f"Processing {len(ai_files)} files with sequential consensus...")
 
-                    for file in files_to_process:
+                    for file in ai_files:
                         try:
                             progress_text.info(f"Processing {file['name']} with sequential consensus...")
                             
@@ -424,7 +637,8 @@ def document_categorization():
                                 model2,
                                 model3,
                                 st.session_state.document_types,
-                                disagreement_threshold
+                                disagreement_threshold,
+                                execution_mode
                             )
                             
                             # Add file info to result
@@ -463,27 +677,22 @@ def document_categorization():
                 
                 # Update status
                 st.session_state.document_categorization["is_categorized"] = True
-                progress_text.success(f"Categorization complete! Processed {len(files_to_process)} files with {len(st.session_state.document_categorization['errors'])} errors.")
+                progress_text.success(f"Categorization complete! Processed {len(files_to_process)} files ({len(files_to_process) - len(ai_files)} by the local pre-classifier) with {len(st.session_state.document_categorization['errors'])} errors.")
                 
-                if files_to_process: # Ensure we only update if files were actually processed
-                    # Ensure files_to_process contains dictionaries with 'id', 'name', and 'type'
-                    # This is already the case based on how files_to_process is constructed for folder mode:
-                    # files_to_process = [
-                    #     {"id": item.id, "name": item.name, "type": item.type}
-                    #     for item in items if item.type == "file"
-                    # ]
-                    # And for selected files mode, it's also structured similarly:
-                    # files_to_process = [
-                    #     {"id": file["id"], "name": file["name"], "type": file["type"]}
-                    #     for file in st.session_state.selected_files
-                    # ]
-                    # So, files_to_process should be suitable for direct assignment if it was populated.
-
-                    st.session_state.selected_files = files_to_process
-                    logger.info(f"Updated st.session_state.selected_files with {len(files_to_process)} categorized files.")
+                # Learn from confident AI results so the local pre-classifier can skip similar files next time
+                if local_classifier.available:
+                    train_local_classifier(st.session_state.document_categorization["results"], file_infos)
+                
+            # All files of the run, including those categorized by the local pre-classifier, move on to processing
+            if files_to_process:
+                st.session_state.selected_files = files_to_process
+                logger.info(f"Updated st.session_state.selected_files with {len(files_to_process)} categorized files.")
 
                 # Display results
                 display_categorization_results()
+            
+            # File metadata memoized for this run is not reused by later runs
+            clear_file_info_cache()
     
     with tab2:  # Settings Tab
         st.write("## Document Categorization Settings")
@@ -5,17 +5,18 @@ import json
 import requests
 import re
 import os
-import datetime as dt_module # Alias to avoid conflict with datetime class
-from datetime import datetime # Specific import for datetime class
 import pandas as pd
 import altair as alt
-from typing import Dict, Any, List, Optional, Tuple
+import threading
+import concurrent.futures
+from typing import Dict, Any, Callable, List, Optional, Tuple
+from modules.date_normalizer import get_date_normalizer
 
 try:
-    from dateutil import parser as dateutil_parser
-    dateutil_parser_available = True
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+    script_run_ctx_available = True
 except ImportError:
-    dateutil_parser_available = False
+    script_run_ctx_available = False
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
@@ -23,6 +24,20 @@ logger = logging.getLogger(__name__)
 
 # --- Core Categorization Logic ---
 
+def with_script_run_context(func: Callable) -> Callable:
+    """
+    Wrap a function so it runs with the current Streamlit script context on worker threads.
+    Worker threads need the context to read st.session_state (e.g. the Box client).
+    """
+    ctx = get_script_run_ctx() if script_run_ctx_available else None
+
+    def wrapper(*args, **kwargs):
+        if ctx is not None:
+            add_script_run_ctx(threading.current_thread(), ctx)
+        return func(*args, **kwargs)
+    return wrapper
+
+
 def categorize_document(file_id: str, model: str, document_types_with_desc: List[Dict[str, str]]) -> Dict[str, Any]:
     """
     Categorize a single document using the specified AI model.
@@ -41,7 +56,7 @@ def categorize_document(file_id: str, model: str, document_types_with_desc: List
     }
 
     valid_categories = [dtype["name"] for dtype in document_types_with_desc]
-    category_options_text = "\n".join([f"- {dtype["name"]}: {dtype["description"]}" for dtype in document_types_with_desc])
+    category_options_text = "\n".join([f"- {dtype['name']}: {dtype['description']}" for dtype in document_types_with_desc])
 
     prompt = (
         f"Please analyze this document and categorize it into one of the following categories:\n"
@@ -103,7 +118,7 @@ def categorize_document_detailed(file_id: str, model: str, initial_category: str
     }
 
     valid_categories = [dtype["name"] for dtype in document_types_with_desc]
-    category_options_text = "\n".join([f"- {dtype["name"]}: {dtype["description"]}" for dtype in document_types_with_desc])
+    category_options_text = "\n".join([f"- {dtype['name']}: {dtype['description']}" for dtype in document_types_with_desc])
 
     prompt = (
         f"An initial analysis suggested this document might be categorized as 	\"{initial_category}\".\n"
@@ -281,81 +296,134 @@ def combine_categorization_results(results: List[Dict[str, Any]], valid_categori
 
 # --- Confidence Calculation and Features ---
 
+FILE_INFO_FIELDS = ["size", "name", "created_at", "modified_at", "parent"]
+# Upper bound on concurrent file info requests made by prefetch_file_infos
+MAX_FILE_INFO_FETCHES = 8
+
+def _item_attribute(item: Any, name: str) -> Any:
+    """Read an attribute from a Box SDK item or an item dictionary."""
+    return item.get(name) if isinstance(item, dict) else getattr(item, name, None)
+
+def file_info_from_item(item: Any, parent: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Convert a Box file item (SDK object or dictionary) into the file metadata used for categorization features.
+    
+    Args:
+        item: File item with any of id, name, size, created_at, modified_at and parent
+        parent: Parent folder (id and name) to use when the item has none, e.g. the listed folder
+    
+    Returns:
+        dict: id, name, size, created_at, modified_at, parent_id and parent_name
+    """
+    item_parent = _item_attribute(item, "parent") or parent or {}
+    info = {"id": str(_item_attribute(item, "id")), "name": _item_attribute(item, "name"), "size": _item_attribute(item, "size")}
+    for key in ("created_at", "modified_at"):
+        value = _item_attribute(item, key)
+        info[key] = value.isoformat() if hasattr(value, "isoformat") else value
+    info["parent_id"] = _item_attribute(item_parent, "id")
+    info["parent_name"] = _item_attribute(item_parent, "name")
+    return info
+
+def _file_info_cache() -> Dict[str, Dict[str, Any]]:
+    """Get the session's file info memo, keyed by file ID."""
+    if "file_info_cache" not in st.session_state:
+        st.session_state.file_info_cache = {}
+    return st.session_state.file_info_cache
+
+def clear_file_info_cache() -> None:
+    """
+    Forget the session's memoized file metadata.
+    Called when a categorization run ends, so listings made while browsing serve the
+    next run only and later runs see renamed, moved or updated files.
+    """
+    st.session_state.file_info_cache = {}
+
+def remember_file_infos(items: List[Any], parent: Optional[Dict[str, Any]] = None) -> int:
+    """
+    Memoize file metadata already returned by a listing (e.g. folder items requested with FILE_INFO_FIELDS).
+    Items without a size are skipped, since the listing did not include the feature fields.
+    
+    Args:
+        items: Listed items; non-file items are ignored
+        parent: Listed folder (id and name), used when items have no parent
+    
+    Returns:
+        int: Number of files memoized
+    """
+    cache = _file_info_cache()
+    remembered = 0
+    for item in items:
+        if _item_attribute(item, "type") not in (None, "file") or _item_attribute(item, "size") is None:
+            continue
+        info = file_info_from_item(item, parent)
+        cache[info["id"]] = info
+        remembered += 1
+    return remembered
+
+def prefetch_file_infos(file_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Make sure the metadata of many files is memoized, fetching the missing ones concurrently.
+    
+    Args:
+        file_ids: File IDs
+    
+    Returns:
+        dict: File ID to file metadata (files that could not be fetched are left out)
+    """
+    cache = _file_info_cache()
+    missing = list(dict.fromkeys(str(file_id) for file_id in file_ids if str(file_id) not in cache))
+    if missing:
+        client = st.session_state.client
+
+        def fetch(file_id):
+            return file_info_from_item(client.file(file_id).get(fields=FILE_INFO_FIELDS))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(MAX_FILE_INFO_FETCHES, len(missing))) as executor:
+            future_to_id = {executor.submit(fetch, file_id): file_id for file_id in missing}
+            for future in concurrent.futures.as_completed(future_to_id):
+                try:
+                    cache[future_to_id[future]] = future.result()
+                except Exception as e:
+                    logger.error(f"Error fetching file info for {future_to_id[future]}: {str(e)}")
+        logger.info(f"Prefetched file info for {len(missing)} of {len(file_ids)} files ({len(file_ids) - len(missing)} already known)")
+    return {str(file_id): cache[str(file_id)] for file_id in file_ids if str(file_id) in cache}
+
+def get_file_info(file_id: str) -> Dict[str, Any]:
+    """
+    Get the file metadata used for categorization features, from the session memo if possible.
+    """
+    cache = _file_info_cache()
+    info = cache.get(str(file_id))
+    if info is None:
+        info = file_info_from_item(st.session_state.client.file(file_id).get(fields=FILE_INFO_FIELDS))
+        cache[str(file_id)] = info
+    return info
+
 def extract_document_features(file_id: str) -> Dict[str, Any]:
     """
     Extract basic document features using Box API (placeholder).
     In a real implementation, this might involve more sophisticated analysis.
     """
     try:
-        file_info = st.session_state.client.file(file_id).get(fields=["size", "name", "created_at", "modified_at", "parent"])
-
-        created_date_str = "N/A"
-        raw_created_at = file_info.created_at
-        if isinstance(raw_created_at, str):
-            try:
-                dt_created = None
-                if dateutil_parser_available:
-                    try:
-                        dt_created = dateutil_parser.isoparse(raw_created_at)
-                    except Exception as de: # Broad exception for dateutil if it fails
-                        logger.warning(f"dateutil.parser failed for created_at '{raw_created_at}': {de}. Falling back.")
-                        # Fall through to fromisoformat logic by not setting dt_created
-
-                if dt_created is None: # Fallback or if dateutil was not available/failed
-                    processed_created_at_str = raw_created_at
-                    if processed_created_at_str.endswith('Z'):
-                        processed_created_at_str = processed_created_at_str[:-1] + '+00:00'
-                    dt_created = datetime.fromisoformat(processed_created_at_str)
-
-                created_date_str = dt_created.strftime("%Y-%m-%d")
-            except ValueError as ve:
-                logger.warning(f"Could not parse created_at string '{raw_created_at}' for file {file_id}: {ve}")
-                created_date_str = raw_created_at # Fallback to original string
-            except Exception as ex:
-                logger.warning(f"Generic error processing created_at string '{raw_created_at}' for file {file_id}: {ex}")
-                created_date_str = raw_created_at # Fallback to original string
-        elif isinstance(raw_created_at, dt_module.datetime) or isinstance(raw_created_at, datetime): # Check for both aliased and direct datetime
-            try:
-                created_date_str = raw_created_at.strftime("%Y-%m-%d")
-            except Exception as ex:
-                logger.warning(f"Error formatting datetime object created_at for file {file_id}: {ex}")
-                # created_date_str remains "N/A"
-
-        modified_date_str = "N/A"
-        raw_modified_at = file_info.modified_at
-        if isinstance(raw_modified_at, str):
-            try:
-                dt_modified = None
-                if dateutil_parser_available:
-                    try:
-                        dt_modified = dateutil_parser.isoparse(raw_modified_at)
-                    except Exception as de:
-                        logger.warning(f"dateutil.parser failed for modified_at '{raw_modified_at}': {de}. Falling back.")
-
-                if dt_modified is None: # Fallback or if dateutil was not available/failed
-                    processed_modified_at_str = raw_modified_at
-                    if processed_modified_at_str.endswith('Z'):
-                        processed_modified_at_str = processed_modified_at_str[:-1] + '+00:00'
-                    dt_modified = datetime.fromisoformat(processed_modified_at_str)
-
-                modified_date_str = dt_modified.strftime("%Y-%m-%d")
-            except ValueError as ve:
-                logger.warning(f"Could not parse modified_at string '{raw_modified_at}' for file {file_id}: {ve}")
-                modified_date_str = raw_modified_at # Fallback to original string
-            except Exception as ex:
-                logger.warning(f"Generic error processing modified_at string '{raw_modified_at}' for file {file_id}: {ex}")
-                modified_date_str = raw_modified_at # Fallback to original string
-        elif isinstance(raw_modified_at, dt_module.datetime) or isinstance(raw_modified_at, datetime): # Check for both aliased and direct datetime
-            try:
-                modified_date_str = raw_modified_at.strftime("%Y-%m-%d")
-            except Exception as ex:
-                logger.warning(f"Error formatting datetime object modified_at for file {file_id}: {ex}")
+        file_info = get_file_info(file_id)
+
+        # Box dates are parsed with the shared date normalizer; unparseable strings are kept as is
+        date_strings = {}
+        for key in ("created_at", "modified_at"):
+            raw_date = file_info[key]
+            parsed_date = get_date_normalizer().parse(raw_date, ("file_info", key))
+            if parsed_date is not None:
+                date_strings[key] = parsed_date.strftime("%Y-%m-%d")
+            elif isinstance(raw_date, str):
+                logger.warning(f"Could not parse {key} string '{raw_date}' for file {file_id}")
+                date_strings[key] = raw_date
+            else:
+                date_strings[key] = "N/A"
 
         return {
-            "file_size_kb": round(file_info.size / 1024, 2),
-            "file_extension": os.path.splitext(file_info.name)[1].lower(),
-            "created_date": created_date_str,
-            "modified_date": modified_date_str
+            "file_size_kb": round(file_info["size"] / 1024, 2),
+            "file_extension": os.path.splitext(file_info["name"])[1].lower(),
+            "created_date": date_strings["created_at"],
+            "modified_date": date_strings["modified_at"]
         }
     except Exception as e:
         logger.error(f"Error extracting features for file {file_id}: {str(e)}")
@@ -449,15 +517,23 @@ def apply_confidence_calibration(category: str, confidence: float) -> float:
         return min(1.0, confidence + 0.05)
     return confidence
 
+DEFAULT_CONFIDENCE_THRESHOLDS = {
+    "auto_accept": 0.85,
+    "verification": 0.6,
+    "rejection": 0.4
+}
+
+def get_confidence_thresholds() -> Dict[str, float]:
+    """
+    Get the configured confidence thresholds (auto_accept, verification, rejection).
+    """
+    return st.session_state.get("confidence_thresholds", DEFAULT_CONFIDENCE_THRESHOLDS)
+
 def apply_confidence_thresholds(results: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
     """
     Apply status labels based on confidence thresholds.
     """
-    thresholds = st.session_state.get("confidence_thresholds", {
-        "auto_accept": 0.85,
-        "verification": 0.6,
-        "rejection": 0.4
-    })
+    thresholds = get_confidence_thresholds()
     
     for file_id, result in results.items():
         confidence = result.get("calibrated_confidence", result.get("multi_factor_confidence", {}).get("overall", result.get("confidence", 0.0)))
@@ -2,6 +2,7 @@ import streamlit as st
 import logging
 import json
 from typing import Dict, Any, List, Optional
+from modules.categorization_results import categorized_document_types, find_categorization, result_document_type
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -27,8 +28,9 @@ def metadata_config():
             file_id = file['id']
             file_name = file['name']
             document_type = 'Not categorized'
-            if file_id in st.session_state.document_categorization['results']:
-                document_type = st.session_state.document_categorization['results'][file_id]['document_type']
+            cat_result = find_categorization(st.session_state.document_categorization['results'], file_id)
+            if cat_result:
+                document_type = result_document_type(cat_result) or 'Not categorized'
             categorization_data.append({'File Name': file_name, 'Document Type': document_type})
         st.table(categorization_data)
     else:
@@ -48,9 +50,7 @@ def metadata_config():
         if has_categorization:
             st.subheader('Document Type Specific Prompts')
             st.info('You can customize the freeform prompt for each document type. These prompts will be used when processing files of the corresponding document type.')
-            document_types = set()
-            for file_id, result in st.session_state.document_categorization['results'].items():
-                document_types.add(result['document_type'])
+            document_types = categorized_document_types(st.session_state.document_categorization['results'])
             if 'document_type_prompts' not in st.session_state.metadata_config:
                 st.session_state.metadata_config['document_type_prompts'] = {}
             for doc_type in document_types:
@@ -69,9 +69,7 @@ def metadata_config():
         if has_categorization:
             st.subheader('Document Type Template Mapping')
             st.info('You can map each document type to a specific metadata template. These mappings will be used when processing files of the corresponding document type.')
-            document_types = set()
-            for file_id, result in st.session_state.document_categorization['results'].items():
-                document_types.add(result['document_type'])
+            document_types = categorized_document_types(st.session_state.document_categorization['results'])
             if not hasattr(st.session_state, 'document_type_to_template'):
                 st.session_state.document_type_to_template = {}
             for doc_type in document_types:
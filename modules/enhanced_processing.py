@@ -7,6 +7,9 @@ import seaborn as sns
 from typing import List, Dict, Any
 import json
 import concurrent.futures
+from modules.response_normalizer import parse_answer_json
+from modules.session_state_manager import create_extraction_results
+from modules.categorization_results import find_categorization, result_document_type
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 DEBUG_MODE = True
@@ -23,7 +26,7 @@ def process_files():
     if 'feedback_data' not in st.session_state:
         st.session_state.feedback_data = {}
     if 'extraction_results' not in st.session_state:
-        st.session_state.extraction_results = {}
+        st.session_state.extraction_results = create_extraction_results()
     try:
         if not st.session_state.authenticated or not st.session_state.client:
             st.error('Please authenticate with Box first')
@@ -99,7 +102,7 @@ def process_files():
         progress_container = st.container()
         if start_button:
             st.session_state.processing_state = {'is_processing': True, 'processed_files': 0, 'total_files': len(st.session_state.selected_files), 'current_file_index': -1, 'current_file': '', 'results': {}, 'errors': {}, 'retries': {}, 'max_retries': max_retries, 'retry_delay': retry_delay, 'processing_mode': processing_mode, 'visualization_data': {}}
-            st.session_state.extraction_results = {}
+            st.session_state.extraction_results = create_extraction_results(reset=True)
             extraction_functions = get_extraction_functions()
             process_files_with_progress(st.session_state.selected_files, extraction_functions, batch_size=batch_size, processing_mode=processing_mode)
         if cancel_button and st.session_state.processing_state.get('is_processing', False):
@@ -163,12 +166,12 @@ def extract_structured_data_from_response(response):
             return structured_data
         if 'answer' in response and isinstance(response['answer'], str):
             try:
-                answer_data = json.loads(response['answer'])
+                answer_data = parse_answer_json(response['answer'])
                 if isinstance(answer_data, dict):
                     structured_data = answer_data
                     logger.info(f"Found structured data in 'answer' field (JSON string): {structured_data}")
                     return structured_data
-            except json.JSONDecodeError:
+            except ValueError:
                 logger.warning(f"Could not parse 'answer' field as JSON: {response['answer']}")
         for key, value in response.items():
             if key not in ['error', 'items', 'response', 'item_collection', 'entries', 'type', 'id', 'sequence_id']:
@@ -256,8 +259,10 @@ def get_document_type_for_file(file_id):
     Returns:
         str: Document type or None if not categorized
     """
-    if hasattr(st.session_state, 'document_categorization') and st.session_state.document_categorization.get('is_categorized', False) and (file_id in st.session_state.document_categorization['results']):
-        return st.session_state.document_categorization['results'][file_id]['document_type']
+    if hasattr(st.session_state, 'document_categorization') and st.session_state.document_categorization.get('is_categorized', False):
+        cat_result = find_categorization(st.session_state.document_categorization['results'], file_id)
+        if cat_result:
+            return result_document_type(cat_result)
     return None
 
 def process_file(file, extraction_functions):
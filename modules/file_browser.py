@@ -1,5 +1,6 @@
 import streamlit as st
 from typing import List, Dict, Any
+from modules.document_categorization_utils import FILE_INFO_FIELDS, remember_file_infos
 
 def file_browser():
     """
@@ -41,7 +42,9 @@ def file_browser():
                 navigate_to_folder(folder['id'], folder['name'])
     try:
         current_folder = st.session_state.client.folder(folder_id=st.session_state.current_folder_id).get()
-        items = st.session_state.client.folder(folder_id=st.session_state.current_folder_id).get_items()
+        items = list(st.session_state.client.folder(folder_id=st.session_state.current_folder_id).get_items(fields=['type', 'id'] + FILE_INFO_FIELDS))
+        # The listing already has the categorization features, so keep them for later steps
+        remember_file_infos(items, parent={'id': current_folder.id, 'name': current_folder.name})
         folders = []
         files = []
         for item in items:
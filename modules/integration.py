@@ -4,12 +4,13 @@ This module provides integration points for the optimized components
 to work together while preserving existing functionality.
 """
 import logging
+import threading
 from typing import Dict, Any, Optional, List, Callable, Union, Tuple
 from modules.api_client import BoxAPIClient
 from modules.cache import PersistentCache, cache_api_call
 from modules.retry import CircuitBreaker, RetryManager
-from modules.session_state_manager import SessionStateManager as SSM
-from modules.background_processing import get_job_manager, run_in_background
+from modules.session_state_manager import get_safe_session_state, get_session_user_id
+from modules.background_processing import JobDeferred, get_job_manager, get_current_job_id, get_current_job_owner, register_job_handler
 from modules.batch_processing import BatchProcessor, AdaptiveBatchProcessor
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -29,6 +30,9 @@ class OptimizedIntegration:
         self.batch_processor = AdaptiveBatchProcessor(min_workers=2, max_workers=10, batch_size=10, throttle_rate=0.2, target_success_rate=95.0)
         self.job_manager = get_job_manager()
         self.api_client = None
+        self.owner_api_clients: Dict[str, BoxAPIClient] = {}
+        self.owner_client_factory: Optional[Callable[[str], Any]] = None
+        self.owner_lock = threading.RLock()
 
     def initialize_api_client(self, client):
         """
@@ -64,12 +68,77 @@ class OptimizedIntegration:
         """
         if self.api_client is None:
             if client is None:
-                client = SSM.get('client')
+                client = get_safe_session_state('client')
                 if client is None:
                     raise ValueError('Box client not initialized')
             self.initialize_api_client(client)
         return self.api_client
 
+    def register_owner_client(self, owner: str, client) -> None:
+        """
+        Register the Box client that durable jobs owned by a Box user run with.
+        
+        Args:
+            owner: Box user ID
+            client: Box SDK client authenticated as (or acting for) that user
+        """
+        with self.owner_lock:
+            api_client = self.owner_api_clients.get(owner)
+            if api_client is None or api_client.client is not client:
+                self.owner_api_clients[owner] = BoxAPIClient(client)
+
+    def register_session_client(self) -> Optional[str]:
+        """
+        Register the session's Box client for the session's user, so that the
+        user's durable jobs can run (or resume) in this process.
+        
+        Returns:
+            str: Box user ID, or None if the session is not authenticated
+        """
+        owner = get_session_user_id()
+        client = get_safe_session_state('client')
+        if owner is None or client is None:
+            return None
+        self.register_owner_client(owner, client)
+        return owner
+
+    def set_owner_client_factory(self, factory: Optional[Callable[[str], Any]]) -> None:
+        """
+        Set the factory that creates Box clients for job owners without a registered client.
+        
+        Args:
+            factory: Function taking a Box user ID and returning a Box SDK client
+                acting as that user, or None if it cannot (or None to remove the factory)
+        """
+        with self.owner_lock:
+            self.owner_client_factory = factory
+
+    def get_owner_api_client(self, owner: Optional[str]) -> BoxAPIClient:
+        """
+        Get the API client for the owner of a durable job.
+        
+        Args:
+            owner: Box user ID of the job owner
+            
+        Returns:
+            BoxAPIClient: API client acting as the owner
+            
+        Raises:
+            ValueError: If the job has no owner
+            JobDeferred: If this process has no Box client for the owner
+        """
+        if not owner:
+            raise ValueError('Job has no owner; refusing to run it without the Box user that submitted it')
+        with self.owner_lock:
+            api_client = self.owner_api_clients.get(owner)
+            if api_client is None and self.owner_client_factory is not None:
+                client = self.owner_client_factory(owner)
+                if client is not None:
+                    api_client = self.owner_api_clients[owner] = BoxAPIClient(client)
+        if api_client is None:
+            raise JobDeferred(f'No Box client for user {owner} in this process')
+        return api_client
+
     @cache_api_call(cache=None, prefix='file_info')
     def get_file_info(self, file_id: str, fields: Optional[List[str]]=None) -> Dict[str, Any]:
         """
@@ -131,7 +200,7 @@ class OptimizedIntegration:
         api_client = self.ensure_api_client()
         return self.retry_managers['metadata'].execute(api_client.get_metadata_template, scope, template)
 
-    def extract_metadata_ai(self, file_id: str, prompt: str=None, fields: List[Dict[str, Any]]=None) -> Dict[str, Any]:
+    def extract_metadata_ai(self, file_id: str, prompt: str=None, fields: List[Dict[str, Any]]=None, api_client: Optional[BoxAPIClient]=None) -> Dict[str, Any]:
         """
         Extract metadata using Box AI.
         
@@ -139,14 +208,15 @@ class OptimizedIntegration:
             file_id: Box file ID
             prompt: Extraction prompt for freeform extraction
             fields: Field definitions for structured extraction
+            api_client: API client to use (or None for the session's client)
             
         Returns:
             dict: Extracted metadata
         """
-        api_client = self.ensure_api_client()
+        api_client = api_client or self.ensure_api_client()
         return self.retry_managers['ai'].execute(api_client.extract_metadata_ai, file_id, prompt, fields)
 
-    def apply_metadata(self, file_id: str, metadata: Dict[str, Any], scope: str='enterprise', template: str='default') -> Dict[str, Any]:
+    def apply_metadata(self, file_id: str, metadata: Dict[str, Any], scope: str='enterprise', template: str='default', api_client: Optional[BoxAPIClient]=None) -> Dict[str, Any]:
         """
         Apply metadata to a file.
         
@@ -155,11 +225,12 @@ class OptimizedIntegration:
             metadata: Metadata to apply
             scope: Metadata scope (enterprise or global)
             template: Template key
+            api_client: API client to use (or None for the session's client)
             
         Returns:
             dict: Applied metadata
         """
-        api_client = self.ensure_api_client()
+        api_client = api_client or self.ensure_api_client()
         return self.retry_managers['metadata'].execute(api_client.apply_metadata, file_id, metadata, scope, template)
 
     def update_metadata(self, file_id: str, operations: List[Dict[str, Any]], scope: str='enterprise', template: str='default') -> Dict[str, Any]:
@@ -221,10 +292,13 @@ class OptimizedIntegration:
             return self.apply_metadata(file_id, metadata, scope, template)
         return self.batch_processor.process_batch(items, process_item, batch_size, max_workers, progress_callback=progress_callback)
 
-    @run_in_background('Extract Metadata')
-    def background_batch_extract_metadata(self, file_ids: List[str], prompt: str=None, fields: List[Dict[str, Any]]=None, batch_size: Optional[int]=None, max_workers: Optional[int]=None) -> List[Tuple[str, Optional[Dict[str, Any]], Optional[Exception]]]:
+    def background_batch_extract_metadata(self, file_ids: List[str], prompt: str=None, fields: List[Dict[str, Any]]=None, batch_size: Optional[int]=None, max_workers: Optional[int]=None, chunk_size: int=50) -> str:
         """
-        Extract metadata for multiple files in batches as a background job.
+        Extract metadata for multiple files in batches as a durable background job.
+        The file list is split into chunk jobs that run in parallel on the job workers.
+        Processed files are checkpointed, so a job resumed after a restart skips them,
+        and their results can be read with job_manager.get_partial_results while it runs.
+        The job is owned by the session's Box user and runs with that user's client.
         
         Args:
             file_ids: List of Box file IDs
@@ -232,21 +306,25 @@ class OptimizedIntegration:
             fields: Field definitions for structured extraction
             batch_size: Batch size (or None for default)
             max_workers: Maximum workers (or None for default)
+            chunk_size: Number of files per chunk job
             
         Returns:
-            List of tuples (file_id, metadata, exception) for each file
+            str: Job ID
+            
+        Raises:
+            ValueError: If the session is not authenticated
         """
-        job_id = SSM.get('active_job_id')
-
-        def update_job_progress(items_processed, total_items, progress):
-            if job_id:
-                self.job_manager.update_progress(job_id, progress, f'Processed {items_processed}/{total_items} files')
-        return self.batch_extract_metadata(file_ids, prompt, fields, batch_size, max_workers, update_job_progress)
+        owner = self.register_session_client()
+        if owner is None:
+            raise ValueError('Background jobs need an authenticated Box session')
+        return self.job_manager.submit_chunked('Extract Metadata', 'extract_metadata', list(file_ids), chunk_size=chunk_size, items_arg='file_ids', kwargs={'prompt': prompt, 'fields': fields, 'batch_size': batch_size, 'max_workers': max_workers}, owner=owner, durable=True)
 
-    @run_in_background('Apply Metadata')
-    def background_batch_apply_metadata(self, items: List[Tuple[str, Dict[str, Any]]], scope: str='enterprise', template: str='default', batch_size: Optional[int]=None, max_workers: Optional[int]=None) -> List[Tuple[Tuple[str, Dict[str, Any]], Optional[Dict[str, Any]], Optional[Exception]]]:
+    def background_batch_apply_metadata(self, items: List[Tuple[str, Dict[str, Any]]], scope: str='enterprise', template: str='default', batch_size: Optional[int]=None, max_workers: Optional[int]=None, chunk_size: int=50) -> str:
         """
-        Apply metadata to multiple files in batches as a background job.
+        Apply metadata to multiple files in batches as a durable background job.
+        The item list is split into chunk jobs that run in parallel on the job workers.
+        Processed files are checkpointed, so a job resumed after a restart skips them.
+        The job is owned by the session's Box user and runs with that user's client.
         
         Args:
             items: List of tuples (file_id, metadata)
@@ -254,16 +332,59 @@ class OptimizedIntegration:
             template: Template key
             batch_size: Batch size (or None for default)
             max_workers: Maximum workers (or None for default)
+            chunk_size: Number of files per chunk job
             
         Returns:
-            List of tuples (item, result, exception) for each item
+            str: Job ID
+            
+        Raises:
+            ValueError: If the session is not authenticated
+        """
+        owner = self.register_session_client()
+        if owner is None:
+            raise ValueError('Background jobs need an authenticated Box session')
+        return self.job_manager.submit_chunked('Apply Metadata', 'apply_metadata', [list(item) for item in items], chunk_size=chunk_size, items_arg='items', kwargs={'scope': scope, 'template': template, 'batch_size': batch_size, 'max_workers': max_workers}, owner=owner, durable=True)
+
+    def run_checkpointed_batch(self, items: List[Any], item_key: Callable[[Any], str], process_func: Callable[[Any], Any], progress_message: str, batch_size: Optional[int]=None, max_workers: Optional[int]=None) -> List[Dict[str, Any]]:
+        """
+        Process items inside a background job, skipping items checkpointed by a previous run
+        and stopping between items once the job is cancelled.
+        
+        Args:
+            items: Items to process
+            item_key: Function returning the checkpoint key of an item
+            process_func: Function to process each item
+            progress_message: Progress message format with {done} and {total} placeholders
+            batch_size: Batch size (or None for default)
+            max_workers: Maximum workers (or None for default)
+            
+        Returns:
+            list: Dicts with item, result and error for each item
         """
-        job_id = SSM.get('active_job_id')
+        job_id = get_current_job_id()
+        item_keys = {item_key(item) for item in items}
+        checkpointed = self.job_manager.get_checkpointed_items(job_id) if job_id else {}
+        completed = {key: result for key, result in checkpointed.items() if key in item_keys}
+        remaining = [item for item in items if item_key(item) not in completed]
+        if completed:
+            logger.info(f'Job {job_id}: resuming with {len(completed)} of {len(items)} items already processed')
+
+        def process_and_checkpoint(item):
+            result = process_func(item)
+            if job_id:
+                failed = isinstance(result, dict) and 'error' in result
+                self.job_manager.checkpoint_item(job_id, item_key(item), result, 'failed' if failed else 'completed')
+            return result
 
         def update_job_progress(items_processed, total_items, progress):
             if job_id:
-                self.job_manager.update_progress(job_id, progress, f'Applied metadata to {items_processed}/{total_items} files')
-        return self.batch_apply_metadata(items, scope, template, batch_size, max_workers, update_job_progress)
+                done = len(completed) + items_processed
+                self.job_manager.update_progress(job_id, done / max(1, len(items)), progress_message.format(done=done, total=len(items)))
+        cancel_check = (lambda: self.job_manager.is_cancelled(job_id)) if job_id else None
+        results = self.batch_processor.process_batch(remaining, process_and_checkpoint, batch_size, max_workers, progress_callback=update_job_progress, cancel_check=cancel_check)
+        output = [{'item': key, 'result': result, 'error': None} for key, result in completed.items()]
+        output.extend(({'item': item_key(item), 'result': result, 'error': str(error) if error else None} for item, result, error in results))
+        return output
 
     def get_metrics(self) -> Dict[str, Any]:
         """
@@ -286,4 +407,18 @@ def get_integration() -> OptimizedIntegration:
     global _integration
     if _integration is None:
         _integration = OptimizedIntegration()
-    return _integration
\ No newline at end of file
+    return _integration
+
+def _extract_metadata_job(file_ids: List[str], prompt: str=None, fields: List[Dict[str, Any]]=None, batch_size: Optional[int]=None, max_workers: Optional[int]=None) -> List[Dict[str, Any]]:
+    """Durable job handler for background metadata extraction, run as the job's owner."""
+    integration = get_integration()
+    api_client = integration.get_owner_api_client(get_current_job_owner())
+    return integration.run_checkpointed_batch(file_ids, str, lambda file_id: integration.extract_metadata_ai(file_id, prompt, fields, api_client=api_client), 'Processed {done}/{total} files', batch_size, max_workers)
+
+def _apply_metadata_job(items: List[List[Any]], scope: str='enterprise', template: str='default', batch_size: Optional[int]=None, max_workers: Optional[int]=None) -> List[Dict[str, Any]]:
+    """Durable job handler for background metadata application, run as the job's owner."""
+    integration = get_integration()
+    api_client = integration.get_owner_api_client(get_current_job_owner())
+    return integration.run_checkpointed_batch([tuple(item) for item in items], lambda item: str(item[0]), lambda item: integration.apply_metadata(item[0], item[1], scope, template, api_client=api_client), 'Applied metadata to {done}/{total} files', batch_size, max_workers)
+register_job_handler('extract_metadata', _extract_metadata_job)
+register_job_handler('apply_metadata', _apply_metadata_job)
@@ -0,0 +1,787 @@
+"""
+Durable job storage for background processing.
+This module provides job queues (brokers) with leases and per-item
+checkpoints so background jobs survive restarts and can be pulled by
+several worker processes: a SQLite store for workers on the same host and
+an optional Redis store for workers spread over several hosts.
+"""
+import os
+import json
+import time
+import sqlite3
+import threading
+import logging
+from typing import Dict, Any, List, Optional, Union
+logger = logging.getLogger(__name__)
+_JSON_COLUMNS = ('args', 'kwargs', 'result', 'metadata')
+_COLUMNS = ('id', 'name', 'handler', 'args', 'kwargs', 'status', 'priority', 'owner', 'result', 'error', 'created_at', 'started_at', 'completed_at', 'progress', 'progress_message', 'metadata', 'worker_id', 'lease_expires', 'parent_id')
+_FLOAT_COLUMNS = ('created_at', 'started_at', 'completed_at', 'progress', 'lease_expires')
+_SCHEMA = """CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    handler TEXT NOT NULL,
+    args TEXT,
+    kwargs TEXT,
+    status TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    owner TEXT,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    completed_at REAL,
+    progress REAL NOT NULL DEFAULT 0,
+    progress_message TEXT,
+    metadata TEXT,
+    worker_id TEXT,
+    lease_expires REAL,
+    parent_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (status, priority, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_parent ON jobs (parent_id);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    item_key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, item_key)
+);
+"""
+
+class SQLiteJobStore:
+    """
+    SQLite-backed durable job queue with leases and per-item checkpoints.
+    """
+
+    def __init__(self, db_path: str='.cache/jobs.db', lease_seconds: float=300.0):
+        """
+        Initialize the job store.
+
+        Args:
+            db_path: Path to the SQLite database file
+            lease_seconds: How long a claimed job stays owned by a worker without a heartbeat
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self._local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get the SQLite connection for the current thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _row_to_job(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """Convert a jobs row into a job dictionary."""
+        job = dict(row)
+        for column in _JSON_COLUMNS:
+            if job.get(column) is not None:
+                job[column] = json.loads(job[column])
+        return job
+
+    def add_job(self, job: Dict[str, Any]) -> None:
+        """
+        Insert a new job.
+
+        Args:
+            job: Job dictionary with id, name, handler, args, kwargs, priority, owner, created_at,
+                metadata and optionally status (default 'pending') and parent_id
+        """
+        self.add_jobs([job])
+
+    def add_jobs(self, jobs: List[Dict[str, Any]]) -> None:
+        """
+        Insert several jobs in one transaction.
+
+        Args:
+            jobs: Job dictionaries as accepted by add_job
+        """
+        now = time.time()
+        rows = [(job['id'], job['name'], job['handler'], json.dumps(list(job.get('args', ()))), json.dumps(job.get('kwargs', {})), job.get('status', 'pending'), job.get('priority', 5), job.get('owner'), job.get('created_at', now), now if job.get('status') == 'running' else None, json.dumps(job.get('metadata', {})), job.get('parent_id')) for job in jobs]
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany('INSERT INTO jobs (id, name, handler, args, kwargs, status, priority, owner, created_at, started_at, metadata, parent_id) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def claim_next_job(self, worker_id: str, max_priority: Optional[int]=None) -> Optional[Dict[str, Any]]:
+        """
+        Atomically claim the next pending job for a worker.
+        Jobs are ordered by priority, then by how many jobs the same owner
+        already has running, then by age.
+
+        Args:
+            worker_id: ID of the claiming worker
+            max_priority: Only claim jobs with priority <= max_priority (or None for all)
+
+        Returns:
+            dict: Claimed job or None if the queue is empty
+        """
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute("SELECT j.id FROM jobs j WHERE j.status = 'pending' AND (? IS NULL OR j.priority <= ?) ORDER BY j.priority, (SELECT COUNT(*) FROM jobs r WHERE r.status = 'running' AND r.owner = j.owner), j.created_at LIMIT 1", (max_priority, max_priority)).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute("UPDATE jobs SET status = 'running', worker_id = ?, lease_expires = ?, started_at = COALESCE(started_at, ?) WHERE id = ?", (worker_id, now + self.lease_seconds, now, row['id']))
+            job_row = conn.execute('SELECT * FROM jobs WHERE id = ?', (row['id'],)).fetchone()
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return self._row_to_job(job_row)
+
+    def heartbeat(self, worker_id: str, job_ids: List[str]) -> None:
+        """
+        Extend the leases of jobs a worker is still running.
+
+        Args:
+            worker_id: ID of the worker
+            job_ids: IDs of the jobs being run
+        """
+        if not job_ids:
+            return
+        expires = time.time() + self.lease_seconds
+        self._connection().executemany("UPDATE jobs SET lease_expires = ? WHERE id = ? AND worker_id = ? AND status = 'running'", [(expires, job_id, worker_id) for job_id in job_ids])
+
+    def requeue_expired(self) -> int:
+        """
+        Return running jobs whose lease expired (crashed worker) to the queue.
+
+        Returns:
+            int: Number of requeued jobs
+        """
+        cursor = self._connection().execute("UPDATE jobs SET status = 'pending', worker_id = NULL, lease_expires = NULL WHERE status = 'running' AND lease_expires < ?", (time.time(),))
+        if cursor.rowcount:
+            logger.warning(f'Requeued {cursor.rowcount} jobs with expired leases')
+        return cursor.rowcount
+
+    def finish_job(self, job_id: str, worker_id: str, status: str, result: Any=None, error: Optional[str]=None) -> bool:
+        """
+        Record the final state of a job run by a worker.
+
+        Args:
+            job_id: Job ID
+            worker_id: ID of the worker that ran the job
+            status: Final status ('completed' or 'failed')
+            result: JSON-serializable job result
+            error: Error message for failed jobs
+
+        Returns:
+            bool: True if the job was still owned by the worker and was updated
+        """
+        progress_clause = ', progress = 1.0' if status == 'completed' else ''
+        cursor = self._connection().execute(f"UPDATE jobs SET status = ?, result = ?, error = ?, completed_at = ?, lease_expires = NULL{progress_clause} WHERE id = ? AND worker_id = ? AND status = 'running'", (status, json.dumps(result, default=str), error, time.time(), job_id, worker_id))
+        return cursor.rowcount > 0
+
+    def update_progress(self, job_id: str, progress: float, message: Optional[str]=None) -> bool:
+        """
+        Update the progress of a running job.
+
+        Args:
+            job_id: Job ID
+            progress: Progress value (0.0 to 1.0)
+            message: Optional progress message
+
+        Returns:
+            bool: True if the job was running and was updated
+        """
+        cursor = self._connection().execute("UPDATE jobs SET progress = ?, progress_message = COALESCE(?, progress_message) WHERE id = ? AND status = 'running'", (progress, message, job_id))
+        return cursor.rowcount > 0
+
+    def cancel_job(self, job_id: str) -> bool:
+        """
+        Cancel a pending or running job and its unfinished child jobs.
+
+        Args:
+            job_id: Job ID
+
+        Returns:
+            bool: True if the job was found and cancelled
+        """
+        now = time.time()
+        conn = self._connection()
+        cursor = conn.execute("UPDATE jobs SET status = 'cancelled', completed_at = ?, lease_expires = NULL WHERE id = ? AND status IN ('pending', 'running')", (now, job_id))
+        conn.execute("UPDATE jobs SET status = 'cancelled', completed_at = ?, lease_expires = NULL WHERE parent_id = ? AND status IN ('pending', 'running')", (now, job_id))
+        return cursor.rowcount > 0
+
+    def complete_group(self, job_id: str, status: str, result: Any=None, error: Optional[str]=None) -> bool:
+        """
+        Record the final state of a parent job whose child jobs have all finished.
+
+        Args:
+            job_id: Parent job ID
+            status: Final status
+            result: JSON-serializable summary result
+            error: Error message for failed groups
+
+        Returns:
+            bool: True if the parent was still running and was updated
+        """
+        cursor = self._connection().execute("UPDATE jobs SET status = ?, result = ?, error = ?, completed_at = ?, progress = CASE WHEN ? = 'completed' THEN 1.0 ELSE progress END WHERE id = ? AND status = 'running'", (status, json.dumps(result, default=str), error, time.time(), status, job_id))
+        return cursor.rowcount > 0
+
+    def get_children(self, parent_id: str) -> List[Dict[str, Any]]:
+        """
+        Get the status and progress of a parent job's child jobs.
+
+        Args:
+            parent_id: Parent job ID
+
+        Returns:
+            list: Dicts with id, status, progress and error for each child
+        """
+        rows = self._connection().execute('SELECT id, status, progress, error FROM jobs WHERE parent_id = ? ORDER BY created_at', (parent_id,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a job by ID.
+
+        Args:
+            job_id: Job ID
+
+        Returns:
+            dict: Job or None if not found
+        """
+        row = self._connection().execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def get_status(self, job_id: str) -> Optional[str]:
+        """
+        Get the status of a job without decoding its payload.
+
+        Args:
+            job_id: Job ID
+
+        Returns:
+            str: Job status or None if not found
+        """
+        row = self._connection().execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return row['status'] if row else None
+
+    def list_jobs(self, include_completed: bool=True, limit: int=100) -> List[Dict[str, Any]]:
+        """
+        List jobs, newest first.
+
+        Args:
+            include_completed: Whether to include completed, failed and cancelled jobs
+            limit: Maximum number of jobs to return
+
+        Returns:
+            list: Job dictionaries
+        """
+        if include_completed:
+            rows = self._connection().execute('SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?', (limit,)).fetchall()
+        else:
+            rows = self._connection().execute("SELECT * FROM jobs WHERE status IN ('pending', 'running') ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def checkpoint_item(self, job_id: str, item_key: str, result: Any=None, status: str='completed') -> None:
+        """
+        Record that one item of a job has been processed.
+
+        Args:
+            job_id: Job ID
+            item_key: Key identifying the item (e.g. file ID)
+            result: JSON-serializable item result
+            status: Item status
+        """
+        # An upsert keeps the item's rowid, so re-checkpointed items keep their place for offset reads
+        self._connection().execute('INSERT INTO job_items (job_id, item_key, status, result, updated_at) VALUES (?, ?, ?, ?, ?) ON CONFLICT(job_id, item_key) DO UPDATE SET status = excluded.status, result = excluded.result, updated_at = excluded.updated_at', (job_id, str(item_key), status, json.dumps(result, default=str), time.time()))
+
+    def get_item_results(self, job_id: str, status: Optional[str]=None, offset: int=0) -> Dict[str, Any]:
+        """
+        Get checkpointed item results for a job in the order they were recorded.
+
+        Args:
+            job_id: Job ID
+            status: Only return items with this status (or None for all)
+            offset: Number of leading items to skip, for incremental reads
+
+        Returns:
+            dict: Item key to item result
+        """
+        rows = self._connection().execute('SELECT item_key, result FROM job_items WHERE job_id = ? AND (? IS NULL OR status = ?) ORDER BY rowid LIMIT -1 OFFSET ?', (job_id, status, status, offset)).fetchall()
+        return {row['item_key']: json.loads(row['result']) if row['result'] is not None else None for row in rows}
+
+    def purge_finished(self, ttl: float) -> int:
+        """
+        Delete finished jobs (and their items) older than the TTL.
+
+        Args:
+            ttl: Time to live for finished jobs in seconds
+
+        Returns:
+            int: Number of deleted jobs
+        """
+        conn = self._connection()
+        cutoff = time.time() - ttl
+        conn.execute("DELETE FROM job_items WHERE job_id IN (SELECT id FROM jobs WHERE status IN ('completed', 'failed', 'cancelled') AND completed_at < ?)", (cutoff,))
+        cursor = conn.execute("DELETE FROM jobs WHERE status IN ('completed', 'failed', 'cancelled') AND completed_at < ? AND (parent_id IS NULL OR parent_id NOT IN (SELECT id FROM jobs WHERE status IN ('pending', 'running')))", (cutoff,))
+        return cursor.rowcount
+
+_PRIORITY_SCORE = 10000000000.0
+# Every key of a store shares the {prefix} hash tag, so scripts that can only derive
+# job keys at run time (claim, requeue, cancelling children) stay in one Redis Cluster slot
+_REDIS_CLAIM = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 1)
+if #ids == 0 then return false end
+local job_key = ARGV[5] .. ids[1]
+redis.call('ZREM', KEYS[1], ids[1])
+redis.call('ZADD', KEYS[2], ARGV[2], ids[1])
+redis.call('HSET', job_key, 'status', 'running', 'worker_id', ARGV[3], 'lease_expires', ARGV[2])
+redis.call('HSETNX', job_key, 'started_at', ARGV[4])
+return ids[1]
+"""
+_REDIS_HEARTBEAT = """
+for i = 2, #KEYS do
+    if redis.call('HGET', KEYS[i], 'status') == 'running' and redis.call('HGET', KEYS[i], 'worker_id') == ARGV[1] then
+        redis.call('HSET', KEYS[i], 'lease_expires', ARGV[2])
+        redis.call('ZADD', KEYS[1], ARGV[2], ARGV[i + 1])
+    end
+end
+return 0
+"""
+_REDIS_REQUEUE = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', '(' .. ARGV[1])
+local requeued = 0
+for _, id in ipairs(ids) do
+    local job_key = ARGV[2] .. id
+    redis.call('ZREM', KEYS[2], id)
+    if redis.call('HGET', job_key, 'status') == 'running' then
+        redis.call('HSET', job_key, 'status', 'pending')
+        redis.call('HDEL', job_key, 'worker_id', 'lease_expires')
+        local score = tonumber(redis.call('HGET', job_key, 'priority')) * tonumber(ARGV[3]) + tonumber(redis.call('HGET', job_key, 'created_at'))
+        redis.call('ZADD', KEYS[1], score, id)
+        requeued = requeued + 1
+    end
+end
+return requeued
+"""
+_REDIS_FINISH = """
+local job_key = KEYS[3]
+if redis.call('HGET', job_key, 'status') ~= 'running' or redis.call('HGET', job_key, 'worker_id') ~= ARGV[2] then return 0 end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZADD', KEYS[2], ARGV[6], ARGV[1])
+redis.call('HSET', job_key, 'status', ARGV[3], 'result', ARGV[4], 'completed_at', ARGV[6])
+redis.call('HDEL', job_key, 'lease_expires')
+if ARGV[5] ~= '' then redis.call('HSET', job_key, 'error', ARGV[5]) end
+if ARGV[3] == 'completed' then redis.call('HSET', job_key, 'progress', '1.0') end
+return 1
+"""
+_REDIS_COMPLETE_GROUP = """
+local job_key = KEYS[2]
+if redis.call('HGET', job_key, 'status') ~= 'running' then return 0 end
+redis.call('ZADD', KEYS[1], ARGV[5], ARGV[1])
+redis.call('HSET', job_key, 'status', ARGV[2], 'result', ARGV[3], 'completed_at', ARGV[5])
+if ARGV[4] ~= '' then redis.call('HSET', job_key, 'error', ARGV[4]) end
+if ARGV[2] == 'completed' then redis.call('HSET', job_key, 'progress', '1.0') end
+return 1
+"""
+_REDIS_PROGRESS = """
+if redis.call('HGET', KEYS[1], 'status') ~= 'running' then return 0 end
+redis.call('HSET', KEYS[1], 'progress', ARGV[1])
+if ARGV[2] ~= '' then redis.call('HSET', KEYS[1], 'progress_message', ARGV[2]) end
+return 1
+"""
+_REDIS_CANCEL = """
+local function cancel(job_key, id)
+    local status = redis.call('HGET', job_key, 'status')
+    if status ~= 'pending' and status ~= 'running' then return 0 end
+    redis.call('HSET', job_key, 'status', 'cancelled', 'completed_at', ARGV[2])
+    redis.call('HDEL', job_key, 'lease_expires')
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('ZADD', KEYS[3], ARGV[2], id)
+    return 1
+end
+local cancelled = cancel(KEYS[4], ARGV[3])
+for _, child in ipairs(redis.call('LRANGE', KEYS[5], 0, -1)) do
+    cancel(ARGV[1] .. child, child)
+end
+return cancelled
+"""
+_REDIS_CHECKPOINT = """
+if redis.call('HSET', KEYS[1], ARGV[1], ARGV[2]) == 1 then
+    redis.call('RPUSH', KEYS[2], ARGV[1])
+end
+return 1
+"""
+
+class RedisJobStore:
+    """
+    Redis-backed durable job queue for workers spread over several hosts.
+    Implements the same interface as SQLiteJobStore. State changes that must
+    be atomic (claims, lease renewal, completion, cancellation) run as Lua
+    scripts, so any Redis-compatible server with scripting support works.
+    Unlike SQLiteJobStore, claims are ordered by priority and age only,
+    without the per-owner running-job tie-break. All keys carry the prefix
+    as a hash tag ({box_jobs}:...), so the store also works on Redis Cluster.
+    """
+
+    def __init__(self, redis_client, lease_seconds: float=300.0, prefix: str='box_jobs'):
+        """
+        Initialize the job store.
+
+        Args:
+            redis_client: Redis client (redis.Redis or a compatible client)
+            lease_seconds: How long a claimed job stays owned by a worker without a heartbeat
+            prefix: Prefix for all keys written by the store, used as their hash tag
+                unless it already contains one
+        """
+        self.redis_client = redis_client
+        self.lease_seconds = lease_seconds
+        self.prefix = f'{prefix}:' if '{' in prefix else f'{{{prefix}}}:'
+        self.job_prefix = f'{self.prefix}job:'
+        self.pending_key = f'{self.prefix}pending'
+        self.running_key = f'{self.prefix}running'
+        self.finished_key = f'{self.prefix}finished'
+        self.all_key = f'{self.prefix}all'
+        self._claim = redis_client.register_script(_REDIS_CLAIM)
+        self._heartbeat = redis_client.register_script(_REDIS_HEARTBEAT)
+        self._requeue = redis_client.register_script(_REDIS_REQUEUE)
+        self._finish = redis_client.register_script(_REDIS_FINISH)
+        self._complete_group = redis_client.register_script(_REDIS_COMPLETE_GROUP)
+        self._progress = redis_client.register_script(_REDIS_PROGRESS)
+        self._cancel = redis_client.register_script(_REDIS_CANCEL)
+        self._checkpoint = redis_client.register_script(_REDIS_CHECKPOINT)
+
+    def _job_key(self, job_id: str) -> str:
+        """Get the hash key holding a job."""
+        return f'{self.job_prefix}{job_id}'
+
+    def _decode(self, value: Any) -> Any:
+        """Decode a Redis reply value for clients created without decode_responses."""
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+
+    def _hash_to_job(self, raw: Dict[Any, Any]) -> Optional[Dict[str, Any]]:
+        """Convert a job hash into a job dictionary in the SQLiteJobStore format."""
+        if not raw:
+            return None
+        values = {self._decode(key): self._decode(value) for key, value in raw.items()}
+        job = {column: values.get(column) for column in _COLUMNS}
+        for column in _JSON_COLUMNS:
+            if job[column] is not None:
+                job[column] = json.loads(job[column])
+        for column in _FLOAT_COLUMNS:
+            if job[column] is not None:
+                job[column] = float(job[column])
+        job['priority'] = int(job['priority']) if job['priority'] is not None else 5
+        if job['progress'] is None:
+            job['progress'] = 0.0
+        return job
+
+    def add_job(self, job: Dict[str, Any]) -> None:
+        """
+        Insert a new job.
+
+        Args:
+            job: Job dictionary as accepted by SQLiteJobStore.add_job
+        """
+        self.add_jobs([job])
+
+    def add_jobs(self, jobs: List[Dict[str, Any]]) -> None:
+        """
+        Insert several jobs in one transaction.
+
+        Args:
+            jobs: Job dictionaries as accepted by SQLiteJobStore.add_job
+        """
+        now = time.time()
+        pipe = self.redis_client.pipeline(transaction=True)
+        for job in jobs:
+            status = job.get('status', 'pending')
+            created_at = job.get('created_at', now)
+            priority = job.get('priority', 5)
+            fields = {'id': job['id'], 'name': job['name'], 'handler': job['handler'], 'args': json.dumps(list(job.get('args', ()))), 'kwargs': json.dumps(job.get('kwargs', {})), 'status': status, 'priority': priority, 'owner': job.get('owner'), 'created_at': created_at, 'started_at': now if status == 'running' else None, 'progress': 0.0, 'metadata': json.dumps(job.get('metadata', {})), 'parent_id': job.get('parent_id')}
+            pipe.hset(self._job_key(job['id']), mapping={key: value for key, value in fields.items() if value is not None})
+            pipe.zadd(self.all_key, {job['id']: created_at})
+            if status == 'pending':
+                pipe.zadd(self.pending_key, {job['id']: priority * _PRIORITY_SCORE + created_at})
+            elif status in ('completed', 'failed', 'cancelled'):
+                pipe.zadd(self.finished_key, {job['id']: now})
+            if job.get('parent_id'):
+                pipe.rpush(f"{self.prefix}children:{job['parent_id']}", job['id'])
+        pipe.execute()
+
+    def claim_next_job(self, worker_id: str, max_priority: Optional[int]=None) -> Optional[Dict[str, Any]]:
+        """
+        Atomically claim the next pending job for a worker.
+
+        Args:
+            worker_id: ID of the claiming worker
+            max_priority: Only claim jobs with priority <= max_priority (or None for all)
+
+        Returns:
+            dict: Claimed job or None if the queue is empty
+        """
+        now = time.time()
+        max_score = '+inf' if max_priority is None else f'({(max_priority + 1) * _PRIORITY_SCORE}'
+        job_id = self._claim(keys=[self.pending_key, self.running_key], args=[max_score, now + self.lease_seconds, worker_id, now, self.job_prefix])
+        if not job_id:
+            return None
+        return self.get_job(self._decode(job_id))
+
+    def heartbeat(self, worker_id: str, job_ids: List[str]) -> None:
+        """
+        Extend the leases of jobs a worker is still running.
+
+        Args:
+            worker_id: ID of the worker
+            job_ids: IDs of the jobs being run
+        """
+        if not job_ids:
+            return
+        self._heartbeat(keys=[self.running_key] + [self._job_key(job_id) for job_id in job_ids], args=[worker_id, time.time() + self.lease_seconds] + list(job_ids))
+
+    def requeue_expired(self) -> int:
+        """
+        Return running jobs whose lease expired (crashed worker) to the queue.
+
+        Returns:
+            int: Number of requeued jobs
+        """
+        requeued = int(self._requeue(keys=[self.pending_key, self.running_key], args=[time.time(), self.job_prefix, _PRIORITY_SCORE]) or 0)
+        if requeued:
+            logger.warning(f'Requeued {requeued} jobs with expired leases')
+        return requeued
+
+    def finish_job(self, job_id: str, worker_id: str, status: str, result: Any=None, error: Optional[str]=None) -> bool:
+        """
+        Record the final state of a job run by a worker.
+
+        Args:
+            job_id: Job ID
+            worker_id: ID of the worker that ran the job
+            status: Final status ('completed' or 'failed')
+            result: JSON-serializable job result
+            error: Error message for failed jobs
+
+        Returns:
+            bool: True if the job was still owned by the worker and was updated
+        """
+        return bool(self._finish(keys=[self.running_key, self.finished_key, self._job_key(job_id)], args=[job_id, worker_id, status, json.dumps(result, default=str), error or '', time.time()]))
+
+    def update_progress(self, job_id: str, progress: float, message: Optional[str]=None) -> bool:
+        """
+        Update the progress of a running job.
+
+        Args:
+            job_id: Job ID
+            progress: Progress value (0.0 to 1.0)
+            message: Optional progress message
+
+        Returns:
+            bool: True if the job was running and was updated
+        """
+        return bool(self._progress(keys=[self._job_key(job_id)], args=[progress, message or '']))
+
+    def cancel_job(self, job_id: str) -> bool:
+        """
+        Cancel a pending or running job and its unfinished child jobs.
+
+        Args:
+            job_id: Job ID
+
+        Returns:
+            bool: True if the job was found and cancelled
+        """
+        return bool(self._cancel(keys=[self.pending_key, self.running_key, self.finished_key, self._job_key(job_id), f'{self.prefix}children:{job_id}'], args=[self.job_prefix, time.time(), job_id]))
+
+    def complete_group(self, job_id: str, status: str, result: Any=None, error: Optional[str]=None) -> bool:
+        """
+        Record the final state of a parent job whose child jobs have all finished.
+
+        Args:
+            job_id: Parent job ID
+            status: Final status
+            result: JSON-serializable summary result
+            error: Error message for failed groups
+
+        Returns:
+            bool: True if the parent was still running and was updated
+        """
+        return bool(self._complete_group(keys=[self.finished_key, self._job_key(job_id)], args=[job_id, status, json.dumps(result, default=str), error or '', time.time()]))
+
+    def get_children(self, parent_id: str) -> List[Dict[str, Any]]:
+        """
+        Get the status and progress of a parent job's child jobs.
+
+        Args:
+            parent_id: Parent job ID
+
+        Returns:
+            list: Dicts with id, status, progress and error for each child
+        """
+        child_ids = [self._decode(child_id) for child_id in self.redis_client.lrange(f'{self.prefix}children:{parent_id}', 0, -1)]
+        pipe = self.redis_client.pipeline(transaction=False)
+        for child_id in child_ids:
+            pipe.hmget(self._job_key(child_id), 'status', 'progress', 'error')
+        children = []
+        for child_id, (status, progress, error) in zip(child_ids, pipe.execute()):
+            if status is not None:
+                children.append({'id': child_id, 'status': self._decode(status), 'progress': float(self._decode(progress) or 0.0), 'error': self._decode(error)})
+        return children
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a job by ID.
+
+        Args:
+            job_id: Job ID
+
+        Returns:
+            dict: Job or None if not found
+        """
+        return self._hash_to_job(self.redis_client.hgetall(self._job_key(job_id)))
+
+    def get_status(self, job_id: str) -> Optional[str]:
+        """
+        Get the status of a job without decoding its payload.
+
+        Args:
+            job_id: Job ID
+
+        Returns:
+            str: Job status or None if not found
+        """
+        return self._decode(self.redis_client.hget(self._job_key(job_id), 'status'))
+
+    def list_jobs(self, include_completed: bool=True, limit: int=100) -> List[Dict[str, Any]]:
+        """
+        List jobs, newest first.
+
+        Args:
+            include_completed: Whether to include completed, failed and cancelled jobs
+            limit: Maximum number of jobs to return
+
+        Returns:
+            list: Job dictionaries
+        """
+        jobs = []
+        start = 0
+        while len(jobs) < limit:
+            job_ids = self.redis_client.zrevrange(self.all_key, start, start + limit - 1)
+            if not job_ids:
+                break
+            start += len(job_ids)
+            pipe = self.redis_client.pipeline(transaction=False)
+            for job_id in job_ids:
+                pipe.hgetall(self._job_key(self._decode(job_id)))
+            for raw in pipe.execute():
+                job = self._hash_to_job(raw)
+                if job is not None and (include_completed or job['status'] in ('pending', 'running')):
+                    jobs.append(job)
+        return jobs[:limit]
+
+    def checkpoint_item(self, job_id: str, item_key: str, result: Any=None, status: str='completed') -> None:
+        """
+        Record that one item of a job has been processed.
+
+        Args:
+            job_id: Job ID
+            item_key: Key identifying the item (e.g. file ID)
+            result: JSON-serializable item result
+            status: Item status
+        """
+        self._checkpoint(keys=[f'{self.prefix}items:{job_id}', f'{self.prefix}item_order:{job_id}'], args=[str(item_key), json.dumps({'status': status, 'result': result}, default=str)])
+
+    def get_item_results(self, job_id: str, status: Optional[str]=None, offset: int=0) -> Dict[str, Any]:
+        """
+        Get checkpointed item results for a job in the order they were recorded.
+
+        Args:
+            job_id: Job ID
+            status: Only return items with this status (or None for all)
+            offset: Number of leading items to skip, for incremental reads
+
+        Returns:
+            dict: Item key to item result
+        """
+        keys = self.redis_client.lrange(f'{self.prefix}item_order:{job_id}', offset if status is None else 0, -1)
+        if not keys:
+            return {}
+        values = self.redis_client.hmget(f'{self.prefix}items:{job_id}', keys)
+        items = []
+        for key, value in zip(keys, values):
+            if value is None:
+                continue
+            item = json.loads(self._decode(value))
+            if status is None or item['status'] == status:
+                items.append((self._decode(key), item['result']))
+        return dict(items if status is None else items[offset:])
+
+    def purge_finished(self, ttl: float) -> int:
+        """
+        Delete finished jobs (and their items) older than the TTL.
+
+        Args:
+            ttl: Time to live for finished jobs in seconds
+
+        Returns:
+            int: Number of deleted jobs
+        """
+        deleted = 0
+        for job_id in self.redis_client.zrangebyscore(self.finished_key, '-inf', time.time() - ttl):
+            job_id = self._decode(job_id)
+            parent_id = self._decode(self.redis_client.hget(self._job_key(job_id), 'parent_id'))
+            if parent_id and self.get_status(parent_id) in ('pending', 'running'):
+                continue
+            pipe = self.redis_client.pipeline(transaction=True)
+            pipe.delete(self._job_key(job_id), f'{self.prefix}items:{job_id}', f'{self.prefix}item_order:{job_id}', f'{self.prefix}children:{job_id}')
+            pipe.zrem(self.finished_key, job_id)
+            pipe.zrem(self.all_key, job_id)
+            pipe.execute()
+            deleted += 1
+        return deleted
+
+def create_job_store(broker_url: Optional[str]=None, lease_seconds: float=300.0) -> Union[SQLiteJobStore, RedisJobStore]:
+    """
+    Create the job store (broker) for a broker URL.
+
+    Args:
+        broker_url: redis://, rediss:// or unix:// URL for a Redis broker, redis+cluster:// or
+            rediss+cluster:// for a Redis Cluster broker, sqlite:///<path> or a plain file
+            path for a SQLite broker, or None for the default SQLite database
+        lease_seconds: How long a claimed job stays owned by a worker without a heartbeat
+
+    Returns:
+        Job store instance
+
+    Raises:
+        ImportError: If a Redis URL is given and the redis package is not installed
+    """
+    if not broker_url:
+        return SQLiteJobStore(db_path=os.path.join('.cache', 'jobs.db'), lease_seconds=lease_seconds)
+    if broker_url.startswith(('redis+cluster://', 'rediss+cluster://')):
+        try:
+            from redis.cluster import RedisCluster
+        except ImportError:
+            raise ImportError('The redis package is required for a Redis job broker (pip install redis)')
+        return RedisJobStore(RedisCluster.from_url(broker_url.replace('+cluster', '', 1), decode_responses=True), lease_seconds=lease_seconds)
+    if broker_url.startswith(('redis://', 'rediss://', 'unix://')):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError('The redis package is required for a Redis job broker (pip install redis)')
+        return RedisJobStore(redis.Redis.from_url(broker_url, decode_responses=True), lease_seconds=lease_seconds)
+    if broker_url.startswith('sqlite:///'):
+        broker_url = broker_url[len('sqlite:///'):]
+    return SQLiteJobStore(db_path=broker_url, lease_seconds=lease_seconds)
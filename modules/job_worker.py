@@ -0,0 +1,134 @@
+"""
+Standalone worker process for durable background jobs.
+Run one or more of these next to the Streamlit app (on the same host with the
+SQLite broker, or on any host with a Redis broker) to run durable jobs that the
+app submits:
+
+    BOX_JOB_BROKER_URL=redis://jobs-host:6379/0 python -m modules.job_worker --workers 4
+
+(use a redis+cluster:// URL for a Redis Cluster).
+
+Workers have no Streamlit session, so they authenticate to Box themselves
+and run every job as the Box user that submitted it: with a JWT config the
+service account acts as the job owner (As-User), with a developer token only
+jobs of the token's user run. Jobs the worker cannot act for are left for
+another worker; jobs without an owner are refused.
+"""
+import os
+import json
+import signal
+import argparse
+import importlib
+import threading
+import logging
+from typing import Any, Callable, List, Optional
+from modules.background_processing import BackgroundJobManager, JOB_BROKER_URL_ENV
+from modules.job_store import create_job_store
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+DEFAULT_HANDLER_MODULES = ['modules.integration']
+
+def create_box_client(jwt_config_path: Optional[str]=None, developer_token: Optional[str]=None):
+    """
+    Create a Box client for a worker process.
+
+    Args:
+        jwt_config_path: Path to a Box JWT config.json (or None to use BOX_JWT_CONFIG)
+        developer_token: Developer token (or None to use BOX_DEVELOPER_TOKEN)
+
+    Returns:
+        Box client or None if no credentials are configured
+    """
+    from boxsdk import Client, JWTAuth, OAuth2
+    jwt_config_path = jwt_config_path or os.environ.get('BOX_JWT_CONFIG')
+    developer_token = developer_token or os.environ.get('BOX_DEVELOPER_TOKEN')
+    if jwt_config_path:
+        with open(jwt_config_path, 'r') as f:
+            auth = JWTAuth.from_settings_dictionary(json.load(f))
+        return Client(auth)
+    if developer_token:
+        return Client(OAuth2(client_id=os.environ.get('BOX_CLIENT_ID', ''), client_secret=os.environ.get('BOX_CLIENT_SECRET', ''), access_token=developer_token))
+    return None
+
+def create_owner_client_factory(jwt_config_path: Optional[str]=None, developer_token: Optional[str]=None) -> Optional[Callable[[str], Any]]:
+    """
+    Create the factory that gives a worker a Box client acting as a job's owner.
+
+    Args:
+        jwt_config_path: Path to a Box JWT config.json (or None to use BOX_JWT_CONFIG)
+        developer_token: Developer token (or None to use BOX_DEVELOPER_TOKEN)
+
+    Returns:
+        Function taking a Box user ID and returning a client acting as that user (or None
+        if the credentials cannot act as the user), or None if no credentials are configured
+    """
+    client = create_box_client(jwt_config_path, developer_token)
+    if client is None:
+        return None
+    client_user_id = str(client.user().get().id)
+    if not (jwt_config_path or os.environ.get('BOX_JWT_CONFIG')):
+        return lambda owner: client if owner == client_user_id else None
+    return lambda owner: client if owner == client_user_id else client.as_user(client.user(user_id=owner))
+
+def load_handlers(module_names: List[str]) -> None:
+    """
+    Import the modules that register durable job handlers.
+
+    Args:
+        module_names: Dotted module names
+    """
+    for module_name in module_names:
+        importlib.import_module(module_name)
+        logger.info(f'Loaded job handlers from {module_name}')
+
+def run_worker(broker_url: Optional[str]=None, num_workers: int=3, interactive_workers: int=1, worker_id: Optional[str]=None, poll_interval: float=1.0, lease_seconds: float=300.0, stop_event: Optional[threading.Event]=None) -> None:
+    """
+    Run durable jobs from the broker until stopped.
+
+    Args:
+        broker_url: Broker URL (see create_job_store), or None for the default SQLite database
+        num_workers: Number of worker threads
+        interactive_workers: Additional worker threads reserved for interactive jobs
+        worker_id: ID used to claim jobs (or None to derive one from host and PID)
+        poll_interval: Seconds between broker polls
+        lease_seconds: How long a claimed job stays owned without a heartbeat
+        stop_event: Event that stops the worker when set
+    """
+    store = create_job_store(broker_url, lease_seconds=lease_seconds)
+    manager = BackgroundJobManager(num_workers=num_workers, interactive_workers=interactive_workers, store=store, worker_id=worker_id, poll_interval=poll_interval)
+    stop_event = stop_event or threading.Event()
+    logger.info(f'Job worker {manager.worker_id} started with {num_workers} workers')
+    try:
+        while not stop_event.wait(1.0):
+            pass
+    finally:
+        manager.shutdown()
+        logger.info(f'Job worker {manager.worker_id} stopped')
+
+def main(argv: Optional[List[str]]=None) -> None:
+    """Command-line entry point for `python -m modules.job_worker`."""
+    parser = argparse.ArgumentParser(description='Run durable background jobs submitted by the metadata extraction app.')
+    parser.add_argument('--broker', default=os.environ.get(JOB_BROKER_URL_ENV), help='Broker URL: redis://..., redis+cluster://..., sqlite:///<path> or a SQLite file path (default: .cache/jobs.db)')
+    parser.add_argument('--workers', type=int, default=3, help='Number of worker threads')
+    parser.add_argument('--interactive-workers', type=int, default=1, help='Worker threads reserved for interactive jobs')
+    parser.add_argument('--worker-id', default=None, help='Worker ID (default: host:pid:random)')
+    parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds between broker polls')
+    parser.add_argument('--lease-seconds', type=float, default=300.0, help='Job lease duration in seconds')
+    parser.add_argument('--handlers', nargs='*', default=DEFAULT_HANDLER_MODULES, help='Modules that register job handlers')
+    parser.add_argument('--box-jwt-config', default=None, help='Path to a Box JWT config.json (default: BOX_JWT_CONFIG)')
+    args = parser.parse_args(argv)
+    load_handlers(args.handlers)
+    owner_client_factory = create_owner_client_factory(args.box_jwt_config)
+    if owner_client_factory is not None:
+        from modules.integration import get_integration
+        get_integration().set_owner_client_factory(owner_client_factory)
+    else:
+        logger.warning('No Box credentials configured; jobs that call Box are left for other workers')
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    try:
+        run_worker(args.broker, args.workers, args.interactive_workers, args.worker_id, args.poll_interval, args.lease_seconds, stop_event)
+    except KeyboardInterrupt:
+        pass
+if __name__ == '__main__':
+    main()
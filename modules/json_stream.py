@@ -0,0 +1,231 @@
+"""
+Incremental JSON scanning for streamed Box AI responses.
+This module decodes the "answer" string of a Box AI response envelope and
+the JSON object inside it chunk by chunk, emitting each top-level field as
+soon as it is complete. Only the field currently being read is buffered, so
+memory stays bounded however long the answer is.
+"""
+import re
+import json
+import codecs
+import logging
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+logger = logging.getLogger(__name__)
+_STRUCTURAL = re.compile('["{}\\[\\],]')
+_STRING_SPECIAL = re.compile('["\\\\]')
+_ANSWER_KEY = re.compile('"answer"\\s*:\\s*"')
+
+class IncrementalObjectScanner:
+    """
+    Scan text for the first JSON object and emit its top-level members as they complete.
+    Text before the opening brace and after the closing brace is ignored.
+    """
+
+    def __init__(self):
+        """Initialize the scanner."""
+        self.state = 'seek'
+        self.error: Optional[str] = None
+        self._depth = 0
+        self._in_string = False
+        self._pending_escape = False
+        self._member_parts: List[str] = []
+
+    @property
+    def found(self) -> bool:
+        """Whether the opening brace of the object has been seen."""
+        return self.state != 'seek'
+
+    @property
+    def complete(self) -> bool:
+        """Whether the closing brace of the object has been seen."""
+        return self.state == 'done'
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """
+        Scan the next piece of text.
+
+        Args:
+            text: Next piece of the answer text
+
+        Returns:
+            list: (key, value) pairs of the members completed by this piece
+        """
+        members = []
+        if self.state in ('done', 'error') or not text:
+            return members
+        pos = 0
+        if self.state == 'seek':
+            start = text.find('{')
+            if start == -1:
+                return members
+            self.state = 'members'
+            self._depth = 1
+            pos = start + 1
+        member_start = pos
+        length = len(text)
+        if self._pending_escape:
+            self._pending_escape = False
+            pos += 1
+        while pos < length:
+            if self._in_string:
+                match = _STRING_SPECIAL.search(text, pos)
+                if match is None:
+                    break
+                pos = match.end()
+                if match.group() == '\\':
+                    if pos < length:
+                        pos += 1
+                    else:
+                        self._pending_escape = True
+                else:
+                    self._in_string = False
+                continue
+            match = _STRUCTURAL.search(text, pos)
+            if match is None:
+                break
+            char = match.group()
+            pos = match.end()
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit(text[member_start:pos - 1], members)
+                    if self.state != 'error':
+                        self.state = 'done'
+                    return members
+            elif self._depth == 1:
+                self._emit(text[member_start:pos - 1], members)
+                if self.state == 'error':
+                    return members
+                member_start = pos
+        self._member_parts.append(text[member_start:])
+        return members
+
+    def _emit(self, tail: str, members: List[Tuple[str, Any]]) -> None:
+        """Decode the buffered member ending with tail and add it to members."""
+        self._member_parts.append(tail)
+        member = ''.join(self._member_parts).strip()
+        self._member_parts = []
+        if not member:
+            return
+        try:
+            members.extend(json.loads('{' + member + '}').items())
+        except json.JSONDecodeError as e:
+            self.error = str(e)
+            self.state = 'error'
+
+class AnswerStringDecoder:
+    """
+    Extract the decoded value of the "answer" string from a response envelope fed in pieces.
+    Envelope text read before the answer starts is kept (up to max_envelope_chars)
+    so responses without an answer string can still be parsed as a whole.
+    """
+
+    def __init__(self, max_envelope_chars: int=1048576):
+        """
+        Initialize the decoder.
+
+        Args:
+            max_envelope_chars: Maximum envelope text kept while looking for the answer
+        """
+        self.state = 'seek'
+        self.max_envelope_chars = max_envelope_chars
+        self.envelope_overflow = False
+        self._envelope: List[str] = []
+        self._envelope_chars = 0
+        self._search_tail = ''
+        self._pending = ''
+
+    @property
+    def found(self) -> bool:
+        """Whether the answer string has started."""
+        return self.state != 'seek'
+
+    @property
+    def envelope_text(self) -> str:
+        """Envelope text read while no answer string was found."""
+        return ''.join(self._envelope)
+
+    def feed(self, text: str) -> List[str]:
+        """
+        Decode the next piece of the envelope.
+
+        Args:
+            text: Next piece of the response body
+
+        Returns:
+            list: Decoded pieces of the answer string
+        """
+        pieces = []
+        if self.state == 'seek':
+            if self._envelope_chars + len(text) <= self.max_envelope_chars:
+                self._envelope.append(text)
+                self._envelope_chars += len(text)
+            else:
+                self.envelope_overflow = True
+            window = self._search_tail + text
+            match = _ANSWER_KEY.search(window)
+            if match is None:
+                self._search_tail = window[-64:]
+                return pieces
+            self.state = 'answer'
+            self._envelope = []
+            text = window[match.end():]
+        if self.state != 'answer':
+            return pieces
+        text = self._pending + text
+        self._pending = ''
+        pos = 0
+        length = len(text)
+        while pos < length:
+            match = _STRING_SPECIAL.search(text, pos)
+            if match is None:
+                pieces.append(text[pos:])
+                break
+            if match.start() > pos:
+                pieces.append(text[pos:match.start()])
+            if match.group() == '"':
+                self.state = 'done'
+                break
+            escape_length = self._escape_length(text, match.start())
+            if match.start() + escape_length > length:
+                self._pending = text[match.start():]
+                break
+            pieces.append(json.loads('"' + text[match.start():match.start() + escape_length] + '"'))
+            pos = match.start() + escape_length
+        return pieces
+
+    def _escape_length(self, text: str, start: int) -> int:
+        """Get the length of the escape sequence at start, including a trailing low surrogate."""
+        if text[start + 1:start + 2] != 'u':
+            return 2
+        code = text[start + 2:start + 6]
+        if len(code) == 4 and 55296 <= int(code, 16) <= 56319:
+            return 12
+        return 6
+
+def iter_answer_text(chunks: Iterable[bytes], decoder: Optional[AnswerStringDecoder]=None) -> Iterator[str]:
+    """
+    Yield decoded pieces of the answer string from raw response body chunks.
+
+    Args:
+        chunks: Raw UTF-8 response body chunks (e.g. requests' iter_content)
+        decoder: AnswerStringDecoder to use (pass one in to inspect it afterwards)
+
+    Returns:
+        Iterator of answer text pieces
+    """
+    decoder = decoder or AnswerStringDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    for chunk in chunks:
+        text = utf8.decode(chunk) if isinstance(chunk, bytes) else chunk
+        if text:
+            yield from decoder.feed(text)
+        if decoder.state == 'done':
+            return
+    tail = utf8.decode(b'', final=True)
+    if tail:
+        yield from decoder.feed(tail)
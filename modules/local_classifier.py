@@ -0,0 +1,323 @@
+"""
+Local document category pre-classifier.
+This module trains a small scikit-learn model on past categorization results
+and predicts a document's category from file metadata only: filename tokens,
+extension, size, parent folder and dates. It runs entirely offline, so
+confident predictions can skip the Box AI call, and files can be pre-sorted
+into likely template batches before any AI call is made. Each Box user gets
+their own history and model, and predictions are limited to the categories
+the session currently uses.
+"""
+import os
+import re
+import json
+import math
+import time
+import logging
+import threading
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+try:
+    import joblib
+    from sklearn.feature_extraction import DictVectorizer
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import make_pipeline
+    sklearn_available = True
+except ImportError:
+    sklearn_available = False
+
+logger = logging.getLogger(__name__)
+CLASSIFIER_DIR = '.cache'
+HISTORY_FILENAME = 'categorization_history.jsonl'
+MODEL_FILENAME = 'local_classifier.joblib'
+LOCAL_CLASSIFIER_MODEL_NAME = 'local_classifier'
+_TOKEN_PATTERN = re.compile('[a-z]+|[0-9]+')
+_DATE_PATTERN = re.compile('^(\\d{4})-(\\d{2})')
+_OWNER_PATTERN = re.compile('[^A-Za-z0-9_-]')
+
+def _name_tokens(name: str) -> List[str]:
+    """Split a name into lowercase word tokens, replacing numbers by their digit count."""
+    return [token if token.isalpha() else f'#{len(token)}' for token in _TOKEN_PATTERN.findall(name.lower())]
+
+def file_features(file_info: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Build the feature dictionary of a file.
+
+    Args:
+        file_info: File metadata with name, size, parent_id, parent_name, created_at and modified_at
+            (missing values are skipped)
+
+    Returns:
+        dict: Feature name to value, for DictVectorizer
+    """
+    features: Dict[str, float] = {}
+    stem, extension = os.path.splitext(file_info.get('name') or '')
+    for token in _name_tokens(stem):
+        features[f'name={token}'] = 1.0
+    features[f'ext={extension.lower()}'] = 1.0
+    size = file_info.get('size')
+    if isinstance(size, (int, float)) and size >= 0:
+        features[f'size_bucket={int(math.log2(size + 1))}'] = 1.0
+    if file_info.get('parent_id'):
+        features[f"folder={file_info['parent_id']}"] = 1.0
+    for token in _name_tokens(file_info.get('parent_name') or ''):
+        features[f'folder_name={token}'] = 1.0
+    for key in ('created_at', 'modified_at'):
+        match = _DATE_PATTERN.match(str(file_info.get(key) or ''))
+        if match:
+            features[f'{key}_year={match.group(1)}'] = 1.0
+            features[f'{key}_month={match.group(2)}'] = 1.0
+    return features
+
+class LocalCategoryClassifier:
+    """
+    Offline category classifier trained on recorded categorization results.
+    Examples are appended to a JSON Lines history file; the trained model is
+    saved with joblib next to it and reloaded when another process retrains it.
+    Retraining runs on a background thread (see schedule_training).
+    """
+
+    def __init__(self, directory: str=CLASSIFIER_DIR, min_examples: int=20):
+        """
+        Initialize the classifier.
+
+        Args:
+            directory: Directory for the history and model files
+            min_examples: Minimum number of distinct labeled files needed to train
+        """
+        self.history_path = os.path.join(directory, HISTORY_FILENAME)
+        self.model_path = os.path.join(directory, MODEL_FILENAME)
+        self.min_examples = min_examples
+        self.lock = threading.RLock()
+        self.model = None
+        self.model_info: Dict[str, Any] = {}
+        self._model_mtime = None
+        self._labels: Optional[Dict[str, str]] = None
+        self._training = False
+        self._retrain_pending = False
+
+    @property
+    def available(self) -> bool:
+        """Whether scikit-learn is installed."""
+        return sklearn_available
+
+    def record(self, examples: List[Tuple[Dict[str, Any], str]]) -> int:
+        """
+        Record labeled examples for training.
+        Files already recorded with the same category are skipped.
+
+        Args:
+            examples: (file_info, category) pairs; file_info must contain an id
+
+        Returns:
+            int: Number of new examples recorded
+        """
+        if not examples:
+            return 0
+        with self.lock:
+            if self._labels is None:
+                self._labels = {str(file_info.get('id')): category for file_info, category in self.load_examples()}
+            new_examples = [(file_info, category) for file_info, category in examples if self._labels.get(str(file_info.get('id'))) != category]
+            if not new_examples:
+                return 0
+            os.makedirs(os.path.dirname(self.history_path) or '.', exist_ok=True)
+            with open(self.history_path, 'a') as f:
+                for file_info, category in new_examples:
+                    f.write(json.dumps({'file_info': file_info, 'category': category, 'recorded_at': time.time()}, default=str) + '\n')
+                    self._labels[str(file_info.get('id'))] = category
+        logger.info(f'Recorded {len(new_examples)} new categorization examples for the local classifier')
+        return len(new_examples)
+
+    def load_examples(self) -> List[Tuple[Dict[str, Any], str]]:
+        """
+        Load recorded examples, keeping the latest label per file.
+
+        Returns:
+            list: (file_info, category) pairs
+        """
+        latest: Dict[str, Tuple[Dict[str, Any], str]] = {}
+        try:
+            with open(self.history_path, 'r') as f:
+                for line_number, line in enumerate(f):
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        logger.warning(f'Skipping unreadable line {line_number + 1} in {self.history_path}')
+                        continue
+                    file_info = record.get('file_info') or {}
+                    latest[str(file_info.get('id', f'line_{line_number}'))] = (file_info, record.get('category'))
+        except FileNotFoundError:
+            return []
+        return [example for example in latest.values() if example[1]]
+
+    def train(self) -> Dict[str, Any]:
+        """
+        Train the classifier on the recorded examples and save it.
+
+        Returns:
+            dict: Training summary with trained, num_examples, classes and (on failure) reason
+        """
+        if not sklearn_available:
+            return {'trained': False, 'reason': 'scikit-learn is not installed'}
+        examples = self.load_examples()
+        classes = sorted({category for _, category in examples})
+        if len(examples) < self.min_examples or len(classes) < 2:
+            return {'trained': False, 'num_examples': len(examples), 'classes': classes, 'reason': f'Need at least {self.min_examples} examples in 2 categories'}
+        start_time = time.time()
+        model = make_pipeline(DictVectorizer(), LogisticRegression(max_iter=1000))
+        model.fit([file_features(file_info) for file_info, _ in examples], [category for _, category in examples])
+        info = {'trained': True, 'num_examples': len(examples), 'classes': classes, 'trained_at': time.time()}
+        with self.lock:
+            temp_path = f'{self.model_path}.{os.getpid()}.tmp'
+            joblib.dump({'model': model, 'info': info}, temp_path)
+            os.replace(temp_path, self.model_path)
+            self.model = model
+            self.model_info = info
+            self._model_mtime = os.path.getmtime(self.model_path)
+        logger.info(f'Trained local classifier on {len(examples)} examples ({len(classes)} categories) in {time.time() - start_time:.2f}s')
+        return info
+
+    def schedule_training(self) -> bool:
+        """
+        Retrain the classifier on a background thread.
+        If training is already running, it runs once more when it finishes.
+
+        Returns:
+            bool: True if a training thread was started
+        """
+        with self.lock:
+            if self._training:
+                self._retrain_pending = True
+                return False
+            self._training = True
+        threading.Thread(target=self._training_worker, name='LocalClassifierTraining', daemon=True).start()
+        return True
+
+    def _training_worker(self) -> None:
+        """Train until no retraining was requested while training."""
+        while True:
+            try:
+                self.train()
+            except Exception as e:
+                logger.error(f'Error training local pre-classifier: {str(e)}')
+            with self.lock:
+                if not self._retrain_pending:
+                    self._training = False
+                    return
+                self._retrain_pending = False
+
+    def wait_for_training(self, timeout: float=60.0) -> bool:
+        """
+        Wait until background training has finished.
+
+        Args:
+            timeout: Maximum seconds to wait
+
+        Returns:
+            bool: True if no training is running
+        """
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            with self.lock:
+                if not self._training:
+                    return True
+            time.sleep(0.05)
+        return False
+
+    def _load_model(self):
+        """Load the saved model if it changed on disk since it was last loaded."""
+        if not sklearn_available:
+            return None
+        with self.lock:
+            try:
+                mtime = os.path.getmtime(self.model_path)
+            except OSError:
+                return self.model
+            if mtime != self._model_mtime:
+                try:
+                    saved = joblib.load(self.model_path)
+                    self.model = saved['model']
+                    self.model_info = saved.get('info', {})
+                except Exception as e:
+                    logger.error(f'Error loading local classifier from {self.model_path}: {str(e)}')
+                self._model_mtime = mtime
+            return self.model
+
+    def is_trained(self) -> bool:
+        """Whether a trained model is available."""
+        return self._load_model() is not None
+
+    def predict(self, file_infos: List[Dict[str, Any]], valid_categories: Optional[Iterable[str]]=None) -> List[Optional[Tuple[str, float]]]:
+        """
+        Predict categories for files.
+        Classes outside valid_categories (e.g. renamed or removed categories) are
+        dropped without renormalizing, so their probability mass does not make
+        the remaining categories look more certain than the model is.
+
+        Args:
+            file_infos: File metadata dictionaries (see file_features)
+            valid_categories: Categories that may be predicted (or None for all trained classes)
+
+        Returns:
+            list: (category, probability) per file, or None per file if no model is trained
+                or the model knows none of the valid categories
+        """
+        model = self._load_model()
+        if model is None or not file_infos:
+            return [None] * len(file_infos)
+        classes = [str(category) for category in model.classes_]
+        valid = set(valid_categories) if valid_categories is not None else set(classes)
+        columns = [index for index, category in enumerate(classes) if category in valid]
+        if not columns:
+            return [None] * len(file_infos)
+        probabilities = model.predict_proba([file_features(file_info) for file_info in file_infos])[:, columns]
+        return [(classes[columns[row.argmax()]], float(row.max())) for row in probabilities]
+
+    def classify_confident(self, file_infos: List[Dict[str, Any]], threshold: float, valid_categories: Optional[Iterable[str]]=None) -> Dict[str, Tuple[str, float]]:
+        """
+        Get the files whose predicted category reaches a probability threshold.
+
+        Args:
+            file_infos: File metadata dictionaries with id
+            threshold: Minimum probability
+            valid_categories: Categories that may be predicted (or None for all trained classes)
+
+        Returns:
+            dict: File ID to (category, probability) for confident predictions
+        """
+        return {str(file_info.get('id')): prediction for file_info, prediction in zip(file_infos, self.predict(file_infos, valid_categories)) if prediction is not None and prediction[1] >= threshold}
+
+    def presort(self, file_infos: List[Dict[str, Any]], valid_categories: Optional[Iterable[str]]=None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Group files by predicted category, e.g. to batch them per metadata template.
+
+        Args:
+            file_infos: File metadata dictionaries
+            valid_categories: Categories that may be predicted (or None for all trained classes)
+
+        Returns:
+            dict: Predicted category (or 'Unknown' without a model) to files
+        """
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for file_info, prediction in zip(file_infos, self.predict(file_infos, valid_categories)):
+            groups.setdefault(prediction[0] if prediction else 'Unknown', []).append(file_info)
+        return groups
+_local_classifiers: Dict[str, LocalCategoryClassifier] = {}
+_local_classifiers_lock = threading.Lock()
+
+def get_local_classifier(owner: Optional[str]=None) -> LocalCategoryClassifier:
+    """
+    Get the local classifier of a Box user, creating it if necessary.
+    Every owner has a separate history and model under CLASSIFIER_DIR.
+
+    Args:
+        owner: Box user ID (or None for the shared 'default' classifier)
+
+    Returns:
+        LocalCategoryClassifier: The owner's classifier
+    """
+    owner_key = _OWNER_PATTERN.sub('_', str(owner)) if owner else 'default'
+    with _local_classifiers_lock:
+        if owner_key not in _local_classifiers:
+            _local_classifiers[owner_key] = LocalCategoryClassifier(os.path.join(CLASSIFIER_DIR, 'local_classifier', owner_key))
+        return _local_classifiers[owner_key]
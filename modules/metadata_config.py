@@ -2,6 +2,7 @@ import streamlit as st
 import logging
 import json
 from typing import Dict, Any, List, Optional
+from modules.categorization_results import categorized_document_types, find_categorization, result_document_type
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -28,10 +29,10 @@ def metadata_config():
             file_name = file['name']
             document_type = 'Not categorized' # Default
             cat_results_list = st.session_state.document_categorization.get('results', [])
-            found_result = next((r for r in cat_results_list if r.get('file_id') == file_id), None)
+            found_result = find_categorization(cat_results_list, file_id)
             if found_result:
                 # Prefer 'document_type', then 'category', then default to 'Not categorized'
-                document_type = found_result.get('document_type') or found_result.get('category', 'Not categorized')
+                document_type = result_document_type(found_result) or 'Not categorized'
             # If found_result is None, document_type remains 'Not categorized' as initialized.
             categorization_data.append({'File Name': file_name, 'Document Type': document_type})
         st.table(categorization_data)
@@ -69,9 +70,7 @@ def metadata_config():
         if has_categorization:
             st.subheader('Document Type Specific Prompts')
             st.info('You can customize the freeform prompt for each document type.')
-            document_types = set()
-            for result in st.session_state.document_categorization["results"]:
-                document_types.add(result['document_type'])
+            document_types = categorized_document_types(st.session_state.document_categorization["results"])
             if 'document_type_prompts' not in st.session_state.metadata_config:
                 st.session_state.metadata_config['document_type_prompts'] = {}
             for doc_type in document_types:
@@ -91,9 +90,7 @@ def metadata_config():
         if has_categorization:
             st.subheader('Document Type Template Mapping')
             st.info('You can map each document type to a specific metadata template.')
-            document_types = set()
-            for result in st.session_state.document_categorization["results"]:
-                document_types.add(result['document_type'])
+            document_types = categorized_document_types(st.session_state.document_categorization["results"])
             if not hasattr(st.session_state, 'document_type_to_template'):
                 from modules.metadata_template_retrieval import initialize_template_state
                 initialize_template_state()
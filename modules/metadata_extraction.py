@@ -2,11 +2,87 @@ import streamlit as st
 import logging
 import json
 import requests
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Callable, List, Optional
+from modules.response_normalizer import normalize_structured_response, normalize_freeform_response, normalize_streamed_response
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+STRUCTURED_EXTRACTION_URL = 'https://api.box.com/2.0/ai/extract_structured'
+STRUCTURED_EXTRACTION_SYSTEM_MESSAGE = 'You are an AI assistant specialized in extracting metadata from documents based on provided field definitions. For each field, analyze the document content and extract the corresponding value. CRITICALLY IMPORTANT: Respond for EACH field with a JSON object containing two keys: 1. "value": The extracted metadata value as a string. 2. "confidence": Your confidence level for this specific extraction, chosen from ONLY these three options: "High", "Medium", or "Low". Base your confidence on how certain you are about the extracted value given the document content and field definition. Example Response for a field: {"value": "INV-12345", "confidence": "High"}'
+
+def to_api_fields(fields: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Convert field definitions to the extract_structured API format.
+    
+    Args:
+        fields: Field definitions, in API format (with 'key') or internal format (with 'name')
+        
+    Returns:
+        list: Field definitions in API format
+    """
+    api_fields = []
+    for field in fields:
+        if 'key' in field: # Already in correct API format
+            api_fields.append(field)
+        else: # Convert from internal format if necessary
+            api_field = {
+                'key': field.get('name', ''),
+                'displayName': field.get('display_name', field.get('name', '')),
+                'type': field.get('type', 'string')
+            }
+            if 'description' in field:
+                api_field['description'] = field['description']
+            if 'prompt' in field:
+                api_field['prompt'] = field['prompt']
+            if field.get('type') == 'enum' and 'options' in field:
+                api_field['options'] = field['options']
+            api_fields.append(api_field)
+    return api_fields
+
+class StructuredRequestBuilder:
+    """
+    Precompiled extract_structured request body for one template (or field list) and model.
+    The body is serialized once; build() only splices in the file ID, so batch
+    extraction does no per-file dict construction or field conversion.
+    """
+
+    def __init__(self, ai_model: str, fields: Optional[List[Dict[str, Any]]] = None, metadata_template: Optional[Dict[str, Any]] = None):
+        """
+        Initialize the builder.
+        
+        Args:
+            ai_model: AI model to use for extraction
+            fields: Field definitions (used when no metadata_template is given)
+            metadata_template: Metadata template reference
+            
+        Raises:
+            ValueError: If neither fields nor metadata_template is provided
+        """
+        agent_config = {'model': ai_model, 'mode': 'default', 'system_message': STRUCTURED_EXTRACTION_SYSTEM_MESSAGE}
+        body: Dict[str, Any] = {'ai_agent': {'type': 'ai_agent_extract_structured', 'long_text': agent_config, 'basic_text': agent_config}}
+        if metadata_template:
+            body['metadata_template'] = metadata_template
+        elif fields:
+            body['fields'] = to_api_fields(fields)
+        else:
+            raise ValueError('Either fields or metadata_template must be provided for structured extraction')
+        self.ai_model = ai_model
+        self._prefix = '{"items": [{"id": '
+        self._suffix = ', "type": "file"}], ' + json.dumps(body)[1:]
+
+    def build(self, file_id: str) -> str:
+        """
+        Build the serialized request body for a file.
+        
+        Args:
+            file_id: Box file ID
+            
+        Returns:
+            str: JSON request body
+        """
+        return self._prefix + json.dumps(str(file_id)) + self._suffix
+
 # This function was previously named metadata_extraction
 # Renaming it to get_extraction_functions to match the import in processing.py
 def get_extraction_functions() -> Dict[str, Any]:
@@ -17,7 +93,7 @@ def get_extraction_functions() -> Dict[str, Any]:
         dict: Dictionary mapping extraction method names to function objects.
     """
 
-    def extract_structured_metadata(client: Any, file_id: str, fields: Optional[List[Dict[str, Any]]] = None, metadata_template: Optional[Dict[str, Any]] = None, ai_model: str = 'azure__openai__gpt_4o_mini') -> Dict[str, Any]:
+    def extract_structured_metadata(client: Any, file_id: str, fields: Optional[List[Dict[str, Any]]] = None, metadata_template: Optional[Dict[str, Any]] = None, ai_model: str = 'azure__openai__gpt_4o_mini', request_builder: Optional[StructuredRequestBuilder] = None) -> Dict[str, Any]:
         """
         Extract structured metadata from a file using Box AI API
         
@@ -27,6 +103,8 @@ def get_extraction_functions() -> Dict[str, Any]:
             fields (list, optional): List of field definitions for extraction
             metadata_template (dict, optional): Metadata template definition
             ai_model (str): AI model to use for extraction
+            request_builder (StructuredRequestBuilder, optional): Precompiled request builder to use
+                instead of fields/metadata_template/ai_model (lets batch callers build it once per template)
             
         Returns:
             dict: Extracted metadata with confidence scores
@@ -42,49 +120,12 @@ def get_extraction_functions() -> Dict[str, Any]:
                 raise ValueError('Could not retrieve access token from client')
 
             headers = {'Authorization': f'Bearer {access_token}', 'Content-Type': 'application/json'}
-            ai_agent = {
-                'type': 'ai_agent_extract_structured',
-                'long_text': {
-                    'model': ai_model,
-                    'mode': 'default',
-                    'system_message': 'You are an AI assistant specialized in extracting metadata from documents based on provided field definitions. For each field, analyze the document content and extract the corresponding value. CRITICALLY IMPORTANT: Respond for EACH field with a JSON object containing two keys: 1. "value": The extracted metadata value as a string. 2. "confidence": Your confidence level for this specific extraction, chosen from ONLY these three options: "High", "Medium", or "Low". Base your confidence on how certain you are about the extracted value given the document content and field definition. Example Response for a field: {"value": "INV-12345", "confidence": "High"}'
-                },
-                'basic_text': {
-                    'model': ai_model,
-                    'mode': 'default',
-                    'system_message': 'You are an AI assistant specialized in extracting metadata from documents based on provided field definitions. For each field, analyze the document content and extract the corresponding value. CRITICALLY IMPORTANT: Respond for EACH field with a JSON object containing two keys: 1. "value": The extracted metadata value as a string. 2. "confidence": Your confidence level for this specific extraction, chosen from ONLY these three options: "High", "Medium", or "Low". Base your confidence on how certain you are about the extracted value given the document content and field definition. Example Response for a field: {"value": "INV-12345", "confidence": "High"}'
-                }
-            }
-            items = [{'id': file_id, 'type': 'file'}]
-            api_url = 'https://api.box.com/2.0/ai/extract_structured'
-            request_body: Dict[str, Any] = {'items': items, 'ai_agent': ai_agent}
-
-            if metadata_template:
-                request_body['metadata_template'] = metadata_template
-            elif fields:
-                api_fields = []
-                for field in fields:
-                    if 'key' in field: # Already in correct API format
-                        api_fields.append(field)
-                    else: # Convert from internal format if necessary
-                        api_field = {
-                            'key': field.get('name', ''),
-                            'displayName': field.get('display_name', field.get('name', '')),
-                            'type': field.get('type', 'string')
-                        }
-                        if 'description' in field:
-                            api_field['description'] = field['description']
-                        if 'prompt' in field:
-                            api_field['prompt'] = field['prompt']
-                        if field.get('type') == 'enum' and 'options' in field:
-                            api_field['options'] = field['options']
-                        api_fields.append(api_field)
-                request_body['fields'] = api_fields
-            else:
-                raise ValueError('Either fields or metadata_template must be provided for structured extraction')
+            if request_builder is None:
+                request_builder = StructuredRequestBuilder(ai_model, fields=fields, metadata_template=metadata_template)
+            request_body = request_builder.build(file_id)
 
-            logger.info(f'Making Box AI API call for structured extraction with request: {json.dumps(request_body)}')
-            response = requests.post(api_url, headers=headers, json=request_body)
+            logger.info(f'Making Box AI API call for structured extraction with request: {request_body}')
+            response = requests.post(STRUCTURED_EXTRACTION_URL, headers=headers, data=request_body.encode('utf-8'))
 
             if response.status_code != 200:
                 logger.error(f'Box AI API error response: {response.text}')
@@ -93,137 +134,13 @@ def get_extraction_functions() -> Dict[str, Any]:
             response_data = response.json()
             logger.info(f'Raw Box AI structured extraction response data: {json.dumps(response_data)}')
 
-            processed_response: Dict[str, Any] = {}
-            if 'answer' in response_data and isinstance(response_data['answer'], dict):
-                answer_dict = response_data['answer']
-                if 'fields' in answer_dict and isinstance(answer_dict['fields'], list):
-                    logger.info("Processing 'answer' with 'fields' array format.")
-                    fields_array = answer_dict['fields']
-                    for field_item in fields_array:
-                        if isinstance(field_item, dict) and 'key' in field_item and ('value' in field_item):
-                            field_key = field_item['key']
-                            extracted_value = field_item['value']
-                            confidence_level = field_item.get('confidence', 'Low') # Default to Low
-                            if not confidence_level or confidence_level not in ['High', 'Medium', 'Low']: # Check for None, empty, or invalid
-                                logger.warning(f"Field {field_key}: AI provided confidence '{confidence_level}' which is invalid or missing. Defaulting to Low.")
-                                confidence_level = 'Low'
-                            processed_response[field_key] = extracted_value
-                            processed_response[f'{field_key}_confidence'] = confidence_level
-                        else:
-                            logger.warning(f"Skipping invalid item in 'fields' array: {field_item}")
-                else:
-                    logger.info("Processing 'answer' as standard key-value dictionary.")
-                    for field_key, field_data in answer_dict.items():
-                        extracted_value = None
-                        confidence_level = 'Low' # Default to Low initially
-                        try:
-                            if isinstance(field_data, dict) and 'value' in field_data and ('confidence' in field_data):
-                                extracted_value = field_data['value']
-                                confidence_level = field_data['confidence']
-                                if not confidence_level or confidence_level not in ['High', 'Medium', 'Low']:
-                                    logger.warning(f"Field {field_key}: AI provided confidence '{confidence_level}' which is invalid. Defaulting to Low.")
-                                    confidence_level = 'Low'
-                            elif field_data is None:
-                                logger.info(f'Field {field_key}: Received null value. Setting value to None and confidence to Low.')
-                                extracted_value = None
-                                confidence_level = 'Low'
-                            elif isinstance(field_data, dict) and 'value' in field_data and (len(field_data) == 1):
-                                logger.warning(f"Field {field_key}: AI response provided 'value' but no 'confidence'. Defaulting confidence to Low.")
-                                extracted_value = field_data['value']
-                                confidence_level = 'Low'
-                            else:
-                                logger.warning(f"Field {field_key}: Unexpected data format for field data: {field_data}. Defaulting confidence to Low.")
-                                extracted_value = field_data
-                                confidence_level = 'Low'
-                            processed_response[field_key] = extracted_value
-                            processed_response[f'{field_key}_confidence'] = confidence_level
-                        except Exception as e:
-                            logger.error(f"Error processing field {field_key} with data '{field_data}': {str(e)}")
-                            processed_response[field_key] = field_data # Store raw data on error
-                            processed_response[f'{field_key}_confidence'] = 'Low'
-
-            elif 'answer' in response_data and isinstance(response_data['answer'], str):
-                logger.info("Processing 'answer' as string (potential freeform JSON).")
-                response_text = response_data['answer']
-                try:
-                    json_start = response_text.find('{')
-                    json_end = response_text.rfind('}') + 1
-                    if json_start != -1 and json_end > json_start:
-                        json_str = response_text[json_start:json_end]
-                        parsed_json = json.loads(json_str)
-                        if isinstance(parsed_json, dict):
-                            for field_key, field_data in parsed_json.items():
-                                if isinstance(field_data, dict) and 'value' in field_data and ('confidence' in field_data):
-                                    extracted_value = field_data['value']
-                                    confidence_level = field_data['confidence']
-                                    if not confidence_level or confidence_level not in ['High', 'Medium', 'Low']:
-                                        logger.warning(f"Field {field_key}: AI provided confidence '{confidence_level}' from parsed string which is invalid. Defaulting to Low.")
-                                        confidence_level = 'Low'
-                                    processed_response[field_key] = extracted_value
-                                    processed_response[f'{field_key}_confidence'] = confidence_level
-                                else:
-                                    logger.warning(f"Field {field_key}: Parsed JSON from AI 'answer' string for this field did not contain 'value'/'confidence' dict: {field_data}. Defaulting confidence to Low.")
-                                    processed_response[field_key] = field_data
-                                    processed_response[f'{field_key}_confidence'] = 'Low'
-                        else:
-                            logger.warning(f"Parsed JSON from 'answer' string is not a dictionary: {parsed_json}")
-                            processed_response['_raw_response'] = response_text
-                            processed_response['_confidence_processing_failed'] = True
-                    else:
-                        logger.warning("No JSON object found in 'answer' string.")
-                        processed_response['_raw_response'] = response_text
-                        processed_response['_confidence_processing_failed'] = True
-                except Exception as e:
-                    logger.error(f'Error parsing JSON from answer string: {str(e)}')
-                    processed_response['_raw_response'] = response_text
-                    processed_response['_confidence_processing_failed'] = True
-            elif 'entries' in response_data and len(response_data['entries']) > 0:
-                logger.info("Processing response using fallback 'entries' format.")
-                entry = response_data['entries'][0]
-                if 'metadata' in entry:
-                    metadata = entry['metadata']
-                    for field_key, field_value in metadata.items():
-                        extracted_value = field_value
-                        confidence_level = 'Low' # Default confidence
-                        try:
-                            if isinstance(field_value, str) and field_value.strip().startswith('{') and field_value.strip().endswith('}'):
-                                try:
-                                    parsed_value = json.loads(field_value)
-                                    if isinstance(parsed_value, dict) and 'value' in parsed_value and ('confidence' in parsed_value):
-                                        extracted_value = parsed_value['value']
-                                        confidence_level = parsed_value['confidence']
-                                        if not confidence_level or confidence_level not in ['High', 'Medium', 'Low']:
-                                            logger.warning(f"Field {field_key}: AI provided confidence '{confidence_level}' in 'entries' path which is invalid. Defaulting to Low.")
-                                            confidence_level = 'Low'
-                                    else:
-                                        logger.warning(f"Field {field_key}: Parsed JSON but keys 'value' and 'confidence' not found. Using raw value.")
-                                        # confidence_level remains 'Low' (initial default)
-                                except json.JSONDecodeError:
-                                    logger.warning(f"Field {field_key}: Failed to parse potential JSON value '{field_value}'. Using raw value.")
-                                    # confidence_level remains 'Low' (initial default)
-                            else:
-                                # Value is not a JSON string, use as is with Low confidence
-                                logger.info(f'Field {field_key}: Value is not the expected JSON format. Using raw value and Low confidence.')
-                            processed_response[field_key] = extracted_value
-                            processed_response[f'{field_key}_confidence'] = confidence_level
-                        except Exception as e:
-                            logger.error(f"Error processing field {field_key} with value '{field_value}': {str(e)}")
-                            processed_response[field_key] = field_value # Store raw data on error
-                            processed_response[f'{field_key}_confidence'] = 'Low'
-                else:
-                    logger.warning(f"No 'metadata' field found in the structured API entry: {entry}")
-                    processed_response['_error'] = "No 'metadata' field in API entry"
-                    processed_response['_confidence_processing_failed'] = True
-            else:
-                logger.warning(f"Neither 'answer' nor 'entries' field found in the structured API response: {response_data}")
-                processed_response['_error'] = "Neither 'answer' nor 'entries' field in API response"
-                processed_response['_confidence_processing_failed'] = True
+            processed_response = normalize_structured_response(response_data)
             return processed_response
         except Exception as e:
             logger.error(f'Error in structured metadata extraction call: {str(e)}')
             return {'error': str(e)}
 
-    def extract_freeform_metadata(client: Any, file_id: str, prompt: str, ai_model: str = 'azure__openai__gpt_4o_mini') -> Dict[str, Any]:
+    def extract_freeform_metadata(client: Any, file_id: str, prompt: str, ai_model: str = 'azure__openai__gpt_4o_mini', stream: bool = False, on_field: Optional[Callable[[str, Any, str], None]] = None) -> Dict[str, Any]:
         """
         Extract freeform metadata from a file using Box AI API
         
@@ -232,6 +149,10 @@ def get_extraction_functions() -> Dict[str, Any]:
             file_id (str): Box file ID
             prompt (str): Extraction prompt
             ai_model (str): AI model to use for extraction
+            stream (bool): Read the response body incrementally and parse fields as they arrive
+                instead of buffering and parsing the whole answer
+            on_field (callable, optional): Called with (key, value, confidence) for each extracted
+                field; with stream=True this happens while the rest of the answer is still arriving
             
         Returns:
             dict: Extracted metadata with confidence scores
@@ -266,64 +187,26 @@ def get_extraction_functions() -> Dict[str, Any]:
             request_body = {'items': items, 'ai_agent': ai_agent}
 
             logger.info(f'Making Box AI API call for freeform extraction with request: {json.dumps(request_body)}')
-            response = requests.post(api_url, headers=headers, json=request_body)
+            response = requests.post(api_url, headers=headers, json=request_body, stream=stream)
 
             if response.status_code != 200:
                 logger.error(f'Box AI API error response: {response.text}')
                 return {'error': f'Error in Box AI API call: {response.status_code} {response.reason}'}
 
+            if stream:
+                with response:
+                    processed_response = normalize_streamed_response(response.iter_content(chunk_size=8192), mode='freeform', on_field=on_field)
+                logger.info(f'Streamed Box AI freeform extraction parsed {len(processed_response)} keys')
+                return processed_response
+
             response_data = response.json()
             logger.info(f'Raw Box AI freeform extraction response data: {json.dumps(response_data)}')
 
-            processed_response: Dict[str, Any] = {}
-            if 'answer' in response_data and isinstance(response_data['answer'], str):
-                response_text = response_data['answer']
-                try:
-                    # Attempt to find and parse JSON within the answer string
-                    json_start = response_text.find('{')
-                    json_end = response_text.rfind('}') + 1
-                    if json_start != -1 and json_end > json_start:
-                        json_str = response_text[json_start:json_end]
-                        parsed_json = json.loads(json_str)
-                        if isinstance(parsed_json, dict):
-                            for key, value_confidence_pair in parsed_json.items():
-                                if isinstance(value_confidence_pair, dict) and 'value' in value_confidence_pair and 'confidence' in value_confidence_pair:
-                                    extracted_val = value_confidence_pair['value']
-                                    confidence_val = value_confidence_pair['confidence']
-                                    if not confidence_val or confidence_val not in ['High', 'Medium', 'Low']:
-                                        logger.warning(f"Field {key}: AI provided confidence '{confidence_val}' in freeform response which is invalid. Defaulting to Low.")
-                                        confidence_val = 'Low'
-                                    processed_response[key] = extracted_val
-                                    processed_response[f'{key}_confidence'] = confidence_val
-                                else:
-                                    # If not in value/confidence format, take the value as is
-                                    logger.warning(f"Field {key}: Unexpected format for value/confidence pair in freeform response: {value_confidence_pair}. Defaulting confidence to Low.")
-                                    processed_response[key] = value_confidence_pair
-                                    processed_response[f'{key}_confidence'] = 'Low'
-                        else:
-                            logger.warning(f"Parsed JSON from 'answer' string is not a dictionary: {parsed_json}. Storing raw answer.")
-                            processed_response['_raw_answer'] = response_text
-                            processed_response['_confidence_processing_failed'] = True
-                    else:
-                        logger.warning("No JSON object found in 'answer' string. Storing raw answer.")
-                        processed_response['_raw_answer'] = response_text
-                        processed_response['_confidence_processing_failed'] = True
-                except json.JSONDecodeError as e_json:
-                    logger.error(f'Error parsing JSON from freeform answer string: {str(e_json)}. Raw answer: {response_text}')
-                    processed_response['_raw_answer'] = response_text
-                    processed_response['_error_parsing_json'] = str(e_json)
-                    processed_response['_confidence_processing_failed'] = True
-            elif 'entries' in response_data and len(response_data['entries']) > 0 and 'answer' in response_data['entries'][0]:
-                 # Fallback for older API response structure if needed
-                response_text = response_data['entries'][0]['answer']
-                logger.info(f"Processing 'answer' from 'entries' (fallback): {response_text}")
-                # (Add similar JSON parsing logic as above if this fallback is common)
-                processed_response['_raw_answer_from_entries'] = response_text
-                processed_response['_confidence_processing_failed'] = True # Assume failure if relying on this fallback for now
-            else:
-                logger.warning(f"Neither 'answer' nor 'entries[0].answer' field found in the freeform API response: {response_data}")
-                processed_response['_error'] = "No 'answer' field in API response"
-                processed_response['_confidence_processing_failed'] = True
+            processed_response = normalize_freeform_response(response_data)
+            if on_field is not None:
+                for key, value in processed_response.items():
+                    if not key.startswith('_') and not key.endswith('_confidence'):
+                        on_field(key, value, processed_response.get(f'{key}_confidence', 'Low'))
             return processed_response
         except Exception as e:
             logger.error(f'Error in freeform metadata extraction call: {str(e)}')
@@ -1,16 +1,133 @@
 import streamlit as st
+import os
+import json
+import time
+import hashlib
 import logging
+import threading
+import concurrent.futures
 import requests
-import time
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
+from modules.template_registry import get_template_registry
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+TEMPLATE_INDEX_PATH = os.path.join('.cache', 'template_index.json')
+TEMPLATE_INDEX_TTL = 900
+TEMPLATE_PAGE_LIMIT = 1000
+TEMPLATE_SCOPES = ('enterprise',)
+
+class TemplateIndex:
+    """
+    Persistent index of template listing pages per tenant and scope.
+    Each page keeps its marker, ETag/Last-Modified validators and entries so a
+    refresh can revalidate known pages concurrently with conditional requests,
+    and each template keeps a content hash so only changed templates are
+    pushed to the template registry.
+    """
+
+    def __init__(self, path: str=TEMPLATE_INDEX_PATH):
+        """
+        Initialize the index.
+
+        Args:
+            path: Path to the JSON index file
+        """
+        self.path = path
+        self.lock = threading.RLock()
+        self.data = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        """Load the index file, starting empty if it is missing or unreadable."""
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f'Could not read template index {self.path}: {str(e)}')
+            return {}
+
+    def get(self, tenant: str, scope: str) -> Dict[str, Any]:
+        """
+        Get the index record for a tenant and listing scope.
+
+        Args:
+            tenant: Tenant key
+            scope: Listing scope
+
+        Returns:
+            dict: Record with pages, hashes and updated_at (empty if not indexed)
+        """
+        with self.lock:
+            return self.data.get(f'{tenant}:{scope}', {})
+
+    def put(self, tenant: str, scope: str, record: Dict[str, Any]) -> None:
+        """
+        Store the index record for a tenant and listing scope and save the file.
+
+        Args:
+            tenant: Tenant key
+            scope: Listing scope
+            record: Record with pages, hashes and updated_at
+        """
+        with self.lock:
+            self.data[f'{tenant}:{scope}'] = record
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_path = f'{self.path}.{os.getpid()}.tmp'
+            try:
+                with open(temp_path, 'w') as f:
+                    json.dump(self.data, f)
+                os.replace(temp_path, self.path)
+            except Exception as e:
+                logger.warning(f'Could not write template index {self.path}: {str(e)}')
+_template_index = None
+
+def get_template_index() -> TemplateIndex:
+    """
+    Get the global template index instance, creating it if necessary.
+
+    Returns:
+        TemplateIndex: Global template index instance
+    """
+    global _template_index
+    if _template_index is None:
+        _template_index = TemplateIndex()
+    return _template_index
+
+def _template_hash(template: Dict[str, Any]) -> str:
+    """Hash a listed template definition to detect changes between refreshes."""
+    return hashlib.sha256(json.dumps(template, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+def _tenant_key(client) -> str:
+    """Get the key that separates index records of different Box users/enterprises."""
+    user = st.session_state.get('user') if hasattr(st, 'session_state') else None
+    user_id = getattr(user, 'id', None) or getattr(getattr(client, 'auth', None), '_user_id', None)
+    return str(user_id) if user_id else 'default'
+
+def _to_template_info(template: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Convert a listed template into the (template_id, info) form kept in session state."""
+    if 'templateKey' not in template or 'scope' not in template:
+        return None
+    template_key = template['templateKey']
+    scope = template['scope'] # This should be 'enterprise' or 'global'
+    # Construct a unique ID combining scope and templateKey
+    template_id = f"{scope}_{template_key}"
+    return (template_id, {'id': template_id, 'key': template_key, 'displayName': template.get('displayName', template_key), 'fields': template.get('fields', []), 'hidden': template.get('hidden', False)})
+
 def get_metadata_templates(client, force_refresh=False):
     """
     Retrieve metadata templates from Box
     
+    Templates are listed through a persistent template index: a session first
+    uses its own cache, then the index if it is younger than TEMPLATE_INDEX_TTL,
+    and otherwise revalidates the indexed listing pages with Box. Only templates
+    that were added, changed or removed since the last listing are pushed to the
+    shared template registry.
+    
     Args:
         client: Box client
         force_refresh: Force refresh of templates
@@ -30,23 +147,26 @@ def get_metadata_templates(client, force_refresh=False):
         if not access_token:
             raise ValueError('Could not retrieve access token from client')
 
+        index = get_template_index()
+        tenant = _tenant_key(client)
+        records = {scope: index.get(tenant, scope) for scope in TEMPLATE_SCOPES}
+        stale_scopes = [scope for scope, record in records.items() if force_refresh or not record or time.time() - record.get('updated_at', 0) > TEMPLATE_INDEX_TTL]
+        if stale_scopes:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=len(stale_scopes)) as executor:
+                refreshed = dict(zip(stale_scopes, executor.map(lambda scope: refresh_templates_for_scope(access_token, scope, records[scope]), stale_scopes)))
+            for scope, record in refreshed.items():
+                if record is not None:
+                    index.put(tenant, scope, record)
+                    records[scope] = record
+
         templates = {}
-        # Assuming 'enterprise' is the primary scope. Add 'global' if needed.
-        enterprise_templates = retrieve_templates_by_scope(access_token, 'enterprise')
-        for template in enterprise_templates:
-            if 'templateKey' in template and 'scope' in template:
-                template_key = template['templateKey']
-                scope = template['scope'] # This should be 'enterprise' or 'global'
-                # Construct a unique ID combining scope and templateKey
-                template_id = f"{scope}_{template_key}" 
-                templates[template_id] = {
-                    'id': template_id,
-                    'key': template_key,
-                    'displayName': template.get('displayName', template_key),
-                    'fields': template.get('fields', []),
-                    'hidden': template.get('hidden', False)
-                }
-        
+        for record in records.values():
+            for page in record.get('pages', []):
+                for template in page.get('entries', []):
+                    template_info = _to_template_info(template)
+                    if template_info is not None:
+                        templates[template_info[0]] = template_info[1]
+
         st.session_state.metadata_templates = templates
         st.session_state.template_cache_timestamp = time.time()
         logger.info(f'Retrieved {len(templates)} metadata templates')
@@ -56,6 +176,114 @@ def get_metadata_templates(client, force_refresh=False):
         st.session_state.metadata_templates = {} # Ensure it's an empty dict on error
         return {}
 
+def refresh_templates_for_scope(access_token, scope, record=None):
+    """
+    Refresh the indexed listing of one scope and apply the changes to the template registry
+    
+    Args:
+        access_token: Box API access token
+        scope: Template scope (enterprise or global)
+        record: Previous index record for the scope (or None)
+        
+    Returns:
+        dict: New index record, or None if the listing failed
+    """
+    record = record or {}
+    try:
+        pages = retrieve_template_pages(access_token, scope, record.get('pages'))
+    except Exception as e:
+        logger.error(f'Error retrieving {scope} templates: {str(e)}')
+        return None
+    previous_hashes = record.get('hashes', {})
+    hashes = {}
+    registry = get_template_registry()
+    changed = 0
+    for page in pages:
+        for template in page['entries']:
+            if 'templateKey' not in template or 'scope' not in template:
+                continue
+            # Template keys cannot contain '/', so it separates scope and key in the index
+            index_key = f"{template['scope']}/{template['templateKey']}"
+            hashes[index_key] = _template_hash(template)
+            if previous_hashes.get(index_key) != hashes[index_key] or (template['scope'], template['templateKey']) not in registry.entries:
+                # Listings include full field definitions, so seed the shared registry and skip per-template fetches later
+                registry.put_template(template['scope'], template['templateKey'], template)
+                changed += 1
+    removed = [index_key for index_key in previous_hashes if index_key not in hashes]
+    for index_key in removed:
+        template_scope, template_key = index_key.split('/', 1)
+        registry.invalidate(template_scope, template_key)
+    logger.info(f'Refreshed {scope} template index: {len(hashes)} templates, {changed} added or changed, {len(removed)} removed')
+    return {'pages': pages, 'hashes': hashes, 'updated_at': time.time()}
+
+def retrieve_template_pages(access_token, scope, cached_pages=None):
+    """
+    Retrieve all listing pages of a scope, revalidating previously indexed pages
+    
+    Pages whose markers are known from the index are requested concurrently with
+    If-None-Match/If-Modified-Since, reusing the indexed entries on 304. Pages
+    past the first one whose next marker changed are fetched sequentially.
+    
+    Args:
+        access_token: Box API access token
+        scope: Template scope (enterprise or global)
+        cached_pages: Pages from the index (or None)
+        
+    Returns:
+        list: Pages with marker, next_marker, etag, last_modified and entries
+        
+    Raises:
+        requests.HTTPError: If Box returns an error
+    """
+    headers = {'Authorization': f'Bearer {access_token}', 'Content-Type': 'application/json'}
+    session = requests.Session()
+    session.headers.update(headers)
+    cached_pages = cached_pages or []
+    pages = []
+    if cached_pages:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(cached_pages))) as executor:
+            futures = [executor.submit(_fetch_template_page, session, scope, page.get('marker'), page) for page in cached_pages]
+            for position, future in enumerate(futures):
+                try:
+                    page = future.result()
+                except Exception as e:
+                    if position == 0:
+                        raise
+                    # Markers past a changed page may no longer be valid; they are refetched below
+                    logger.info(f'Could not revalidate {scope} template page {position + 1}: {str(e)}')
+                    break
+                pages.append(page)
+                expected_next = cached_pages[position + 1].get('marker') if position + 1 < len(cached_pages) else None
+                if page['next_marker'] != expected_next:
+                    break
+        if not pages[-1]['next_marker']:
+            return pages
+    next_marker = pages[-1]['next_marker'] if pages else None
+    while True:
+        page = _fetch_template_page(session, scope, next_marker)
+        pages.append(page)
+        next_marker = page['next_marker']
+        if not next_marker:
+            return pages
+
+def _fetch_template_page(session, scope, marker=None, cached_page=None):
+    """Fetch one listing page, sending the cached page's validators if there is one."""
+    params = {'limit': TEMPLATE_PAGE_LIMIT}
+    if marker:
+        params['marker'] = marker
+    headers = {}
+    if cached_page:
+        if cached_page.get('etag'):
+            headers['If-None-Match'] = cached_page['etag']
+        if cached_page.get('last_modified'):
+            headers['If-Modified-Since'] = cached_page['last_modified']
+    response = session.get(f'https://api.box.com/2.0/metadata_templates/{scope}', params=params, headers=headers)
+    if response.status_code == 304 and cached_page:
+        return cached_page
+    response.raise_for_status() # Will raise an HTTPError for bad responses (4xx or 5xx)
+    data = response.json()
+    return {'marker': marker, 'next_marker': data.get('next_marker') or None, 'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified'), 'entries': data.get('entries', [])}
+
 def retrieve_templates_by_scope(access_token, scope):
     """
     Retrieve metadata templates for a specific scope using direct API call
@@ -67,25 +295,8 @@ def retrieve_templates_by_scope(access_token, scope):
     Returns:
         list: List of metadata templates for the specified scope
     """
-    templates = []
-    next_marker = None
     try:
-        while True:
-            api_url = f'https://api.box.com/2.0/metadata_templates/{scope}'
-            if next_marker:
-                api_url += f'?marker={next_marker}'
-            headers = {'Authorization': f'Bearer {access_token}', 'Content-Type': 'application/json'}
-            response = requests.get(api_url, headers=headers)
-            response.raise_for_status() # Will raise an HTTPError for bad responses (4xx or 5xx)
-            data = response.json()
-            if 'entries' in data:
-                templates.extend(data['entries'])
-            
-            if 'next_marker' in data and data['next_marker']:
-                next_marker = data['next_marker']
-            else:
-                break # No more pages
-        return templates
+        return [template for page in retrieve_template_pages(access_token, scope) for template in page['entries']]
     except Exception as e:
         logger.error(f'Error retrieving {scope} templates: {str(e)}')
         return [] # Return empty list on error
@@ -0,0 +1,317 @@
+"""
+Normalization of Box AI extraction responses.
+This module converts the response shapes returned by the Box AI extract and
+text generation endpoints into the flat {key, key_confidence} form used by
+the rest of the app. The response shape is detected once and dispatched
+through a table of converters instead of being re-checked field by field.
+"""
+import json
+import logging
+from typing import Dict, Any, Callable, Iterable, List, Optional, Tuple
+from modules.json_stream import AnswerStringDecoder, IncrementalObjectScanner, iter_answer_text
+logger = logging.getLogger(__name__)
+VALID_CONFIDENCE_LEVELS = frozenset(('High', 'Medium', 'Low'))
+_decoder = json.JSONDecoder()
+
+def normalize_confidence(field_key: str, confidence: Any, source: str='response') -> str:
+    """
+    Return a confidence level, defaulting to Low for missing or invalid values.
+
+    Args:
+        field_key: Field key (for logging)
+        confidence: Confidence provided by the AI
+        source: Description of where the confidence came from (for logging)
+
+    Returns:
+        str: High, Medium or Low
+    """
+    if confidence.__class__ is str and confidence in VALID_CONFIDENCE_LEVELS:
+        return confidence
+    logger.warning(f"Field {field_key}: AI provided confidence '{confidence}' in {source} which is invalid or missing. Defaulting to Low.")
+    return 'Low'
+
+def parse_answer_json(text: str) -> Any:
+    """
+    Parse the first JSON object embedded in an AI answer string.
+    The object is decoded in place from its opening brace, so surrounding
+    prose (including trailing braces) is ignored and no substring is copied.
+
+    Args:
+        text: Answer text
+
+    Returns:
+        Parsed JSON value
+
+    Raises:
+        ValueError: If the text contains no JSON object (json.JSONDecodeError if it is malformed)
+    """
+    start = text.find('{')
+    if start == -1 or text.rfind('}') < start:
+        raise ValueError('No JSON object found in answer string')
+    value, _ = _decoder.raw_decode(text, start)
+    return value
+
+def _log_defaulted(defaulted: List[str], source: str) -> None:
+    """Log the fields of one response whose confidence was defaulted to Low."""
+    if defaulted:
+        logger.warning(f"Fields {', '.join(defaulted)}: {source} had no valid 'value'/'confidence' pair. Defaulting confidence to Low.")
+
+def _convert_pairs(pairs: Dict[str, Any], source: str) -> Dict[str, Any]:
+    """Convert fields given as {value, confidence} objects, keeping other values raw with Low confidence."""
+    processed = {}
+    defaulted = []
+    valid = VALID_CONFIDENCE_LEVELS
+    for field_key, field_data in pairs.items():
+        if field_data.__class__ is dict and 'value' in field_data and 'confidence' in field_data:
+            confidence = field_data['confidence']
+            processed[field_key] = field_data['value']
+            if confidence.__class__ is str and confidence in valid:
+                processed[f'{field_key}_confidence'] = confidence
+                continue
+        else:
+            processed[field_key] = field_data
+        processed[f'{field_key}_confidence'] = 'Low'
+        defaulted.append(field_key)
+    _log_defaulted(defaulted, source)
+    return processed
+
+def _convert_answer_fields(response_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert an 'answer' with a 'fields' array of {key, value, confidence} items."""
+    processed = {}
+    defaulted = []
+    valid = VALID_CONFIDENCE_LEVELS
+    for field_item in response_data['answer']['fields']:
+        if isinstance(field_item, dict) and 'key' in field_item and 'value' in field_item:
+            field_key = field_item['key']
+            confidence = field_item.get('confidence')
+            processed[field_key] = field_item['value']
+            if confidence.__class__ is str and confidence in valid:
+                processed[f'{field_key}_confidence'] = confidence
+            else:
+                processed[f'{field_key}_confidence'] = 'Low'
+                defaulted.append(str(field_key))
+        else:
+            logger.warning(f"Skipping invalid item in 'fields' array: {field_item}")
+    _log_defaulted(defaulted, 'fields array')
+    return processed
+
+def _convert_answer_dict(response_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert an 'answer' dictionary of field key to {value, confidence}, accepting nulls and value-only objects."""
+    answer = response_data['answer']
+    processed = _convert_pairs(answer, 'answer dictionary')
+    for field_key, field_data in answer.items():
+        if field_data.__class__ is dict and len(field_data) == 1 and 'value' in field_data:
+            processed[field_key] = field_data['value']
+    return processed
+
+def _convert_answer_string(response_data: Dict[str, Any], answer: Optional[str]=None) -> Dict[str, Any]:
+    """Convert an 'answer' string holding a JSON object of field key to {value, confidence}."""
+    response_text = response_data['answer'] if answer is None else answer
+    try:
+        parsed_json = parse_answer_json(response_text)
+    except ValueError as e:
+        logger.warning(f'Could not parse JSON from answer string: {str(e)}')
+        return {'_raw_response': response_text, '_confidence_processing_failed': True}
+    if not isinstance(parsed_json, dict):
+        logger.warning(f"Parsed JSON from 'answer' string is not a dictionary: {parsed_json}")
+        return {'_raw_response': response_text, '_confidence_processing_failed': True}
+    return _convert_pairs(parsed_json, 'answer string')
+
+def _convert_entries_metadata(response_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert the fallback 'entries[0].metadata' format whose values may be JSON strings."""
+    entry = response_data['entries'][0]
+    if 'metadata' not in entry:
+        logger.warning(f"No 'metadata' field found in the structured API entry: {entry}")
+        return {'_error': "No 'metadata' field in API entry", '_confidence_processing_failed': True}
+    processed = {}
+    defaulted = []
+    valid = VALID_CONFIDENCE_LEVELS
+    for field_key, field_value in entry['metadata'].items():
+        processed[field_key] = field_value
+        if isinstance(field_value, str):
+            stripped = field_value.strip()
+            if stripped[:1] == '{' and stripped[-1:] == '}':
+                try:
+                    parsed_value = json.loads(stripped)
+                except json.JSONDecodeError:
+                    parsed_value = None
+                if isinstance(parsed_value, dict) and 'value' in parsed_value and 'confidence' in parsed_value:
+                    confidence = parsed_value['confidence']
+                    processed[field_key] = parsed_value['value']
+                    if confidence.__class__ is str and confidence in valid:
+                        processed[f'{field_key}_confidence'] = confidence
+                        continue
+        processed[f'{field_key}_confidence'] = 'Low'
+        defaulted.append(field_key)
+    _log_defaulted(defaulted, "'entries' metadata")
+    return processed
+
+def _convert_missing_structured(response_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Report a structured response with neither 'answer' nor 'entries'."""
+    logger.warning(f"Neither 'answer' nor 'entries' field found in the structured API response: {response_data}")
+    return {'_error': "Neither 'answer' nor 'entries' field in API response", '_confidence_processing_failed': True}
+
+def _convert_freeform_answer(response_data: Dict[str, Any], answer: Optional[str]=None) -> Dict[str, Any]:
+    """Convert a text generation 'answer' string holding a JSON object."""
+    response_text = response_data['answer'] if answer is None else answer
+    try:
+        parsed_json = parse_answer_json(response_text)
+    except json.JSONDecodeError as e:
+        logger.error(f'Error parsing JSON from freeform answer string: {str(e)}. Raw answer: {response_text}')
+        return {'_raw_answer': response_text, '_error_parsing_json': str(e), '_confidence_processing_failed': True}
+    except ValueError:
+        logger.warning("No JSON object found in 'answer' string. Storing raw answer.")
+        return {'_raw_answer': response_text, '_confidence_processing_failed': True}
+    if not isinstance(parsed_json, dict):
+        logger.warning(f"Parsed JSON from 'answer' string is not a dictionary: {parsed_json}. Storing raw answer.")
+        return {'_raw_answer': response_text, '_confidence_processing_failed': True}
+    return _convert_pairs(parsed_json, 'freeform response')
+
+def _convert_freeform_entries(response_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert the fallback 'entries[0].answer' format of text generation responses."""
+    response_text = response_data['entries'][0]['answer']
+    if isinstance(response_text, str):
+        processed = _convert_freeform_answer(response_data, response_text)
+        if not processed.get('_confidence_processing_failed'):
+            return processed
+    return {'_raw_answer_from_entries': response_text, '_confidence_processing_failed': True}
+
+def _convert_missing_freeform(response_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Report a text generation response without an answer."""
+    logger.warning(f"Neither 'answer' nor 'entries[0].answer' field found in the freeform API response: {response_data}")
+    return {'_error': "No 'answer' field in API response", '_confidence_processing_failed': True}
+
+def _has_entries(response_data: Dict[str, Any]) -> bool:
+    """Check for a non-empty 'entries' list."""
+    entries = response_data.get('entries')
+    return isinstance(entries, list) and len(entries) > 0
+_SHAPES: Dict[str, List[Tuple[str, Callable[[Dict[str, Any]], bool], Callable[[Dict[str, Any]], Dict[str, Any]]]]] = {'structured': [('answer_fields', lambda r: isinstance(r.get('answer'), dict) and isinstance(r['answer'].get('fields'), list), _convert_answer_fields), ('answer_dict', lambda r: isinstance(r.get('answer'), dict), _convert_answer_dict), ('answer_string', lambda r: isinstance(r.get('answer'), str), _convert_answer_string), ('entries_metadata', _has_entries, _convert_entries_metadata), ('missing', lambda r: True, _convert_missing_structured)], 'freeform': [('answer_string', lambda r: isinstance(r.get('answer'), str), _convert_freeform_answer), ('entries_answer', lambda r: _has_entries(r) and isinstance(r['entries'][0], dict) and 'answer' in r['entries'][0], _convert_freeform_entries), ('missing', lambda r: True, _convert_missing_freeform)]}
+
+def detect_response_shape(response_data: Dict[str, Any], mode: str='structured') -> str:
+    """
+    Detect the shape of a Box AI response.
+
+    Args:
+        response_data: Parsed API response
+        mode: 'structured' for extract_structured responses or 'freeform' for text_gen responses
+
+    Returns:
+        str: Shape name from the normalizer table
+    """
+    for shape, matches, _ in _SHAPES[mode]:
+        if matches(response_data):
+            return shape
+    return 'missing'
+
+def normalize_response(response_data: Dict[str, Any], mode: str='structured') -> Dict[str, Any]:
+    """
+    Convert a Box AI response into the flat {key, key_confidence} form.
+
+    Args:
+        response_data: Parsed API response
+        mode: 'structured' for extract_structured responses or 'freeform' for text_gen responses
+
+    Returns:
+        dict: Field values with `<key>_confidence` companions, or `_`-prefixed diagnostics
+            (_error, _raw_response/_raw_answer, _confidence_processing_failed) when the
+            response could not be interpreted
+    """
+    for shape, matches, convert in _SHAPES[mode]:
+        if matches(response_data):
+            logger.debug(f'Normalizing {mode} response with shape {shape}')
+            return convert(response_data)
+    return {}
+
+def normalize_structured_response(response_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert an extract_structured response into the flat {key, key_confidence} form.
+
+    Args:
+        response_data: Parsed API response
+
+    Returns:
+        dict: Normalized fields (see normalize_response)
+    """
+    return normalize_response(response_data, 'structured')
+
+def normalize_freeform_response(response_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Convert a text_gen response into the flat {key, key_confidence} form.
+
+    Args:
+        response_data: Parsed API response
+
+    Returns:
+        dict: Normalized fields (see normalize_response)
+    """
+    return normalize_response(response_data, 'freeform')
+
+def normalize_streamed_response(chunks: Iterable[bytes], mode: str='freeform', on_field: Optional[Callable[[str, Any, str], None]]=None, max_raw_chars: int=65536) -> Dict[str, Any]:
+    """
+    Normalize a response whose body is read in chunks, emitting fields as they complete.
+    The JSON object in the answer string is scanned incrementally, so on_field is
+    called for each field while the rest of the answer is still arriving and only
+    the field being read (plus up to max_raw_chars of raw answer for diagnostics)
+    is held in memory. Responses without an answer string are parsed as a whole
+    with normalize_response.
+
+    Args:
+        chunks: Raw response body chunks (e.g. requests' iter_content)
+        mode: 'structured' or 'freeform' (see normalize_response)
+        on_field: Optional callback called with (key, value, confidence) for each completed field
+        max_raw_chars: Maximum answer text kept for `_raw_answer`/`_raw_response` when parsing fails
+
+    Returns:
+        dict: Normalized fields (see normalize_response)
+    """
+    raw_key = '_raw_answer' if mode == 'freeform' else '_raw_response'
+    source = 'freeform response' if mode == 'freeform' else 'answer string'
+    decoder = AnswerStringDecoder()
+    scanner = IncrementalObjectScanner()
+    processed = {}
+    defaulted = []
+    raw_parts = []
+    raw_chars = 0
+    for piece in iter_answer_text(chunks, decoder):
+        if raw_chars < max_raw_chars:
+            raw_parts.append(piece[:max_raw_chars - raw_chars])
+            raw_chars += len(raw_parts[-1])
+        for field_key, field_data in scanner.feed(piece):
+            if field_data.__class__ is dict and 'value' in field_data and 'confidence' in field_data:
+                value = field_data['value']
+                confidence = field_data['confidence']
+                if not (confidence.__class__ is str and confidence in VALID_CONFIDENCE_LEVELS):
+                    confidence = 'Low'
+                    defaulted.append(field_key)
+            else:
+                value = field_data
+                confidence = 'Low'
+                defaulted.append(field_key)
+            processed[field_key] = value
+            processed[f'{field_key}_confidence'] = confidence
+            if on_field is not None:
+                on_field(field_key, value, confidence)
+    if not decoder.found:
+        if decoder.envelope_overflow:
+            logger.warning('Streamed response had no answer string and was too large to parse as a whole')
+            return {'_error': "No 'answer' field in API response", '_confidence_processing_failed': True}
+        try:
+            response_data = json.loads(decoder.envelope_text)
+        except json.JSONDecodeError as e:
+            logger.error(f'Could not parse streamed response body: {str(e)}')
+            return {'_error': f'Invalid JSON in API response: {str(e)}', '_confidence_processing_failed': True}
+        return normalize_response(response_data, mode) if isinstance(response_data, dict) else {'_error': 'Unexpected API response', '_confidence_processing_failed': True}
+    raw_answer = ''.join(raw_parts)
+    if scanner.error or (scanner.found and not scanner.complete):
+        error = scanner.error or 'Unterminated JSON object in answer'
+        logger.error(f'Error parsing JSON from streamed answer: {error}')
+        failed = {raw_key: raw_answer, '_confidence_processing_failed': True}
+        if mode == 'freeform':
+            failed['_error_parsing_json'] = error
+        return failed
+    if not scanner.found:
+        logger.warning("No JSON object found in streamed 'answer' string.")
+        return {raw_key: raw_answer, '_confidence_processing_failed': True}
+    _log_defaulted(defaulted, source)
+    return processed
+
@@ -0,0 +1,257 @@
+"""
+Streaming export of extraction results to CSV, Excel and Parquet.
+Results are written as one row per file-field (value, AI and adjusted
+confidence, validation status and message) in chunks, so an export never
+builds the whole table in memory. The exporters read any file ID -> result
+mapping (an ExtractionResultStore, a plain dict or a JSON file) and work from
+the results viewer as well as from the command line:
+
+    python -m modules.result_export results.json results.parquet
+
+Spreadsheet exports (CSV and Excel) prefix cells that would start a formula
+with an apostrophe.
+"""
+import io
+import os
+import csv
+import json
+import argparse
+import logging
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+
+try:
+    import openpyxl
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+    openpyxl_available = True
+except ImportError:
+    openpyxl_available = False
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    pyarrow_available = True
+except ImportError:
+    pyarrow_available = False
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+EXPORT_COLUMNS = ['file_id', 'file_name', 'document_type', 'template_id', 'overall_status', 'field_key', 'value', 'ai_confidence', 'adjusted_confidence', 'validation_status', 'validation_message', 'error']
+EXPORT_FORMATS = {'.csv': 'csv', '.xlsx': 'xlsx', '.parquet': 'parquet'}
+DEFAULT_CHUNK_SIZE = 10000
+# Excel sheets hold at most 1,048,576 rows including the header
+XLSX_MAX_ROWS = 1048575
+# Leading characters that make spreadsheet applications evaluate a cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+Destination = Union[str, BinaryIO]
+
+def _text(value: Any) -> str:
+    return '' if value is None else str(value)
+
+def _spreadsheet_cell(value: str) -> str:
+    """Make an extracted value safe to open in a spreadsheet (no formula injection)."""
+    return f"'{value}" if value.startswith(FORMULA_PREFIXES) else value
+
+def _xlsx_cell(value: str) -> str:
+    """Make an extracted value safe for a worksheet: no formulas and no control characters Excel rejects."""
+    return _spreadsheet_cell(ILLEGAL_CHARACTERS_RE.sub('', value))
+
+def iter_export_rows(results: Mapping[str, Any], file_ids: Optional[Iterable[str]]=None) -> Iterator[Tuple[str, ...]]:
+    """
+    Yield the export rows of stored results, one file at a time.
+
+    Args:
+        results: File ID to result data in the extraction_results format
+        file_ids: File IDs to export in order (or None for all results); unknown IDs are skipped
+
+    Yields:
+        tuple: Row with the values of EXPORT_COLUMNS; files without fields get one row without a field
+    """
+    for file_id in (results if file_ids is None else file_ids):
+        result_data = results.get(file_id)
+        if not isinstance(result_data, dict):
+            continue
+        summary = result_data.get('document_validation_summary') or {}
+        file_columns = (str(file_id), _text(result_data.get('file_name')), _text(result_data.get('document_type')), _text(result_data.get('template_id_used_for_extraction')), _text(summary.get('overall_document_confidence_suggestion')))
+        error = _text(result_data.get('error'))
+        fields = result_data.get('fields') or {}
+        if not fields:
+            yield file_columns + ('', '', '', '', '', '', error)
+            continue
+        for field_key, field_data in fields.items():
+            if not isinstance(field_data, dict):
+                field_data = {'value': field_data}
+            messages = [validation.get('message') for validation in field_data.get('validations') or [] if isinstance(validation, dict) and validation.get('message')]
+            yield file_columns + (str(field_key), _text(field_data.get('value')), _text(field_data.get('ai_confidence')), _text(field_data.get('adjusted_confidence')), _text(field_data.get('field_validation_status')), '. '.join(messages), error)
+
+def iter_export_chunks(results: Mapping[str, Any], file_ids: Optional[Iterable[str]]=None, chunk_size: int=DEFAULT_CHUNK_SIZE) -> Iterator[List[Tuple[str, ...]]]:
+    """
+    Yield the export rows in lists of at most chunk_size rows.
+
+    Args:
+        results: File ID to result data
+        file_ids: File IDs to export (or None for all results)
+        chunk_size: Maximum rows per chunk
+
+    Yields:
+        list: Rows (see iter_export_rows)
+    """
+    chunk = []
+    for row in iter_export_rows(results, file_ids):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def export_csv(results: Mapping[str, Any], destination: Destination, file_ids: Optional[Iterable[str]]=None, chunk_size: int=DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Write results to a UTF-8 CSV file.
+
+    Args:
+        results: File ID to result data
+        destination: File path or binary file object
+        file_ids: File IDs to export (or None for all results)
+        chunk_size: Rows written per chunk
+
+    Returns:
+        int: Number of rows written (without the header)
+    """
+    is_path = isinstance(destination, (str, os.PathLike))
+    stream = open(destination, 'w', newline='', encoding='utf-8') if is_path else io.TextIOWrapper(destination, encoding='utf-8', newline='')
+    rows = 0
+    try:
+        writer = csv.writer(stream)
+        writer.writerow(EXPORT_COLUMNS)
+        for chunk in iter_export_chunks(results, file_ids, chunk_size):
+            writer.writerows([[_spreadsheet_cell(value) for value in row] for row in chunk])
+            rows += len(chunk)
+    finally:
+        if is_path:
+            stream.close()
+        else:
+            # Leave the caller's binary stream open
+            stream.flush()
+            stream.detach()
+    return rows
+
+def export_xlsx(results: Mapping[str, Any], destination: Destination, file_ids: Optional[Iterable[str]]=None, chunk_size: int=DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Write results to an Excel workbook with openpyxl's write-only mode.
+    Rows beyond a sheet's capacity continue on further sheets.
+
+    Args:
+        results: File ID to result data
+        destination: File path or binary file object
+        file_ids: File IDs to export (or None for all results)
+        chunk_size: Rows appended per chunk
+
+    Returns:
+        int: Number of rows written (without headers)
+
+    Raises:
+        ImportError: If openpyxl is not installed
+    """
+    if not openpyxl_available:
+        raise ImportError('The openpyxl package is required for Excel export (pip install openpyxl)')
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet, sheet_rows, rows = (None, 0, 0)
+    for chunk in iter_export_chunks(results, file_ids, chunk_size):
+        for row in chunk:
+            if sheet is None or sheet_rows >= XLSX_MAX_ROWS:
+                sheet = workbook.create_sheet('Results' if sheet is None else f'Results {len(workbook.worksheets) + 1}')
+                sheet.append(EXPORT_COLUMNS)
+                sheet_rows = 0
+            sheet.append([_xlsx_cell(value) for value in row])
+            sheet_rows += 1
+        rows += len(chunk)
+    if sheet is None:
+        workbook.create_sheet('Results').append(EXPORT_COLUMNS)
+    workbook.save(destination)
+    return rows
+
+def export_parquet(results: Mapping[str, Any], destination: Destination, file_ids: Optional[Iterable[str]]=None, chunk_size: int=DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Write results to a Parquet file, one row group per chunk.
+
+    Args:
+        results: File ID to result data
+        destination: File path or binary file object
+        file_ids: File IDs to export (or None for all results)
+        chunk_size: Rows per row group
+
+    Returns:
+        int: Number of rows written
+
+    Raises:
+        ImportError: If pyarrow is not installed
+    """
+    if not pyarrow_available:
+        raise ImportError('The pyarrow package is required for Parquet export (pip install pyarrow)')
+    schema = pa.schema([(column, pa.string()) for column in EXPORT_COLUMNS])
+    rows = 0
+    with pq.ParquetWriter(destination, schema) as writer:
+        for chunk in iter_export_chunks(results, file_ids, chunk_size):
+            columns = list(zip(*chunk))
+            writer.write_table(pa.Table.from_arrays([pa.array(column, type=pa.string()) for column in columns], schema=schema))
+            rows += len(chunk)
+    return rows
+_EXPORTERS = {'csv': export_csv, 'xlsx': export_xlsx, 'parquet': export_parquet}
+
+def export_results(results: Mapping[str, Any], destination: Destination, export_format: Optional[str]=None, file_ids: Optional[Iterable[str]]=None, chunk_size: int=DEFAULT_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Export results in a format given explicitly or by the destination's extension.
+
+    Args:
+        results: File ID to result data
+        destination: File path or binary file object
+        export_format: 'csv', 'xlsx' or 'parquet' (required for file objects)
+        file_ids: File IDs to export (or None for all results)
+        chunk_size: Rows per chunk
+
+    Returns:
+        dict: format and rows written
+
+    Raises:
+        ValueError: If the format is unknown
+        ImportError: If the format's optional package is not installed
+    """
+    if export_format is None and isinstance(destination, (str, os.PathLike)):
+        export_format = EXPORT_FORMATS.get(os.path.splitext(str(destination))[1].lower())
+    if export_format not in _EXPORTERS:
+        raise ValueError(f"Unknown export format {export_format!r} (expected one of {', '.join(_EXPORTERS)})")
+    rows = _EXPORTERS[export_format](results, destination, file_ids, chunk_size)
+    logger.info(f'Exported {rows} result rows as {export_format}')
+    return {'format': export_format, 'rows': rows}
+
+def export_to_bytes(results: Mapping[str, Any], export_format: str, file_ids: Optional[Iterable[str]]=None, chunk_size: int=DEFAULT_CHUNK_SIZE) -> bytes:
+    """
+    Export results into memory (for Streamlit download buttons).
+
+    Args:
+        results: File ID to result data
+        export_format: 'csv', 'xlsx' or 'parquet'
+        file_ids: File IDs to export (or None for all results)
+        chunk_size: Rows per chunk
+
+    Returns:
+        bytes: Encoded export file
+    """
+    buffer = io.BytesIO()
+    export_results(results, buffer, export_format, file_ids, chunk_size)
+    return buffer.getvalue()
+
+def main(argv: Optional[List[str]]=None) -> None:
+    """Command-line entry point for `python -m modules.result_export`."""
+    parser = argparse.ArgumentParser(description='Export extraction results to CSV, Excel or Parquet.')
+    parser.add_argument('source', help='JSON file with a file ID -> result mapping (the extraction_results format)')
+    parser.add_argument('destination', help='Output file (.csv, .xlsx or .parquet)')
+    parser.add_argument('--format', choices=sorted(_EXPORTERS), default=None, help='Output format (default: from the destination extension)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows written per chunk')
+    args = parser.parse_args(argv)
+    with open(args.source, 'r', encoding='utf-8') as f:
+        results = json.load(f)
+    summary = export_results(results, args.destination, args.format, chunk_size=args.chunk_size)
+    print(f"Exported {summary['rows']} rows to {args.destination}")
+if __name__ == '__main__':
+    main()
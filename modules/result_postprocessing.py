@@ -0,0 +1,255 @@
+"""
+CPU-bound post-processing of Box AI extraction results.
+This module holds the pure-Python work that runs after the AI call for each
+file (validation, confidence adjustment and UI-shape building). Everything here
+is free of Streamlit session state so it can run inside worker processes via
+BatchProcessor's process-pool mode. postprocess_tasks() runs small chunks
+inline and hands chunks of PROCESS_POOL_THRESHOLD or more files to the pool;
+submit_postprocessing() and collect_postprocessing() post-process files one
+at a time in the shared process pool while further extractions run.
+"""
+import json
+import logging
+from datetime import datetime
+import concurrent.futures
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional
+from modules.batch_processing import BatchProcessor, get_cpu_pool, reset_cpu_pool
+from modules.validation_engine import Validator, ConfidenceAdjuster
+logger = logging.getLogger(__name__)
+_worker_validator: Optional[Validator] = None
+_worker_confidence_adjuster: Optional[ConfidenceAdjuster] = None
+# Below this many files, starting worker processes costs more than it saves
+PROCESS_POOL_THRESHOLD = 50
+
+@dataclass
+class PostProcessingTask:
+    """
+    Picklable description of the post-processing work for one file.
+    """
+    file_id: str
+    file_name: str
+    extracted_metadata: Dict[str, Any]
+    template_id: Optional[str] = None
+    doc_category: Optional[str] = None
+    document_type: Optional[str] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+def build_adjuster_input(extracted_metadata: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+    """
+    Restructure a flat AI response into the {key: {value, confidence}} form used by ConfidenceAdjuster.
+
+    Args:
+        extracted_metadata: Flat AI response with `<key>_confidence` companions
+
+    Returns:
+        dict: Data for ConfidenceAdjuster.adjust_confidence
+    """
+    data_for_adjuster = {}
+    if isinstance(extracted_metadata, dict):
+        for field_key, field_value in extracted_metadata.items():
+            if not field_key.endswith('_confidence'):
+                confidence_str = str(extracted_metadata.get(f'{field_key}_confidence', 'Low'))
+                if not confidence_str:
+                    confidence_str = 'Low'
+                data_for_adjuster[field_key] = {'value': str(field_value), 'confidence': confidence_str}
+    return data_for_adjuster
+
+def build_ui_fields(extracted_metadata: Dict[str, Any], validation_output: Dict[str, Any], confidence_output: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Build the per-field structure stored in extraction_results and shown in the results viewer.
+
+    Args:
+        extracted_metadata: Flat AI response
+        validation_output: Output of Validator.validate
+        confidence_output: Output of ConfidenceAdjuster.adjust_confidence
+
+    Returns:
+        dict: Field key to UI field data
+    """
+    extraction_output = extracted_metadata if isinstance(extracted_metadata, dict) else {}
+    field_validations = validation_output.get('field_validations', {})
+    fields = {}
+    for field_key, raw_field_value in extraction_output.items():
+        if field_key.startswith('_'):
+            continue
+        value_str = str(raw_field_value)
+        if field_key.endswith('_confidence'):
+            ai_confidence = value_str if value_str else 'Low'
+            adjusted_qualitative = ai_confidence
+            if ai_confidence == 'High':
+                adjusted_numeric = 0.9
+            elif ai_confidence == 'Medium':
+                adjusted_numeric = 0.5
+            elif ai_confidence == 'Low':
+                adjusted_numeric = 0.1
+            else:
+                logger.warning(f"Unexpected AI confidence string for _confidence field {field_key}: '{ai_confidence}'. Defaulting adjusted to Low (0.1).")
+                adjusted_qualitative = 'Low'
+                adjusted_numeric = 0.1
+        else:
+            ai_confidence = str(extraction_output.get(f'{field_key}_confidence', 'Low'))
+            if not ai_confidence:
+                ai_confidence = 'Low'
+            adjusted_details = confidence_output.get(field_key, {})
+            adjusted_qualitative = adjusted_details.get('confidence_qualitative', 'Low')
+            adjusted_numeric = adjusted_details.get('confidence', 0.0)
+        validation_details = field_validations.get(field_key, {})
+        validation_status = validation_details.get('status', 'skip')
+        fields[field_key] = {'value': value_str, 'ai_confidence': ai_confidence, 'adjusted_confidence': adjusted_qualitative, 'field_validation_status': validation_status.lower(), 'validations': [{'rule_type': 'field_validation', 'status': validation_status, 'message': '. '.join(validation_details.get('messages', [])), 'confidence_impact': adjusted_numeric}]}
+    return fields
+
+def build_structured_result(task: PostProcessingTask, validator: Optional[Validator]=None, confidence_adjuster: Optional[ConfidenceAdjuster]=None) -> Dict[str, Any]:
+    """
+    Validate, adjust confidence and build the extraction_results entry for one file.
+
+    Args:
+        task: Post-processing task for the file
+        validator: Validator to use (or None for a per-process instance)
+        confidence_adjuster: ConfidenceAdjuster to use (or None for a per-process instance)
+
+    Returns:
+        dict: Result data in the extraction_results format
+    """
+    if validator is None or confidence_adjuster is None:
+        default_validator, default_adjuster = _get_worker_components()
+        validator = validator or default_validator
+        confidence_adjuster = confidence_adjuster or default_adjuster
+    extracted_metadata = task.extracted_metadata
+    logger.info(f'Validating with template_id={task.template_id}, doc_category={task.doc_category}')
+    validation_output = validator.validate(ai_response=extracted_metadata, doc_type=None, doc_category=task.doc_category, template_id=task.template_id)
+    logger.info(f'File {task.file_name} ({task.file_id}): Validation output for confidence adjustment: {json.dumps(validation_output, indent=2)}')
+    data_for_adjuster = build_adjuster_input(extracted_metadata)
+    confidence_output = confidence_adjuster.adjust_confidence(data_for_adjuster, validation_output)
+    logger.info(f'File {task.file_name} ({task.file_id}): Adjusted confidence output from adjuster: {json.dumps(confidence_output, indent=2)}')
+    overall_status_info = confidence_adjuster.get_overall_document_status(confidence_output, validation_output)
+    mandatory_check = validation_output.get('mandatory_check', {})
+    return {'file_name': task.file_name, 'document_type': task.document_type, 'template_id_used_for_extraction': task.template_id, 'fields': build_ui_fields(extracted_metadata, validation_output, confidence_output), 'document_validation_summary': {'mandatory_fields_status': mandatory_check.get('status', 'fail').lower(), 'missing_mandatory_fields': mandatory_check.get('missing_fields', []), 'cross_field_status': overall_status_info.get('cross_field_status', 'pass').lower(), 'overall_document_confidence_suggestion': overall_status_info.get('status', 'Low')}, 'raw_ai_response': extracted_metadata, 'data_sent_to_adjuster': data_for_adjuster, 'confidence_adjuster_output': confidence_output, 'validation_output': validation_output}
+
+def build_error_result(task: PostProcessingTask, error: Exception) -> Dict[str, Any]:
+    """
+    Build the extraction_results entry for a file whose post-processing failed.
+
+    Args:
+        task: Post-processing task for the file
+        error: Error raised while post-processing
+
+    Returns:
+        dict: Result data with the raw values, an 'error' key and failed validation summary
+    """
+    raw_data = task.extracted_metadata if isinstance(task.extracted_metadata, dict) else {}
+    fields = {}
+    for field_key, value in raw_data.items():
+        field_value = value.get('value', value) if isinstance(value, dict) else value
+        fields[field_key] = {'value': field_value, 'ai_confidence': 'Low', 'adjusted_confidence': 'Low', 'field_validation_status': 'skip', 'validations': [{'rule_type': 'field_validation', 'status': 'error', 'message': f'Processing error: {str(error)}', 'confidence_impact': 0.0}]}
+    return {'file_name': task.file_name, 'file_id': task.file_id, 'document_type': task.document_type, 'template_id_used_for_extraction': task.template_id, 'extraction_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'), 'processing_mode': 'structured', 'raw_extraction': raw_data, 'error': str(error), 'fields': fields, 'document_validation_summary': {'mandatory_fields_status': 'fail', 'missing_mandatory_fields': [], 'cross_field_status': 'fail', 'overall_document_confidence_suggestion': 'Low'}, 'raw_ai_response': raw_data}
+
+def run_postprocessing_task(task: PostProcessingTask) -> Dict[str, Any]:
+    """
+    Process-pool entry point for a single post-processing task.
+
+    Args:
+        task: Post-processing task for the file
+
+    Returns:
+        dict: Result data in the extraction_results format
+    """
+    return build_structured_result(task)
+
+def postprocess_batch(tasks: List[PostProcessingTask], use_processes: bool=True, max_workers: Optional[int]=None, batch_size: int=50) -> Dict[str, Dict[str, Any]]:
+    """
+    Post-process many files, optionally spreading the work across processes.
+
+    Args:
+        tasks: Post-processing tasks
+        use_processes: Whether to run in a process pool instead of threads
+        max_workers: Maximum workers (or None for the executor default)
+        batch_size: Number of tasks submitted per batch
+
+    Returns:
+        dict: File ID to result data in task order; failed tasks map to build_error_result() data
+    """
+    processor = BatchProcessor(max_workers=max_workers or 4, batch_size=batch_size, executor_type='process' if use_processes else 'thread')
+    results = {}
+    for task, result, error in processor.process_batch(tasks, run_postprocessing_task):
+        if error is not None:
+            logger.error(f'Post-processing failed for {task.file_name} ({task.file_id}): {str(error)}')
+            results[task.file_id] = build_error_result(task, error)
+        else:
+            results[task.file_id] = result
+    # Workers finish in any order; keep the order of the tasks
+    return {task.file_id: results[task.file_id] for task in tasks if task.file_id in results}
+
+def postprocess_tasks(tasks: List[PostProcessingTask], validator: Optional[Validator]=None, confidence_adjuster: Optional[ConfidenceAdjuster]=None, process_threshold: int=PROCESS_POOL_THRESHOLD, max_workers: Optional[int]=None) -> Dict[str, Dict[str, Any]]:
+    """
+    Post-process a chunk of files, in a process pool when the chunk is large enough.
+
+    Args:
+        tasks: Post-processing tasks
+        validator: Validator for inline processing (or None for a per-process instance)
+        confidence_adjuster: ConfidenceAdjuster for inline processing (or None for a per-process instance)
+        process_threshold: Minimum number of tasks that are spread across processes
+        max_workers: Maximum worker processes (or None for the default)
+
+    Returns:
+        dict: File ID to result data; failed tasks map to build_error_result() data
+    """
+    if len(tasks) >= process_threshold:
+        logger.info(f'Post-processing {len(tasks)} files in a process pool')
+        return postprocess_batch(tasks, use_processes=True, max_workers=max_workers)
+    results = {}
+    for task in tasks:
+        try:
+            results[task.file_id] = build_structured_result(task, validator=validator, confidence_adjuster=confidence_adjuster)
+        except Exception as e:
+            logger.error(f'Post-processing failed for {task.file_name} ({task.file_id}): {str(e)}')
+            results[task.file_id] = build_error_result(task, e)
+    return results
+
+def submit_postprocessing(task: PostProcessingTask) -> concurrent.futures.Future:
+    """
+    Start post-processing a file in the shared process pool.
+
+    Args:
+        task: Post-processing task for the file
+
+    Returns:
+        Future: Future of the result data (see collect_postprocessing)
+    """
+    return get_cpu_pool().submit(run_postprocessing_task, task)
+
+def collect_postprocessing(pending: Dict[concurrent.futures.Future, PostProcessingTask], wait: bool=False) -> Dict[str, Dict[str, Any]]:
+    """
+    Collect the results of submitted post-processing tasks, removing them from pending.
+
+    Args:
+        pending: Future to task for submitted tasks
+        wait: Wait for all tasks instead of collecting only the finished ones
+
+    Returns:
+        dict: File ID to result data in submission order; failed tasks map to build_error_result() data
+    """
+    futures = list(pending) if wait else [future for future in pending if future.done()]
+    results = {}
+    for future in futures:
+        task = pending.pop(future)
+        try:
+            results[task.file_id] = future.result()
+        except concurrent.futures.process.BrokenProcessPool as e:
+            # A dead worker takes the pool down with it; finish the file here and start a new pool next time
+            logger.warning(f'Process pool broke while post-processing {task.file_name} ({task.file_id}): {str(e)}. Running it inline')
+            reset_cpu_pool()
+            results.update(postprocess_tasks([task], process_threshold=2))
+        except Exception as e:
+            logger.error(f'Post-processing failed for {task.file_name} ({task.file_id}): {str(e)}')
+            results[task.file_id] = build_error_result(task, e)
+    return results
+
+def _get_worker_components():
+    """Get the Validator and ConfidenceAdjuster owned by the current process."""
+    global _worker_validator, _worker_confidence_adjuster
+    if _worker_validator is None:
+        _worker_validator = Validator()
+    if _worker_confidence_adjuster is None:
+        _worker_confidence_adjuster = ConfidenceAdjuster()
+    return (_worker_validator, _worker_confidence_adjuster)
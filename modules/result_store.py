@@ -0,0 +1,379 @@
+"""
+Columnar store for extraction results.
+This module keeps extraction results in flat, typed columns: one row per
+file-field, with categorical codes for confidences and validation statuses,
+instead of a nested dict per file and field. ExtractionResultStore still
+behaves like the file ID -> result dict mapping that the pipeline writes and
+the apply step reads, and additionally serves cached DataFrame views that the
+results viewer can use without walking every result on each rerun. A store
+backed by a RunStore writes each result through to the run's database and
+keeps only the columns and document summaries in memory; full results are
+read back from the database when they are requested.
+"""
+import logging
+import threading
+from array import array
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from modules.result_postprocessing import build_adjuster_input
+from modules.run_store import RunStore
+
+logger = logging.getLogger(__name__)
+FIELD_COLUMNS = ['file_id', 'file_name', 'field_key', 'value', 'ai_confidence', 'adjusted_confidence', 'validation_status', 'message', 'confidence_impact']
+FILE_COLUMNS = ['file_id', 'file_name', 'document_type', 'template_id', 'overall_status', 'mandatory_status', 'cross_field_status', 'num_fields', 'has_error']
+_DERIVED_ADJUSTER_INPUT = '_derived_adjuster_input'
+_CANONICAL_FIELD_KEYS = frozenset(('value', 'ai_confidence', 'adjusted_confidence', 'field_validation_status', 'validations'))
+# Keys kept in memory for results that are persisted in a run store (enough for files_frame)
+_SUMMARY_KEYS = ('file_name', 'document_type', 'template_id_used_for_extraction', 'document_validation_summary', 'error')
+
+def _to_numpy(column: array, dtype) -> np.ndarray:
+    """Copy an array column into a NumPy array (a copy, so the column can keep growing)."""
+    return np.frombuffer(column, dtype=dtype).copy() if len(column) else np.zeros(0, dtype=dtype)
+
+class _Categories:
+    """Dictionary encoding of the distinct strings in a column."""
+
+    def __init__(self, initial: Tuple[str, ...]=()):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+        for value in initial:
+            self.code(value)
+
+    def code(self, value: str) -> int:
+        """Get the code of a value, adding it if it is new."""
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+def _canonical_field(field_data: Any) -> Optional[Tuple[str, str, str, str, str, float]]:
+    """
+    Split a field in the build_ui_fields shape into column values.
+
+    Returns:
+        tuple: (value, ai_confidence, adjusted_confidence, validation_status, message, confidence_impact),
+            or None if the field has another shape and must be stored as is
+    """
+    if not isinstance(field_data, dict) or field_data.keys() != _CANONICAL_FIELD_KEYS:
+        return None
+    validations = field_data['validations']
+    if not isinstance(validations, list) or len(validations) != 1 or not isinstance(validations[0], dict):
+        return None
+    validation = validations[0]
+    if validation.keys() != {'rule_type', 'status', 'message', 'confidence_impact'} or validation['rule_type'] != 'field_validation':
+        return None
+    columns = (field_data['value'], field_data['ai_confidence'], field_data['adjusted_confidence'], field_data['field_validation_status'], validation['message'])
+    if not all((isinstance(column, str) for column in columns)) or validation['status'] != field_data['field_validation_status']:
+        return None
+    if not isinstance(validation['confidence_impact'], (int, float)) or isinstance(validation['confidence_impact'], bool):
+        return None
+    return (*columns, float(validation['confidence_impact']))
+
+class ExtractionResultStore(MutableMapping):
+    """
+    Extraction results of a run, stored column by column.
+    Setting a file's result appends its fields as rows; replacing or deleting
+    it marks the old rows dead (they are compacted away once they outnumber
+    the live rows). Reading a file's result rebuilds the nested dict, so
+    changes to a returned dict must be written back with store[file_id] = result.
+    """
+
+    def __init__(self, results: Optional[Dict[str, Dict[str, Any]]]=None, run_store: Optional[RunStore]=None, run_id: Optional[str]=None, owner: Optional[str]=None):
+        """
+        Initialize the store.
+
+        Args:
+            results: Initial file ID to result mapping
+            run_store: RunStore that results are written through to (or None to keep them in memory only)
+            run_id: Run the results belong to (required with run_store)
+            owner: Box user ID stored as the run's owner when results are written (if the run has none yet)
+        """
+        if run_store is not None and not run_id:
+            raise ValueError('A run_id is required for a store backed by a run store')
+        self.run_store = run_store
+        self.run_id = run_id
+        self.owner = owner
+        self.lock = threading.RLock()
+        self.version = 0
+        self._views: Dict[str, Tuple[int, pd.DataFrame]] = {}
+        self._file_index: Dict[str, int] = {}
+        self._file_info: List[Any] = []
+        self._file_ranges: List[Tuple[int, int]] = []
+        self._file_columnar: List[bool] = []
+        self._file_persisted: List[bool] = []
+        self._field_keys = _Categories()
+        self._confidences = _Categories(('High', 'Medium', 'Low'))
+        self._statuses = _Categories(('pass', 'fail', 'error', 'skip'))
+        self._reset_field_columns()
+        if results:
+            self.update(results)
+
+    def _reset_field_columns(self) -> None:
+        """Create empty field columns."""
+        self._row_key = array('i')
+        self._row_ai_confidence = array('h')
+        self._row_adjusted_confidence = array('h')
+        self._row_status = array('h')
+        self._row_impact = array('d')
+        self._row_value: List[str] = []
+        self._row_message: List[str] = []
+        self._row_extra: Dict[int, Any] = {}
+        self._live_rows = 0
+
+    def __len__(self) -> int:
+        return len(self._file_index)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._file_index))
+
+    def __contains__(self, file_id: object) -> bool:
+        return file_id in self._file_index
+
+    @classmethod
+    def from_run(cls, run_store: RunStore, run_id: str, owner: Optional[str]=None) -> 'ExtractionResultStore':
+        """
+        Load the results of a stored run (e.g. after a session timeout).
+
+        Args:
+            run_store: RunStore with the run
+            run_id: Run ID
+            owner: Box user ID of the run's owner
+
+        Returns:
+            ExtractionResultStore: Store backed by the run, with the run's results
+        """
+        store = cls(run_store=run_store, run_id=run_id, owner=owner)
+        with store.lock:
+            for file_id, result in run_store.iter_results(run_id):
+                store._set_local(file_id, result, True)
+            store.version += 1
+        logger.info(f'Loaded {len(store)} results of run {run_id}')
+        return store
+
+    def __getitem__(self, file_id: str) -> Dict[str, Any]:
+        with self.lock:
+            file_row = self._file_index[file_id]
+            if self._file_persisted[file_row]:
+                result = self.run_store.get_result(self.run_id, file_id)
+                if result is not None:
+                    return result
+                logger.warning(f'Result of file {file_id} is missing from run {self.run_id}; returning the in-memory summary')
+            if not self._file_columnar[file_row]:
+                return self._file_info[file_row]
+            result = dict(self._file_info[file_row])
+            if result.pop(_DERIVED_ADJUSTER_INPUT, False):
+                result['data_sent_to_adjuster'] = build_adjuster_input(result.get('raw_ai_response'))
+            result['fields'] = self._build_fields(*self._file_ranges[file_row])
+            return result
+
+    def __setitem__(self, file_id: str, result: Dict[str, Any]) -> None:
+        with self.lock:
+            persisted = self._persist({file_id: result})
+            self._set_local(file_id, result, persisted)
+            self.version += 1
+
+    def _persist(self, results: Dict[str, Any]) -> bool:
+        """Write results through to the run store; returns whether they were saved."""
+        if self.run_store is None:
+            return False
+        try:
+            self.run_store.save_results(self.run_id, results, self.owner)
+            return True
+        except Exception as e:
+            # The results stay complete in memory, so nothing is lost for this session
+            logger.error(f'Error saving {len(results)} results to run {self.run_id}: {e}')
+            return False
+
+    def _set_local(self, file_id: str, result: Dict[str, Any], persisted: bool) -> None:
+        """Store a result's columns and the rest of its data (or only its summary if it was persisted)."""
+        with self.lock:
+            if file_id in self._file_index:
+                # The file keeps its position in the iteration order, like in a dict
+                self._drop_rows(self._file_index[file_id])
+            # Results without a fields dict (e.g. unexpected shapes) are kept as they are
+            columnar = isinstance(result, dict) and isinstance(result.get('fields'), dict)
+            start = len(self._row_key)
+            if columnar:
+                self._append_fields(result['fields'])
+            self._file_index[file_id] = len(self._file_info)
+            info = result
+            if columnar and persisted:
+                info = {key: result[key] for key in _SUMMARY_KEYS if key in result}
+            elif columnar:
+                info = {key: value for key, value in result.items() if key != 'fields'}
+                # The adjuster input is derived from the raw AI response, so it is only kept when it differs
+                if 'data_sent_to_adjuster' in info and info['data_sent_to_adjuster'] == build_adjuster_input(info.get('raw_ai_response')):
+                    del info['data_sent_to_adjuster']
+                    info[_DERIVED_ADJUSTER_INPUT] = True
+            self._file_info.append(info)
+            self._file_ranges.append((start, len(self._row_key)))
+            self._file_columnar.append(columnar)
+            self._file_persisted.append(persisted)
+            self._compact_if_needed()
+
+    def __delitem__(self, file_id: str) -> None:
+        with self.lock:
+            if file_id not in self._file_index:
+                raise KeyError(file_id)
+            self._drop_rows(self._file_index.pop(file_id))
+            self._compact_if_needed()
+            if self.run_store is not None:
+                try:
+                    self.run_store.delete_result(self.run_id, file_id)
+                except Exception as e:
+                    logger.error(f'Error deleting result of file {file_id} from run {self.run_id}: {e}')
+            self.version += 1
+
+    def _append_fields(self, fields: Dict[str, Any]) -> None:
+        """Append a file's fields as rows."""
+        for field_key, field_data in fields.items():
+            row = len(self._row_key)
+            self._row_key.append(self._field_keys.code(field_key))
+            canonical = _canonical_field(field_data)
+            if canonical is None:
+                # Fields in other shapes are kept as is (and still get a row for the views)
+                self._row_extra[row] = field_data
+                details = field_data if isinstance(field_data, dict) else {'value': field_data}
+                canonical = (str(details.get('value', '')), str(details.get('ai_confidence', '')), str(details.get('adjusted_confidence', '')), str(details.get('field_validation_status', '')), '', 0.0)
+            value, ai_confidence, adjusted_confidence, status, message, impact = canonical
+            self._row_value.append(value)
+            self._row_ai_confidence.append(self._confidences.code(ai_confidence))
+            self._row_adjusted_confidence.append(self._confidences.code(adjusted_confidence))
+            self._row_status.append(self._statuses.code(status))
+            self._row_message.append(message)
+            self._row_impact.append(impact)
+        self._live_rows += len(fields)
+
+    def _build_fields(self, start: int, end: int) -> Dict[str, Any]:
+        """Rebuild the nested fields dict of a file from its rows."""
+        fields = {}
+        confidences, statuses = (self._confidences.values, self._statuses.values)
+        for row in range(start, end):
+            field_key = self._field_keys.values[self._row_key[row]]
+            if row in self._row_extra:
+                fields[field_key] = self._row_extra[row]
+                continue
+            status = statuses[self._row_status[row]]
+            fields[field_key] = {'value': self._row_value[row], 'ai_confidence': confidences[self._row_ai_confidence[row]], 'adjusted_confidence': confidences[self._row_adjusted_confidence[row]], 'field_validation_status': status, 'validations': [{'rule_type': 'field_validation', 'status': status, 'message': self._row_message[row], 'confidence_impact': self._row_impact[row]}]}
+        return fields
+
+    def _drop_rows(self, file_row: int) -> None:
+        """Mark a file's rows dead until the next compaction."""
+        start, end = self._file_ranges[file_row]
+        self._file_info[file_row] = None
+        self._live_rows -= end - start
+
+    def _compact_if_needed(self) -> None:
+        """Compact the columns once the dead rows outnumber the live rows."""
+        if len(self._row_key) - self._live_rows > max(self._live_rows, 1024):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Rewrite the columns without the rows of replaced and deleted files, in iteration order."""
+        file_index, file_info, file_ranges, file_columnar, file_persisted = (self._file_index, self._file_info, self._file_ranges, self._file_columnar, self._file_persisted)
+        keys, ai_confidences, adjusted_confidences, statuses, impacts, values, messages, extras = (self._row_key, self._row_ai_confidence, self._row_adjusted_confidence, self._row_status, self._row_impact, self._row_value, self._row_message, self._row_extra)
+        self._file_index, self._file_info, self._file_ranges, self._file_columnar, self._file_persisted = ({}, [], [], [], [])
+        self._reset_field_columns()
+        for file_id, file_row in file_index.items():
+            info = file_info[file_row]
+            start, end = file_ranges[file_row]
+            new_start = len(self._row_key)
+            for row in range(start, end):
+                if row in extras:
+                    self._row_extra[new_start + row - start] = extras[row]
+            self._row_key.extend(keys[start:end])
+            self._row_ai_confidence.extend(ai_confidences[start:end])
+            self._row_adjusted_confidence.extend(adjusted_confidences[start:end])
+            self._row_status.extend(statuses[start:end])
+            self._row_impact.extend(impacts[start:end])
+            self._row_value.extend(values[start:end])
+            self._row_message.extend(messages[start:end])
+            self._live_rows += end - start
+            self._file_index[file_id] = len(self._file_info)
+            self._file_info.append(info)
+            self._file_ranges.append((new_start, len(self._row_key)))
+            self._file_columnar.append(file_columnar[file_row])
+            self._file_persisted.append(file_persisted[file_row])
+        logger.info(f'Compacted extraction result store to {len(self._file_info)} files and {self._live_rows} field rows')
+
+    def add_results(self, results: Dict[str, Dict[str, Any]]) -> None:
+        """
+        Append the results of several files (the pipeline's append API).
+        A backed store writes them to the run store in one transaction.
+
+        Args:
+            results: File ID to result data in the extraction_results format
+        """
+        with self.lock:
+            persisted = self._persist(results)
+            for file_id, result in results.items():
+                self._set_local(file_id, result, persisted)
+            self.version += 1
+
+    def _cached_view(self, name: str, build) -> pd.DataFrame:
+        """Get a view, rebuilding it only after the store changed."""
+        with self.lock:
+            cached = self._views.get(name)
+            if cached is None or cached[0] != self.version:
+                cached = (self.version, build())
+                self._views[name] = cached
+            return cached[1]
+
+    def fields_frame(self) -> pd.DataFrame:
+        """
+        Get one row per file-field with categorical confidence and status columns.
+        The frame is cached until the store changes; treat it as read-only.
+
+        Returns:
+            DataFrame: Columns of FIELD_COLUMNS
+        """
+        return self._cached_view('fields', self._build_fields_frame)
+
+    def _build_fields_frame(self) -> pd.DataFrame:
+        file_rows = list(self._file_index.values())
+        lengths = np.array([self._file_ranges[file_row][1] - self._file_ranges[file_row][0] for file_row in file_rows], dtype=np.int64)
+        # Rows of replaced files sit after the rest, so the live rows are gathered in iteration order
+        starts = np.array([self._file_ranges[file_row][0] for file_row in file_rows], dtype=np.int64)
+        offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths) if len(file_rows) else np.zeros(0, dtype=np.int64)
+        rows = np.arange(len(offsets), dtype=np.int64) + offsets
+        file_codes = np.repeat(np.arange(len(file_rows), dtype=np.int32), lengths)
+        file_names = np.array([str(self._file_info[file_row].get('file_name', 'Unknown')) if isinstance(self._file_info[file_row], dict) else 'Unknown' for file_row in file_rows], dtype=object)
+        return pd.DataFrame({
+            'file_id': pd.Categorical.from_codes(file_codes, categories=pd.Index(list(self._file_index), dtype=object)),
+            'file_name': pd.Categorical(file_names[file_codes]),
+            'field_key': pd.Categorical.from_codes(_to_numpy(self._row_key, np.int32)[rows], categories=pd.Index(self._field_keys.values, dtype=object)),
+            'value': pd.array(np.array(self._row_value, dtype=object)[rows], dtype='string'),
+            'ai_confidence': pd.Categorical.from_codes(_to_numpy(self._row_ai_confidence, np.int16)[rows], categories=pd.Index(self._confidences.values, dtype=object)),
+            'adjusted_confidence': pd.Categorical.from_codes(_to_numpy(self._row_adjusted_confidence, np.int16)[rows], categories=pd.Index(self._confidences.values, dtype=object)),
+            'validation_status': pd.Categorical.from_codes(_to_numpy(self._row_status, np.int16)[rows], categories=pd.Index(self._statuses.values, dtype=object)),
+            'message': pd.array(np.array(self._row_message, dtype=object)[rows], dtype='string'),
+            'confidence_impact': _to_numpy(self._row_impact, np.float64)[rows]
+        }, columns=FIELD_COLUMNS)
+
+    def files_frame(self) -> pd.DataFrame:
+        """
+        Get one row per file with its document-level summary.
+        The frame is cached until the store changes; treat it as read-only.
+
+        Returns:
+            DataFrame: Columns of FILE_COLUMNS, indexed by position
+        """
+        return self._cached_view('files', self._build_files_frame)
+
+    def _build_files_frame(self) -> pd.DataFrame:
+        records = []
+        for file_id, file_row in self._file_index.items():
+            info = self._file_info[file_row]
+            info = info if isinstance(info, dict) else {}
+            summary = info.get('document_validation_summary') or {}
+            start, end = self._file_ranges[file_row]
+            records.append((file_id, info.get('file_name', 'Unknown'), info.get('document_type'), info.get('template_id_used_for_extraction'), summary.get('overall_document_confidence_suggestion', 'N/A'), summary.get('mandatory_fields_status', 'N/A'), summary.get('cross_field_status', 'N/A'), end - start, 'error' in info))
+        frame = pd.DataFrame.from_records(records, columns=FILE_COLUMNS)
+        for column in ('document_type', 'template_id', 'overall_status', 'mandatory_status', 'cross_field_status'):
+            frame[column] = frame[column].astype('category')
+        return frame
@@ -0,0 +1,191 @@
+"""
+Filtered and paginated views over stored extraction results.
+This module turns an ExtractionResultStore into the per-file summary shown by
+the results viewer (document status plus columns precomputed from the field
+rows, such as the lowest adjusted confidence), answers the viewer's filters
+with vectorized masks over the store's field frame, memoizes the filtered
+files per filter state and builds the wide results table only for the page
+that is displayed.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from modules.result_store import ExtractionResultStore
+
+logger = logging.getLogger(__name__)
+CONFIDENCE_RANKS = {'Low': 0, 'Medium': 1, 'High': 2}
+SUMMARY_COLUMNS = ['file_id', 'file_name', 'document_type', 'template_id', 'overall_status', 'mandatory_status', 'cross_field_status', 'num_fields', 'has_error', 'min_adjusted_confidence', 'failed_fields']
+TABLE_BASE_COLUMNS = ['File Name', 'File ID', 'Overall Doc Status', 'Min Adj. Conf.', 'Failed Fields', 'Mandatory Fields', 'Cross-field Valid.']
+
+def filter_key(name_filter: str, ai_confidences: Optional[Sequence[str]], adjusted_confidences: Optional[Sequence[str]], validation_statuses: Optional[Sequence[str]]) -> Tuple[Any, ...]:
+    """
+    Build the memoization key of a filter state.
+
+    Args:
+        name_filter: Case-insensitive file name substring
+        ai_confidences: AI confidences of which a file needs at least one field (empty for any)
+        adjusted_confidences: Adjusted confidences of which a file needs at least one field (empty for any)
+        validation_statuses: Field validation statuses of which a file needs at least one field (empty for any)
+
+    Returns:
+        tuple: Hashable key that is the same for equivalent filter states
+    """
+    return ((name_filter or '').lower(), tuple(sorted(set(ai_confidences or ()))), tuple(sorted(set(adjusted_confidences or ()))), tuple(sorted(set(validation_statuses or ()))))
+
+class ResultsView:
+    """
+    Cached per-file summary and filter results of an ExtractionResultStore.
+    The summary is rebuilt only when the store's version changes, and the
+    files matching a filter state are kept for the last few filter states.
+    """
+
+    def __init__(self, store: ExtractionResultStore, max_cached_filters: int=16):
+        """
+        Initialize the view.
+
+        Args:
+            store: Result store to view
+            max_cached_filters: Number of filter states whose results are kept
+        """
+        self.store = store
+        self.max_cached_filters = max_cached_filters
+        self.lock = threading.RLock()
+        self._version = None
+        self._summary: Optional[pd.DataFrame] = None
+        self._names_lower: Optional[pd.Series] = None
+        self._row_files: Optional[np.ndarray] = None
+        self._filtered: 'OrderedDict[Tuple[Any, ...], pd.DataFrame]' = OrderedDict()
+
+    def _refresh(self) -> None:
+        """Rebuild the summary if the store changed since it was built."""
+        if self._version == self.store.version and self._summary is not None:
+            return
+        version = self.store.version
+        files = self.store.files_frame()
+        fields = self.store.fields_frame()
+        file_count = len(files)
+        row_files = fields['file_id'].cat.codes.to_numpy()
+        # Per-file columns are aggregated over the field rows once per store version
+        ranks = np.array([CONFIDENCE_RANKS.get(category, np.nan) for category in fields['adjusted_confidence'].cat.categories], dtype=np.float64)
+        row_ranks = ranks[fields['adjusted_confidence'].cat.codes.to_numpy()] if len(ranks) else np.zeros(0)
+        min_ranks = np.full(file_count, np.inf)
+        np.fmin.at(min_ranks, row_files, row_ranks)
+        labels = np.array(sorted(CONFIDENCE_RANKS, key=CONFIDENCE_RANKS.get) + ['N/A'], dtype=object)
+        min_labels = labels[np.where(np.isfinite(min_ranks), min_ranks, len(CONFIDENCE_RANKS)).astype(np.int64)]
+        failed = np.bincount(row_files[(fields['validation_status'] == 'fail').to_numpy()], minlength=file_count)
+        summary = files.copy()
+        summary['min_adjusted_confidence'] = pd.Categorical(min_labels, categories=labels)
+        summary['failed_fields'] = failed[:file_count]
+        self._summary = summary[SUMMARY_COLUMNS]
+        self._names_lower = summary['file_name'].astype(str).str.lower()
+        self._row_files = row_files
+        self._filtered.clear()
+        self._version = version
+        logger.info(f'Built results summary for {file_count} files and {len(fields)} field rows (store version {version})')
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Get one row per stored file with its document status and precomputed field aggregates.
+
+        Returns:
+            DataFrame: Columns of SUMMARY_COLUMNS; the index is the file's position in the store
+        """
+        with self.lock:
+            self._refresh()
+            return self._summary
+
+    def _any_field_in(self, column: str, selection: Tuple[str, ...]) -> np.ndarray:
+        """Get which files have at least one field whose column value is in the selection."""
+        codes = self.store.fields_frame()[column]
+        selected_codes = [code for code, category in enumerate(codes.cat.categories) if category in selection]
+        row_match = np.isin(codes.cat.codes.to_numpy(), selected_codes)
+        file_match = np.zeros(len(self._summary), dtype=bool)
+        file_match[self._row_files[row_match]] = True
+        return file_match
+
+    def filter(self, name_filter: str='', ai_confidences: Optional[Sequence[str]]=None, adjusted_confidences: Optional[Sequence[str]]=None, validation_statuses: Optional[Sequence[str]]=None) -> pd.DataFrame:
+        """
+        Get the summary rows of the files matching a filter state.
+        An empty selection matches every file, like in the results viewer.
+
+        Args:
+            name_filter: Case-insensitive file name substring
+            ai_confidences: AI confidences of which a file needs at least one field
+            adjusted_confidences: Adjusted confidences of which a file needs at least one field
+            validation_statuses: Field validation statuses of which a file needs at least one field
+
+        Returns:
+            DataFrame: Matching rows of summary() (cached per filter state; treat it as read-only)
+        """
+        key = filter_key(name_filter, ai_confidences, adjusted_confidences, validation_statuses)
+        with self.lock:
+            self._refresh()
+            cached = self._filtered.get(key)
+            if cached is not None:
+                self._filtered.move_to_end(key)
+                return cached
+            name_lower, ai_selection, adjusted_selection, status_selection = key
+            mask = np.ones(len(self._summary), dtype=bool)
+            if name_lower:
+                mask &= self._names_lower.str.contains(name_lower, regex=False).to_numpy(dtype=bool)
+            for column, selection in (('ai_confidence', ai_selection), ('adjusted_confidence', adjusted_selection), ('validation_status', status_selection)):
+                if selection:
+                    mask &= self._any_field_in(column, selection)
+            filtered = self._summary[mask]
+            self._filtered[key] = filtered
+            if len(self._filtered) > self.max_cached_filters:
+                self._filtered.popitem(last=False)
+            return filtered
+
+    def page_count(self, filtered: pd.DataFrame, page_size: int) -> int:
+        """
+        Get the number of pages of a filter result.
+
+        Args:
+            filtered: Output of filter()
+            page_size: Files per page
+
+        Returns:
+            int: Number of pages (at least 1)
+        """
+        return max(1, -(-len(filtered) // max(1, page_size)))
+
+    def page_table(self, filtered: pd.DataFrame, page: int, page_size: int) -> pd.DataFrame:
+        """
+        Build the wide results table (one row per file, four columns per field) for one page.
+
+        Args:
+            filtered: Output of filter()
+            page: Zero-based page number (clamped to the last page)
+            page_size: Files per page
+
+        Returns:
+            DataFrame: Table with TABLE_BASE_COLUMNS and the field columns of the page's first file
+        """
+        page = min(max(0, page), self.page_count(filtered, page_size) - 1)
+        page_rows = filtered.iloc[page * page_size:(page + 1) * page_size]
+        table_rows: List[Dict[str, Any]] = []
+        field_keys: Optional[List[str]] = None
+        for file_id, file_name, overall_status, min_adjusted_confidence, failed_fields, mandatory_status, cross_field_status in zip(page_rows['file_id'], page_rows['file_name'], page_rows['overall_status'], page_rows['min_adjusted_confidence'], page_rows['failed_fields'], page_rows['mandatory_status'], page_rows['cross_field_status']):
+            row = {'File Name': file_name, 'File ID': file_id, 'Overall Doc Status': overall_status, 'Min Adj. Conf.': min_adjusted_confidence, 'Failed Fields': int(failed_fields), 'Mandatory Fields': mandatory_status, 'Cross-field Valid.': cross_field_status}
+            result_data = self.store.get(file_id)
+            fields = result_data.get('fields', {}) if isinstance(result_data, dict) else {}
+            if field_keys is None:
+                field_keys = sorted(fields)
+            for key, field_details in fields.items():
+                if not isinstance(field_details, dict):
+                    field_details = {'value': field_details}
+                row[key] = field_details.get('value', '')
+                row[f'{key} AI Conf.'] = field_details.get('ai_confidence', 'N/A')
+                row[f'{key} Valid. Status'] = field_details.get('field_validation_status', 'N/A')
+                row[f'{key} Adj. Conf.'] = field_details.get('adjusted_confidence', 'N/A')
+            table_rows.append(row)
+        columns = TABLE_BASE_COLUMNS[:]
+        for key in field_keys or []:
+            columns.extend([key, f'{key} AI Conf.', f'{key} Valid. Status', f'{key} Adj. Conf.'])
+        return pd.DataFrame(table_rows).reindex(columns=columns) if table_rows else pd.DataFrame(columns=columns)
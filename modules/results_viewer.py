@@ -1,11 +1,18 @@
 import streamlit as st
 import pandas as pd
-from typing import Dict, List, Any, Union # Added Union
+from typing import Dict, List, Any, Callable, Union # Added Union
 import json
 import logging
+from modules.result_store import ExtractionResultStore
+from modules.session_state_manager import create_extraction_results, get_session_user_id, restore_session_run
+from modules.run_store import get_run_store
+from modules.results_view import ResultsView
+from modules.result_export import export_to_bytes, openpyxl_available, pyarrow_available
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
+PAGE_SIZES = [25, 50, 100, 200]
+EXPORT_MIME_TYPES = {'csv': 'text/csv', 'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'parquet': 'application/vnd.apache.parquet'}
 
 def get_confidence_color(confidence_level):
     """Get color based on confidence level."""
@@ -18,6 +25,65 @@ def get_confidence_color(confidence_level):
     else:
         return 'gray'
 
+def style_confidence_and_status(val):
+    """Get the CSS color of a confidence or validation status cell."""
+    color = 'black' # Default color
+    if isinstance(val, str):
+        if val in ['High', 'Medium', 'Low']:
+            color = get_confidence_color(val)
+        elif val == 'pass':
+            color = 'green'
+        elif val == 'fail':
+            color = 'red'
+        elif val == 'error':
+            color = 'purple' # Or some other distinct color for error
+        elif val == 'skip':
+            color = 'grey'
+    return f'color: {color}'
+
+def style_table(df: pd.DataFrame, subset: List[str]):
+    """Style the confidence and status columns of a results table page."""
+    styler = df.style
+    # Styler.applymap was renamed to Styler.map in pandas 2.1
+    style_cells = styler.map if hasattr(styler, 'map') else styler.applymap
+    return style_cells(style_confidence_and_status, subset=subset)
+
+def make_export(results: ExtractionResultStore, export_format: str, file_ids: List[str]) -> Callable[[], bytes]:
+    """
+    Create the deferred data of an export download button.
+
+    Args:
+        results: Extraction results to export
+        export_format: 'csv', 'xlsx' or 'parquet'
+        file_ids: File IDs to export
+
+    Returns:
+        callable: Function building the export file when the download is clicked
+    """
+    def build_export() -> bytes:
+        try:
+            return export_to_bytes(results, export_format, file_ids)
+        except Exception as e:
+            logger.error(f'Error exporting results as {export_format}: {e}')
+            raise
+    return build_export
+
+def get_results_view(store: ExtractionResultStore) -> ResultsView:
+    """
+    Get the session's view of a result store, creating it if the store was replaced.
+
+    Args:
+        store: Current extraction_results store
+
+    Returns:
+        ResultsView: View whose summary and filter results are cached across reruns
+    """
+    results_view = st.session_state.get('results_view')
+    if results_view is None or results_view.store is not store:
+        results_view = ResultsView(store)
+        st.session_state.results_view = results_view
+    return results_view
+
 def view_results():
     """
     View and manage extraction results.
@@ -33,7 +99,7 @@ def view_results():
         return
 
     if not hasattr(st.session_state, 'extraction_results'):
-        st.session_state.extraction_results = {}
+        st.session_state.extraction_results = create_extraction_results()
         logger.info('Initialized extraction_results in view_results')
 
     if not hasattr(st.session_state, 'selected_result_ids'):
@@ -58,6 +124,22 @@ def view_results():
         if st.button('Go to Process Files', key='go_to_process_files_btn_vr'):
             st.session_state.current_page = 'Process Files'
             st.rerun()
+        # Runs are stored as they are processed, so results of an expired session can be reopened
+        try:
+            user_id = get_session_user_id()
+            stored_runs = [run for run in get_run_store().list_runs(user_id) if run['num_results'] > 0] if user_id else []
+        except Exception as e:
+            logger.error(f'Error listing stored runs: {e}')
+            stored_runs = []
+        if stored_runs:
+            st.subheader('Restore a Previous Run')
+            run_labels = {f"{run['run_id']} ({run['num_results']} results, {run['num_categorizations']} categorizations)": run['run_id'] for run in stored_runs}
+            selected_run_label = st.selectbox('Stored runs', options=list(run_labels), key='restore_run_select_vr')
+            if st.button('Restore Run', key='restore_run_btn_vr'):
+                if restore_session_run(run_labels[selected_run_label]):
+                    st.rerun()
+                else:
+                    st.error('The run could not be restored.')
         return
 
     st.write('Review and manage the metadata extraction results.')
@@ -89,160 +171,62 @@ def view_results():
     with row2_filter_col2:
         st.session_state.validation_status_filter_selection = st.multiselect('Filter by Field Validation Status', options=['pass', 'fail', 'error', 'skip'], default=['pass', 'fail', 'error', 'skip'], key='validation_status_filter_multiselect_vr') # Default to all
 
-    processed_and_filtered_results = {}
-    # The st.session_state.extraction_results structure is now assumed to be:
-    # file_id: {
-    #     "file_name": str,
-    #     "document_type": str,
-    #     "template_id_used_for_extraction": str,
-    #     "fields": {
-    #         field_key: {
-    #             "value": any,
-    #             "ai_confidence": str, # Original from Box AI
-    #             "validations": list_of_validation_details, # From validation_engine
-    #             "field_validation_status": str, # Overall for this field (pass/fail/error)
-    #             "adjusted_confidence": str, # After validation
-    #             "is_mandatory": bool,
-    #             "is_present": bool
-    #         }
-    #     },
-    #     "document_validation_summary": { # From validation_engine
-    #         "mandatory_fields_status": str,
-    #         "missing_mandatory_fields": list_of_str,
-    #         "cross_field_status": str,
-    #         "cross_field_results": list_of_cross_field_validation_details,
-    #         "overall_document_confidence_suggestion": str
-    #     },
-    #     "raw_ai_response": dict # The original full response from Box AI if needed
-    # }
-
-    for file_id, result_data_for_file in st.session_state.extraction_results.items():
-        if not isinstance(result_data_for_file, dict): # Skip if data is not in expected format
-            logger.warning(f"Skipping file_id {file_id} in results_viewer due to unexpected data format: {type(result_data_for_file)}")
-            continue
-
-        file_name = result_data_for_file.get('file_name', 'Unknown')
-        fields_data = result_data_for_file.get('fields', {})
-
-        # Apply filters
-        name_match = st.session_state.results_filter_text.lower() in file_name.lower()
-        
-        ai_confidence_match = False
-        if not st.session_state.confidence_filter_selection:
-            ai_confidence_match = True
-        else:
-            for field_detail in fields_data.values():
-                if field_detail.get('ai_confidence') in st.session_state.confidence_filter_selection:
-                    ai_confidence_match = True
-                    break
-        
-        adj_confidence_match = False
-        if not st.session_state.adjusted_confidence_filter_selection:
-            adj_confidence_match = True
-        else:
-            for field_detail in fields_data.values():
-                if field_detail.get('adjusted_confidence') in st.session_state.adjusted_confidence_filter_selection:
-                    adj_confidence_match = True
-                    break
-
-        validation_status_match = False
-        if not st.session_state.validation_status_filter_selection:
-            validation_status_match = True
-        else:
-            for field_detail in fields_data.values():
-                if field_detail.get('field_validation_status') in st.session_state.validation_status_filter_selection:
-                    validation_status_match = True
-                    break
-        
-        if name_match and ai_confidence_match and adj_confidence_match and validation_status_match:
-            processed_and_filtered_results[file_id] = result_data_for_file
-
-    # Prepare data for DataFrame
-    table_data_for_df = []
-    for file_id, data_item in processed_and_filtered_results.items():
-        row = {'File Name': data_item.get('file_name', 'Unknown'), 'File ID': file_id}
-        doc_summary = data_item.get('document_validation_summary', {})
-        row['Overall Doc Status'] = doc_summary.get('overall_document_confidence_suggestion', 'N/A') # Example of doc level info
-        row['Mandatory Fields'] = doc_summary.get('mandatory_fields_status', 'N/A')
-        row['Cross-field Valid.'] = doc_summary.get('cross_field_status', 'N/A')
-
-        fields_in_item = data_item.get('fields', {})
-        for key, field_details in fields_in_item.items():
-            row[key] = field_details.get('value', '')
-            row[f'{key} AI Conf.'] = field_details.get('ai_confidence', 'N/A')
-            row[f'{key} Valid. Status'] = field_details.get('field_validation_status', 'N/A')
-            row[f'{key} Adj. Conf.'] = field_details.get('adjusted_confidence', 'N/A')
-        table_data_for_df.append(row)
-    
-    df_results = pd.DataFrame(table_data_for_df)
-
-    if not df_results.empty:
-        base_cols = ['File Name', 'File ID', 'Overall Doc Status', 'Mandatory Fields', 'Cross-field Valid.']
-        
-        # Dynamically get field names from the first data item if possible, to create sorted field columns
-        field_cols_sorted = []
-        if processed_and_filtered_results:
-            first_item_fields = list(list(processed_and_filtered_results.values())[0].get('fields', {}).keys())
-            field_cols_sorted = sorted(first_item_fields)
-        
-        # Construct the final column order
-        final_ordered_cols = base_cols[:]
-        for field_name_key in field_cols_sorted:
-            final_ordered_cols.append(field_name_key) # Value
-            final_ordered_cols.append(f'{field_name_key} AI Conf.')
-            final_ordered_cols.append(f'{field_name_key} Valid. Status')
-            final_ordered_cols.append(f'{field_name_key} Adj. Conf.')
-        
-        # Filter df_results to only include columns that actually exist to prevent KeyError
-        existing_cols_in_df = [col for col in final_ordered_cols if col in df_results.columns]
-        df_results = df_results[existing_cols_in_df]
+    # Non-store results (e.g. restored from an older session) are moved into a store once
+    if not isinstance(st.session_state.extraction_results, ExtractionResultStore):
+        st.session_state.extraction_results = ExtractionResultStore(dict(st.session_state.extraction_results))
+    results_view = get_results_view(st.session_state.extraction_results)
+    # Filtered files are memoized per filter state, so reruns that keep the filters reuse them
+    filtered_files = results_view.filter(
+        st.session_state.results_filter_text,
+        st.session_state.confidence_filter_selection,
+        st.session_state.adjusted_confidence_filter_selection,
+        st.session_state.validation_status_filter_selection
+    )
+    filtered_file_ids = filtered_files['file_id'].tolist()
+
+    if not hasattr(st.session_state, 'results_page_size'):
+        st.session_state.results_page_size = 50
+    if not hasattr(st.session_state, 'results_page'):
+        st.session_state.results_page = 1
 
     st.subheader('Extraction Results')
     tab_table, tab_detailed = st.tabs(['Table View', 'Detailed View'])
 
     with tab_table:
-        st.write(f'Showing {len(df_results)} of {len(st.session_state.extraction_results)} results based on filters.')
+        page_col1, page_col2 = st.columns(2)
+        with page_col1:
+            st.session_state.results_page_size = st.selectbox('Files per page', options=PAGE_SIZES, index=PAGE_SIZES.index(st.session_state.results_page_size) if st.session_state.results_page_size in PAGE_SIZES else 1, key='page_size_select_vr')
+        page_count = results_view.page_count(filtered_files, st.session_state.results_page_size)
+        with page_col2:
+            st.session_state.results_page = st.number_input(f'Page (of {page_count})', min_value=1, max_value=page_count, value=min(st.session_state.results_page, page_count), step=1, key='page_number_input_vr')
+        # Only the displayed page is turned into the wide table and styled
+        df_results = results_view.page_table(filtered_files, st.session_state.results_page - 1, st.session_state.results_page_size)
+        st.write(f'Showing {len(df_results)} of {len(filtered_files)} filtered results ({len(st.session_state.extraction_results)} total).')
         if not df_results.empty:
-            # Define a function for styling
-            def style_confidence_and_status(val):
-                color = 'black' # Default color
-                if isinstance(val, str):
-                    if val in ['High', 'Medium', 'Low']:
-                        color = get_confidence_color(val)
-                    elif val == 'pass':
-                        color = 'green'
-                    elif val == 'fail':
-                        color = 'red'
-                    elif val == 'error':
-                        color = 'purple' # Or some other distinct color for error
-                    elif val == 'skip':
-                        color = 'grey'
-                return f'color: {color}'
-
-            st.dataframe(df_results.style.applymap(
-                style_confidence_and_status, 
-                subset=[col for col in df_results.columns if col.endswith(' AI Conf.') or col.endswith(' Adj. Conf.') or col.endswith(' Valid. Status') or col in ['Overall Doc Status', 'Mandatory Fields', 'Cross-field Valid.']]
-            ), use_container_width=True, hide_index=True)
+            st.dataframe(style_table(df_results, [col for col in df_results.columns if col.endswith(' AI Conf.') or col.endswith(' Adj. Conf.') or col.endswith(' Valid. Status') or col in ['Overall Doc Status', 'Min Adj. Conf.', 'Mandatory Fields', 'Cross-field Valid.']]), use_container_width=True, hide_index=True)
             
-            # Export buttons (functionality not fully implemented here)
+            # Exports cover all filtered files and are only built when requested
+            export_formats = {'CSV': 'csv'}
+            if openpyxl_available:
+                export_formats['Excel'] = 'xlsx'
+            if pyarrow_available:
+                export_formats['Parquet'] = 'parquet'
             col_export1, col_export2 = st.columns(2)
             with col_export1:
-                if st.button('Export as CSV', use_container_width=True, key='export_csv_btn_vr'):
-                    st.info('CSV export would be implemented here.') 
+                export_label = st.selectbox('Export format', options=list(export_formats), key='export_format_select_vr')
             with col_export2:
-                if st.button('Export as Excel', use_container_width=True, key='export_excel_btn_vr'):
-                    st.info('Excel export would be implemented here.')
+                export_format = export_formats[export_label]
+                # The export is built when the button is clicked, from the filters shown now, and is not kept in the session
+                st.download_button(f'Download {export_format.upper()} ({len(filtered_file_ids)} files)', data=make_export(st.session_state.extraction_results, export_format, list(filtered_file_ids)), file_name=f'extraction_results.{export_format}', mime=EXPORT_MIME_TYPES[export_format], use_container_width=True, key='download_export_btn_vr')
         else:
             st.info('No results match the current filter criteria.')
 
     with tab_detailed:
-        if not processed_and_filtered_results:
+        if df_results.empty:
             st.info('No results to display based on current filters.')
         else:
-            detailed_view_file_options = {
-                result_item.get('file_name', 'Unknown File'): file_id 
-                for file_id, result_item in processed_and_filtered_results.items()
-            }
+            # Details are offered for the files on the current table page
+            detailed_view_file_options = dict(zip(df_results['File Name'], df_results['File ID']))
             selected_file_name_for_detail = st.selectbox(
                 'Select a file to view details:', 
                 options=list(detailed_view_file_options.keys()),
@@ -251,7 +235,7 @@ def view_results():
 
             if selected_file_name_for_detail:
                 selected_file_id_for_detail = detailed_view_file_options[selected_file_name_for_detail]
-                detailed_data = processed_and_filtered_results[selected_file_id_for_detail]
+                detailed_data = st.session_state.extraction_results[selected_file_id_for_detail]
                 
                 st.write(f"**File Name:** {detailed_data.get('file_name', 'N/A')}")
                 st.write(f"**File ID:** {selected_file_id_for_detail}")
@@ -300,14 +284,14 @@ def view_results():
     col_select_all, col_deselect_all = st.columns(2)
     with col_select_all:
         if st.button('Select All Displayed', use_container_width=True, key='select_all_btn_vr'):
-            st.session_state.selected_result_ids = list(processed_and_filtered_results.keys())
+            st.session_state.selected_result_ids = filtered_file_ids
             st.rerun()
     with col_deselect_all:
         if st.button('Deselect All', use_container_width=True, key='deselect_all_btn_vr'):
             st.session_state.selected_result_ids = []
             st.rerun()
     
-    st.write(f"Selected {len(st.session_state.selected_result_ids)} of {len(processed_and_filtered_results)} displayed results for metadata application.")
+    st.write(f"Selected {len(st.session_state.selected_result_ids)} of {len(filtered_file_ids)} displayed results for metadata application.")
 
     if st.button('Apply Metadata', use_container_width=True, key='apply_metadata_btn_vr'):
         if not st.session_state.selected_result_ids:
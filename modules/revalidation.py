@@ -0,0 +1,179 @@
+"""
+Re-validation of stored extraction results after validation rules change.
+This module compares the previous and the new validation rules per template,
+re-runs only the field rules (and the mandatory check) that changed over the
+raw AI responses stored in extraction_results, recomputes the confidence
+adjustment and updates the results in place. No Box AI calls are made.
+The results of a template are validated together with batch_validation's
+vectorized validate_frame.
+"""
+import json
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+from modules.validation_engine import ValidationRuleLoader, ValidationPlan, ConfidenceAdjuster
+from modules.result_postprocessing import build_adjuster_input, build_ui_fields
+from modules.batch_validation import build_key_positions, build_value_frame, validate_frame
+
+logger = logging.getLogger(__name__)
+
+def _field_rules_by_key(template_rules: Dict[str, Any]) -> Dict[Any, str]:
+    """Get the serialized rule definitions of each field key (duplicate keys are kept in order)."""
+    field_rules: Dict[Any, List[Any]] = {}
+    for field_def in template_rules.get("fields", []):
+        field_rules.setdefault(field_def.get("key"), []).append(field_def.get("rules", []))
+    return {field_key: json.dumps(rules, sort_keys=True, default=str) for field_key, rules in field_rules.items()}
+
+def diff_template_rules(old_template_rules: Dict[str, Any], new_template_rules: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Find what changed between two versions of a template's rules.
+
+    Args:
+        old_template_rules: Previous dictionary with fields and mandatory_fields
+        new_template_rules: New dictionary with fields and mandatory_fields
+
+    Returns:
+        dict: changed_fields (field keys whose rules were added, removed or edited) and mandatory_changed
+    """
+    old_fields = _field_rules_by_key(old_template_rules)
+    new_fields = _field_rules_by_key(new_template_rules)
+    changed_fields = [field_key for field_key in list(old_fields) + [key for key in new_fields if key not in old_fields] if old_fields.get(field_key) != new_fields.get(field_key)]
+    mandatory_changed = list(old_template_rules.get("mandatory_fields", [])) != list(new_template_rules.get("mandatory_fields", []))
+    return {"changed_fields": changed_fields, "mandatory_changed": mandatory_changed}
+
+def _has_previous_output(result_data: Dict[str, Any]) -> bool:
+    """Whether a result still has the validation output that partial re-validation merges into."""
+    previous_output = result_data.get("validation_output")
+    return isinstance(previous_output, dict) and isinstance(previous_output.get("field_validations"), dict)
+
+def _changed_rules(new_template_rules: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, Any]:
+    """Get the part of a template's new rules that has to be run again."""
+    return {
+        "fields": [field_def for field_def in new_template_rules.get("fields", []) if field_def.get("key") in set(changes["changed_fields"])],
+        "mandatory_fields": new_template_rules.get("mandatory_fields", []) if changes["mandatory_changed"] else []
+    }
+
+def _merge_validation_output(previous_output: Dict[str, Any], partial_output: Dict[str, Any], changes: Dict[str, Any]) -> Dict[str, Any]:
+    """Replace the validations of the changed fields (and the mandatory check if it changed) in a previous validation output."""
+    changed_fields = set(changes["changed_fields"])
+    field_validations = {field_key: validation for field_key, validation in previous_output["field_validations"].items() if field_key not in changed_fields}
+    field_validations.update(partial_output["field_validations"])
+    mandatory_check = partial_output["mandatory_check"] if changes["mandatory_changed"] else previous_output.get("mandatory_check", {})
+    return {"field_validations": field_validations, "mandatory_check": mandatory_check}
+
+def apply_validation_output(result_data: Dict[str, Any], validation_output: Dict[str, Any], confidence_adjuster: ConfidenceAdjuster) -> None:
+    """
+    Recompute the confidence adjustment and UI fields of a result from a new validation output.
+
+    Args:
+        result_data: extraction_results entry with raw_ai_response (updated in place)
+        validation_output: New validation output of the result
+        confidence_adjuster: ConfidenceAdjuster for the new confidence values
+    """
+    extracted_metadata = result_data["raw_ai_response"]
+    data_for_adjuster = result_data.get("data_sent_to_adjuster") or build_adjuster_input(extracted_metadata)
+    confidence_output = confidence_adjuster.adjust_confidence(data_for_adjuster, validation_output)
+    overall_status_info = confidence_adjuster.get_overall_document_status(confidence_output, validation_output)
+    mandatory_check = validation_output.get("mandatory_check", {})
+    result_data["fields"] = build_ui_fields(extracted_metadata, validation_output, confidence_output)
+    result_data["document_validation_summary"] = {
+        "mandatory_fields_status": mandatory_check.get("status", "fail").lower(),
+        "missing_mandatory_fields": mandatory_check.get("missing_fields", []),
+        "cross_field_status": overall_status_info.get("cross_field_status", "pass").lower(),
+        "overall_document_confidence_suggestion": overall_status_info.get("status", "Low")
+    }
+    result_data["data_sent_to_adjuster"] = data_for_adjuster
+    result_data["confidence_adjuster_output"] = confidence_output
+    result_data["validation_output"] = validation_output
+
+def can_revalidate(result_data: Any) -> bool:
+    """Whether a stored result has a raw AI response to re-validate."""
+    return isinstance(result_data, dict) and isinstance(result_data.get("raw_ai_response"), dict) and "error" not in result_data
+
+def revalidate_result(result_data: Dict[str, Any], new_template_rules: Dict[str, Any], changes: Dict[str, Any], confidence_adjuster: ConfidenceAdjuster) -> bool:
+    """
+    Re-validate one stored result and update it in place.
+
+    Only the changed fields are validated again when the result still has its
+    previous validation output; older results are validated in full.
+    revalidate_results validates many results at once instead.
+
+    Args:
+        result_data: extraction_results entry with raw_ai_response
+        new_template_rules: New rules of the result's template
+        changes: Output of diff_template_rules
+        confidence_adjuster: ConfidenceAdjuster for the new confidence values
+
+    Returns:
+        bool: Whether the result was updated
+    """
+    if not can_revalidate(result_data):
+        return False
+    extracted_metadata = result_data["raw_ai_response"]
+    if _has_previous_output(result_data):
+        partial_output = ValidationPlan(_changed_rules(new_template_rules, changes)).run(extracted_metadata)
+        validation_output = _merge_validation_output(result_data["validation_output"], partial_output, changes)
+    else:
+        validation_output = ValidationPlan(new_template_rules).run(extracted_metadata)
+    apply_validation_output(result_data, validation_output, confidence_adjuster)
+    return True
+
+def revalidate_results(
+    extraction_results: Dict[str, Dict[str, Any]],
+    old_rules: Dict[str, Any],
+    new_rules: Dict[str, Any],
+    confidence_adjuster: Optional[ConfidenceAdjuster] = None,
+    rules_config_path: str = "config/validation_rules.json"
+) -> Dict[str, Any]:
+    """
+    Re-validate the stored results whose template rules changed.
+
+    The results of each changed template are validated together: the changed
+    field rules over a value table of the results that still have their previous
+    validation output, and the full rules over the others. The new validations
+    are then merged into each result.
+
+    Args:
+        extraction_results: File ID to extraction_results entry (an ExtractionResultStore or dict; updated entries are written back)
+        old_rules: Validation rules before the change (validation_rules.json content)
+        new_rules: Validation rules after the change
+        confidence_adjuster: ConfidenceAdjuster to use (or None for a default one)
+        rules_config_path: Path of the rules file (used for logging only)
+
+    Returns:
+        dict: Summary with changed_templates, results_revalidated and fields_revalidated
+            (the number of field validations that were actually run again)
+    """
+    confidence_adjuster = confidence_adjuster or ConfidenceAdjuster()
+    old_loader = ValidationRuleLoader(rules_config_path, rules=old_rules or {})
+    new_loader = ValidationRuleLoader(rules_config_path, rules=new_rules or {})
+    results_by_template: Dict[Optional[str], List[Tuple[str, Dict[str, Any]]]] = {}
+    for file_id, result_data in extraction_results.items():
+        if isinstance(result_data, dict):
+            results_by_template.setdefault(result_data.get("template_id_used_for_extraction"), []).append((file_id, result_data))
+
+    summary = {"changed_templates": [], "results_revalidated": 0, "fields_revalidated": 0}
+    for template_id, template_results in results_by_template.items():
+        new_template_rules = new_loader.get_rules_for_category_template(None, template_id)
+        changes = diff_template_rules(old_loader.get_rules_for_category_template(None, template_id), new_template_rules)
+        if not changes["changed_fields"] and not changes["mandatory_changed"]:
+            continue
+        summary["changed_templates"].append(template_id)
+        template_results = [(file_id, result_data) for file_id, result_data in template_results if can_revalidate(result_data)]
+        partial = [(file_id, result_data) for file_id, result_data in template_results if _has_previous_output(result_data)]
+        full = [(file_id, result_data) for file_id, result_data in template_results if not _has_previous_output(result_data)]
+        for group, rules in ((partial, _changed_rules(new_template_rules, changes)), (full, new_template_rules)):
+            if not group:
+                continue
+            responses = {file_id: result_data["raw_ai_response"] for file_id, result_data in group}
+            outputs = validate_frame(build_value_frame(responses), rules, build_key_positions(responses))
+            for file_id, result_data in group:
+                output = outputs[str(file_id)]
+                validation_output = _merge_validation_output(result_data["validation_output"], output, changes) if group is partial else output
+                apply_validation_output(result_data, validation_output, confidence_adjuster)
+                # The result store hands out copies, so the updated entry is stored again
+                extraction_results[file_id] = result_data
+                summary["results_revalidated"] += 1
+                summary["fields_revalidated"] += len(output["field_validations"])
+    logger.info(f"Re-validated {summary['results_revalidated']} stored results ({summary['fields_revalidated']} field validations) for changed rules in {rules_config_path} (templates: {summary['changed_templates']})")
+    return summary
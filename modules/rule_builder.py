@@ -3,7 +3,7 @@ import pandas as pd
 import json
 import logging
 from typing import Dict, List, Any, Optional, Tuple
-from modules.validation_engine import ValidationRuleLoader
+from modules.validation_engine import get_rule_store
 from modules.metadata_template_retrieval import get_metadata_templates
 # Import the template-based rule functions
 from modules.category_template_rules import manage_template_rules, show_template_rule_overview, save_validation_rules
@@ -17,9 +17,9 @@ def initialize_rule_builder():
     """Initialize resources needed for the rule builder"""
     # Initialize rule loader
     if 'rule_loader' not in st.session_state:
-        st.session_state.rule_loader = ValidationRuleLoader(rules_config_path='config/validation_rules.json')
+        st.session_state.rule_loader = get_rule_store('config/validation_rules.json').snapshot()
         if hasattr(st.session_state.rule_loader, 'rules'):
-            st.session_state.validation_rules = st.session_state.rule_loader.rules
+            st.session_state.validation_rules = st.session_state.rule_loader.mutable_rules()
         else:
             st.session_state.validation_rules = {"template_rules": []}
     
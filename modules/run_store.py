@@ -0,0 +1,417 @@
+"""
+Persistent storage of processing runs.
+This module keeps the extraction and categorization results of each run in a
+local SQLite database, indexed by run, file ID, template, document type and
+status. The pipeline writes results one file at a time as they are produced,
+so a run survives session timeouts and restarts, and the results viewer and
+the apply step read results from it as they need them instead of holding
+every full result in session memory. Runs belong to the Box user who created
+them and are deleted after a retention period.
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import threading
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+logger = logging.getLogger(__name__)
+RUN_STORE_PATH_ENV = 'BOX_RUN_STORE_PATH'
+RUN_RETENTION_DAYS_ENV = 'BOX_RUN_RETENTION_DAYS'
+DEFAULT_RUN_RETENTION_DAYS = 30
+# Minimum seconds between retention purges of the global run store
+RUN_PURGE_INTERVAL = 3600.0
+_SCHEMA = """CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    metadata TEXT,
+    owner TEXT
+);
+CREATE TABLE IF NOT EXISTS run_results (
+    run_id TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    file_name TEXT,
+    template_id TEXT,
+    document_type TEXT,
+    status TEXT,
+    result TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run_id, file_id)
+);
+CREATE INDEX IF NOT EXISTS idx_run_results_template ON run_results (run_id, template_id);
+CREATE INDEX IF NOT EXISTS idx_run_results_status ON run_results (run_id, status);
+CREATE INDEX IF NOT EXISTS idx_run_results_file ON run_results (file_id);
+CREATE TABLE IF NOT EXISTS run_categorizations (
+    run_id TEXT NOT NULL,
+    file_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    document_type TEXT,
+    result TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run_id, file_id)
+);
+CREATE INDEX IF NOT EXISTS idx_run_categorizations_type ON run_categorizations (run_id, document_type);
+CREATE INDEX IF NOT EXISTS idx_run_categorizations_file ON run_categorizations (file_id);
+"""
+
+def new_run_id() -> str:
+    """
+    Create an ID for a new run.
+
+    Returns:
+        str: Run ID (sortable by creation time)
+    """
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+def _json_default(value: Any) -> Any:
+    # NumPy scalars (e.g. classifier probabilities) serialize as their Python values
+    return value.item() if hasattr(value, 'item') else str(value)
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, default=_json_default)
+
+def result_status(result: Any) -> str:
+    """
+    Get the status a result is indexed by.
+
+    Args:
+        result: Result data in the extraction_results format
+
+    Returns:
+        str: 'error' for failed files, otherwise the suggested document confidence (or 'unknown')
+    """
+    if not isinstance(result, dict):
+        return 'unknown'
+    if 'error' in result:
+        return 'error'
+    summary = result.get('document_validation_summary') or {}
+    return str(summary.get('overall_document_confidence_suggestion') or 'unknown')
+
+class RunStore:
+    """
+    SQLite-backed store of the results of processing runs.
+    """
+
+    def __init__(self, db_path: str='.cache/runs.db'):
+        """
+        Initialize the run store.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        conn.executescript(_SCHEMA)
+        # Databases created before runs had owners get the column added
+        if 'owner' not in {row['name'] for row in conn.execute('PRAGMA table_info(runs)')}:
+            conn.execute('ALTER TABLE runs ADD COLUMN owner TEXT')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_runs_owner ON runs (owner, updated_at)')
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get the SQLite connection for the current thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _write(self, statements: List[Tuple[str, Iterable[Tuple[Any, ...]]]], run_id: str, owner: Optional[str]=None) -> None:
+        """Run write statements in one transaction, creating the run row (and setting an unset owner) if needed."""
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute('INSERT INTO runs (run_id, created_at, updated_at, metadata, owner) VALUES (?, ?, ?, ?, ?) ON CONFLICT(run_id) DO UPDATE SET updated_at = excluded.updated_at, owner = COALESCE(runs.owner, excluded.owner)', (run_id, now, now, _dumps({}), owner))
+            for sql, rows in statements:
+                conn.executemany(sql, rows)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def create_run(self, run_id: Optional[str]=None, metadata: Optional[Dict[str, Any]]=None, owner: Optional[str]=None) -> str:
+        """
+        Create a run (or update an existing one).
+        The owner of a run is set once and never changed; check get_run_owner
+        to see whether an existing run belongs to the caller.
+
+        Args:
+            run_id: Run ID (or None for a new one)
+            metadata: JSON-serializable run metadata (e.g. the extraction settings), or None to keep the current metadata
+            owner: Box user ID of the run's owner
+
+        Returns:
+            str: Run ID
+        """
+        run_id = run_id or new_run_id()
+        now = time.time()
+        self._connection().execute('INSERT INTO runs (run_id, created_at, updated_at, metadata, owner) VALUES (?, ?, ?, ?, ?) ON CONFLICT(run_id) DO UPDATE SET updated_at = excluded.updated_at, metadata = COALESCE(excluded.metadata, runs.metadata), owner = COALESCE(runs.owner, excluded.owner)', (run_id, now, now, _dumps(metadata) if metadata is not None else None, owner))
+        return run_id
+
+    def get_run_owner(self, run_id: str) -> Optional[str]:
+        """
+        Get the owner of a run.
+
+        Args:
+            run_id: Run ID
+
+        Returns:
+            str: Box user ID of the owner, or None if the run doesn't exist or has no owner
+        """
+        row = self._connection().execute('SELECT owner FROM runs WHERE run_id = ?', (run_id,)).fetchone()
+        return row['owner'] if row is not None else None
+
+    def list_runs(self, owner: str, limit: int=50) -> List[Dict[str, Any]]:
+        """
+        List a user's most recently updated runs.
+        Runs without an owner are not listed for anyone.
+
+        Args:
+            owner: Box user ID of the runs' owner
+            limit: Maximum number of runs
+
+        Returns:
+            list: Runs with run_id, created_at, updated_at, metadata, owner, num_results and num_categorizations
+        """
+        rows = self._connection().execute('SELECT r.run_id, r.created_at, r.updated_at, r.metadata, r.owner, (SELECT COUNT(*) FROM run_results WHERE run_id = r.run_id) AS num_results, (SELECT COUNT(*) FROM run_categorizations WHERE run_id = r.run_id) AS num_categorizations FROM runs r WHERE r.owner = ? ORDER BY r.updated_at DESC LIMIT ?', (owner, limit)).fetchall()
+        return [dict(row, metadata=json.loads(row['metadata']) if row['metadata'] else {}) for row in rows]
+
+    def purge_runs(self, max_age: float) -> int:
+        """
+        Delete runs (with their results) that have not been updated for a while.
+
+        Args:
+            max_age: Maximum seconds since a run's last update
+
+        Returns:
+            int: Number of deleted runs
+        """
+        cutoff = time.time() - max_age
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            run_ids = [row['run_id'] for row in conn.execute('SELECT run_id FROM runs WHERE updated_at < ?', (cutoff,))]
+            for table in ('run_results', 'run_categorizations', 'runs'):
+                conn.executemany(f'DELETE FROM {table} WHERE run_id = ?', [(run_id,) for run_id in run_ids])
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        if run_ids:
+            logger.info(f'Purged {len(run_ids)} runs not updated for {max_age / 86400:.1f} days')
+        return len(run_ids)
+
+    def delete_run(self, run_id: str) -> None:
+        """
+        Delete a run and all of its results.
+
+        Args:
+            run_id: Run ID
+        """
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for table in ('run_results', 'run_categorizations', 'runs'):
+                conn.execute(f'DELETE FROM {table} WHERE run_id = ?', (run_id,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+    def save_results(self, run_id: str, results: Dict[str, Any], owner: Optional[str]=None) -> None:
+        """
+        Insert or update extraction results of a run in one transaction.
+
+        Args:
+            run_id: Run ID
+            results: File ID to result data in the extraction_results format
+            owner: Box user ID that becomes the run's owner if it has none yet
+        """
+        now = time.time()
+        rows = [(run_id, str(file_id), result.get('file_name') if isinstance(result, dict) else None, result.get('template_id_used_for_extraction') if isinstance(result, dict) else None, result.get('document_type') if isinstance(result, dict) else None, result_status(result), _dumps(result), now) for file_id, result in results.items()]
+        self._write([('INSERT INTO run_results (run_id, file_id, file_name, template_id, document_type, status, result, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(run_id, file_id) DO UPDATE SET file_name = excluded.file_name, template_id = excluded.template_id, document_type = excluded.document_type, status = excluded.status, result = excluded.result, updated_at = excluded.updated_at', rows)], run_id, owner)
+
+    def save_result(self, run_id: str, file_id: str, result: Any, owner: Optional[str]=None) -> None:
+        """
+        Insert or update one extraction result of a run.
+
+        Args:
+            run_id: Run ID
+            file_id: Box file ID
+            result: Result data in the extraction_results format
+            owner: Box user ID that becomes the run's owner if it has none yet
+        """
+        self.save_results(run_id, {file_id: result}, owner)
+
+    def delete_result(self, run_id: str, file_id: str) -> None:
+        """
+        Delete one extraction result of a run.
+
+        Args:
+            run_id: Run ID
+            file_id: Box file ID
+        """
+        self._connection().execute('DELETE FROM run_results WHERE run_id = ? AND file_id = ?', (run_id, str(file_id)))
+
+    def clear_results(self, run_id: str) -> None:
+        """
+        Delete all extraction results of a run (e.g. when processing starts over).
+
+        Args:
+            run_id: Run ID
+        """
+        self._connection().execute('DELETE FROM run_results WHERE run_id = ?', (run_id,))
+
+    def get_result(self, run_id: str, file_id: str) -> Optional[Any]:
+        """
+        Get one extraction result of a run.
+
+        Args:
+            run_id: Run ID
+            file_id: Box file ID
+
+        Returns:
+            Result data, or None if the run has no result for the file
+        """
+        row = self._connection().execute('SELECT result FROM run_results WHERE run_id = ? AND file_id = ?', (run_id, str(file_id))).fetchone()
+        return json.loads(row['result']) if row is not None else None
+
+    def _result_filter(self, run_id: str, template_id: Optional[str], status: Optional[str]) -> Tuple[str, List[Any]]:
+        where, params = ['run_id = ?'], [run_id]
+        if template_id is not None:
+            where.append('template_id = ?')
+            params.append(template_id)
+        if status is not None:
+            where.append('status = ?')
+            params.append(status)
+        return ' AND '.join(where), params
+
+    def list_result_ids(self, run_id: str, template_id: Optional[str]=None, status: Optional[str]=None) -> List[str]:
+        """
+        List the file IDs with results in a run, in the order they were first saved.
+
+        Args:
+            run_id: Run ID
+            template_id: Only files extracted with this template (or None for all)
+            status: Only files with this status (see result_status; or None for all)
+
+        Returns:
+            list: File IDs
+        """
+        where, params = self._result_filter(run_id, template_id, status)
+        return [row['file_id'] for row in self._connection().execute(f'SELECT file_id FROM run_results WHERE {where} ORDER BY rowid', params)]
+
+    def count_results(self, run_id: str, template_id: Optional[str]=None, status: Optional[str]=None) -> int:
+        """
+        Count the results of a run.
+
+        Args:
+            run_id: Run ID
+            template_id: Only files extracted with this template (or None for all)
+            status: Only files with this status (or None for all)
+
+        Returns:
+            int: Number of results
+        """
+        where, params = self._result_filter(run_id, template_id, status)
+        return self._connection().execute(f'SELECT COUNT(*) FROM run_results WHERE {where}', params).fetchone()[0]
+
+    def iter_results(self, run_id: str, template_id: Optional[str]=None, status: Optional[str]=None, batch_size: int=500) -> Iterator[Tuple[str, Any]]:
+        """
+        Iterate over the results of a run, reading them from the database in batches.
+
+        Args:
+            run_id: Run ID
+            template_id: Only files extracted with this template (or None for all)
+            status: Only files with this status (or None for all)
+            batch_size: Rows read per query
+
+        Yields:
+            tuple: (file ID, result data)
+        """
+        where, params = self._result_filter(run_id, template_id, status)
+        last_rowid = 0
+        while True:
+            rows = self._connection().execute(f'SELECT rowid, file_id, result FROM run_results WHERE {where} AND rowid > ? ORDER BY rowid LIMIT ?', params + [last_rowid, batch_size]).fetchall()
+            for row in rows:
+                yield (row['file_id'], json.loads(row['result']))
+            if len(rows) < batch_size:
+                return
+            last_rowid = rows[-1]['rowid']
+
+    def save_categorizations(self, run_id: str, results: List[Tuple[int, Dict[str, Any]]], owner: Optional[str]=None) -> None:
+        """
+        Insert or update categorization results of a run in one transaction.
+
+        Args:
+            run_id: Run ID
+            results: (position, categorization result with file_id) pairs
+            owner: Box user ID that becomes the run's owner if it has none yet
+        """
+        now = time.time()
+        rows = [(run_id, str(result.get('file_id')), position, result.get('document_type'), _dumps(result), now) for position, result in results]
+        self._write([('INSERT INTO run_categorizations (run_id, file_id, position, document_type, result, updated_at) VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT(run_id, file_id) DO UPDATE SET position = excluded.position, document_type = excluded.document_type, result = excluded.result, updated_at = excluded.updated_at', rows)], run_id, owner)
+
+    def delete_categorizations(self, run_id: str, file_ids: Optional[List[str]]=None) -> None:
+        """
+        Delete categorization results of a run.
+
+        Args:
+            run_id: Run ID
+            file_ids: File IDs whose results are deleted (or None for all)
+        """
+        conn = self._connection()
+        if file_ids is None:
+            conn.execute('DELETE FROM run_categorizations WHERE run_id = ?', (run_id,))
+        else:
+            conn.executemany('DELETE FROM run_categorizations WHERE run_id = ? AND file_id = ?', [(run_id, str(file_id)) for file_id in file_ids])
+
+    def get_categorizations(self, run_id: str, document_type: Optional[str]=None) -> List[Dict[str, Any]]:
+        """
+        Get the categorization results of a run in their original order.
+
+        Args:
+            run_id: Run ID
+            document_type: Only results of this document type (or None for all)
+
+        Returns:
+            list: Categorization results
+        """
+        rows = self._connection().execute('SELECT result FROM run_categorizations WHERE run_id = ? AND (? IS NULL OR document_type = ?) ORDER BY position', (run_id, document_type, document_type)).fetchall()
+        return [json.loads(row['result']) for row in rows]
+_run_store = None
+_run_store_lock = threading.Lock()
+_last_purge = 0.0
+
+def get_run_store() -> RunStore:
+    """
+    Get the global run store instance, creating it if necessary.
+    The database path can be set with the BOX_RUN_STORE_PATH environment variable.
+    At most once per RUN_PURGE_INTERVAL, runs older than BOX_RUN_RETENTION_DAYS
+    (default 30, 0 keeps runs forever) are deleted.
+
+    Returns:
+        RunStore: Global run store instance
+    """
+    global _run_store, _last_purge
+    with _run_store_lock:
+        if _run_store is None:
+            _run_store = RunStore(os.environ.get(RUN_STORE_PATH_ENV) or os.path.join('.cache', 'runs.db'))
+        if time.time() - _last_purge >= RUN_PURGE_INTERVAL:
+            _last_purge = time.time()
+            try:
+                retention_days = float(os.environ.get(RUN_RETENTION_DAYS_ENV) or DEFAULT_RUN_RETENTION_DAYS)
+                if retention_days > 0:
+                    _run_store.purge_runs(retention_days * 86400)
+            except Exception as e:
+                logger.error(f'Error purging old runs: {str(e)}')
+    return _run_store
@@ -6,21 +6,52 @@ import re
 import os
 import datetime
 import pandas as pd
-from typing import Dict, Any, List, Optional, Tuple
+from typing import Callable, Dict, Any, List, Optional, Tuple
 import uuid
 import time
+import concurrent.futures
+from modules.batch_processing import run_in_cpu_pool
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
+# Execution modes for sequential consensus
+EXECUTION_MODE_SEQUENTIAL = "sequential"
+EXECUTION_MODE_PARALLEL = "parallel"
+EXECUTION_MODE_SPECULATIVE = "speculative"
+EXECUTION_MODES = [EXECUTION_MODE_SEQUENTIAL, EXECUTION_MODE_PARALLEL, EXECUTION_MODE_SPECULATIVE]
+
+# Responses at least this long are parsed in the shared process pool instead of under the GIL
+PARSE_IN_PROCESS_MIN_CHARS = 8000
+
+def parse_response(parse_func: Callable[..., Dict[str, Any]], response_text: str, *args: Any) -> Dict[str, Any]:
+    """
+    Parse a model response with one of the parse_* functions.
+    Long responses are parsed in the shared process pool so that concurrent
+    categorizations don't serialize on the GIL; short ones are parsed inline,
+    where a round trip to another process would cost more than the parse.
+    
+    Args:
+        parse_func: parse_independent_response, parse_review_response or parse_arbitration_response
+        response_text: Response text from the AI model
+        *args: Remaining arguments of parse_func
+        
+    Returns:
+        Dictionary with parsed results
+    """
+    if len(response_text) >= PARSE_IN_PROCESS_MIN_CHARS:
+        return run_in_cpu_pool(parse_func, response_text, *args)
+    return parse_func(response_text, *args)
+
 def categorize_document_with_sequential_consensus(
     file_id: str, 
     model1: str, 
     model2: str, 
     model3: str, 
     document_types_with_desc: List[Dict[str, str]],
-    disagreement_threshold: float = 0.2
+    disagreement_threshold: float = 0.2,
+    execution_mode: str = EXECUTION_MODE_SEQUENTIAL
 ) -> Dict[str, Any]:
     """
     Perform document categorization using sequential consensus approach:
@@ -29,6 +60,12 @@ def categorize_document_with_sequential_consensus(
     3. Model 2 reviews both results only after forming its own opinion
     4. Model 3 arbitrates if there's significant disagreement
     
+    Steps 1 and 2 are independent by design. In "parallel" execution mode they run
+    concurrently (together with the document feature lookup). In "speculative" mode,
+    arbitration is additionally started alongside the review when Model 1 and Model 2's
+    independent results already disagree; its result is used only if the review keeps
+    Model 2's independent category, and it is discarded when no arbitration is needed.
+    
     Args:
         file_id: Box file ID
         model1: AI model for initial categorization
@@ -36,6 +73,7 @@ def categorize_document_with_sequential_consensus(
         model3: AI model for arbitration (used only when needed)
         document_types_with_desc: List of document types with descriptions
         disagreement_threshold: Threshold to trigger Model 3 arbitration
+        execution_mode: "sequential", "parallel" or "speculative"
         
     Returns:
         Dictionary with categorization results and consensus information
@@ -45,95 +83,124 @@ def categorize_document_with_sequential_consensus(
         categorize_document,
         extract_document_features,
         calculate_multi_factor_confidence,
-        apply_confidence_calibration
+        apply_confidence_calibration,
+        with_script_run_context
     )
     
-    logger.info(f"Starting sequential consensus categorization for file {file_id}")
-    
-    # Step 1: Initial categorization with Model 1
-    logger.info(f"Step 1: Initial categorization with {model1}")
-    model1_result = categorize_document(file_id, model1, document_types_with_desc)
-    model1_result["model_name"] = model1
-    
-    # Extract document features and calculate multi-factor confidence for Model 1
+    if execution_mode not in EXECUTION_MODES:
+        logger.warning(f"Unknown sequential consensus execution mode '{execution_mode}'. Using sequential.")
+        execution_mode = EXECUTION_MODE_SEQUENTIAL
+    logger.info(f"Starting sequential consensus categorization for file {file_id} ({execution_mode} execution)")
+    
+    def get_document_features():
+        try:
+            return extract_document_features(file_id)
+        except AttributeError as e:
+            logger.error(f"AttributeError extracting features in sequential_consensus for file {file_id}: {str(e)}. Using empty features.")
+            return {}
+        except Exception as e:
+            logger.error(f"Unexpected error extracting features in sequential_consensus for file {file_id}: {str(e)}. Using empty features.")
+            return {}
+    
+    executor = None
+    speculative_arbitration = None
     try:
-        document_features = extract_document_features(file_id)
-    except AttributeError as e:
-        logger.error(f"AttributeError extracting features in sequential_consensus for file {file_id}: {str(e)}. Using empty features.")
-        document_features = {}
-    except Exception as e:
-        logger.error(f"Unexpected error extracting features in sequential_consensus for file {file_id}: {str(e)}. Using empty features.")
-        document_features = {}
-
-    valid_categories = [dtype["name"] for dtype in document_types_with_desc]
-    
-    model1_multi_factor_confidence = calculate_multi_factor_confidence(
-        model1_result["confidence"],
-        document_features,
-        model1_result["document_type"],
-        model1_result.get("reasoning", ""),
-        valid_categories
-    )
-    model1_result["multi_factor_confidence"] = model1_multi_factor_confidence
-    model1_result["calibrated_confidence"] = apply_confidence_calibration(
-        model1_result["document_type"],
-        model1_multi_factor_confidence.get("overall", model1_result["confidence"])
-    )
-    
-    # Step 2: Completely independent assessment by Model 2 with no knowledge of Model 1's results
-    logger.info(f"Step 2A: Independent assessment by {model2} (no knowledge of Model 1's results)")
-    model2_independent_result = independent_categorization(file_id, model2, document_types_with_desc)
-    
-    # Step 2B: Only after independent assessment, Model 2 reviews both results
-    logger.info(f"Step 2B: Review by {model2} (after independent assessment)")
-    model2_result = review_categorization(
-        file_id, 
-        model2, 
-        model1_result, 
-        model2_independent_result, 
-        document_types_with_desc
-    )
-    model2_result["model_name"] = model2
-    
-    # Calculate agreement level and confidence
-    agreement_level, confidence_adjustment = calculate_agreement_confidence(model1_result, model2_result)
-    
-    # Determine if arbitration is needed
-    needs_arbitration = False
-    arbitration_reason = ""
-    
-    # Check for category disagreement
-    if model1_result["document_type"] != model2_result["document_type"]:
-        needs_arbitration = True
-        arbitration_reason = "Category disagreement"
-    
-    # Check for significant confidence difference
-    elif abs(model1_result["confidence"] - model2_result["confidence"]) > disagreement_threshold:
-        needs_arbitration = True
-        arbitration_reason = f"Confidence difference exceeds threshold ({disagreement_threshold})"
-    
-    # Step 3: Arbitration by Model 3 if needed
-    model3_result = {}
-    final_document_type = ""
-    final_confidence = 0.0
-    final_reasoning = ""
-    
-    if needs_arbitration:
-        logger.info(f"Step 3: Arbitration needed ({arbitration_reason}). Using {model3}")
-        model3_result = arbitrate_categorization(file_id, model3, model1_result, model2_result, document_types_with_desc)
-        model3_result["model_name"] = model3
-        
-        # Use Model 3's decision as final
-        final_document_type = model3_result["document_type"]
-        final_confidence = model3_result["confidence"]
-        final_reasoning = model3_result["reasoning"]
-        agreement_level = "Arbitrated"
-    else:
-        logger.info("No arbitration needed, using Model 2's review as final")
-        # Use Model 2's review as final (it already considered Model 1's result)
-        final_document_type = model2_result["document_type"]
-        final_confidence = model2_result["confidence"]
-        final_reasoning = model2_result["reasoning"]
+        if execution_mode == EXECUTION_MODE_SEQUENTIAL:
+            # Step 1: Initial categorization with Model 1
+            logger.info(f"Step 1: Initial categorization with {model1}")
+            model1_result = categorize_document(file_id, model1, document_types_with_desc)
+            document_features = get_document_features()
+            
+            # Step 2: Completely independent assessment by Model 2 with no knowledge of Model 1's results
+            logger.info(f"Step 2A: Independent assessment by {model2} (no knowledge of Model 1's results)")
+            model2_independent_result = independent_categorization(file_id, model2, document_types_with_desc)
+        else:
+            # Steps 1 and 2A do not depend on each other, so they run concurrently
+            logger.info(f"Steps 1 and 2A: Initial categorization with {model1} and independent assessment by {model2} in parallel")
+            executor = concurrent.futures.ThreadPoolExecutor(max_workers=3, thread_name_prefix="SequentialConsensus")
+            model1_future = executor.submit(with_script_run_context(categorize_document), file_id, model1, document_types_with_desc)
+            model2_independent_future = executor.submit(with_script_run_context(independent_categorization), file_id, model2, document_types_with_desc)
+            features_future = executor.submit(with_script_run_context(get_document_features))
+            model1_result = model1_future.result()
+            model2_independent_result = model2_independent_future.result()
+            document_features = features_future.result()
+        model1_result["model_name"] = model1
+        
+        # Calculate multi-factor confidence for Model 1
+        valid_categories = [dtype["name"] for dtype in document_types_with_desc]
+        
+        model1_multi_factor_confidence = calculate_multi_factor_confidence(
+            model1_result["confidence"],
+            document_features,
+            model1_result["document_type"],
+            model1_result.get("reasoning", ""),
+            valid_categories
+        )
+        model1_result["multi_factor_confidence"] = model1_multi_factor_confidence
+        model1_result["calibrated_confidence"] = apply_confidence_calibration(
+            model1_result["document_type"],
+            model1_multi_factor_confidence.get("overall", model1_result["confidence"])
+        )
+        
+        if execution_mode == EXECUTION_MODE_SPECULATIVE:
+            predicted_arbitration, predicted_reason = check_needs_arbitration(model1_result, model2_independent_result, disagreement_threshold)
+            if predicted_arbitration:
+                # The review rarely reconciles independent results that already disagree, so start arbitration now
+                logger.info(f"Step 3 (speculative): {predicted_reason} between {model1} and {model2}'s independent assessment. Starting arbitration with {model3}")
+                speculative_arbitration = executor.submit(
+                    with_script_run_context(arbitrate_categorization), file_id, model3, model1_result, dict(model2_independent_result, model_name=model2), document_types_with_desc
+                )
+        
+        # Step 2B: Only after independent assessment, Model 2 reviews both results
+        logger.info(f"Step 2B: Review by {model2} (after independent assessment)")
+        model2_result = review_categorization(
+            file_id, 
+            model2, 
+            model1_result, 
+            model2_independent_result, 
+            document_types_with_desc
+        )
+        model2_result["model_name"] = model2
+        
+        # Calculate agreement level and confidence
+        agreement_level, confidence_adjustment = calculate_agreement_confidence(model1_result, model2_result)
+        
+        # Determine if arbitration is needed
+        needs_arbitration, arbitration_reason = check_needs_arbitration(model1_result, model2_result, disagreement_threshold)
+        
+        # Step 3: Arbitration by Model 3 if needed
+        model3_result = {}
+        final_document_type = ""
+        final_confidence = 0.0
+        final_reasoning = ""
+        
+        if needs_arbitration:
+            if speculative_arbitration is not None and model2_result["document_type"] == model2_independent_result["document_type"]:
+                logger.info(f"Step 3: Arbitration needed ({arbitration_reason}). Using speculative arbitration by {model3}")
+                model3_result = speculative_arbitration.result()
+                model3_result["speculative"] = True
+            else:
+                logger.info(f"Step 3: Arbitration needed ({arbitration_reason}). Using {model3}")
+                model3_result = arbitrate_categorization(file_id, model3, model1_result, model2_result, document_types_with_desc)
+            model3_result["model_name"] = model3
+            
+            # Use Model 3's decision as final
+            final_document_type = model3_result["document_type"]
+            final_confidence = model3_result["confidence"]
+            final_reasoning = model3_result["reasoning"]
+            agreement_level = "Arbitrated"
+        else:
+            logger.info("No arbitration needed, using Model 2's review as final")
+            # Use Model 2's review as final (it already considered Model 1's result)
+            final_document_type = model2_result["document_type"]
+            final_confidence = model2_result["confidence"]
+            final_reasoning = model2_result["reasoning"]
+    finally:
+        if executor is not None:
+            if speculative_arbitration is not None and not speculative_arbitration.done():
+                logger.info(f"Discarding unneeded speculative arbitration for file {file_id}")
+            # Don't wait for a discarded speculative call; cancel it if it hasn't started
+            executor.shutdown(wait=False, cancel_futures=True)
     
     # Calculate final multi-factor confidence
     final_multi_factor_confidence = calculate_multi_factor_confidence(
@@ -155,7 +222,8 @@ def categorize_document_with_sequential_consensus(
         "agreement_level": agreement_level,
         "confidence_adjustment": confidence_adjustment,
         "needs_arbitration": needs_arbitration,
-        "arbitration_reason": arbitration_reason if needs_arbitration else ""
+        "arbitration_reason": arbitration_reason if needs_arbitration else "",
+        "execution_mode": execution_mode
     }
     
     # Prepare final result
@@ -178,6 +246,27 @@ def categorize_document_with_sequential_consensus(
     
     return result
 
+def check_needs_arbitration(model1_result: Dict[str, Any], model2_result: Dict[str, Any], disagreement_threshold: float) -> Tuple[bool, str]:
+    """
+    Determine whether two categorization results disagree enough to need arbitration.
+    
+    Args:
+        model1_result: Result from Model 1
+        model2_result: Result from Model 2
+        disagreement_threshold: Confidence difference that triggers arbitration
+        
+    Returns:
+        Tuple of (needs arbitration, reason)
+    """
+    # Check for category disagreement
+    if model1_result["document_type"] != model2_result["document_type"]:
+        return True, "Category disagreement"
+    
+    # Check for significant confidence difference
+    if abs(model1_result["confidence"] - model2_result["confidence"]) > disagreement_threshold:
+        return True, f"Confidence difference exceeds threshold ({disagreement_threshold})"
+    return False, ""
+
 def independent_categorization(
     file_id: str, 
     model: str, 
@@ -247,7 +336,7 @@ def independent_categorization(
 
         if "answer" in response_data and response_data["answer"]:
             original_response = response_data["answer"]
-            parsed_result = parse_independent_response(original_response, valid_categories)
+            parsed_result = parse_response(parse_independent_response, original_response, valid_categories)
             parsed_result["session_id"] = session_id
             return parsed_result
         else:
@@ -387,7 +476,7 @@ def review_categorization(
 
         if "answer" in review_data and review_data["answer"]:
             original_response = review_data["answer"]
-            parsed_result = parse_review_response(original_response, valid_categories, model1_result)
+            parsed_result = parse_response(parse_review_response, original_response, valid_categories, model1_result)
             
             # Add independent assessment and session info to result
             parsed_result["independent_assessment"] = model2_independent_result
@@ -756,7 +845,7 @@ def arbitrate_categorization(
 
         if "answer" in response_data and response_data["answer"]:
             original_response = response_data["answer"]
-            parsed_result = parse_arbitration_response(original_response, valid_categories, model1_result, model2_result)
+            parsed_result = parse_response(parse_arbitration_response, original_response, valid_categories, model1_result, model2_result)
             parsed_result["arbitration_session_id"] = arbitration_session_id
             
             # Calculate confidence factors based on arbitration
@@ -1,8 +1,146 @@
 import streamlit as st
 import logging
+from modules.result_store import ExtractionResultStore
+from modules.categorization_results import CategorizationResults
+from modules.run_store import get_run_store, new_run_id
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def get_session_user_id():
+    """
+    Get the ID of the authenticated Box user of the session.
+
+    Returns:
+        str: Box user ID, or None if the session is not authenticated
+    """
+    user = st.session_state.get('user')
+    client = st.session_state.get('client')
+    user_id = getattr(user, 'id', None) or getattr(getattr(client, 'auth', None), '_user_id', None)
+    return str(user_id) if user_id else None
+
+def get_session_run_id():
+    """
+    Get the ID of the session's run, creating one if necessary.
+    Once the session is authenticated, the run is stored with the Box user as
+    its owner; if it already belongs to another user, a new run is started.
+
+    Returns:
+        str: Run ID
+    """
+    if 'run_id' not in st.session_state:
+        st.session_state.run_id = new_run_id()
+        st.session_state.run_owner = None
+        logger.info(f'Started run {st.session_state.run_id}')
+    user_id = get_session_user_id()
+    if user_id and st.session_state.get('run_owner') != user_id:
+        try:
+            run_store = get_run_store()
+            run_store.create_run(st.session_state.run_id, owner=user_id)
+            if run_store.get_run_owner(st.session_state.run_id) != user_id:
+                st.session_state.run_id = run_store.create_run(owner=user_id)
+                logger.info(f'Started run {st.session_state.run_id} for user {user_id}')
+            st.session_state.run_owner = user_id
+        except Exception as e:
+            logger.error(f'Error storing the owner of run {st.session_state.run_id}: {str(e)}')
+    return st.session_state.run_id
+
+def create_extraction_results(reset=False):
+    """
+    Create the session's extraction results, written through to the run store.
+    Falls back to an in-memory store if the run store cannot be opened.
+
+    Args:
+        reset (bool): Whether to delete the results already stored for the session's run
+
+    Returns:
+        ExtractionResultStore: Empty result store for the session's run
+    """
+    try:
+        run_store = get_run_store()
+        if reset:
+            run_store.clear_results(get_session_run_id())
+        return ExtractionResultStore(run_store=run_store, run_id=get_session_run_id(), owner=get_session_user_id())
+    except Exception as e:
+        logger.error(f'Error opening the run store, keeping extraction results in memory only: {str(e)}')
+        return ExtractionResultStore()
+
+def create_categorization_results(reset=False):
+    """
+    Create the session's categorization results, written through to the run store.
+    Falls back to in-memory results if the run store cannot be opened.
+
+    Args:
+        reset (bool): Whether to delete the categorizations already stored for the session's run
+
+    Returns:
+        CategorizationResults: Empty categorization results for the session's run
+    """
+    try:
+        run_store = get_run_store()
+        if reset:
+            run_store.delete_categorizations(get_session_run_id())
+        return CategorizationResults(run_store=run_store, run_id=get_session_run_id(), owner=get_session_user_id())
+    except Exception as e:
+        logger.error(f'Error opening the run store, keeping categorization results in memory only: {str(e)}')
+        return CategorizationResults()
+
+def bind_session_results():
+    """
+    Bind the session's extraction and categorization results to the session's
+    run and user. Called at login and when processing starts: results kept
+    since before login stay in their run, which becomes the user's run, while
+    results of a run that belongs to another user (e.g. the session's previous
+    user) are replaced with empty results for the user's own run.
+    """
+    run_id = get_session_run_id()
+    user_id = get_session_user_id()
+    extraction_results = st.session_state.get('extraction_results')
+    if getattr(extraction_results, 'run_store', None) is not None:
+        if extraction_results.run_id != run_id:
+            logger.info(f'Moving the session from run {extraction_results.run_id} to run {run_id}')
+            st.session_state.extraction_results = create_extraction_results()
+        else:
+            extraction_results.owner = user_id
+    categorization = st.session_state.get('document_categorization')
+    categorization_results = categorization.get('results') if isinstance(categorization, dict) else None
+    if getattr(categorization_results, 'run_store', None) is not None:
+        if categorization_results.run_id != run_id:
+            categorization['results'] = create_categorization_results()
+            categorization['is_categorized'] = False
+        else:
+            categorization_results.owner = user_id
+
+def restore_session_run(run_id):
+    """
+    Make a stored run of the session's user the session's run, loading its
+    extraction and categorization results.
+
+    Args:
+        run_id (str): ID of the stored run
+
+    Returns:
+        bool: True if the run was restored, False otherwise (including runs of other users)
+    """
+    user_id = get_session_user_id()
+    try:
+        run_store = get_run_store()
+        if not user_id or run_store.get_run_owner(run_id) != user_id:
+            logger.warning(f"Refusing to restore run '{run_id}': it does not belong to the session's user")
+            return False
+        extraction_results = ExtractionResultStore.from_run(run_store, run_id, owner=user_id)
+        categorization_results = CategorizationResults.from_run(run_store, run_id, owner=user_id)
+    except Exception as e:
+        logger.error(f"Error restoring run '{run_id}': {str(e)}")
+        return False
+    st.session_state.run_id = run_id
+    st.session_state.run_owner = user_id
+    st.session_state.extraction_results = extraction_results
+    if 'document_categorization' in st.session_state:
+        st.session_state.document_categorization['results'] = categorization_results
+        st.session_state.document_categorization['is_categorized'] = len(categorization_results) > 0
+    logger.info(f'Restored run {run_id} with {len(extraction_results)} extraction and {len(categorization_results)} categorization results')
+    return True
+
 def initialize_app_session_state():
     """
     Global session state initialization function to be called at the start of the application.
@@ -24,7 +162,7 @@ def initialize_app_session_state():
         st.session_state.metadata_config = {'extraction_method': 'freeform', 'freeform_prompt': 'Extract key metadata from this document.', 'use_template': False, 'template_id': '', 'custom_fields': [], 'ai_model': 'azure__openai__gpt_4o_mini', 'batch_size': 5}
         logger.info('Initialized metadata_config in session state')
     if 'extraction_results' not in st.session_state:
-        st.session_state.extraction_results = {}
+        st.session_state.extraction_results = create_extraction_results()
         logger.info('Initialized extraction_results in session state')
     if 'selected_result_ids' not in st.session_state:
         st.session_state.selected_result_ids = []
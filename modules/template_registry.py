@@ -0,0 +1,342 @@
+"""
+Process-wide registry of Box metadata template schemas.
+This module caches template definitions once per deployment (instead of once
+per Streamlit session) together with the forms derived from them: the field
+list sent to Box AI, the key to type map and the set of valid keys. Entries
+are versioned and refreshed in the background when they go stale.
+"""
+import time
+import json
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field, replace
+from typing import Dict, Any, List, Optional, Tuple, FrozenSet
+logger = logging.getLogger(__name__)
+_FIELD_ATTRIBUTES = ('key', 'type', 'displayName', 'description', 'options', 'hidden')
+
+@dataclass(frozen=True)
+class TemplateEntry:
+    """
+    Immutable snapshot of one metadata template and its derived forms.
+    """
+    scope: str
+    template_key: str
+    display_name: str = ''
+    fields: Tuple[Dict[str, Any], ...] = ()
+    version: int = 0
+    content_hash: str = ''
+    fetched_at: float = 0.0
+    ai_fields: Tuple[Dict[str, Any], ...] = ()
+    schema: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    key_types: Dict[str, str] = field(default_factory=dict)
+    valid_keys: FrozenSet[str] = frozenset()
+    error: Optional[Dict[str, Any]] = None
+
+def api_scope(scope: str) -> str:
+    """
+    Get the scope to use with the metadata template API for a registry scope.
+
+    Args:
+        scope: Scope as stored in the registry (e.g. enterprise_12345 or global)
+
+    Returns:
+        str: enterprise or global
+    """
+    return 'enterprise' if scope.startswith('enterprise') else scope
+
+def is_shared_scope(scope: str) -> bool:
+    """
+    Check whether entries of a scope can be shared across sessions.
+    A bare 'enterprise' scope resolves to whichever enterprise the caller
+    belongs to, so its templates differ between tenants and are not cached.
+
+    Args:
+        scope: Registry scope
+
+    Returns:
+        bool: True for global and enterprise_<ID> scopes
+    """
+    return scope != 'enterprise'
+
+def normalize_template_fields(fields: Any) -> List[Dict[str, Any]]:
+    """
+    Convert template fields (dicts or Box SDK objects) into plain dictionaries.
+
+    Args:
+        fields: Fields of a metadata template
+
+    Returns:
+        list: Field dictionaries with key, type, displayName, description, options and hidden
+    """
+    normalized = []
+    for field_item in fields or []:
+        if isinstance(field_item, dict):
+            source = field_item
+        elif isinstance(getattr(field_item, '_response_object', None), dict):
+            source = field_item._response_object
+        else:
+            source = {attr: getattr(field_item, attr) for attr in _FIELD_ATTRIBUTES if hasattr(field_item, attr)}
+        field_dict = {attr: source[attr] for attr in _FIELD_ATTRIBUTES if attr in source}
+        if not field_dict.get('key'):
+            logger.warning(f'Skipping template field without a key: {str(field_item)[:500]}')
+            continue
+        normalized.append(field_dict)
+    return normalized
+
+def build_template_entry(scope: str, template_key: str, template: Any, version: int=1) -> TemplateEntry:
+    """
+    Build a registry entry and its derived forms from a template definition.
+
+    Args:
+        scope: Registry scope
+        template_key: Template key
+        template: Template definition (dict or Box SDK MetadataTemplate)
+        version: Version number for the entry
+
+    Returns:
+        TemplateEntry: Registry entry
+    """
+    if isinstance(template, dict):
+        display_name = template.get('displayName', template_key)
+        raw_fields = template.get('fields', [])
+    else:
+        display_name = getattr(template, 'displayName', template_key)
+        raw_fields = getattr(template, 'fields', [])
+    fields = normalize_template_fields(raw_fields)
+    ai_fields = []
+    for field_dict in fields:
+        ai_field = {'key': field_dict['key']}
+        for attr in ('type', 'displayName', 'description', 'options'):
+            if attr in field_dict:
+                ai_field[attr] = field_dict[attr]
+        ai_field.setdefault('displayName', field_dict['key'])
+        ai_field.setdefault('type', 'string')
+        ai_fields.append(ai_field)
+    schema = {f['key']: {'type': f.get('type', 'string'), 'displayName': f.get('displayName', f['key'].replace('_', ' ').title()), 'description': f.get('description', '')} for f in fields}
+    content_hash = hashlib.sha256(json.dumps({'displayName': display_name, 'fields': fields}, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    return TemplateEntry(scope=scope, template_key=template_key, display_name=display_name, fields=tuple(fields), version=version, content_hash=content_hash, fetched_at=time.time(), ai_fields=tuple(ai_fields), schema=schema, key_types={key: value['type'] for key, value in schema.items()}, valid_keys=frozenset(schema))
+
+class TemplateRegistry:
+    """
+    Thread-safe, process-wide cache of metadata template entries keyed by (scope, template key).
+    Fresh entries are served from memory. Stale entries are served while a
+    background refresh runs; entries older than max_stale are refetched inline.
+    Concurrent requests for the same missing template share one fetch.
+    """
+
+    def __init__(self, ttl: float=3600.0, max_stale: float=86400.0, error_ttl: float=60.0):
+        """
+        Initialize the registry.
+
+        Args:
+            ttl: Seconds an entry is served without a refresh
+            max_stale: Seconds after which a stale entry is refetched before being served
+            error_ttl: Seconds a failed fetch is remembered before retrying
+        """
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.error_ttl = error_ttl
+        self.entries: Dict[Tuple[str, str], TemplateEntry] = {}
+        self.lock = threading.RLock()
+        self._inflight: Dict[Tuple[str, str], threading.Event] = {}
+        self.stats = {'hits': 0, 'misses': 0, 'refreshes': 0, 'errors': 0, 'uncached': 0}
+
+    def get(self, client: Any, scope: str, template_key: str, force_refresh: bool=False) -> Optional[TemplateEntry]:
+        """
+        Get a template entry, fetching it from Box if needed.
+
+        Args:
+            client: Box client used if the template has to be fetched
+            scope: Scope (full enterprise scope such as enterprise_12345, or global)
+            template_key: Template key
+            force_refresh: Fetch from Box even if a fresh entry is cached
+
+        Returns:
+            TemplateEntry: Entry (with error set if the last fetch failed) or None
+        """
+        cache_key = (scope, template_key)
+        if not is_shared_scope(scope):
+            # The tenant is unknown, so neither the template nor an error may be served to other sessions
+            with self.lock:
+                self.stats['uncached'] += 1
+            logger.info(f'Fetching {scope}/{template_key} without the shared registry (no enterprise ID)')
+            return self._fetch(client, cache_key, store=False)
+        while True:
+            with self.lock:
+                entry = self.entries.get(cache_key)
+                age = time.time() - entry.fetched_at if entry else None
+                if entry is not None and not force_refresh:
+                    if entry.error is not None:
+                        if age < self.error_ttl:
+                            self.stats['hits'] += 1
+                            return entry
+                    elif age < self.ttl:
+                        self.stats['hits'] += 1
+                        return entry
+                    elif age < self.max_stale:
+                        self.stats['hits'] += 1
+                        self._start_background_refresh(client, cache_key)
+                        return entry
+                inflight = self._inflight.get(cache_key)
+                if inflight is None:
+                    inflight = threading.Event()
+                    self._inflight[cache_key] = inflight
+                    self.stats['misses'] += 1
+                    break
+            inflight.wait(timeout=60.0)
+            force_refresh = False
+        try:
+            return self._fetch(client, cache_key)
+        finally:
+            with self.lock:
+                self._inflight.pop(cache_key, None)
+            inflight.set()
+
+    def get_ai_fields(self, client: Any, scope: str, template_key: str) -> Optional[List[Dict[str, Any]]]:
+        """
+        Get the field definitions to send to Box AI for a template.
+
+        Args:
+            client: Box client
+            scope: Scope
+            template_key: Template key
+
+        Returns:
+            list: Copies of the AI field definitions, or None if the template could not be fetched
+        """
+        entry = self.get(client, scope, template_key)
+        if entry is None or entry.error is not None:
+            return None
+        return [dict(ai_field) for ai_field in entry.ai_fields]
+
+    def get_schema(self, client: Any, scope: str, template_key: str) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Get the key to {type, displayName, description} schema of a template.
+
+        Args:
+            client: Box client
+            scope: Scope
+            template_key: Template key
+
+        Returns:
+            dict: Copy of the schema, or None if the template could not be fetched
+        """
+        entry = self.get(client, scope, template_key)
+        if entry is None or entry.error is not None:
+            return None
+        return {key: dict(value) for key, value in entry.schema.items()}
+
+    def get_error(self, scope: str, template_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the error recorded by the last failed fetch of a template.
+
+        Args:
+            scope: Scope
+            template_key: Template key
+
+        Returns:
+            dict: Error details or None
+        """
+        with self.lock:
+            entry = self.entries.get((scope, template_key))
+            return dict(entry.error) if entry is not None and entry.error is not None else None
+
+    def put_template(self, scope: str, template_key: str, template: Any) -> TemplateEntry:
+        """
+        Store a template definition obtained elsewhere (e.g. from a template listing).
+
+        Args:
+            scope: Scope
+            template_key: Template key
+            template: Template definition
+
+        Returns:
+            TemplateEntry: Stored entry (not stored for scopes without an enterprise ID)
+        """
+        if not is_shared_scope(scope):
+            return build_template_entry(scope, template_key, template)
+        return self._store((scope, template_key), template)
+
+    def invalidate(self, scope: Optional[str]=None, template_key: Optional[str]=None) -> int:
+        """
+        Drop cached entries so they are refetched on next use.
+
+        Args:
+            scope: Only drop entries in this scope (or None for all)
+            template_key: Only drop entries with this key (or None for all)
+
+        Returns:
+            int: Number of dropped entries
+        """
+        with self.lock:
+            keys = [key for key in self.entries if (scope is None or key[0] == scope) and (template_key is None or key[1] == template_key)]
+            for key in keys:
+                del self.entries[key]
+            return len(keys)
+
+    def _store(self, cache_key: Tuple[str, str], template: Any) -> TemplateEntry:
+        """Build and store an entry, bumping the version only when the content changed."""
+        with self.lock:
+            previous = self.entries.get(cache_key)
+            entry = build_template_entry(cache_key[0], cache_key[1], template)
+            if previous is not None and previous.error is None and previous.content_hash == entry.content_hash:
+                entry = replace(entry, version=previous.version)
+            elif previous is not None:
+                entry = replace(entry, version=previous.version + 1)
+            self.entries[cache_key] = entry
+            return entry
+
+    def _fetch(self, client: Any, cache_key: Tuple[str, str], store: bool=True) -> TemplateEntry:
+        """Fetch a template from Box and store the result or the error (unless store is False)."""
+        scope, template_key = cache_key
+        try:
+            logger.info(f'Fetching template schema for {scope}/{template_key}')
+            template = client.metadata_template(api_scope(scope), template_key).get()
+            return self._store(cache_key, template) if store else build_template_entry(scope, template_key, template)
+        except Exception as e:
+            status = getattr(e, 'status', None)
+            error = {'error_status': status if status is not None else 'general_error', 'error_code': getattr(e, 'code', None), 'message': str(e)}
+            logger.error(f'Error fetching template schema for {scope}/{template_key}: {str(e)}')
+            with self.lock:
+                self.stats['errors'] += 1
+                if not store:
+                    return TemplateEntry(scope=scope, template_key=template_key, fetched_at=time.time(), error=error)
+                previous = self.entries.get(cache_key)
+                if previous is not None and previous.error is None:
+                    return previous
+                entry = TemplateEntry(scope=scope, template_key=template_key, fetched_at=time.time(), error=error)
+                self.entries[cache_key] = entry
+                return entry
+
+    def _start_background_refresh(self, client: Any, cache_key: Tuple[str, str]) -> None:
+        """Refresh a stale entry on a daemon thread unless a refresh is already running."""
+        if cache_key in self._inflight:
+            return
+        done = threading.Event()
+        self._inflight[cache_key] = done
+        self.stats['refreshes'] += 1
+
+        def refresh():
+            try:
+                self._fetch(client, cache_key)
+            finally:
+                with self.lock:
+                    self._inflight.pop(cache_key, None)
+                done.set()
+        threading.Thread(target=refresh, name=f'TemplateRefresh-{cache_key[1]}', daemon=True).start()
+_template_registry = None
+_template_registry_lock = threading.Lock()
+
+def get_template_registry() -> TemplateRegistry:
+    """
+    Get the global template registry instance, creating it if necessary.
+
+    Returns:
+        TemplateRegistry: Global template registry instance
+    """
+    global _template_registry
+    with _template_registry_lock:
+        if _template_registry is None:
+            _template_registry = TemplateRegistry()
+    return _template_registry
@@ -1,17 +1,81 @@
 # modules/validation_engine.py
+import os
 import json
 import re
+import time
 import logging
-from datetime import datetime
-from typing import Dict, List, Any, Optional, Tuple, Union
+import threading
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Callable, Dict, List, Any, Optional, Tuple, Union
 
 
 logger = logging.getLogger(__name__)
 
+EMPTY_TEMPLATE_RULES = {"fields": [], "mandatory_fields": []}
+
+def clean_template_id(template_id: str) -> str:
+    """Get the template key part of a 'scope_template' style template ID (the part after the last underscore)."""
+    if '_' in template_id:
+        parts = template_id.split('_')
+        if len(parts) >= 2:
+            return parts[-1]  # Take the last part after the underscore
+    return template_id
+
+def get_rules_file_version(rules_config_path: str) -> Optional[Tuple[int, int]]:
+    """Get the (mtime_ns, size) version of a rules file, or None if it does not exist."""
+    try:
+        stat = os.stat(rules_config_path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+def normalize_field_key(field_key: str) -> str:
+    """Normalize a field key for matching (case-insensitive, spaces and dashes as underscores)."""
+    return field_key.lower().replace(" ", "_").replace("-", "_")
+
+def freeze_rules(value: Any) -> Any:
+    """Get a read-only copy of parsed rules (dicts become mapping proxies and lists tuples)."""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: freeze_rules(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_rules(item) for item in value)
+    return value
+
+def thaw_rules(value: Any) -> Any:
+    """Get a mutable (JSON-serializable) copy of rules, e.g. of frozen rules for editing."""
+    if isinstance(value, Mapping):
+        return {key: thaw_rules(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw_rules(item) for item in value]
+    return value
+
 class ValidationRuleLoader:
-    def __init__(self, rules_config_path: str):
+    def __init__(self, rules_config_path: str, rules: Optional[Dict[str, Any]] = None, version: Optional[Tuple[int, int]] = None):
         self.rules_config_path = rules_config_path
-        self.rules = self._load_rules()
+        self.version = version if version is not None else get_rules_file_version(rules_config_path)
+        # Rules can be passed in directly, e.g. to look up a previous version of the rules file
+        self.rules = rules if rules is not None else self._load_rules()
+        self._build_indexes()
+
+    def _build_indexes(self) -> None:
+        """Index template rules and document types by name (the first definition wins, as with a linear scan)."""
+        template_rules_index: Dict[str, Dict[str, Any]] = {}
+        document_types_index: Dict[str, Dict[str, Any]] = {}
+        template_rules = self.rules.get("template_rules", []) if isinstance(self.rules, Mapping) else []
+        for rule in template_rules if isinstance(template_rules, (list, tuple)) else []:
+            if isinstance(rule, Mapping) and isinstance(rule.get("template_id"), str):
+                template_rules_index.setdefault(rule["template_id"], rule)
+        document_types = self.rules.get("document_types", []) if isinstance(self.rules, Mapping) else []
+        for doc_type in document_types if isinstance(document_types, (list, tuple)) else []:
+            if isinstance(doc_type, Mapping) and isinstance(doc_type.get("name"), str):
+                document_types_index.setdefault(doc_type["name"], doc_type)
+        self._template_rules_index = MappingProxyType(template_rules_index)
+        self._document_types_index = MappingProxyType(document_types_index)
+
+    def mutable_rules(self) -> Dict[str, Any]:
+        """Get an editable copy of the rules (e.g. for the Rule Builder), leaving this loader unchanged."""
+        return thaw_rules(self.rules)
 
     def _load_rules(self) -> Dict[str, Any]:
         try:
@@ -61,73 +125,320 @@ class ValidationRuleLoader:
             return {"fields": [], "mandatory_fields": []}
         
         # Extract clean template ID if it's in the 'scope_template' format
-        clean_template_id = template_id
-        if '_' in template_id:
-            parts = template_id.split('_')
-            if len(parts) >= 2:
-                clean_template_id = parts[-1]  # Take the last part after the underscore
+        cleaned_template_id = clean_template_id(template_id)
         
-        logger.info(f"Looking for rules with template_id='{template_id}' or '{clean_template_id}'")
+        logger.info(f"Looking for rules with template_id='{template_id}' or '{cleaned_template_id}'")
         
-        # Load the full ruleset to access the template_rules
-        try:
-            # Make sure we have the latest rules loaded
-            if hasattr(self, 'rules') and self.rules:
-                full_config = self.rules
-            else:
+        # First check the template_rules array (new approach), trying both original ID and cleaned ID
+        matching_rule = self._template_rules_index.get(template_id) or self._template_rules_index.get(cleaned_template_id)
+        if matching_rule:
+            logger.info(f"Found specific rules for template '{template_id}'")
+            # Ensure we have all the expected keys, even if they're empty
+            return {
+                "fields": matching_rule.get("fields", []),
+                "mandatory_fields": matching_rule.get("mandatory_fields", [])
+            }
+        
+        # If no rules found in template_rules, check for document_types structure
+        # This handles rules created with the original structure format
+        template_doc_type = self._document_types_index.get(template_id) or self._document_types_index.get(cleaned_template_id)
+        if template_doc_type:
+            logger.info(f"Found specific document type rules for template '{template_id}'")
+            return {
+                "fields": template_doc_type.get("fields", []),
+                "mandatory_fields": template_doc_type.get("mandatory_fields", [])
+            }
+        
+        logger.warning(f"No specific rules found for template '{template_id}' or '{cleaned_template_id}'")
+        return {"fields": [], "mandatory_fields": []}
+
+class RuleStore:
+    """
+    Process-wide store of the validation rules in one rules file.
+    Each version of the file is loaded once into a frozen, indexed
+    ValidationRuleLoader snapshot. The file's mtime is checked (at most every
+    check_interval seconds) and a changed file is loaded by one thread while
+    the others keep using the previous snapshot, so readers never block and
+    never see a partially loaded or partially written rules file.
+    """
+    
+    def __init__(self, rules_config_path: str, check_interval: float = 0.0):
+        """
+        Initialize the store.
+        
+        Args:
+            rules_config_path: Path of the rules file
+            check_interval: Minimum seconds between checks of the file's mtime (0 checks on every call)
+        """
+        self.rules_config_path = rules_config_path
+        self.check_interval = check_interval
+        self.reload_lock = threading.Lock()
+        self._snapshot: Optional[ValidationRuleLoader] = None
+        self._checked_at = 0.0
+    
+    def _load_snapshot(self) -> Optional[ValidationRuleLoader]:
+        """Load the current file into a frozen snapshot, or None if it can't be parsed (e.g. while it is being written)."""
+        version = get_rules_file_version(self.rules_config_path)
+        if version is None:
+            logger.error(f"Validation rules file not found at {self.rules_config_path}. Using empty ruleset.")
+            rules = {"document_types": [], "template_rules": []}
+        else:
+            try:
                 with open(self.rules_config_path, 'r') as f:
-                    full_config = json.load(f)
-                    self.rules = full_config
-            
-            # First check the template_rules array (new approach)
-            template_rules = full_config.get("template_rules", [])
-            logger.info(f"Found {len(template_rules)} template rules in config")
-            
-            # Find the matching template rule by trying both original ID and cleaned ID
-            matching_rule = next((rule for rule in template_rules 
-                                  if rule.get("template_id") == template_id), None)
-            
-            if not matching_rule:
-                # Try with clean template ID
-                matching_rule = next((rule for rule in template_rules 
-                                     if rule.get("template_id") == clean_template_id), None)
+                    rules = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.error(f"Error loading validation rules from {self.rules_config_path}: {e}")
+                return None
+        logger.info(f"Loaded validation rules snapshot from {self.rules_config_path} (version {version})")
+        return ValidationRuleLoader(self.rules_config_path, rules=freeze_rules(rules), version=version)
+    
+    def snapshot(self) -> ValidationRuleLoader:
+        """
+        Get the current rules snapshot, reloading it if the file changed.
+        
+        Returns:
+            Frozen ValidationRuleLoader for the latest readable version of the file
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return snapshot
+        if snapshot is not None and snapshot.version == get_rules_file_version(self.rules_config_path):
+            self._checked_at = time.monotonic()
+            return snapshot
+        # Only the first caller loads; the others keep the previous snapshot instead of waiting
+        if not self.reload_lock.acquire(blocking=snapshot is None):
+            return snapshot
+        try:
+            if self._snapshot is snapshot:
+                loaded = self._load_snapshot()
+                if loaded is not None:
+                    self._snapshot = loaded
+                elif self._snapshot is None:
+                    self._snapshot = ValidationRuleLoader(self.rules_config_path, rules=freeze_rules({"document_types": [], "template_rules": []}), version=(0, 0))
+                self._checked_at = time.monotonic()
+            return self._snapshot
+        finally:
+            self.reload_lock.release()
+    
+    def reload(self) -> ValidationRuleLoader:
+        """Get the current snapshot without waiting for the next mtime check (e.g. right after saving the file)."""
+        self._checked_at = 0.0
+        return self.snapshot()
+
+_rule_stores: Dict[str, RuleStore] = {}
+_rule_stores_lock = threading.Lock()
+
+def get_rule_store(rules_config_path: str = "config/validation_rules.json") -> RuleStore:
+    """
+    Get the process-wide rule store for a rules file, creating it if necessary.
+    
+    Args:
+        rules_config_path: Path of the rules file
+        
+    Returns:
+        RuleStore shared by all sessions and validators using this file
+    """
+    key = os.path.abspath(rules_config_path)
+    with _rule_stores_lock:
+        if key not in _rule_stores:
+            _rule_stores[key] = RuleStore(rules_config_path)
+        return _rule_stores[key]
+
+def _compile_rule(rule: Dict[str, Any]) -> Optional[Callable[[Any], Optional[str]]]:
+    """Compile one validation rule into a check returning an error message, or None if the value passes."""
+    rule_type = rule.get("type")
+    rule_name = rule.get("name", f"{rule_type} Rule")
+    
+    if rule_type == "regex":
+        pattern = rule.get("pattern", "")
+        if not pattern:
+            return None
+        try:
+            compiled = re.compile(pattern)
+        except Exception as e:
+            # Invalid patterns only surface when a string is actually matched
+            error_message = f"{rule_name}: Error validating regex: {e}"
+            return lambda value: f"{rule_name}: Value '{value}' does not match pattern '{pattern}'" if value is None else (error_message if isinstance(value, str) else None)
+        match = compiled.match
+        return lambda value: f"{rule_name}: Value '{value}' does not match pattern '{pattern}'" if value is None or (isinstance(value, str) and not match(value)) else None
+    
+    if rule_type == "enum":
+        values = rule.get("values", "")
+        cleaned_allowed_values = [str(v).strip() for v in (values.split(",") if isinstance(values, str) else values or [])]
+        if not cleaned_allowed_values:
+            return None
+        allowed = frozenset(cleaned_allowed_values)
+        allowed_text = ', '.join(cleaned_allowed_values)
+        return lambda value: f"{rule_name}: Value '{value}' is not in allowed values: {allowed_text}" if value is not None and str(value).strip() not in allowed else None
+    
+    if rule_type == "min_length":
+        min_length = rule.get("length", 0)
+        try:
+            min_length = int(min_length)
+        except (ValueError, TypeError):
+            error_message = f"{rule_name}: Invalid minimum length: {min_length}"
+            return lambda value: error_message
+        return lambda value: f"{rule_name}: Value length ({0 if value is None else len(value)}) is less than minimum length ({min_length})" if value is None or (isinstance(value, str) and len(value) < min_length) else None
+    
+    if rule_type == "max_length":
+        max_length = rule.get("length", 0)
+        try:
+            max_length = int(max_length)
+        except (ValueError, TypeError):
+            error_message = f"{rule_name}: Invalid maximum length: {max_length}"
+            return lambda value: error_message
+        return lambda value: f"{rule_name}: Value length ({len(value)}) exceeds maximum length ({max_length})" if isinstance(value, str) and len(value) > max_length else None
+    
+    if rule_type == "dataType":
+        # The rule's "type" key holds the rule type itself, so the data type is unknown and only None fails
+        return lambda value: f"{rule_name}: Value '{value}' is not of type 'dataType'" if value is None else None
+    
+    return None
+
+def compile_field_rules(rules: List[Dict[str, Any]]) -> Tuple[Callable[[Any], Optional[str]], ...]:
+    """
+    Compile a field's validation rules into checks.
+    
+    Args:
+        rules: List of validation rules
+        
+    Returns:
+        Tuple of checks; each returns an error message, or None if the value passes
+    """
+    return tuple(check for check in (_compile_rule(rule) for rule in rules or []) if check is not None)
+
+class ValidationPlan:
+    """
+    Executable form of a template's validation rules.
+    Rules are compiled once (regexes, enum sets, length bounds) and field keys
+    pre-normalized, so validating a file only runs the checks.
+    """
+    
+    def __init__(self, template_rules: Dict[str, Any]):
+        """
+        Compile a template's rules.
+        
+        Args:
+            template_rules: Dictionary with fields and mandatory_fields
+        """
+        self.fields = []
+        for field_def in template_rules.get("fields", []):
+            field_key = field_def.get("key")
+            if field_key is not None and not isinstance(field_key, str):
+                # Skip fields that can't be normalized
+                logger.warning(f"Skipping field with invalid key: {field_key}")
+                continue
+            self.fields.append((field_key, normalize_field_key(field_key) if field_key is not None else None, compile_field_rules(field_def.get("rules", []))))
+        self.fields = tuple(self.fields)
+        self.mandatory_fields = tuple((field_key, normalize_field_key(field_key) if isinstance(field_key, str) else None) for field_key in template_rules.get("mandatory_fields", []))
+    
+    def run(self, ai_response: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Validate an AI response.
+        
+        Args:
+            ai_response: AI response to validate
             
-            if matching_rule:
-                logger.info(f"Found specific rules for template '{template_id}'")
-                # Ensure we have all the expected keys, even if they're empty
-                return {
-                    "fields": matching_rule.get("fields", []),
-                    "mandatory_fields": matching_rule.get("mandatory_fields", [])
+        Returns:
+            Validation results with field_validations and mandatory_check
+        """
+        normalized_keys: Optional[Dict[str, Any]] = None
+        
+        def find_field(field_key, normalized_field_key):
+            """Find a field by exact key, then by normalized key (the first matching response key wins)."""
+            nonlocal normalized_keys
+            if field_key in ai_response:
+                return True, ai_response[field_key]
+            if normalized_field_key is None:
+                return False, None
+            if normalized_keys is None:
+                normalized_keys = {}
+                for response_key in ai_response:
+                    if isinstance(response_key, str):
+                        normalized_keys.setdefault(normalize_field_key(response_key), response_key)
+            response_key = normalized_keys.get(normalized_field_key)
+            if response_key is None:
+                return False, None
+            return True, ai_response[response_key]
+        
+        field_validations = {}
+        for field_key, normalized_field_key, checks in self.fields:
+            field_found, field_value = find_field(field_key, normalized_field_key) if field_key is not None else (False, None)
+            if field_found and field_value is not None:
+                # Handle both formats: direct values and dictionary with 'value' key
+                actual_value = field_value.get("value") if isinstance(field_value, dict) and "value" in field_value else field_value
+                messages = [message for message in (check(actual_value) for check in checks) if message is not None]
+                is_valid = not messages
+                field_validations[field_key] = {
+                    "is_valid": is_valid,
+                    "status": "pass" if is_valid else "fail",
+                    "messages": messages
                 }
-            
-            # If no rules found in template_rules, check for document_types structure
-            # This handles rules created with the original structure format
-            document_types = full_config.get("document_types", [])
-            logger.info(f"Found {len(document_types)} document types in config")
-            
-            # Check if we have a document type that matches our template_id (or clean version)
-            template_doc_type = next((dt for dt in document_types if dt.get("name") == template_id), None)
-            
-            if not template_doc_type:
-                # Try with clean template ID
-                template_doc_type = next((dt for dt in document_types if dt.get("name") == clean_template_id), None)
-            
-            if template_doc_type:
-                logger.info(f"Found specific document type rules for template '{template_id}'")
-                return {
-                    "fields": template_doc_type.get("fields", []),
-                    "mandatory_fields": template_doc_type.get("mandatory_fields", [])
+            else:
+                # Field not found in response
+                field_validations[field_key] = {
+                    "is_valid": True,  # Not present = valid (skip)
+                    "status": "skip",
+                    "messages": [f"Field '{field_key}' not found in response"]
                 }
-                
-        except Exception as e:
-            logger.error(f"Error loading template rules: {e}")
         
-        logger.warning(f"No specific rules found for template '{template_id}' or '{clean_template_id}'")
-        return {"fields": [], "mandatory_fields": []}
+        missing_fields = []
+        for field_key, normalized_field_key in self.mandatory_fields:
+            field_present, field_value = find_field(field_key, normalized_field_key)
+            # Handle both formats: direct values and dictionary with 'value' key
+            actual_value = field_value.get("value") if isinstance(field_value, dict) and "value" in field_value else field_value
+            # Check if the value is empty
+            if not field_present or actual_value is None or (isinstance(actual_value, str) and actual_value.strip() == ""):
+                missing_fields.append(field_key)
+        
+        return {
+            "field_validations": field_validations,
+            "mandatory_check": {
+                "status": "Passed" if not missing_fields else "Failed",
+                "missing_fields": missing_fields
+            }
+        }
 
 class Validator:
-    def __init__(self):
-        pass
+    def __init__(self, rules_config_path: str = "config/validation_rules.json"):
+        self.rules_config_path = rules_config_path
+        self.lock = threading.RLock()
+        self._rules_loader: Optional[ValidationRuleLoader] = None
+        self._plans: Dict[Optional[str], ValidationPlan] = {}
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # Locks can't be pickled; plans are rebuilt in the receiving process
+        return {"rules_config_path": self.rules_config_path}
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["rules_config_path"])
+    
+    def get_rules_loader(self) -> ValidationRuleLoader:
+        """Get the shared rules snapshot, dropping compiled plans when the rules file changed"""
+        snapshot = get_rule_store(self.rules_config_path).snapshot()
+        with self.lock:
+            if snapshot is not self._rules_loader:
+                self._rules_loader = snapshot
+                self._plans = {}
+            return self._rules_loader
+    
+    def get_plan(self, doc_category: Optional[str], template_id: Optional[str]) -> ValidationPlan:
+        """Get the compiled validation plan for a template, compiling it once per rules file version
+        
+        Args:
+            doc_category: Document category of the document
+            template_id: Metadata template ID
+            
+        Returns:
+            Compiled validation plan
+        """
+        with self.lock:
+            rules_loader = self.get_rules_loader()
+            plan = self._plans.get(template_id)
+            if plan is None:
+                plan = ValidationPlan(rules_loader.get_rules_for_category_template(doc_category, template_id))
+                self._plans[template_id] = plan
+            return plan
             
     def _validate_field(self, field_key: str, value: Any, rules: List[Dict[str, Any]]) -> Tuple[bool, List[str]]:
         """Validate a field value against a list of validation rules
@@ -140,135 +451,12 @@ class Validator:
         Returns:
             Tuple with (passed, messages)
         """
-        if not rules:
-            return True, []
-            
-        all_passed = True
-        messages = []
-        
-        for rule in rules:
-            rule_type = rule.get("type")
-            rule_name = rule.get("name", f"{rule_type} Rule")
-            
-            if rule_type == "regex":
-                pattern = rule.get("pattern", "")
-                if pattern:
-                    try:
-                        if value is None or (isinstance(value, str) and not re.match(pattern, value)):
-                            all_passed = False
-                            messages.append(f"{rule_name}: Value '{value}' does not match pattern '{pattern}'")
-                    except Exception as e:
-                        all_passed = False
-                        messages.append(f"{rule_name}: Error validating regex: {e}")
-                        
-            elif rule_type == "enum":
-                allowed_values = rule.get("values", "").split(",")
-                cleaned_allowed_values = [v.strip() for v in allowed_values]
-                if cleaned_allowed_values and value is not None:
-                    str_value = str(value).strip()
-                    if str_value not in cleaned_allowed_values:
-                        all_passed = False
-                        messages.append(f"{rule_name}: Value '{value}' is not in allowed values: {', '.join(cleaned_allowed_values)}")
-                        
-            elif rule_type == "min_length":
-                min_length = rule.get("length", 0)
-                try:
-                    min_length = int(min_length)
-                    if value is None or (isinstance(value, str) and len(value) < min_length):
-                        all_passed = False
-                        messages.append(f"{rule_name}: Value length ({0 if value is None else len(value)}) is less than minimum length ({min_length})")
-                except ValueError:
-                    all_passed = False
-                    messages.append(f"{rule_name}: Invalid minimum length: {min_length}")
-                    
-            elif rule_type == "max_length":
-                max_length = rule.get("length", 0)
-                try:
-                    max_length = int(max_length)
-                    if value is not None and isinstance(value, str) and len(value) > max_length:
-                        all_passed = False
-                        messages.append(f"{rule_name}: Value length ({len(value)}) exceeds maximum length ({max_length})")
-                except ValueError:
-                    all_passed = False
-                    messages.append(f"{rule_name}: Invalid maximum length: {max_length}")
-                    
-            elif rule_type == "dataType":
-                type_name = rule.get("type", "")
-                if not self._validate_data_type(value, type_name):
-                    all_passed = False
-                    messages.append(f"{rule_name}: Value '{value}' is not of type '{type_name}'")
-                    
-        return all_passed, messages
-        
-    def _validate_data_type(self, value: Any, type_name: str) -> bool:
-        """Validate that a value is of the specified data type"""
-        if value is None:
-            return False
-            
-        if type_name == "string":
-            return isinstance(value, str)
-        elif type_name == "number":
-            try:
-                float(value)
-                return True
-            except (ValueError, TypeError):
-                return False
-        elif type_name == "boolean":
-            return isinstance(value, bool) or (isinstance(value, str) and value.lower() in ("true", "false"))
-        elif type_name == "date":
-            if isinstance(value, str):
-                try:
-                    # Try to parse as ISO date
-                    datetime.fromisoformat(value.replace('Z', '+00:00'))
-                    return True
-                except ValueError:
-                    try:
-                        # Try common date formats
-                        datetime.strptime(value, "%Y-%m-%d")
-                        return True
-                    except ValueError:
-                        try:
-                            datetime.strptime(value, "%m/%d/%Y")
-                            return True
-                        except ValueError:
-                            return False
-            return False
-        return True  # Unknown type, assume valid
+        messages = [message for message in (check(value) for check in compile_field_rules(rules)) if message is not None]
+        return not messages, messages
         
     def _check_mandatory_fields(self, ai_response: Dict[str, Any], mandatory_fields: List[str]) -> Tuple[bool, List[str]]:
         """Check that all mandatory fields are present and not empty"""
-        missing = []
-        for field_key in mandatory_fields:
-            field_present = False
-            field_value = None
-            
-            # Check both direct field_key and normalized variations
-            if field_key in ai_response:
-                field_present = True
-                field_value = ai_response[field_key]
-            else:
-                # Try case-insensitive match or with common variations (spaces, underscores, etc.)
-                normalized_field_key = field_key.lower().replace(" ", "_").replace("-", "_")
-                for response_key in ai_response.keys():
-                    normalized_response_key = response_key.lower().replace(" ", "_").replace("-", "_")
-                    if normalized_response_key == normalized_field_key:
-                        field_present = True
-                        field_value = ai_response[response_key]
-                        break
-            
-            # If field is present, check if it has a value
-            if field_present:
-                # Handle both formats: direct values and dictionary with 'value' key
-                if isinstance(field_value, dict) and "value" in field_value:
-                    actual_value = field_value.get("value")
-                else:
-                    actual_value = field_value
-                
-                # Check if the value is empty
-                if actual_value is None or (isinstance(actual_value, str) and actual_value.strip() == ""):
-                    missing.append(field_key)
-            else:
-                missing.append(field_key)
+        missing = ValidationPlan({"mandatory_fields": mandatory_fields}).run(ai_response)["mandatory_check"]["missing_fields"]
         return not missing, missing
         
     def validate(self, ai_response: Dict[str, Any], doc_type: Optional[str] = None, doc_category: Optional[str] = None, template_id: Optional[str] = None) -> Dict[str, Any]:
@@ -283,12 +471,6 @@ class Validator:
         Returns:
             Validation results
         """
-        # Load validation rules
-        rules_loader = ValidationRuleLoader("config/validation_rules.json")
-        
-        # Get template-specific rules
-        template_rules = rules_loader.get_rules_for_category_template(doc_category, template_id)
-        
         # If AI response is not a dict, return validation error
         if not isinstance(ai_response, dict):
             logger.warning(f"AI response is not a dictionary. Cannot perform validation.")
@@ -296,91 +478,13 @@ class Validator:
                 "field_validations": {},
                 "mandatory_check": {"status": "Error", "message": "AI response not a dict"}
             }
-
-        # Initialize field validations
-        field_validations = {}
-
-        # 1. Validate fields based on template rules
-        template_fields = template_rules.get("fields", [])
-        
-        # Process each field in the template rules
-        for field_def in template_fields:
-            field_key = field_def.get("key")
-            field_rules = field_def.get("rules", [])
-            
-            # Log the field we're checking for debugging
-            logger.info(f"Checking validation rules for field '{field_key}' with {len(field_rules)} rules")
-            
-            # Check both direct field_key and normalized variations
-            field_found = False
-            actual_field_key = field_key
-            field_value = None
-            
-            # Try exact match first
-            if field_key and field_key in ai_response:
-                field_found = True
-                field_value = ai_response[field_key]
-                logger.info(f"Field '{field_key}' found in response (exact match)")
-            else:
-                # Try case-insensitive match or with common variations (spaces, underscores, etc.)
-                if field_key is not None:  # Skip if field_key is None
-                    try:
-                        normalized_field_key = field_key.lower().replace(" ", "_").replace("-", "_")
-                        for response_key in ai_response.keys():
-                            if response_key is not None:  # Skip None keys in response
-                                try:
-                                    normalized_response_key = response_key.lower().replace(" ", "_").replace("-", "_")
-                                    if normalized_response_key == normalized_field_key:
-                                        field_found = True
-                                        actual_field_key = response_key  # Use the actual key from the response
-                                        field_value = ai_response[response_key]
-                                        logger.info(f"Field '{field_key}' found as '{response_key}' in response (normalized match)")
-                                        break
-                                except (AttributeError, TypeError):
-                                    # Skip keys that can't be normalized
-                                    continue
-                    except (AttributeError, TypeError):
-                        # Skip fields that can't be normalized
-                        logger.warning(f"Skipping field with invalid key: {field_key}")
-                        continue
-            
-            if field_found and field_value is not None:
-                # Handle both formats: direct values and dictionary with 'value' key
-                if isinstance(field_value, dict) and "value" in field_value:
-                    actual_value = field_value.get("value")
-                else:
-                    actual_value = field_value
-                
-                is_valid, messages = self._validate_field(field_key, actual_value, field_rules)
-                field_validations[field_key] = {
-                    "is_valid": is_valid,
-                    "status": "pass" if is_valid else "fail",
-                    "messages": messages
-                }
-                logger.info(f"Validation result for '{field_key}': {'PASS' if is_valid else 'FAIL'}")
-            else:
-                # Field not found in response
-                field_validations[field_key] = {
-                    "is_valid": True,  # Not present = valid (skip)
-                    "status": "skip",
-                    "messages": [f"Field '{field_key}' not found in response"]
-                }
-                logger.info(f"Field '{field_key}' not found in response, marked as SKIP")
         
-        # 2. Check mandatory fields
-        mandatory_fields = template_rules.get("mandatory_fields", [])
-        mandatory_passed, missing_fields = self._check_mandatory_fields(ai_response, mandatory_fields)
-        
-        mandatory_check_result = {
-            "status": "Passed" if mandatory_passed else "Failed",
-            "missing_fields": missing_fields
-        }
-        
-        # Compile and return validation results
-        return {
-            "field_validations": field_validations,
-            "mandatory_check": mandatory_check_result
-        }
+        # Template rules are compiled once per rules file version and reused for every file
+        plan = self.get_plan(doc_category, template_id)
+        validation_output = plan.run(ai_response)
+        failed = [field_key for field_key, result in validation_output["field_validations"].items() if result["status"] == "fail"]
+        logger.info(f"Validated {len(plan.fields)} fields for template '{template_id}': {len(failed)} failed {failed}, mandatory check {validation_output['mandatory_check']['status']}")
+        return validation_output
 
 class ConfidenceAdjuster:
     def __init__(self, high_confidence_threshold=0.8, medium_confidence_threshold=0.5, low_confidence_penalty=0.2, validation_failure_penalty=0.3, mandatory_failure_penalty=0.4):
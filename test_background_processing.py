@@ -0,0 +1,276 @@
+import os
+import time
+import logging
+import tempfile
+import threading
+from modules.job_store import RedisJobStore, SQLiteJobStore
+from modules.background_processing import BackgroundJobManager, JobDeferred, PRIORITY_INTERACTIVE, PRIORITY_BULK, get_current_job_id, get_current_job_owner, register_job_handler
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def test_priority_and_fairness_order():
+    """
+    Test that interactive jobs run before bulk jobs and that bulk jobs
+    from different owners are interleaved round-robin.
+    """
+    manager = BackgroundJobManager(num_workers=1, interactive_workers=0)
+    gate = threading.Event()
+    done = threading.Event()
+    order = []
+
+    def record(label):
+        order.append(label)
+        if len(order) == 6:
+            done.set()
+    try:
+        manager.submit('Blocker', gate.wait, args=(5,))
+        for i in range(3):
+            manager.submit('Bulk A', record, args=(f'A{i}',), priority=PRIORITY_BULK, owner='user-a')
+        manager.submit('Bulk B', record, args=('B0',), priority=PRIORITY_BULK, owner='user-b')
+        cancelled_id = manager.submit('Bulk B', record, args=('B-cancelled',), priority=PRIORITY_BULK, owner='user-b')
+        manager.cancel_job(cancelled_id)
+        manager.submit('Normal', record, args=('N0',))
+        manager.submit('Re-extract file', record, args=('I0',), priority=PRIORITY_INTERACTIVE)
+        gate.set()
+        assert done.wait(5), f'Jobs did not finish: {order}'
+    finally:
+        manager.shutdown()
+    logger.info(f'Execution order: {order}')
+    assert order == ['I0', 'N0', 'A0', 'B0', 'A1', 'A2']
+    assert manager.get_job(cancelled_id)['status'] == 'cancelled'
+    print('✅ Priority and fairness scheduling verified')
+
+def test_interactive_worker_not_blocked_by_bulk():
+    """
+    Test that the reserved interactive worker runs interactive jobs
+    while bulk jobs occupy every regular worker.
+    """
+    manager = BackgroundJobManager(num_workers=1, interactive_workers=1)
+    gate = threading.Event()
+    try:
+        manager.submit('Bulk', gate.wait, args=(5,), priority=PRIORITY_BULK)
+        manager.submit('Bulk', gate.wait, args=(5,), priority=PRIORITY_BULK)
+        job_id = manager.submit('Interactive', lambda: 'ok', priority=PRIORITY_INTERACTIVE)
+        finished = threading.Event()
+        for _ in range(50):
+            if manager.get_job(job_id)['status'] == 'completed':
+                finished.set()
+                break
+            finished.wait(0.05)
+        gate.set()
+        assert finished.is_set(), 'Interactive job did not run while bulk jobs were busy'
+        assert manager.get_job(job_id)['result'] == 'ok'
+    finally:
+        manager.shutdown()
+    print('✅ Interactive worker verified')
+processed_items = []
+
+def _checkpointed_job(items):
+    """Durable test handler that checkpoints every item it processes."""
+    manager = _checkpointed_job.manager
+    job_id = get_current_job_id()
+    done = manager.get_checkpointed_items(job_id)
+    for item in items:
+        if item in done:
+            continue
+        processed_items.append(item)
+        manager.checkpoint_item(job_id, item, {'value': item.upper()})
+    return sorted(manager.get_checkpointed_items(job_id))
+register_job_handler('test_checkpointed_job', _checkpointed_job)
+
+def test_durable_job_resumes_after_crash():
+    """
+    Test that a durable job claimed by a crashed worker is requeued once its
+    lease expires and that the resumed run skips checkpointed items.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = SQLiteJobStore(db_path=os.path.join(tmp_dir, 'jobs.db'), lease_seconds=0.2)
+        submitter = BackgroundJobManager(num_workers=0, interactive_workers=0, store=store)
+        job_id = submitter.submit('Checkpointed', 'test_checkpointed_job', args=(['a', 'b', 'c'],), durable=True)
+        submitter.shutdown()
+        claimed = store.claim_next_job('crashed-worker')
+        assert claimed['id'] == job_id
+        store.checkpoint_item(job_id, 'a', {'value': 'A'})
+        time.sleep(0.3)
+        manager = BackgroundJobManager(num_workers=1, interactive_workers=0, store=store, poll_interval=0.05)
+        _checkpointed_job.manager = manager
+        try:
+            job = None
+            for _ in range(100):
+                job = manager.get_job(job_id)
+                if job['status'] == 'completed':
+                    break
+                time.sleep(0.05)
+        finally:
+            manager.shutdown()
+        assert job['status'] == 'completed', job
+        assert job['result'] == ['a', 'b', 'c']
+        assert processed_items == ['b', 'c']
+        assert store.get_item_results(job_id)['b'] == {'value': 'B'}
+    print('✅ Durable job crash recovery verified')
+
+def _chunk_job(items):
+    """In-memory chunk handler that checkpoints each item under the parent job."""
+    manager = _chunk_job.manager
+    job_id = get_current_job_id()
+    for item in items:
+        if manager.is_cancelled(job_id):
+            break
+        manager.checkpoint_item(job_id, item, item * 2)
+    return len(items)
+
+def test_chunked_job_fan_out():
+    """
+    Test that a chunked job fans out into child jobs, streams partial results
+    under the parent and completes once every chunk has finished.
+    """
+    manager = BackgroundJobManager(num_workers=2, interactive_workers=0)
+    _chunk_job.manager = manager
+    try:
+        parent_id = manager.submit_chunked('Chunked', _chunk_job, list(range(7)), chunk_size=3)
+        job = None
+        for _ in range(100):
+            job = manager.get_job(parent_id)
+            if job['status'] == 'completed':
+                break
+            time.sleep(0.05)
+    finally:
+        manager.shutdown()
+    assert job['status'] == 'completed', job
+    assert len(job['metadata']['children']) == 3
+    assert job['result']['completed_chunks'] == 3
+    partial = manager.get_partial_results(parent_id)
+    assert sorted(partial) == [str(i) for i in range(7)]
+    assert sorted(partial.values()) == [i * 2 for i in range(7)]
+    assert len(manager.get_partial_results(parent_id, offset=5)) == 2
+    print('✅ Chunked job fan-out verified')
+
+def test_checkpoint_update_keeps_order():
+    """
+    Test that re-checkpointing an item updates it in place, so offset reads
+    of partial results neither skip nor repeat items.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = SQLiteJobStore(db_path=os.path.join(tmp_dir, 'jobs.db'))
+        for key in ('a', 'b', 'c'):
+            store.checkpoint_item('job', key, {'value': key}, 'failed' if key == 'a' else 'completed')
+        first_read = store.get_item_results('job')
+        store.checkpoint_item('job', 'a', {'value': 'A'})
+        store.checkpoint_item('job', 'd', {'value': 'd'})
+        assert list(first_read) == ['a', 'b', 'c']
+        assert store.get_item_results('job', offset=len(first_read)) == {'d': {'value': 'd'}}
+        assert list(store.get_item_results('job')) == ['a', 'b', 'c', 'd']
+        assert store.get_item_results('job', status='completed')['a'] == {'value': 'A'}
+    print('✅ Checkpoint order verified')
+
+class RecordingRedis:
+    """Redis client stand-in that records the keys passed to store scripts."""
+
+    def __init__(self):
+        self.calls = []
+
+    def register_script(self, script):
+        return lambda keys, args: self.calls.append((script, list(keys), list(args)))
+
+def test_redis_scripts_declare_cluster_keys():
+    """
+    Test that Redis store scripts receive the job keys they touch in KEYS and
+    that every key shares one hash tag, as Redis Cluster requires.
+    """
+    redis_client = RecordingRedis()
+    store = RedisJobStore(redis_client)
+    assert store.claim_next_job('worker') is None
+    store.heartbeat('worker', ['job-1', 'job-2'])
+    store.finish_job('job-1', 'worker', 'completed', result=1)
+    store.complete_group('parent', 'completed')
+    store.cancel_job('parent')
+    store.checkpoint_item('job-1', 'file-1', {'value': 1})
+    store.requeue_expired()
+    keys = [key for _, call_keys, _ in redis_client.calls for key in call_keys]
+    assert keys and all((key.startswith('{box_jobs}:') for key in keys)), keys
+    claim, heartbeat, finish, complete_group, cancel = [call_keys for _, call_keys, _ in redis_client.calls[:5]]
+    assert heartbeat[1:] == ['{box_jobs}:job:job-1', '{box_jobs}:job:job-2']
+    assert '{box_jobs}:job:job-1' in finish
+    assert '{box_jobs}:job:parent' in complete_group and '{box_jobs}:job:parent' in cancel and '{box_jobs}:children:parent' in cancel
+    assert RedisJobStore(RecordingRedis(), prefix='{tenant}:jobs').pending_key == '{tenant}:jobs:pending'
+    print('✅ Redis Cluster keys verified')
+
+def _double_job(value):
+    """Durable test handler run by a separate worker."""
+    return value * 2
+register_job_handler('test_double_job', _double_job)
+
+def test_external_worker_runs_submitted_job():
+    """
+    Test that a front-end manager with claim_jobs disabled leaves durable jobs
+    to a separate worker and still reads their results from the broker.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'jobs.db')
+        front_end = BackgroundJobManager(num_workers=1, interactive_workers=0, store=SQLiteJobStore(db_path=db_path), poll_interval=0.05, claim_jobs=False)
+        worker = None
+        try:
+            job_id = front_end.submit('Double', 'test_double_job', args=(21,), durable=True)
+            time.sleep(0.2)
+            assert front_end.get_job(job_id)['status'] == 'pending'
+            worker = BackgroundJobManager(num_workers=1, interactive_workers=0, store=SQLiteJobStore(db_path=db_path), worker_id='remote-worker', poll_interval=0.05)
+            job = None
+            for _ in range(100):
+                job = front_end.get_job(job_id)
+                if job['status'] == 'completed':
+                    break
+                time.sleep(0.05)
+        finally:
+            front_end.shutdown()
+            if worker is not None:
+                worker.shutdown()
+        assert job['status'] == 'completed', job
+        assert job['result'] == 42
+        assert job['worker_id'] == 'remote-worker'
+    print('✅ External worker verified')
+_owner_clients = {}
+
+def _owned_job(value):
+    """Durable test handler that needs a client for its owner, like the Box job handlers."""
+    owner = get_current_job_owner()
+    if not owner:
+        raise ValueError('Job has no owner')
+    if owner not in _owner_clients:
+        raise JobDeferred(f'No client for {owner}')
+    return f'{_owner_clients[owner]}:{value}'
+register_job_handler('test_owned_job', _owned_job)
+
+def test_jobs_run_as_their_owner():
+    """
+    Test that a durable job waits in the queue until a worker can act as its
+    owner and that jobs without an owner are refused.
+    """
+    _owner_clients.clear()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        manager = BackgroundJobManager(num_workers=1, interactive_workers=0, store=SQLiteJobStore(db_path=os.path.join(tmp_dir, 'jobs.db'), lease_seconds=0.3), poll_interval=0.05)
+        try:
+            owned_id = manager.submit('Owned', 'test_owned_job', args=('a',), owner='user-1', durable=True)
+            orphan_id = manager.submit('Orphan', 'test_owned_job', args=('b',), durable=True)
+            time.sleep(0.5)
+            assert manager.get_job(owned_id)['status'] in ('pending', 'running')
+            _owner_clients['user-1'] = 'client-1'
+            owned = orphan = None
+            for _ in range(100):
+                owned, orphan = (manager.get_job(owned_id), manager.get_job(orphan_id))
+                if owned['status'] == 'completed' and orphan['status'] == 'failed':
+                    break
+                time.sleep(0.05)
+        finally:
+            manager.shutdown()
+    assert owned['status'] == 'completed' and owned['result'] == 'client-1:a', owned
+    assert orphan['status'] == 'failed' and 'no owner' in orphan['error'], orphan
+    print('✅ Job owner verified')
+if __name__ == '__main__':
+    test_priority_and_fairness_order()
+    test_interactive_worker_not_blocked_by_bulk()
+    test_durable_job_resumes_after_crash()
+    test_chunked_job_fan_out()
+    test_checkpoint_update_keeps_order()
+    test_external_worker_runs_submitted_job()
+    test_redis_scripts_declare_cluster_keys()
+    test_jobs_run_as_their_owner()
@@ -0,0 +1,40 @@
+import os
+import json
+import random
+import logging
+import tempfile
+from modules.validation_engine import Validator
+from modules.batch_validation import batch_validate
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+RULES = {'document_types': [], 'template_rules': [{'template_id': 'invoice', 'fields': [{'key': 'invoice_number', 'rules': [{'type': 'regex', 'pattern': '^INV-\\d+$', 'name': 'Format'}, {'type': 'min_length', 'length': 5}, {'type': 'max_length', 'length': 8}]}, {'key': 'Status', 'rules': [{'type': 'enum', 'values': 'Paid, Unpaid'}, {'type': 'dataType'}]}, {'key': 'notes', 'rules': [{'type': 'regex', 'pattern': '(', 'name': 'Broken'}, {'type': 'max_length', 'length': 'ten'}]}], 'mandatory_fields': ['Vendor Name', 'invoice_number']}]}
+VALUES = [None, '', '   ', 'INV-1', 'INV-123456', 'X-1', 'Paid', ' Unpaid ', 'Void', 42, True, ['Paid']]
+KEYS = ['invoice_number', 'Invoice Number', 'INVOICE-NUMBER', 'Status', 'status', 'notes', 'vendor-name', 'Vendor Name', 'other']
+
+def random_response(rng):
+    response = {}
+    for key in rng.sample(KEYS, rng.randint(0, len(KEYS))):
+        value = rng.choice(VALUES)
+        response[key] = {'value': value, 'confidence': 'High'} if rng.random() < 0.3 else value
+    return response
+
+def test_batch_validation_matches_validator():
+    """
+    Test that vectorized batch validation produces the same results as
+    validating each response with Validator.validate.
+    """
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as directory:
+        rules_path = os.path.join(directory, 'validation_rules.json')
+        with open(rules_path, 'w') as f:
+            json.dump(RULES, f)
+        validator = Validator(rules_path)
+        responses = {f'file_{i}': random_response(rng) for i in range(300)}
+        responses['file_error'] = 'not a dict'
+        results = batch_validate(responses, 'enterprise_123_invoice', validator)
+        for file_id, response in responses.items():
+            expected = validator.validate(response, template_id='enterprise_123_invoice')
+            assert results[file_id] == expected, (file_id, response, results[file_id], expected)
+    print('✅ Batch validation matches per-file validation')
+if __name__ == '__main__':
+    test_batch_validation_matches_validator()
@@ -0,0 +1,41 @@
+import logging
+from modules import cascade_categorization
+from modules.cascade_categorization import categorize_document_with_cascade
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+DOCUMENT_TYPES = [{'name': 'Invoices', 'description': 'Bills'}, {'name': 'Contracts', 'description': 'Agreements'}]
+THRESHOLDS = {'auto_accept': 0.85, 'verification': 0.6, 'rejection': 0.4}
+
+def run_cascade(fast_confidence, detailed_confidence, calls):
+    """Run the cascade with fake model calls returning the given calibrated confidences."""
+    originals = (cascade_categorization.categorize_document, cascade_categorization.categorize_document_detailed, cascade_categorization.extract_document_features, cascade_categorization.score_result, cascade_categorization.categorize_document_with_sequential_consensus)
+    cascade_categorization.categorize_document = lambda file_id, model, types: calls.append('fast') or {'document_type': 'Invoices', 'confidence': fast_confidence}
+    cascade_categorization.categorize_document_detailed = lambda file_id, model, initial, types: calls.append('detailed') or {'document_type': initial, 'confidence': detailed_confidence}
+    cascade_categorization.extract_document_features = lambda file_id: {}
+    cascade_categorization.score_result = lambda result, features, categories: result.setdefault('calibrated_confidence', result['confidence'])
+    cascade_categorization.categorize_document_with_sequential_consensus = lambda *args: calls.append('consensus') or {'document_type': 'Contracts', 'confidence': 0.9, 'calibrated_confidence': 0.9}
+    try:
+        return categorize_document_with_cascade('1', DOCUMENT_TYPES, thresholds=THRESHOLDS)
+    finally:
+        cascade_categorization.categorize_document, cascade_categorization.categorize_document_detailed, cascade_categorization.extract_document_features, cascade_categorization.score_result, cascade_categorization.categorize_document_with_sequential_consensus = originals
+
+def test_cascade_exits_early():
+    """
+    Test that confident documents stop at the fast model and only uncertain
+    ones escalate to the detailed review and sequential consensus.
+    """
+    calls = []
+    assert run_cascade(0.9, None, calls)['cascade']['exit_stage'] == 'fast'
+    assert calls == ['fast']
+    calls = []
+    assert run_cascade(0.7, 0.65, calls)['cascade']['exit_stage'] == 'detailed'
+    assert calls == ['fast', 'detailed']
+    calls = []
+    result = run_cascade(0.7, 0.5, calls)
+    assert calls == ['fast', 'detailed', 'consensus']
+    assert result['document_type'] == 'Contracts'
+    calls = []
+    assert [stage['stage'] for stage in run_cascade(0.3, None, calls)['cascade']['stages']] == ['fast', 'consensus']
+    print('✅ Cascade categorization verified')
+if __name__ == '__main__':
+    test_cascade_exits_early()
@@ -0,0 +1,43 @@
+import logging
+from modules.categorization_results import CategorizationResults, categorized_document_types, find_categorization
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def test_indexes_follow_changes():
+    """
+    Test that the file ID and document type indexes stay consistent as results change.
+    """
+    results = CategorizationResults()
+    results.append({'file_id': 1, 'document_type': 'Invoices', 'confidence': 0.9})
+    results.extend([{'file_id': '2', 'document_type': 'Contracts', 'confidence': 0.5}, {'file_id': '3', 'category': 'Invoices', 'confidence': 0.7}])
+    assert results.get_by_file_id('1')['confidence'] == 0.9
+    assert results.get_by_file_id(3)['confidence'] == 0.7
+    assert results.document_types() == ['Invoices', 'Contracts']
+    assert results.file_ids_for_type('Invoices') == ['1', '3']
+    results.append({'file_id': '1', 'document_type': 'Other', 'confidence': 0.1})
+    assert results.get_by_file_id('1')['document_type'] == 'Invoices', 'Lookups should return the first result of a file'
+    results.insert(0, {'file_id': '4', 'document_type': 'Other', 'confidence': 0.2})
+    del results[1]
+    assert results.get_by_file_id('1')['document_type'] == 'Other'
+    assert results.document_types() == ['Other', 'Contracts', 'Invoices']
+    assert results.file_ids_for_type('Other') == ['4', '1']
+    results[0] = {'file_id': '5', 'document_type': 'Contracts', 'confidence': 0.4}
+    assert not results.has_file('4') and results.file_ids_for_type('Contracts') == ['5', '2']
+    results.clear()
+    assert results.get_by_file_id('5') is None and results.document_types() == []
+    print('✅ Categorization result indexes verified')
+
+def test_lookup_helpers():
+    """
+    Test the lookup helpers on indexed results, plain lists and file ID mappings.
+    """
+    items = [{'file_id': '1', 'document_type': 'Invoices'}, {'file_id': '2', 'category': 'Contracts'}, {'file_id': '3', 'document_type': 'Invoices'}]
+    for results in (CategorizationResults(items), items, {item['file_id']: item for item in items}):
+        assert find_categorization(results, 2) == items[1]
+        assert find_categorization(results, '9') is None
+        assert categorized_document_types(results) == ['Invoices', 'Contracts']
+    assert find_categorization(None, '1') is None
+    print('✅ Categorization lookup helpers verified')
+if __name__ == '__main__':
+    test_indexes_follow_changes()
+    test_lookup_helpers()
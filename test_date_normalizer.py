@@ -0,0 +1,39 @@
+import logging
+from datetime import datetime, timezone
+from dateutil import parser
+from modules.date_normalizer import DateNormalizer, DATE_FORMATS
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+VALUES = ['2024-01-05', '2024-01-05T10:20:30Z', '2024-01-05T10:20:30.123456+05:30', '2024-01-05 10:20', '2024-01-05T10:20:30-0800', '01/05/2024', '13/05/2024', '5/1/2024', '05.03.2024', '2024/03/05', '20240305', 'March 5, 2024', 'Mar 5 2024', '5 March 2024', '05-Mar-2024', 'Sept. 9, 2024', '1st January 2024', '2024-02-29']
+
+def test_formats_match_dateutil():
+    """
+    Test that every recognized shape parses to the same datetime and RFC 3339
+    value as dateutil, without falling back to it.
+    """
+    normalizer = DateNormalizer(use_fallback=False)
+    for value in VALUES:
+        assert normalizer.parse(value) == parser.parse(value), value
+    assert normalizer.to_rfc3339('2024-01-05T10:20:30-08:00') == '2024-01-05T18:20:30Z'
+    assert normalizer.to_rfc3339('March 5, 2024') == '2024-03-05T00:00:00Z'
+    assert normalizer.to_rfc3339(datetime(2024, 1, 5, tzinfo=timezone.utc)) == '2024-01-05T00:00:00Z'
+    for value in ['2023-02-29', 'February 30, 2024', '2024-13-01', 'not a date', '', None, 42]:
+        assert normalizer.parse(value) is None, value
+    assert DateNormalizer().parse('Jan 2024, 10am') == parser.parse('Jan 2024, 10am')
+    print('✅ Date formats verified')
+
+def test_formats_are_learned_per_field():
+    """
+    Test that the format that parsed a field's value is remembered for the field.
+    """
+    normalizer = DateNormalizer(use_fallback=False)
+    names = [name for name, _, _ in DATE_FORMATS]
+    normalizer.parse('March 5, 2024', ('invoice', 'due_date'))
+    normalizer.parse('2024-01-05', ('invoice', 'issued'))
+    assert normalizer.learned_formats == {('invoice', 'due_date'): names.index('month_name_first'), ('invoice', 'issued'): names.index('iso')}
+    assert normalizer.parse('2024-03-05', ('invoice', 'due_date')) == datetime(2024, 3, 5)
+    assert normalizer.learned_formats[('invoice', 'due_date')] == names.index('iso')
+    print('✅ Per-field format learning verified')
+if __name__ == '__main__':
+    test_formats_match_dateutil()
+    test_formats_are_learned_per_field()
@@ -0,0 +1,50 @@
+import logging
+import threading
+import streamlit as st
+from modules.document_categorization_utils import clear_file_info_cache, remember_file_infos, prefetch_file_infos, extract_document_features
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class FakeFileRequest:
+
+    def __init__(self, client, file_id):
+        self.client = client
+        self.file_id = file_id
+
+    def get(self, fields=None):
+        with self.client.lock:
+            self.client.fetches.append(self.file_id)
+        return {'id': self.file_id, 'name': f'{self.file_id}.pdf', 'size': 4096, 'created_at': '2024-01-02T03:04:05Z', 'modified_at': '2024-02-03T04:05:06Z', 'parent': {'id': '9', 'name': 'Inbox'}}
+
+class FakeClient:
+    """Box client stand-in that counts file info requests."""
+
+    def __init__(self):
+        self.fetches = []
+        self.lock = threading.Lock()
+
+    def file(self, file_id):
+        return FakeFileRequest(self, file_id)
+
+def test_prefetch_uses_listing_and_memo():
+    """
+    Test that listed files need no lookups, the others are fetched once, and
+    document features come from the memo.
+    """
+    client = FakeClient()
+    st.session_state.client = client
+    st.session_state.file_info_cache = {}
+    listed = [{'type': 'file', 'id': '1', 'name': 'invoice.pdf', 'size': 2048, 'created_at': '2023-05-06T07:08:09Z', 'modified_at': '2023-05-07T07:08:09Z'}, {'type': 'folder', 'id': '5', 'name': 'Archive'}, {'type': 'file', 'id': '2', 'name': 'no_fields.pdf'}]
+    assert remember_file_infos(listed, parent={'id': '7', 'name': 'Invoices'}) == 1
+    infos = prefetch_file_infos(['1', '2', '3', '2'])
+    assert sorted(client.fetches) == ['2', '3']
+    assert infos['1']['parent_name'] == 'Invoices' and infos['3']['parent_id'] == '9'
+    features = extract_document_features('1')
+    assert features['file_size_kb'] == 2.0 and features['file_extension'] == '.pdf' and features['created_date'] == '2023-05-06'
+    assert sorted(client.fetches) == ['2', '3']
+    clear_file_info_cache()
+    assert prefetch_file_infos(['1'])['1']['name'] == '1.pdf', 'A new run should fetch fresh file metadata'
+    assert sorted(client.fetches) == ['1', '2', '3']
+    print('✅ File info prefetch verified')
+if __name__ == '__main__':
+    test_prefetch_uses_listing_and_memo()
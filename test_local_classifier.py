@@ -0,0 +1,71 @@
+import os
+import logging
+import tempfile
+from modules import local_classifier
+from modules.local_classifier import LocalCategoryClassifier, file_features, get_local_classifier
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def test_local_classifier_trains_and_predicts():
+    """
+    Test that the classifier trains offline on recorded examples, persists
+    the model and predicts categories from file metadata.
+    """
+    features = file_features({'name': 'Invoice_2024-0042.PDF', 'size': 2048, 'parent_id': '77', 'parent_name': 'Accounts Payable', 'created_at': '2024-03-05T10:00:00-08:00'})
+    assert features['name=invoice'] == 1.0 and features['name=#4'] == 1.0 and features['ext=.pdf'] == 1.0
+    assert 'folder_name=payable' in features and 'created_at_month=03' in features and 'size_bucket=11' in features
+    examples = []
+    for i in range(15):
+        examples.append(({'id': f'i{i}', 'name': f'Invoice {1000 + i}.pdf', 'size': 40000 + i, 'parent_id': '1', 'parent_name': 'Invoices'}, 'Invoices'))
+        examples.append(({'id': f'c{i}', 'name': f'Services Agreement v{i}.docx', 'size': 900000 + i, 'parent_id': '2', 'parent_name': 'Legal'}, 'Contracts'))
+    with tempfile.TemporaryDirectory() as directory:
+        classifier = LocalCategoryClassifier(directory, min_examples=20)
+        assert classifier.train()['trained'] is False
+        assert classifier.predict([{'name': 'Invoice 1.pdf'}]) == [None]
+        classifier.record(examples)
+        assert classifier.train()['num_examples'] == 30
+        reloaded = LocalCategoryClassifier(directory)
+        confident = reloaded.classify_confident([{'id': 'new1', 'name': 'Invoice 2001.pdf', 'size': 41000, 'parent_id': '1', 'parent_name': 'Invoices'}, {'id': 'new2', 'name': 'notes.txt'}], 0.8)
+        assert confident['new1'][0] == 'Invoices'
+        assert 'new2' not in confident
+        assert sorted(reloaded.presort([{'name': 'Master Agreement.docx', 'parent_id': '2'}])) == ['Contracts']
+        assert os.path.exists(os.path.join(directory, 'local_classifier.joblib'))
+    print('✅ Local classifier verified')
+
+def test_valid_categories_and_background_training():
+    """
+    Test that predictions are limited to the session's categories, that only
+    new examples are recorded and trained on in the background, and that
+    classifiers are kept per owner.
+    """
+    examples = []
+    for i in range(15):
+        examples.append(({'id': f'i{i}', 'name': f'Invoice {1000 + i}.pdf', 'parent_id': '1'}, 'Invoices'))
+        examples.append(({'id': f'c{i}', 'name': f'Services Agreement v{i}.docx', 'parent_id': '2'}, 'Contracts'))
+    invoice = {'id': 'new1', 'name': 'Invoice 2001.pdf', 'parent_id': '1'}
+    with tempfile.TemporaryDirectory() as directory:
+        classifier = LocalCategoryClassifier(directory, min_examples=20)
+        assert classifier.record(examples) == 30
+        assert classifier.record(examples[:4]) == 0
+        assert classifier.schedule_training() is True
+        assert classifier.wait_for_training(30) and classifier.is_trained()
+        assert classifier.classify_confident([invoice], 0.8, ['Invoices', 'Contracts'])['new1'][0] == 'Invoices'
+        category, probability = classifier.predict([invoice], ['Contracts', 'Receipts'])[0]
+        assert category == 'Contracts' and probability < 0.5, 'Dropped classes must not be renormalized into confidence'
+        assert classifier.classify_confident([invoice], 0.8, ['Contracts']) == {}
+        assert classifier.predict([invoice], ['Receipts']) == [None]
+        assert classifier.record([({'id': 'i0', 'name': 'Invoice 1000.pdf'}, 'Receipts')]) == 1
+        original_directory = local_classifier.CLASSIFIER_DIR
+        local_classifier.CLASSIFIER_DIR = directory
+        try:
+            first = get_local_classifier('123')
+            assert get_local_classifier('123') is first and get_local_classifier('456') is not first
+            assert first.history_path == os.path.join(directory, 'local_classifier', '123', 'categorization_history.jsonl')
+            assert get_local_classifier('../x').history_path.startswith(os.path.join(directory, 'local_classifier', '___x'))
+        finally:
+            local_classifier.CLASSIFIER_DIR = original_directory
+            local_classifier._local_classifiers.clear()
+    print('✅ Local classifier scoping and background training verified')
+if __name__ == '__main__':
+    test_local_classifier_trains_and_predicts()
+    test_valid_categories_and_background_training()
@@ -0,0 +1,40 @@
+import time
+import logging
+from modules import document_categorization_updated
+from modules.document_categorization_updated import run_parallel_consensus
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+DOCUMENT_TYPES = [{'name': 'Invoices', 'description': 'Bills'}, {'name': 'Contracts', 'description': 'Agreements'}, {'name': 'Other', 'description': 'Anything else'}]
+MODEL_DELAYS = {'fast': 0.05, 'medium': 0.1, 'slow': 0.2}
+
+def fake_categorize_document(file_id, model, document_types):
+    time.sleep(MODEL_DELAYS[model])
+    if file_id == 'broken':
+        raise Exception('Box AI unavailable')
+    return {'document_type': 'Invoices' if model != 'slow' else 'Contracts', 'confidence': 0.8, 'reasoning': f'{model} reasoning'}
+
+def test_parallel_consensus_fans_out():
+    """
+    Test that parallel consensus runs models concurrently, combines each
+    file's results and reports files where every model failed.
+    """
+    original = (document_categorization_updated.categorize_document, document_categorization_updated.extract_document_features)
+    document_categorization_updated.categorize_document = fake_categorize_document
+    document_categorization_updated.extract_document_features = lambda file_id: {}
+    progress = []
+    try:
+        start = time.time()
+        files = [{'id': 'a', 'name': 'a.pdf'}, {'id': 'broken', 'name': 'b.pdf'}]
+        results, errors = run_parallel_consensus(files, list(MODEL_DELAYS), DOCUMENT_TYPES, False, 0.6, on_file_done=lambda done, total: progress.append((done, total)))
+        elapsed = time.time() - start
+    finally:
+        document_categorization_updated.categorize_document, document_categorization_updated.extract_document_features = original
+    assert elapsed < sum(MODEL_DELAYS.values()) * len(files)
+    assert [r['file_id'] for r in results] == ['a']
+    assert results[0]['document_type'] == 'Invoices'
+    assert [r['model_name'] for r in results[0]['model_results']] == ['fast', 'medium', 'slow']
+    assert errors[0]['file_id'] == 'broken'
+    assert progress == [(1, 2), (2, 2)]
+    print('✅ Parallel consensus fan-out verified')
+if __name__ == '__main__':
+    test_parallel_consensus_fans_out()
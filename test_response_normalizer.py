@@ -0,0 +1,64 @@
+import json
+import logging
+from modules.response_normalizer import detect_response_shape, normalize_structured_response, normalize_freeform_response, normalize_streamed_response, parse_answer_json
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def test_structured_shapes():
+    """
+    Test that every structured response shape normalizes to the flat {key, key_confidence} form.
+    """
+    fields_response = {'answer': {'fields': [{'key': 'invoice', 'value': 'INV-1', 'confidence': 'High'}, {'key': 'total', 'value': '10', 'confidence': 'Sure'}, {'value': 'no key'}]}}
+    assert detect_response_shape(fields_response) == 'answer_fields'
+    assert normalize_structured_response(fields_response) == {'invoice': 'INV-1', 'invoice_confidence': 'High', 'total': '10', 'total_confidence': 'Low'}
+    dict_response = {'answer': {'invoice': {'value': 'INV-1', 'confidence': 'Medium'}, 'vendor': None, 'total': {'value': '10'}, 'raw': 'text'}}
+    assert detect_response_shape(dict_response) == 'answer_dict'
+    assert normalize_structured_response(dict_response) == {'invoice': 'INV-1', 'invoice_confidence': 'Medium', 'vendor': None, 'vendor_confidence': 'Low', 'total': '10', 'total_confidence': 'Low', 'raw': 'text', 'raw_confidence': 'Low'}
+    string_response = {'answer': 'Here you go: {"invoice": {"value": "INV-1", "confidence": "High"}} (note: {braces})'}
+    assert detect_response_shape(string_response) == 'answer_string'
+    assert normalize_structured_response(string_response) == {'invoice': 'INV-1', 'invoice_confidence': 'High'}
+    assert normalize_structured_response({'answer': 'no json here'}) == {'_raw_response': 'no json here', '_confidence_processing_failed': True}
+    entries_response = {'entries': [{'metadata': {'invoice': json.dumps({'value': 'INV-1', 'confidence': 'High'}), 'total': '10'}}]}
+    assert detect_response_shape(entries_response) == 'entries_metadata'
+    assert normalize_structured_response(entries_response) == {'invoice': 'INV-1', 'invoice_confidence': 'High', 'total': '10', 'total_confidence': 'Low'}
+    assert normalize_structured_response({'entries': [{}]})['_error'] == "No 'metadata' field in API entry"
+    assert normalize_structured_response({})['_confidence_processing_failed'] is True
+    print('✅ Structured response shapes verified')
+
+def test_freeform_shapes():
+    """
+    Test freeform answer parsing, including malformed JSON and the entries fallback.
+    """
+    answer = '{"title": {"value": "Lease", "confidence": "High"}, "pages": 3}'
+    assert normalize_freeform_response({'answer': answer}) == {'title': 'Lease', 'title_confidence': 'High', 'pages': 3, 'pages_confidence': 'Low'}
+    malformed = normalize_freeform_response({'answer': '{"title": }'})
+    assert malformed['_raw_answer'] == '{"title": }' and '_error_parsing_json' in malformed
+    assert normalize_freeform_response({'entries': [{'answer': answer}]})['title'] == 'Lease'
+    assert normalize_freeform_response({'entries': [{'answer': 'plain text'}]}) == {'_raw_answer_from_entries': 'plain text', '_confidence_processing_failed': True}
+    assert normalize_freeform_response({})['_error'] == "No 'answer' field in API response"
+    assert parse_answer_json('x {"a": [1, {"b": 2}]} y }') == {'a': [1, {'b': 2}]}
+    print('✅ Freeform response shapes verified')
+
+def test_streamed_answer_matches_buffered():
+    """
+    Test that streamed parsing emits fields as they complete and matches the
+    buffered result whatever the chunk boundaries (escapes, multi-byte characters).
+    """
+    pairs = {f'field_{i}': {'value': f'line "{i}" \\ é 😀\n', 'confidence': ('High', 'Low', 'Unsure')[i % 3]} for i in range(20)}
+    pairs['nested'] = {'value': {'items': [1, {'text': '}]'}]}, 'confidence': 'High'}
+    answer = 'Result: ' + json.dumps(pairs, ensure_ascii=False) + ' (end {note})'
+    expected = normalize_freeform_response({'answer': answer})
+    for ensure_ascii in (True, False):
+        body = json.dumps({'answer': answer, 'created_at': '2024-01-01T00:00:00Z'}, ensure_ascii=ensure_ascii).encode('utf-8')
+        for size in (1, 3, 7, 256, len(body)):
+            seen = []
+            result = normalize_streamed_response((body[i:i + size] for i in range(0, len(body), size)), on_field=lambda key, value, confidence: seen.append(key))
+            assert result == expected, size
+            assert seen == list(pairs)
+    assert normalize_streamed_response([json.dumps({'entries': [{'answer': '{"a": {"value": 1, "confidence": "High"}}'}]}).encode('utf-8')]) == {'a': 1, 'a_confidence': 'High'}
+    assert '_error_parsing_json' in normalize_streamed_response([b'{"answer": "{\\"a\\": 1, \\"b\\": "}'])
+    print('✅ Streamed answer parsing verified')
+if __name__ == '__main__':
+    test_structured_shapes()
+    test_freeform_shapes()
+    test_streamed_answer_matches_buffered()
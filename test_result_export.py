@@ -0,0 +1,85 @@
+import io
+import os
+import csv
+import json
+import logging
+import tempfile
+from modules.result_store import ExtractionResultStore
+from modules.result_export import EXPORT_COLUMNS, export_csv, export_results, export_to_bytes, iter_export_chunks, main, openpyxl_available, pyarrow_available
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def make_results(count=25):
+    results = {}
+    for index in range(count):
+        fields = {key: {'value': f'{key}-{index}', 'ai_confidence': 'High', 'adjusted_confidence': 'Medium', 'field_validation_status': 'fail', 'validations': [{'rule_type': 'field_validation', 'status': 'fail', 'message': 'too short', 'confidence_impact': 0.5}]} for key in ('amount', 'vendor')}
+        results[f'file_{index}'] = {'file_name': f'{index}.pdf', 'document_type': 'Invoices', 'template_id_used_for_extraction': 'enterprise_1_invoice', 'fields': fields, 'document_validation_summary': {'overall_document_confidence_suggestion': 'Medium'}}
+    results['broken'] = {'file_name': 'broken.pdf', 'error': 'Box AI timeout', 'fields': {}}
+    return results
+
+def test_csv_export():
+    """
+    Test CSV export to a path and to a binary stream, chunking and file selection.
+    """
+    results = make_results()
+    store = ExtractionResultStore(results)
+    assert [len(chunk) for chunk in iter_export_chunks(store, chunk_size=20)] == [20, 20, 11]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'results.csv')
+        assert export_csv(store, path, chunk_size=7) == 51
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.reader(f))
+    assert rows[0] == EXPORT_COLUMNS
+    assert rows[1] == ['file_0', '0.pdf', 'Invoices', 'enterprise_1_invoice', 'Medium', 'amount', 'amount-0', 'High', 'Medium', 'fail', 'too short', '']
+    assert rows[-1][:2] == ['broken', 'broken.pdf'] and rows[-1][-1] == 'Box AI timeout'
+    data = export_to_bytes(results, 'csv', file_ids=['file_3', 'missing', 'file_1'])
+    assert [row[0] for row in csv.reader(io.StringIO(data.decode('utf-8')))] == ['file_id', 'file_3', 'file_3', 'file_1', 'file_1']
+    print('✅ CSV export verified')
+
+def test_spreadsheet_cells_are_escaped():
+    """
+    Test that values starting a formula are prefixed in CSV and Excel exports
+    and that Excel exports drop control characters openpyxl rejects.
+    """
+    results = {'file_1': {'file_name': '=HYPERLINK("http://x")', 'fields': {'total': {'value': '-5+3'}, 'contact': {'value': '@SUM(A1)'}, 'notes': {'value': 'line\x07bell'}}}}
+    rows = list(csv.reader(io.StringIO(export_to_bytes(results, 'csv').decode('utf-8'))))
+    assert rows[1][1] == '\'=HYPERLINK("http://x")' and rows[1][6] == "'-5+3" and rows[2][6] == "'@SUM(A1)"
+    assert rows[3][6] == 'line\x07bell'
+    if openpyxl_available:
+        import openpyxl
+        sheet = openpyxl.load_workbook(io.BytesIO(export_to_bytes(results, 'xlsx')))['Results']
+        values = [[cell.value for cell in row] for row in sheet.iter_rows(min_row=2)]
+        assert values[0][1] == '\'=HYPERLINK("http://x")' and values[0][6] == "'-5+3" and values[2][6] == 'linebell'
+    print('✅ Spreadsheet cell escaping verified')
+
+def test_parquet_and_headless_export():
+    """
+    Test Parquet export and the command-line entry point.
+    """
+    results = make_results()
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, 'results.json')
+        with open(source, 'w') as f:
+            json.dump(results, f)
+        main([source, os.path.join(directory, 'results.csv')])
+        with open(os.path.join(directory, 'results.csv'), encoding='utf-8') as f:
+            assert len(f.read().splitlines()) == 52
+        if pyarrow_available:
+            import pyarrow.parquet as pq
+            path = os.path.join(directory, 'results.parquet')
+            assert export_results(results, path, chunk_size=10) == {'format': 'parquet', 'rows': 51}
+            parquet_file = pq.ParquetFile(path)
+            assert parquet_file.metadata.num_row_groups == 6
+            table = parquet_file.read()
+            assert table.column_names == EXPORT_COLUMNS
+            assert table.column('value').to_pylist()[:2] == ['amount-0', 'vendor-0']
+    try:
+        export_results(results, 'results.txt')
+        assert False, 'Unknown formats should be rejected'
+    except ValueError:
+        pass
+    print('✅ Parquet and headless export verified')
+if __name__ == '__main__':
+    test_csv_export()
+    test_spreadsheet_cells_are_escaped()
+    test_parquet_and_headless_export()
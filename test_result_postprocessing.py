@@ -0,0 +1,78 @@
+import logging
+from modules import sequential_consensus_implementation
+from modules.result_postprocessing import PostProcessingTask, collect_postprocessing, postprocess_batch, postprocess_tasks, submit_postprocessing
+from modules.sequential_consensus_implementation import parse_arbitration_response, parse_independent_response, parse_response
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class UnprintableValue:
+    """Field value that breaks post-processing (picklable, so it reaches worker processes)."""
+
+    def __str__(self):
+        raise ValueError('value cannot be converted to text')
+
+def make_tasks(count=12):
+    return [PostProcessingTask(file_id=str(index), file_name=f'{index}.pdf', extracted_metadata={'amount': str(index * 10), 'amount_confidence': ('High', 'Medium', 'Low')[index % 3], 'vendor': f'Vendor {index}', 'vendor_confidence': 'High'}, template_id='enterprise_1_invoice', doc_category='Invoices', document_type='Invoices') for index in range(count)]
+
+def test_process_and_thread_modes_match():
+    """
+    Test that post-processing in worker processes gives the same results as
+    threads and as inline processing below the process pool threshold.
+    """
+    tasks = make_tasks()
+    process_results = postprocess_batch(tasks, use_processes=True, max_workers=2, batch_size=5)
+    thread_results = postprocess_batch(tasks, use_processes=False, max_workers=2, batch_size=5)
+    inline_results = postprocess_tasks(tasks, process_threshold=len(tasks) + 1)
+    assert list(process_results) == [task.file_id for task in tasks]
+    assert process_results == thread_results == inline_results
+    assert postprocess_tasks(tasks, process_threshold=len(tasks)) == process_results
+    assert process_results['1']['fields']['amount']['ai_confidence'] == 'Medium'
+    print('✅ Process and thread post-processing results match')
+
+def test_postprocessing_errors():
+    """
+    Test that a failing file gets an error result in every mode without
+    affecting the other files of the chunk.
+    """
+    tasks = make_tasks(4)
+    tasks[2].extracted_metadata['vendor'] = UnprintableValue()
+    for results in (postprocess_batch(tasks, use_processes=True, max_workers=2), postprocess_batch(tasks, use_processes=False), postprocess_tasks(tasks, process_threshold=10)):
+        assert 'error' in results['2'] and 'cannot be converted' in results['2']['error']
+        assert results['2']['document_validation_summary']['overall_document_confidence_suggestion'] == 'Low'
+        assert results['2']['fields']['amount']['validations'][0]['status'] == 'error'
+        assert all(('error' not in results[file_id] for file_id in ('0', '1', '3')))
+    print('✅ Post-processing error results verified')
+
+def test_shared_pool_collection():
+    """
+    Test that files submitted one at a time to the shared process pool are
+    collected as they finish, with the same results as inline processing.
+    """
+    tasks = make_tasks(6)
+    tasks[4].extracted_metadata['vendor'] = UnprintableValue()
+    pending = {submit_postprocessing(task): task for task in tasks}
+    collected = collect_postprocessing(pending)
+    assert all((file_id not in [task.file_id for task in pending.values()] for file_id in collected))
+    collected.update(collect_postprocessing(pending, wait=True))
+    assert not pending
+    expected = postprocess_tasks(tasks, process_threshold=len(tasks) + 1)
+    assert collected == expected
+    assert 'error' in collected['4'] and 'cannot be converted' in collected['4']['error']
+    print('✅ Shared process pool collection verified')
+
+def test_parse_in_process():
+    """
+    Test that long consensus responses parsed in the shared process pool match inline parsing.
+    """
+    response = 'Category: Invoice documents\nConfidence: 0.85\nReasoning: ' + 'The document lists line items and totals. ' * 300
+    model1_result = {'document_type': 'Invoices', 'confidence': 0.8}
+    model2_result = {'document_type': 'Contracts', 'confidence': 0.6}
+    assert len(response) >= sequential_consensus_implementation.PARSE_IN_PROCESS_MIN_CHARS
+    assert parse_response(parse_independent_response, response, ['Invoices', 'Contracts']) == parse_independent_response(response, ['Invoices', 'Contracts'])
+    assert parse_response(parse_arbitration_response, response, ['Invoices', 'Contracts'], model1_result, model2_result) == parse_arbitration_response(response, ['Invoices', 'Contracts'], model1_result, model2_result)
+    print('✅ Process-pool response parsing verified')
+if __name__ == '__main__':
+    test_process_and_thread_modes_match()
+    test_postprocessing_errors()
+    test_shared_pool_collection()
+    test_parse_in_process()
@@ -0,0 +1,106 @@
+import os
+import copy
+import json
+import random
+import logging
+import tempfile
+from modules.validation_engine import Validator, ConfidenceAdjuster
+from modules.result_postprocessing import PostProcessingTask, build_structured_result
+from modules.result_store import ExtractionResultStore, FIELD_COLUMNS, FILE_COLUMNS
+from modules.revalidation import revalidate_results
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+RULES = {'document_types': [], 'template_rules': [{'template_id': 'invoice', 'fields': [{'key': 'invoice_number', 'rules': [{'type': 'regex', 'pattern': '^INV-\\d+$'}]}, {'key': 'status', 'rules': [{'type': 'enum', 'values': 'Paid, Unpaid'}]}], 'mandatory_fields': ['vendor']}]}
+
+def make_results(rules_path, count=50, seed=7):
+    rng = random.Random(seed)
+    validator, adjuster = (Validator(rules_path), ConfidenceAdjuster())
+    results = {}
+    for index in range(count):
+        response = {'invoice_number': rng.choice(['INV-1', 'X-2', '']), 'invoice_number_confidence': rng.choice(['High', 'Medium', 'Low']), 'status': rng.choice(['Paid', 'Void']), 'status_confidence': rng.choice(['High', 'Low'])}
+        if rng.random() < 0.5:
+            response['vendor'] = 'Acme'
+        results[f'file_{index}'] = build_structured_result(PostProcessingTask(f'file_{index}', f'{index}.pdf', response, 'enterprise_1_invoice'), validator, adjuster)
+    return results
+
+def test_round_trip():
+    """
+    Test that the store returns the same results that were written, including
+    results and fields in shapes other than the pipeline's.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        rules_path = os.path.join(directory, 'validation_rules.json')
+        with open(rules_path, 'w') as f:
+            json.dump(RULES, f)
+        results = make_results(rules_path)
+    results['error_file'] = {'file_name': 'broken.pdf', 'error': 'Box AI timeout', 'fields': {}}
+    results['odd_file'] = {'file_name': 'odd.pdf', 'fields': {'title': 'plain value', 'amount': {'value': 3}}}
+    results['not_a_dict'] = 'unexpected'
+    store = ExtractionResultStore(copy.deepcopy(results))
+    assert len(store) == len(results)
+    assert list(store) == list(results)
+    assert dict(store) == results
+    assert store['file_0'] is not store['file_0']
+    print('✅ Result store round trip verified')
+
+def test_replace_delete_and_views():
+    """
+    Test replacing and deleting results (with compaction) and that the frames
+    are cached until the store changes.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        rules_path = os.path.join(directory, 'validation_rules.json')
+        with open(rules_path, 'w') as f:
+            json.dump(RULES, f)
+        results = make_results(rules_path, count=600)
+    store = ExtractionResultStore()
+    store.add_results(results)
+    fields_frame = store.fields_frame()
+    assert list(fields_frame.columns) == FIELD_COLUMNS
+    assert len(fields_frame) == sum((len(result['fields']) for result in results.values()))
+    assert store.fields_frame() is fields_frame
+    for rounds in range(3):
+        for index in range(0, 600, 2):
+            store[f'file_{index}'] = results[f'file_{index + 1}']
+    for index in range(1, 600, 4):
+        del store[f'file_{index}']
+        del results[f'file_{index}']
+    for index in range(0, 600, 2):
+        results[f'file_{index}'] = results[f'file_{index + 1}'] if f'file_{index + 1}' in results else store[f'file_{index}']
+    assert dict(store) == results
+    assert store.fields_frame() is not fields_frame
+    fields_frame, files_frame = (store.fields_frame(), store.files_frame())
+    assert list(files_frame.columns) == FILE_COLUMNS
+    assert files_frame['file_id'].tolist() == list(results)
+    assert len(fields_frame) == sum((len(result['fields']) for result in results.values()))
+    first = fields_frame[fields_frame['file_id'] == 'file_2']
+    expected = results['file_2']['fields']
+    assert first['field_key'].tolist() == list(expected)
+    assert first['adjusted_confidence'].tolist() == [field['adjusted_confidence'] for field in expected.values()]
+    assert first['validation_status'].tolist() == [field['field_validation_status'] for field in expected.values()]
+    assert str(fields_frame['validation_status'].dtype) == 'category'
+    print('✅ Result store replace, delete and views verified')
+
+def test_revalidation_writes_back():
+    """
+    Test that re-validation updates results held in the store.
+    """
+    new_rules = copy.deepcopy(RULES)
+    new_rules['template_rules'][0]['fields'][1]['rules'] = [{'type': 'enum', 'values': 'Paid, Void'}]
+    with tempfile.TemporaryDirectory() as directory:
+        rules_path = os.path.join(directory, 'validation_rules.json')
+        with open(rules_path, 'w') as f:
+            json.dump(RULES, f)
+        store = ExtractionResultStore(make_results(rules_path, count=20))
+        with open(rules_path, 'w') as f:
+            json.dump(new_rules, f)
+        expected = make_results(rules_path, count=20)
+    summary = revalidate_results(store, RULES, new_rules)
+    assert summary['results_revalidated'] == 20
+    assert dict(store) == expected
+    assert set(store.fields_frame().query("field_key == 'status'")['validation_status']) == {'pass'}
+    print('✅ Re-validation of stored results verified')
+if __name__ == '__main__':
+    test_round_trip()
+    test_replace_delete_and_views()
+    test_revalidation_writes_back()
@@ -0,0 +1,80 @@
+import random
+import logging
+from modules.result_store import ExtractionResultStore
+from modules.results_view import ResultsView, TABLE_BASE_COLUMNS
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+CONFIDENCES = ['High', 'Medium', 'Low']
+STATUSES = ['pass', 'fail', 'skip']
+
+def make_results(count=400, seed=3):
+    rng = random.Random(seed)
+    results = {}
+    for index in range(count):
+        fields = {}
+        for key in rng.sample(['amount', 'vendor', 'date', 'number'], rng.randint(0, 4)):
+            status = rng.choice(STATUSES)
+            fields[key] = {'value': str(rng.randint(0, 99)), 'ai_confidence': rng.choice(CONFIDENCES), 'adjusted_confidence': rng.choice(CONFIDENCES), 'field_validation_status': status, 'validations': [{'rule_type': 'field_validation', 'status': status, 'message': '', 'confidence_impact': 0.5}]}
+        results[f'file_{index}'] = {'file_name': f"{rng.choice(['Invoice', 'contract'])}_{index}.pdf", 'document_type': 'Invoices', 'fields': fields, 'document_validation_summary': {'overall_document_confidence_suggestion': rng.choice(CONFIDENCES), 'mandatory_fields_status': 'passed', 'cross_field_status': 'pass'}}
+    return results
+
+def loop_filter(results, name_filter, ai_confidences, adjusted_confidences, validation_statuses):
+    """The results viewer's previous per-rerun filter loop."""
+    matched = []
+    for file_id, result in results.items():
+        fields = result['fields'].values()
+        if name_filter.lower() not in result['file_name'].lower():
+            continue
+        if ai_confidences and not any((field['ai_confidence'] in ai_confidences for field in fields)):
+            continue
+        if adjusted_confidences and not any((field['adjusted_confidence'] in adjusted_confidences for field in fields)):
+            continue
+        if validation_statuses and not any((field['field_validation_status'] in validation_statuses for field in fields)):
+            continue
+        matched.append(file_id)
+    return matched
+
+def test_filters_match_loop():
+    """
+    Test that the vectorized filters select the same files as the previous loop
+    and that filter results are memoized until the store changes.
+    """
+    results = make_results()
+    store = ExtractionResultStore(results)
+    view = ResultsView(store)
+    rng = random.Random(5)
+    for _ in range(50):
+        filters = (rng.choice(['', 'invoice', 'CONTRACT_1', '7']), rng.sample(CONFIDENCES, rng.randint(0, 3)), rng.sample(CONFIDENCES, rng.randint(0, 3)), rng.sample(STATUSES + ['error'], rng.randint(0, 4)))
+        assert view.filter(*filters)['file_id'].tolist() == loop_filter(results, *filters)
+    filtered = view.filter('invoice', ['Low'], [], ['fail'])
+    assert view.filter('INVOICE', ['Low'], [], ['fail']) is filtered
+    store['file_0'] = results['file_1']
+    assert view.filter('invoice', ['Low'], [], ['fail']) is not filtered
+    print('✅ Results view filters verified')
+
+def test_summary_and_pages():
+    """
+    Test the precomputed summary columns and the paginated table.
+    """
+    results = make_results()
+    store = ExtractionResultStore(results)
+    view = ResultsView(store)
+    summary = view.summary()
+    for file_id, min_confidence, failed_fields in zip(summary['file_id'], summary['min_adjusted_confidence'], summary['failed_fields']):
+        fields = results[file_id]['fields'].values()
+        expected = min((field['adjusted_confidence'] for field in fields), key=CONFIDENCES[::-1].index) if fields else 'N/A'
+        assert min_confidence == expected
+        assert failed_fields == sum((field['field_validation_status'] == 'fail' for field in fields))
+    filtered = view.filter()
+    assert view.page_count(filtered, 50) == 8
+    page = view.page_table(filtered, 7, 50)
+    assert page['File ID'].tolist() == list(results)[350:400]
+    assert page.columns.tolist()[:len(TABLE_BASE_COLUMNS)] == TABLE_BASE_COLUMNS
+    first = results[page['File ID'].iloc[0]]['fields']
+    for key, field in first.items():
+        assert page[f'{key} Adj. Conf.'].iloc[0] == field['adjusted_confidence']
+    assert view.page_table(filtered, 99, 50)['File ID'].tolist() == page['File ID'].tolist()
+    print('✅ Results view summary and pages verified')
+if __name__ == '__main__':
+    test_filters_match_loop()
+    test_summary_and_pages()
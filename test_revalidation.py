@@ -0,0 +1,50 @@
+import os
+import copy
+import json
+import logging
+import tempfile
+from modules.validation_engine import Validator, ConfidenceAdjuster
+from modules.result_postprocessing import PostProcessingTask, build_structured_result
+from modules.revalidation import diff_template_rules, revalidate_result, revalidate_results
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+RULES = {'document_types': [], 'template_rules': [{'template_id': 'invoice', 'fields': [{'key': 'invoice_number', 'rules': [{'type': 'regex', 'pattern': '^INV-\\d+$'}]}, {'key': 'status', 'rules': [{'type': 'enum', 'values': 'Paid, Unpaid'}]}], 'mandatory_fields': ['vendor']}, {'template_id': 'contract', 'fields': [{'key': 'party', 'rules': [{'type': 'min_length', 'length': 2}]}], 'mandatory_fields': []}]}
+RESPONSES = {'1': ('enterprise_1_invoice', {'invoice_number': 'INV-1', 'invoice_number_confidence': 'High', 'status': 'Void', 'status_confidence': 'Medium', 'vendor': 'Acme'}), '2': ('enterprise_1_invoice', {'invoice_number': 'X-2', 'invoice_number_confidence': 'High', 'status': 'Paid', 'status_confidence': 'High'}), '3': ('enterprise_1_contract', {'party': 'A', 'party_confidence': 'Low'})}
+
+def process_all(rules_path):
+    validator, adjuster = (Validator(rules_path), ConfidenceAdjuster())
+    return {file_id: build_structured_result(PostProcessingTask(file_id, f'{file_id}.pdf', copy.deepcopy(response), template_id), validator, adjuster) for file_id, (template_id, response) in RESPONSES.items()}
+
+def test_revalidation_matches_reprocessing():
+    """
+    Test that re-validating stored results after a rule change gives the same
+    results as reprocessing them, and leaves templates without changes untouched.
+    """
+    new_rules = copy.deepcopy(RULES)
+    new_rules['template_rules'][0]['fields'][1]['rules'] = [{'type': 'enum', 'values': 'Paid, Unpaid, Void'}]
+    new_rules['template_rules'][0]['mandatory_fields'] = ['vendor', 'status']
+    changes = diff_template_rules(RULES['template_rules'][0], new_rules['template_rules'][0])
+    assert changes == {'changed_fields': ['status'], 'mandatory_changed': True}
+    with tempfile.TemporaryDirectory() as directory:
+        rules_path = os.path.join(directory, 'validation_rules.json')
+        with open(rules_path, 'w') as f:
+            json.dump(RULES, f)
+        results = process_all(rules_path)
+        contract_result = copy.deepcopy(results['3'])
+        del results['2']['validation_output']
+        per_file = copy.deepcopy(results)
+        with open(rules_path, 'w') as f:
+            json.dump(new_rules, f)
+        expected = process_all(rules_path)
+    summary = revalidate_results(results, RULES, new_rules)
+    assert summary == {'changed_templates': ['enterprise_1_invoice'], 'results_revalidated': 2, 'fields_revalidated': 3}
+    assert results == expected
+    for file_id in ('1', '2'):
+        assert revalidate_result(per_file[file_id], new_rules['template_rules'][0], changes, ConfidenceAdjuster())
+        assert per_file[file_id] == results[file_id], 'Batch re-validation should match re-validating each file'
+    assert results['3'] == contract_result
+    assert results['1']['fields']['status']['field_validation_status'] == 'pass'
+    assert results['2']['document_validation_summary']['missing_mandatory_fields'] == ['vendor']
+    print('✅ Incremental re-validation verified')
+if __name__ == '__main__':
+    test_revalidation_matches_reprocessing()
@@ -0,0 +1,160 @@
+import os
+import time
+import sqlite3
+import logging
+import tempfile
+import numpy as np
+import streamlit as st
+from modules import run_store as run_store_module
+from modules.run_store import RunStore
+from modules.session_state_manager import bind_session_results, create_categorization_results, create_extraction_results, get_session_run_id, restore_session_run
+from modules.result_store import ExtractionResultStore
+from modules.categorization_results import CategorizationResults
+from test_results_view import make_results
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def test_backed_result_store():
+    """
+    Test that a backed result store writes results through to the run store,
+    reads them back lazily and can be restored from the run.
+    """
+    results = make_results(120)
+    for index, result in enumerate(results.values()):
+        result['template_id_used_for_extraction'] = 'enterprise_1_invoice' if index % 3 else 'enterprise_1_contract'
+        result['raw_ai_response'] = {'amount': str(index)}
+    results['file_5']['error'] = 'Box AI timeout'
+    with tempfile.TemporaryDirectory() as directory:
+        run_store = RunStore(os.path.join(directory, 'runs.db'))
+        store = ExtractionResultStore(run_store=run_store, run_id='run-1')
+        for file_id, result in results.items():
+            store[file_id] = result
+        assert dict(store) == results
+        assert all(('raw_ai_response' not in info for info in store._file_info))
+        assert run_store.count_results('run-1') == 120
+        assert run_store.count_results('run-1', template_id='enterprise_1_contract') == 40
+        assert run_store.list_result_ids('run-1', status='error') == ['file_5']
+        assert [file_id for file_id, _ in run_store.iter_results('run-1', batch_size=7)] == list(results)
+        store['file_0'] = results['file_1']
+        del store['file_2']
+        results['file_0'] = results['file_1']
+        del results['file_2']
+        restored = ExtractionResultStore.from_run(run_store, 'run-1')
+        assert dict(restored) == results
+        assert list(restored) == list(results)
+        assert restored.files_frame()['file_id'].tolist() == list(results)
+        assert restored.fields_frame().equals(store.fields_frame())
+        run_store.create_run('run-1', owner='user-1')
+        assert run_store.list_runs('user-1')[0]['num_results'] == 119
+    print('✅ Run-backed result store verified')
+
+def test_categorization_results():
+    """
+    Test that categorization results are written through and restored in order.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        run_store = RunStore(os.path.join(directory, 'runs.db'))
+        results = CategorizationResults(run_store=run_store, run_id='run-1')
+        results.append({'file_id': '1', 'document_type': 'Invoices', 'confidence': np.float64(0.9)})
+        results.extend([{'file_id': '2', 'document_type': 'Contracts', 'confidence': 0.5}, {'file_id': '3', 'document_type': 'Invoices', 'confidence': 0.7}])
+        results.insert(0, {'file_id': '0', 'document_type': 'Other', 'confidence': 0.1})
+        del results[2]
+        expected = [{'file_id': '0', 'document_type': 'Other', 'confidence': 0.1}, {'file_id': '1', 'document_type': 'Invoices', 'confidence': 0.9}, {'file_id': '3', 'document_type': 'Invoices', 'confidence': 0.7}]
+        assert results == expected
+        assert CategorizationResults.from_run(run_store, 'run-1') == expected
+        assert [result['file_id'] for result in run_store.get_categorizations('run-1', document_type='Invoices')] == ['1', '3']
+        results.clear()
+        assert CategorizationResults.from_run(run_store, 'run-1') == []
+    print('✅ Run-backed categorization results verified')
+
+class FakeUser:
+
+    def __init__(self, user_id):
+        self.id = user_id
+
+def test_run_owners_and_retention():
+    """
+    Test that runs are listed and restored only for their owner, that owners
+    are added to older databases and that old runs are purged.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'runs.db')
+        with sqlite3.connect(path) as conn:
+            conn.execute('CREATE TABLE runs (run_id TEXT PRIMARY KEY, created_at REAL NOT NULL, updated_at REAL NOT NULL, metadata TEXT)')
+            conn.execute("INSERT INTO runs VALUES ('legacy', 0, 0, '{}')")
+        run_store = RunStore(path)
+        assert run_store.get_run_owner('legacy') is None
+        run_store.create_run('run-a', metadata={'ai_model': 'm'}, owner='alice')
+        run_store.create_run('run-a', owner='mallory')
+        assert run_store.get_run_owner('run-a') == 'alice'
+        assert run_store.list_runs('alice')[0]['metadata'] == {'ai_model': 'm'}
+        run_store.save_result('run-a', '1', {'file_name': '1.pdf', 'fields': {}})
+        run_store.save_result('run-b', '2', {'file_name': '2.pdf', 'fields': {}})
+        assert [run['run_id'] for run in run_store.list_runs('alice')] == ['run-a']
+        assert run_store.list_runs('mallory') == []
+        original_store, original_purge = (run_store_module._run_store, run_store_module._last_purge)
+        run_store_module._run_store, run_store_module._last_purge = (run_store, time.time())
+        try:
+            st.session_state.clear()
+            st.session_state.user = FakeUser('mallory')
+            mallory_run = get_session_run_id()
+            assert run_store.get_run_owner(mallory_run) == 'mallory'
+            assert restore_session_run('run-a') is False
+            assert get_session_run_id() == mallory_run
+            st.session_state.user = FakeUser('alice')
+            assert get_session_run_id() != mallory_run, "A new user must not write to another user's run"
+            assert restore_session_run('run-a') is True
+            assert dict(st.session_state.extraction_results) == {'1': {'file_name': '1.pdf', 'fields': {}}}
+        finally:
+            run_store_module._run_store, run_store_module._last_purge = (original_store, original_purge)
+            st.session_state.clear()
+        assert run_store.purge_runs(3600) == 1
+        assert run_store.get_run_owner('run-a') == 'alice' and run_store.count_results('run-b') == 1
+        time.sleep(0.05)
+        assert run_store.purge_runs(0.01) >= 4
+        assert run_store.count_results('run-a') == 0 and run_store.list_runs('alice') == []
+    print('✅ Run owners and retention verified')
+
+def test_results_bound_at_login():
+    """
+    Test that results stored before login end up in a run of the user who logs
+    in, and that the session's next user gets a run of their own.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        run_store = RunStore(os.path.join(directory, 'runs.db'))
+        run_store.save_result('run-c', '1', {'file_name': '1.pdf', 'fields': {}}, owner='carol')
+        run_store.save_result('run-c', '2', {'file_name': '2.pdf', 'fields': {}}, owner='mallory')
+        assert run_store.get_run_owner('run-c') == 'carol'
+        original_store, original_purge = (run_store_module._run_store, run_store_module._last_purge)
+        run_store_module._run_store, run_store_module._last_purge = (run_store, time.time())
+        try:
+            st.session_state.clear()
+            st.session_state.extraction_results = create_extraction_results()
+            st.session_state.document_categorization = {'results': create_categorization_results(), 'is_categorized': False}
+            st.session_state.extraction_results['1'] = {'file_name': '1.pdf', 'fields': {}}
+            anonymous_run = st.session_state.extraction_results.run_id
+            assert run_store.get_run_owner(anonymous_run) is None
+            st.session_state.user = FakeUser('alice')
+            bind_session_results()
+            assert [run['run_id'] for run in run_store.list_runs('alice')] == [anonymous_run]
+            st.session_state.extraction_results['2'] = {'file_name': '2.pdf', 'fields': {}}
+            st.session_state.document_categorization['results'].append({'file_id': '2', 'document_type': 'Invoices'})
+            assert run_store.count_results(anonymous_run) == 2 and len(run_store.get_categorizations(anonymous_run)) == 1
+            st.session_state.user = FakeUser('bob')
+            bind_session_results()
+            bob_run = st.session_state.extraction_results.run_id
+            assert bob_run != anonymous_run and len(st.session_state.extraction_results) == 0
+            assert st.session_state.document_categorization['results'].run_id == bob_run
+            st.session_state.extraction_results['3'] = {'file_name': '3.pdf', 'fields': {}}
+            assert run_store.count_results(anonymous_run) == 2, "Another user's results must not be written to alice's run"
+            assert [run['run_id'] for run in run_store.list_runs('bob')] == [bob_run]
+            assert [run['run_id'] for run in run_store.list_runs('alice')] == [anonymous_run]
+        finally:
+            run_store_module._run_store, run_store_module._last_purge = (original_store, original_purge)
+            st.session_state.clear()
+    print('✅ Results bound to the logged-in user verified')
+if __name__ == '__main__':
+    test_backed_result_store()
+    test_categorization_results()
+    test_run_owners_and_retention()
+    test_results_bound_at_login()
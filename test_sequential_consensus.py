@@ -0,0 +1,49 @@
+import time
+import logging
+from modules import document_categorization_utils, sequential_consensus_implementation
+from modules.sequential_consensus_implementation import categorize_document_with_sequential_consensus
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+DOCUMENT_TYPES = [{'name': 'Invoices', 'description': 'Bills'}, {'name': 'Contracts', 'description': 'Agreements'}]
+CALL_DELAY = 0.1
+
+def fake_result(document_type):
+    time.sleep(CALL_DELAY)
+    return {'document_type': document_type, 'confidence': 0.8, 'reasoning': 'Fake reasoning long enough to count as detailed.'}
+
+def run_consensus(execution_mode, review_category, calls):
+    """Run consensus with fake model calls where Model 1 says Invoices and Model 2 says Contracts."""
+    originals = (document_categorization_utils.categorize_document, document_categorization_utils.extract_document_features, sequential_consensus_implementation.independent_categorization, sequential_consensus_implementation.review_categorization, sequential_consensus_implementation.arbitrate_categorization)
+    document_categorization_utils.categorize_document = lambda file_id, model, types: calls.append('model1') or fake_result('Invoices')
+    document_categorization_utils.extract_document_features = lambda file_id: {}
+    sequential_consensus_implementation.independent_categorization = lambda file_id, model, types: calls.append('independent') or fake_result('Contracts')
+    sequential_consensus_implementation.review_categorization = lambda file_id, model, model1_result, independent_result, types: calls.append('review') or fake_result(review_category)
+    sequential_consensus_implementation.arbitrate_categorization = lambda file_id, model, model1_result, model2_result, types: calls.append(('arbitration', model2_result['document_type'])) or fake_result('Contracts')
+    try:
+        start = time.time()
+        result = categorize_document_with_sequential_consensus('1', 'm1', 'm2', 'm3', DOCUMENT_TYPES, 0.2, execution_mode)
+        return (result, time.time() - start)
+    finally:
+        document_categorization_utils.categorize_document, document_categorization_utils.extract_document_features, sequential_consensus_implementation.independent_categorization, sequential_consensus_implementation.review_categorization, sequential_consensus_implementation.arbitrate_categorization = originals
+
+def test_speculative_consensus():
+    """
+    Test that speculative execution overlaps the independent calls and
+    arbitration with the review, and falls back when the review changes.
+    """
+    calls = []
+    result, sequential_time = run_consensus('sequential', 'Contracts', calls)
+    assert result['model3_result']['document_type'] == 'Contracts'
+    assert sequential_time >= 4 * CALL_DELAY
+    calls = []
+    result, speculative_time = run_consensus('speculative', 'Contracts', calls)
+    assert speculative_time < 3 * CALL_DELAY
+    assert result['model3_result'].get('speculative') is True
+    assert result['sequential_consensus']['execution_mode'] == 'speculative'
+    calls = []
+    result, _ = run_consensus('speculative', 'Invoices', calls)
+    assert 'model3_result' not in result
+    assert result['document_type'] == 'Invoices'
+    print('✅ Speculative sequential consensus verified')
+if __name__ == '__main__':
+    test_speculative_consensus()
@@ -0,0 +1,25 @@
+import json
+import logging
+from modules.metadata_extraction import StructuredRequestBuilder, STRUCTURED_EXTRACTION_SYSTEM_MESSAGE
+from modules.processing import parse_template_id
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def test_builder_matches_request_body():
+    """
+    Test that the precompiled builder produces the same body as building the
+    request dict for each file.
+    """
+    agent_config = {'model': 'azure__openai__gpt_4o_mini', 'mode': 'default', 'system_message': STRUCTURED_EXTRACTION_SYSTEM_MESSAGE}
+    metadata_template = {'scope': 'enterprise', 'template_key': 'invoice', 'id': 'enterprise_123_invoice'}
+    builder = StructuredRequestBuilder('azure__openai__gpt_4o_mini', fields=[{'key': 'total'}], metadata_template=metadata_template)
+    for file_id in ('12345', 'quote"id'):
+        expected = {'items': [{'id': file_id, 'type': 'file'}], 'ai_agent': {'type': 'ai_agent_extract_structured', 'long_text': agent_config, 'basic_text': agent_config}, 'metadata_template': metadata_template}
+        assert json.loads(builder.build(file_id)) == expected
+    fields_body = json.loads(StructuredRequestBuilder('model', fields=[{'name': 'status', 'type': 'enum', 'options': [{'key': 'Paid'}]}]).build('1'))
+    assert fields_body['fields'] == [{'key': 'status', 'displayName': 'status', 'type': 'enum', 'options': [{'key': 'Paid'}]}]
+    assert parse_template_id('enterprise_336904155_tax_form') == ('enterprise', 'tax_form', 'enterprise_336904155')
+    assert parse_template_id('invoice') == ('enterprise', 'invoice', 'enterprise')
+    print('✅ Structured request builder verified')
+if __name__ == '__main__':
+    test_builder_matches_request_body()
@@ -0,0 +1,104 @@
+import time
+import logging
+import threading
+from modules.template_registry import TemplateRegistry
+from modules.processing import parse_template_id
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class FakeTemplateRequest:
+
+    def __init__(self, client, scope, template_key):
+        self.client = client
+        self.scope = scope
+        self.template_key = template_key
+
+    def get(self):
+        with self.client.lock:
+            self.client.fetches.append((self.scope, self.template_key))
+        time.sleep(0.05)
+        if self.template_key not in self.client.templates:
+            error = Exception('Not Found')
+            error.status = 404
+            raise error
+        return self.client.templates[self.template_key]
+
+class FakeClient:
+    """Box client stand-in that counts metadata template fetches."""
+
+    def __init__(self, templates):
+        self.templates = templates
+        self.fetches = []
+        self.lock = threading.Lock()
+
+    def metadata_template(self, scope, template_key):
+        return FakeTemplateRequest(self, scope, template_key)
+
+def test_registry_shares_fetches_and_derives_forms():
+    """
+    Test that concurrent sessions share one fetch per template and that the
+    derived forms are built from the template fields.
+    """
+    client = FakeClient({'invoice': {'displayName': 'Invoice', 'fields': [{'key': 'invoice_number', 'type': 'string', 'displayName': 'Invoice Number'}, {'key': 'total', 'type': 'float'}, {'key': 'status', 'type': 'enum', 'options': [{'key': 'Paid'}]}]}})
+    registry = TemplateRegistry(ttl=60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get_ai_fields(client, 'enterprise_123', 'invoice'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.fetches == [('enterprise', 'invoice')]
+    assert all((result == results[0] for result in results))
+    assert results[0][1] == {'key': 'total', 'type': 'float', 'displayName': 'total'}
+    entry = registry.get(client, 'enterprise_123', 'invoice')
+    assert entry.key_types == {'invoice_number': 'string', 'total': 'float', 'status': 'enum'}
+    assert entry.valid_keys == frozenset({'invoice_number', 'total', 'status'})
+    assert registry.get_schema(client, 'enterprise_123', 'invoice')['total']['displayName'] == 'Total'
+    assert registry.get_schema(client, 'enterprise_123', 'missing') is None
+    assert registry.get_error('enterprise_123', 'missing')['error_status'] == 404
+    print('✅ Template registry sharing verified')
+
+def test_registry_background_refresh_and_versions():
+    """
+    Test that a stale entry is served while it is refreshed in the background
+    and that the version only changes when the template changes.
+    """
+    client = FakeClient({'invoice': {'fields': [{'key': 'total', 'type': 'float'}]}})
+    registry = TemplateRegistry(ttl=0.1)
+    first = registry.get(client, 'enterprise_123', 'invoice')
+    assert first.version == 1
+    time.sleep(0.15)
+    client.templates['invoice'] = {'fields': [{'key': 'total', 'type': 'float'}, {'key': 'vendor', 'type': 'string'}]}
+    stale = registry.get(client, 'enterprise_123', 'invoice')
+    assert stale is first
+    time.sleep(0.2)
+    refreshed = registry.get(client, 'enterprise_123', 'invoice')
+    assert refreshed.version == 2
+    assert 'vendor' in refreshed.valid_keys
+    registry.put_template('enterprise_123', 'invoice', client.templates['invoice'])
+    assert registry.get(client, 'enterprise_123', 'invoice').version == 2
+    print('✅ Template registry refresh verified')
+
+def test_registry_does_not_share_unknown_tenants():
+    """
+    Test that templates and errors fetched without an enterprise ID are not
+    served to sessions of other enterprises.
+    """
+    first_tenant = FakeClient({'invoice': {'fields': [{'key': 'total', 'type': 'float'}]}})
+    second_tenant = FakeClient({'invoice': {'fields': [{'key': 'vendor', 'type': 'string'}]}})
+    registry = TemplateRegistry(ttl=60)
+    assert parse_template_id('invoice') == ('enterprise', 'invoice', 'enterprise')
+    assert parse_template_id('invoice', '456') == ('enterprise', 'invoice', 'enterprise_456')
+    assert registry.get_schema(first_tenant, 'enterprise', 'invoice').keys() == {'total'}
+    assert registry.get_schema(second_tenant, 'enterprise', 'invoice').keys() == {'vendor'}
+    assert registry.get(FakeClient({}), 'enterprise', 'invoice').error['error_status'] == 404
+    assert registry.get_schema(first_tenant, 'enterprise', 'invoice').keys() == {'total'}
+    registry.put_template('enterprise', 'invoice', second_tenant.templates['invoice'])
+    assert registry.entries == {} and registry.stats['uncached'] == 4
+    assert registry.get_schema(second_tenant, 'enterprise_456', 'invoice').keys() == {'vendor'}
+    assert list(registry.entries) == [('enterprise_456', 'invoice')]
+    print('✅ Template registry tenant isolation verified')
+if __name__ == '__main__':
+    test_registry_shares_fetches_and_derives_forms()
+    test_registry_background_refresh_and_versions()
+    test_registry_does_not_share_unknown_tenants()
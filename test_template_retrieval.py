@@ -0,0 +1,86 @@
+import os
+import logging
+import tempfile
+import threading
+from modules import metadata_template_retrieval
+from modules.metadata_template_retrieval import TemplateIndex, refresh_templates_for_scope
+from modules.template_registry import TemplateRegistry
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+class FakeResponse:
+
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self.data = data
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f'HTTP {self.status_code}')
+
+    def json(self):
+        return self.data
+
+class FakeSession:
+    """requests.Session stand-in serving marker-paginated template listings with ETags."""
+    pages = {}
+    requests = []
+    lock = threading.Lock()
+
+    def __init__(self):
+        self.headers = {}
+
+    def get(self, url, params=None, headers=None):
+        marker = params.get('marker')
+        with self.lock:
+            self.requests.append((marker, bool(headers.get('If-None-Match'))))
+        entries, next_marker = self.pages[marker]
+        etag = f'"{hash(str((entries, next_marker)))}"'
+        if headers.get('If-None-Match') == etag:
+            return FakeResponse(304)
+        return FakeResponse(200, {'entries': entries, 'next_marker': next_marker}, {'ETag': etag})
+
+def template(key, fields):
+    return {'templateKey': key, 'scope': 'enterprise_1', 'displayName': key.title(), 'fields': [{'key': field, 'type': 'string'} for field in fields]}
+
+def test_index_revalidation_and_deltas():
+    """
+    Test that a refresh revalidates indexed pages with conditional requests,
+    follows a changed marker chain and only pushes changed templates to the registry.
+    """
+    registry = TemplateRegistry()
+    original_session, original_registry = metadata_template_retrieval.requests.Session, metadata_template_retrieval.get_template_registry
+    metadata_template_retrieval.requests.Session = FakeSession
+    metadata_template_retrieval.get_template_registry = lambda: registry
+    try:
+        check_index_revalidation_and_deltas(registry)
+    finally:
+        metadata_template_retrieval.requests.Session = original_session
+        metadata_template_retrieval.get_template_registry = original_registry
+    print('✅ Template index revalidation verified')
+
+def check_index_revalidation_and_deltas(registry):
+    FakeSession.pages = {None: ([template('invoice', ['total'])], 'm2'), 'm2': ([template('contract', ['party'])], None)}
+    record = refresh_templates_for_scope('token', 'enterprise')
+    assert [page['marker'] for page in record['pages']] == [None, 'm2']
+    assert registry.get(None, 'enterprise_1', 'contract').version == 1
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'index.json')
+        TemplateIndex(path).put('user', 'enterprise', record)
+        record = TemplateIndex(path).get('user', 'enterprise')
+    FakeSession.requests = []
+    FakeSession.pages['m2'] = ([template('contract', ['party', 'term'])], 'm3')
+    FakeSession.pages['m3'] = ([template('lease', ['rent'])], None)
+    registry.put_template('enterprise_1', 'invoice', {'fields': []})
+    refreshed = refresh_templates_for_scope('token', 'enterprise', record)
+    assert sorted(FakeSession.requests, key=str) == sorted([(None, True), ('m2', True), ('m3', False)], key=str)
+    assert refreshed['pages'][0] is record['pages'][0]
+    assert sorted(refreshed['hashes']) == ['enterprise_1/contract', 'enterprise_1/invoice', 'enterprise_1/lease']
+    assert registry.get(None, 'enterprise_1', 'contract').version == 2
+    assert registry.get(None, 'enterprise_1', 'invoice').fields == ()
+    FakeSession.pages = {None: ([template('invoice', ['total'])], None)}
+    refresh_templates_for_scope('token', 'enterprise', refreshed)
+    assert ('enterprise_1', 'contract') not in registry.entries
+if __name__ == '__main__':
+    test_index_revalidation_and_deltas()
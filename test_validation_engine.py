@@ -0,0 +1,78 @@
+import os
+import copy
+import json
+import time
+import logging
+import tempfile
+from modules.validation_engine import Validator, RuleStore, get_rule_store
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+RULES = {'document_types': [], 'template_rules': [{'template_id': 'invoice', 'fields': [{'key': 'invoice_number', 'rules': [{'type': 'regex', 'pattern': '^INV-\\d+$', 'name': 'Format'}]}, {'key': 'Status', 'rules': [{'type': 'enum', 'values': 'Paid, Unpaid'}]}], 'mandatory_fields': ['Vendor Name']}]}
+
+def test_compiled_plans_are_reused_and_reloaded():
+    """
+    Test that validation plans are compiled once per rules file version,
+    matched by raw or cleaned template ID, and recompiled after the file changes.
+    """
+    rules = copy.deepcopy(RULES)
+    with tempfile.TemporaryDirectory() as directory:
+        rules_path = os.path.join(directory, 'validation_rules.json')
+        with open(rules_path, 'w') as f:
+            json.dump(rules, f)
+        validator = Validator(rules_path)
+        result = validator.validate({'invoice_number': {'value': 'INV-7', 'confidence': 'High'}, 'status': ' Paid ', 'vendor-name': 'Acme'}, template_id='enterprise_123_invoice')
+        assert result['field_validations']['invoice_number']['status'] == 'pass'
+        assert result['field_validations']['Status']['status'] == 'pass'
+        assert result['mandatory_check'] == {'status': 'Passed', 'missing_fields': []}
+        plan = validator.get_plan(None, 'enterprise_123_invoice')
+        result = validator.validate({'invoice_number': 'X-1', 'Status': 'Void'}, template_id='enterprise_123_invoice')
+        assert validator.get_plan(None, 'enterprise_123_invoice') is plan
+        assert result['field_validations']['invoice_number']['messages'] == ["Format: Value 'X-1' does not match pattern '^INV-\\d+$'"]
+        assert result['field_validations']['Status']['status'] == 'fail'
+        assert result['mandatory_check']['missing_fields'] == ['Vendor Name']
+        rules['template_rules'][0]['mandatory_fields'] = []
+        time.sleep(0.01)
+        with open(rules_path, 'w') as f:
+            json.dump(rules, f)
+        assert validator.validate({}, template_id='invoice')['mandatory_check']['status'] == 'Passed'
+        assert validator.get_plan(None, 'enterprise_123_invoice') is not plan
+    print('✅ Compiled validation plans verified')
+
+def test_rule_store_snapshots():
+    """
+    Test that the rule store shares one frozen snapshot per file version,
+    hot-reloads changed files and keeps the last good snapshot while the file is unreadable.
+    """
+    rules = copy.deepcopy(RULES)
+    with tempfile.TemporaryDirectory() as directory:
+        rules_path = os.path.join(directory, 'validation_rules.json')
+        with open(rules_path, 'w') as f:
+            json.dump(rules, f)
+        store = get_rule_store(rules_path)
+        assert get_rule_store(rules_path) is store
+        snapshot = store.snapshot()
+        assert store.snapshot() is snapshot
+        assert Validator(rules_path).get_rules_loader() is snapshot
+        assert snapshot.get_rules_for_category_template(None, 'enterprise_123_invoice')['mandatory_fields'] == ('Vendor Name',)
+        try:
+            snapshot.rules['template_rules'][0]['fields'] = []
+            assert False, 'snapshot rules must be read-only'
+        except TypeError:
+            pass
+        editable = snapshot.mutable_rules()
+        assert editable == rules
+        editable['template_rules'][0]['mandatory_fields'] = []
+        time.sleep(0.01)
+        with open(rules_path, 'w') as f:
+            f.write('{"template_rules": [')
+        assert store.snapshot() is snapshot
+        with open(rules_path, 'w') as f:
+            json.dump(editable, f)
+        reloaded = store.snapshot()
+        assert reloaded is not snapshot
+        assert reloaded.get_rules_for_category_template(None, 'invoice')['mandatory_fields'] == ()
+        assert RuleStore(rules_path).snapshot().mutable_rules() == editable
+    print('✅ Rule store snapshots verified')
+if __name__ == '__main__':
+    test_compiled_plans_are_reused_and_reloaded()
+    test_rule_store_snapshots()